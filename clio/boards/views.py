@@ -3,11 +3,13 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
+from django.contrib.auth.models import User
 from django.http import JsonResponse
 from django.views.decorators.http import require_POST
 from django.db.models import Q
 import json
 
+from core.pagination import KeysetPaginator, InvalidCursor, parse_per_page
 from .models import Board, Card, CardComment, CardDocument
 from .forms import CardForm, CardCommentForm, CardDocumentForm, BoardForm
 from systems.models import System
@@ -141,6 +143,13 @@ def card_list(request):
             Q(description__icontains=search_query)
         )
     
+    paginator = KeysetPaginator(cards, ['-updated_at'], per_page=parse_per_page(request.GET.get('per_page')),
+                                count='approximate')
+    try:
+        page_obj = paginator.page(request.GET.get('cursor'))
+    except InvalidCursor:
+        page_obj = paginator.page()
+    
     # Get filter options
     systems = System.objects.all()
     workflows = Workflow.objects.all()
@@ -148,7 +157,9 @@ def card_list(request):
     users = User.objects.all()
     
     context = {
-        'cards': cards,
+        'cards': page_obj,
+        'page_obj': page_obj,
+        'paginator': paginator,
         'systems': systems,
         'workflows': workflows,
         'scripts': scripts,
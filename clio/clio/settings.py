@@ -39,6 +39,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.profiling.QueryProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -128,6 +129,16 @@ SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
 CSRF_TRUSTED_ORIGINS = [config('CSRF_TRUSTED_ORIGINS')]
 
 
+# SQL profiling and per-view query budgets (core/profiling.py); turn on
+# QUERY_BUDGET_STRICT in test runs so views over budget fail the tests
+QUERY_PROFILING = config('QUERY_PROFILING', default=False, cast=bool)
+QUERY_BUDGET_STRICT = config('QUERY_BUDGET_STRICT', default=False, cast=bool)
+
+# Workflow version storage (workflows/versioning.py): a full snapshot every
+# WORKFLOW_SNAPSHOT_INTERVAL versions with deltas in between, zlib-compressed
+WORKFLOW_SNAPSHOT_INTERVAL = config('WORKFLOW_SNAPSHOT_INTERVAL', default=20, cast=int)
+WORKFLOW_VERSION_COMPRESSION = config('WORKFLOW_VERSION_COMPRESSION', default=True, cast=bool)
+
 # Login redirects
 LOGIN_URL = '/accounts/login/'
 LOGIN_REDIRECT_URL = '/'
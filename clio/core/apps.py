@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        from .signals import connect_search_signals, connect_lookup_signals, connect_dashboard_signals
+        connect_search_signals()
+        connect_lookup_signals()
+        connect_dashboard_signals()
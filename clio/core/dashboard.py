@@ -0,0 +1,108 @@
+# core/dashboard.py
+
+"""
+Statistics for the dashboard on the landing page.
+
+Every count comes out of one grouped query over systems plus a COUNT each for
+workflows and scripts, instead of one COUNT per category and status. The
+result, including the recently updated lists, is cached until a system,
+category, status, workflow or script is written: the handlers in
+core/signals.py drop it once the write commits, and bulk writers call
+invalidate_dashboard_stats themselves.
+"""
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count
+
+from scripts.models import Script
+from systems.models import System, SystemCategory, SystemStatus
+from workflows.models import Workflow
+
+DASHBOARD_CACHE_KEY = 'core:dashboard-stats'
+# Backstop for per-process caches, which the signal handlers can't reach
+DASHBOARD_CACHE_TIMEOUT = 300
+RECENT_LIMIT = 5
+
+# Models whose writes change the dashboard
+DASHBOARD_MODELS = [System, SystemCategory, SystemStatus, Workflow, Script]
+
+
+def compute_dashboard_stats():
+    """
+    Return the dashboard's counts and recently updated items
+
+    Returns:
+        dict: system_count, workflow_count, script_count, active_systems,
+              deprecated_systems, category_counts, status_counts and the
+              recent_systems, recent_workflows and recent_scripts lists
+    """
+    category_totals = {}
+    status_totals = {}
+    system_count = 0
+    grouped = System.objects.order_by().values_list('category_id', 'status_id').annotate(count=Count('id'))
+    for category_id, status_id, count in grouped:
+        category_totals[category_id] = category_totals.get(category_id, 0) + count
+        status_totals[status_id] = status_totals.get(status_id, 0) + count
+        system_count += count
+
+    category_counts = [
+        {
+            'name': category.name,
+            'count': category_totals.get(category.id, 0),
+            'color': category.color,
+            'text_color': category.text_color,
+            'slug': category.slug
+        }
+        for category in SystemCategory.objects.order_by('order', 'name')
+    ]
+    status_counts = [
+        {
+            'name': status.name,
+            'count': status_totals.get(status.id, 0),
+            'color': status.color,
+            'text_color': status.text_color,
+            'slug': status.slug,
+            'is_active': status.is_active
+        }
+        for status in SystemStatus.objects.order_by('order', 'name')
+    ]
+    counts_by_slug = {status['slug']: status['count'] for status in status_counts}
+
+    return {
+        'system_count': system_count,
+        'workflow_count': Workflow.objects.count(),
+        'script_count': Script.objects.count(),
+        'active_systems': counts_by_slug.get('active', 0),
+        'deprecated_systems': counts_by_slug.get('deprecated', 0),
+        'category_counts': category_counts,
+        'status_counts': status_counts,
+        # Only the columns the dashboard shows, to keep the cached copy small
+        'recent_systems': list(
+            System.objects.select_related('status')
+            .only('name', 'vendor', 'updated_at', 'status__name', 'status__color', 'status__text_color')
+            .order_by('-updated_at')[:RECENT_LIMIT]
+        ),
+        'recent_workflows': list(
+            Workflow.objects.only('name', 'description', 'status', 'updated_at').order_by('-updated_at')[:RECENT_LIMIT]
+        ),
+        'recent_scripts': list(
+            Script.objects.only('name', 'description', 'updated_at').order_by('-updated_at')[:RECENT_LIMIT]
+        ),
+    }
+
+
+def get_dashboard_stats():
+    """Return the cached dashboard statistics, computing them if needed"""
+    stats = cache.get(DASHBOARD_CACHE_KEY)
+    if stats is None:
+        stats = compute_dashboard_stats()
+        cache.set(DASHBOARD_CACHE_KEY, stats, DASHBOARD_CACHE_TIMEOUT)
+    return stats
+
+
+def invalidate_dashboard_stats():
+    """Drop the cached statistics once the current transaction commits"""
+    # Deleting before the commit would let a concurrent request cache the
+    # old figures again
+    transaction.on_commit(lambda: cache.delete(DASHBOARD_CACHE_KEY))
@@ -0,0 +1,142 @@
+# core/lookups.py
+
+"""
+Typeahead lookups for pickers that used to be filled with every row.
+
+A PrefixIndex keeps, for every word of every item's searchable text, the text
+from that word on in one sorted list. Finding the items with a word starting
+with the typed prefix is then a bisect to the first key at or after it plus a
+slice up to the last key that still starts with it, whatever the size of the
+table. Indexes are built once and kept in process memory, since unpickling
+one from the shared cache would cost far more than the search. The systems
+index follows the graph version (systems/lookups.py). The users index below
+follows a small version counter in the cache, which the handlers in
+core/signals.py bump whenever a user changes.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+
+from .pagination import parse_per_page
+
+DEFAULT_LOOKUP_LIMIT = 20
+USERS_VERSION_CACHE_KEY = 'core:user-lookup-version'
+# Backstop for per-process caches, which the signal handlers can't reach
+USERS_INDEX_MAX_AGE = 300
+# Sorts after every character, so prefix + this bounds the keys starting with prefix
+_MAX_CHAR = '\U0010ffff'
+
+
+def _normalize(text):
+    return ' '.join(str(text).casefold().split())
+
+
+class PrefixIndex:
+    """Items findable by a prefix of any word in their search texts"""
+
+    def __init__(self, items):
+        """
+        Args:
+            items: (item, texts) pairs in display order, where item is the
+                   JSON-ready dict returned for a match and texts are the
+                   strings it can be found by
+        """
+        self.items = []
+        keys = []
+        for position, (item, texts) in enumerate(items):
+            self.items.append(item)
+            for text in texts:
+                words = _normalize(text).split(' ') if text else []
+                for start in range(len(words)):
+                    keys.append((' '.join(words[start:]), position, start))
+        keys.sort()
+        self.keys = [key for key, _, _ in keys]
+        self.entries = [(position, start) for _, position, start in keys]
+
+    def __len__(self):
+        return len(self.items)
+
+    def search(self, query, offset=0, limit=DEFAULT_LOOKUP_LIMIT):
+        """
+        Return (items, has_more) for one page of the items matching query
+
+        Items whose text starts with the query come first, then those with a
+        later word starting with it, each group in display order.
+        """
+        prefix = _normalize(query)
+        if not prefix:
+            positions = range(len(self.items))
+        else:
+            start = bisect_left(self.keys, prefix)
+            end = bisect_left(self.keys, prefix + _MAX_CHAR, start)
+            best = {}
+            for position, word in self.entries[start:end]:
+                best[position] = min(word, best.get(position, word))
+            positions = sorted(best, key=lambda position: (best[position] > 0, position))
+        page = positions[offset:offset + limit]
+        return [self.items[position] for position in page], offset + limit < len(positions)
+
+
+def lookup_page(index, params):
+    """
+    Answer a lookup request from its q, offset and limit parameters
+
+    Returns:
+        dict: results, plus next_offset for the following page or None
+    """
+    try:
+        offset = max(int(params.get('offset', 0)), 0)
+    except ValueError:
+        offset = 0
+    limit = parse_per_page(params.get('limit'), default=DEFAULT_LOOKUP_LIMIT)
+    results, has_more = index.search(params.get('q', ''), offset, limit)
+    return {
+        'results': results,
+        'next_offset': offset + limit if has_more else None,
+    }
+
+
+def user_lookup_entry(user):
+    return {
+        'id': user.id,
+        'name': user.get_full_name() or user.username,
+        'username': user.username,
+        'email': user.email,
+    }
+
+
+def build_user_index():
+    users = User.objects.filter(is_active=True).order_by('first_name', 'last_name', 'username')
+    return PrefixIndex(
+        (user_lookup_entry(user), [user.get_full_name(), user.username, user.email])
+        for user in users
+    )
+
+
+_user_index = None
+_user_index_state = None
+_user_index_lock = threading.Lock()
+
+
+def get_user_index():
+    """Return this process's user index, rebuilding it if users changed"""
+    global _user_index, _user_index_state
+    version = cache.get(USERS_VERSION_CACHE_KEY, 0)
+    now = time.monotonic()
+    with _user_index_lock:
+        if (_user_index is None or _user_index_state[0] != version
+                or now - _user_index_state[1] > USERS_INDEX_MAX_AGE):
+            _user_index = build_user_index()
+            _user_index_state = (version, now)
+        return _user_index
+
+
+def invalidate_user_index():
+    try:
+        cache.incr(USERS_VERSION_CACHE_KEY)
+    except ValueError:
+        cache.set(USERS_VERSION_CACHE_KEY, 1, None)
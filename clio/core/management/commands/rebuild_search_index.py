@@ -0,0 +1,29 @@
+# core/management/commands/rebuild_search_index.py
+
+from django.core.management.base import BaseCommand, CommandError
+from core.search import SEARCH_ENTRY_INDEX, SEARCH_TYPES, rebuild_search_entries
+from systems.search import SYSTEM_INDEX, get_search_backend, rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the system search index and the global search entries'
+
+    def add_arguments(self, parser):
+        parser.add_argument('types', nargs='*', help=f'Search types to rebuild (default all: {", ".join(SEARCH_TYPES)})')
+
+    def handle(self, *args, **options):
+        unknown = [key for key in options['types'] if key not in SEARCH_TYPES]
+        if unknown:
+            raise CommandError(f'Unknown search types: {", ".join(unknown)}')
+
+        if not options['types']:
+            rebuild_search_index(SYSTEM_INDEX)
+            self.stdout.write(f'System search index rebuilt ({get_search_backend(SYSTEM_INDEX).name} backend)')
+
+        counts = rebuild_search_entries(options['types'] or None)
+        for key, count in counts.items():
+            self.stdout.write(f'  {SEARCH_TYPES[key].label}: {count}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Global search rebuilt with {sum(counts.values())} entries '
+            f'({get_search_backend(SEARCH_ENTRY_INDEX).name} backend)'
+        ))
@@ -0,0 +1,186 @@
+# Full-text index over the global search entries, filled from existing data
+#
+# The index SQL and the entry builders are frozen copies of what
+# systems.search.install_search_index and core.search.SEARCH_TYPES did when
+# this migration was written, so later changes there don't alter it
+
+from django.db import migrations
+
+BATCH_SIZE = 500
+COMMENT_TITLE_LENGTH = 80
+
+SQLITE_INSTALL = [
+    "CREATE VIRTUAL TABLE core_searchentry_fts USING fts5(title, body, content='core_searchentry', "
+    "content_rowid='id', tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    'CREATE TRIGGER core_searchentry_fts_insert AFTER INSERT ON core_searchentry BEGIN '
+    'INSERT INTO core_searchentry_fts(rowid, title, body) VALUES (new.id, new.title, new.body); END',
+    'CREATE TRIGGER core_searchentry_fts_delete AFTER DELETE ON core_searchentry BEGIN '
+    "INSERT INTO core_searchentry_fts(core_searchentry_fts, rowid, title, body) "
+    "VALUES ('delete', old.id, old.title, old.body); END",
+    'CREATE TRIGGER core_searchentry_fts_update AFTER UPDATE ON core_searchentry BEGIN '
+    "INSERT INTO core_searchentry_fts(core_searchentry_fts, rowid, title, body) "
+    "VALUES ('delete', old.id, old.title, old.body); "
+    'INSERT INTO core_searchentry_fts(rowid, title, body) VALUES (new.id, new.title, new.body); END',
+    "INSERT INTO core_searchentry_fts(core_searchentry_fts) VALUES ('rebuild')",
+]
+
+SQLITE_UNINSTALL = [
+    'DROP TRIGGER IF EXISTS core_searchentry_fts_insert',
+    'DROP TRIGGER IF EXISTS core_searchentry_fts_delete',
+    'DROP TRIGGER IF EXISTS core_searchentry_fts_update',
+    'DROP TABLE IF EXISTS core_searchentry_fts',
+]
+
+POSTGRES_INSTALL = [
+    'ALTER TABLE core_searchentry ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ('
+    "setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(body, '')), 'D')) STORED",
+    'CREATE INDEX core_searchentry_search_idx ON core_searchentry USING GIN (search_vector)',
+]
+
+POSTGRES_UNINSTALL = [
+    'DROP INDEX IF EXISTS core_searchentry_search_idx',
+    'ALTER TABLE core_searchentry DROP COLUMN IF EXISTS search_vector',
+]
+
+
+def join(*parts):
+    return '\n'.join(part for part in parts if part)
+
+
+def workflow_labels(workflow):
+    nodes = workflow.nodes if isinstance(workflow.nodes, list) else []
+    labels = []
+    for node in nodes:
+        data = node.get('data') if isinstance(node, dict) else None
+        if isinstance(data, dict):
+            labels.extend(str(data[key]) for key in ('label', 'description') if data.get(key))
+    return labels
+
+
+def planning_document_url(document):
+    if document.task_id:
+        return f'/planning/tasks/{document.task_id}/'
+    if document.plan_id:
+        return f'/planning/plans/{document.plan_id}/'
+    return f'/planning/initiatives/{document.initiative_id}/'
+
+
+# key, model, title, body, url
+SEARCH_TYPES = [
+    ('system', 'systems.System',
+     lambda system: system.name,
+     lambda system: join(system.vendor, system.description, system.operating_system,
+                         system.contact_information, system.support_information),
+     lambda system: f'/systems/{system.pk}/'),
+    ('script', 'scripts.Script',
+     lambda script: script.name,
+     lambda script: join(script.description, script.author, script.path,
+                         script.programming_language, script.documentation),
+     lambda script: f'/scripts/{script.pk}/'),
+    ('workflow', 'workflows.Workflow',
+     lambda workflow: workflow.name,
+     lambda workflow: join(workflow.description, *workflow_labels(workflow)),
+     lambda workflow: f'/workflows/{workflow.pk}/'),
+    ('card', 'boards.Card',
+     lambda card: card.title,
+     lambda card: card.description,
+     lambda card: f'/boards/cards/{card.pk}/'),
+    ('card_comment', 'boards.CardComment',
+     lambda comment: ' '.join(comment.text.split())[:COMMENT_TITLE_LENGTH],
+     lambda comment: comment.text,
+     lambda comment: f'/boards/cards/{comment.card_id}/'),
+    ('initiative', 'planning.Initiative',
+     lambda initiative: initiative.name,
+     lambda initiative: join(initiative.description, initiative.business_justification,
+                             initiative.success_criteria),
+     lambda initiative: f'/planning/initiatives/{initiative.pk}/'),
+    ('task', 'planning.Task',
+     lambda task: task.name,
+     lambda task: join(task.description, task.notes),
+     lambda task: f'/planning/tasks/{task.pk}/'),
+    ('system_note', 'systems.SystemNote',
+     lambda note: note.title,
+     lambda note: note.content,
+     lambda note: f'/systems/{note.system_id}/'),
+    ('system_document', 'systems.SystemDocument',
+     lambda document: document.name,
+     lambda document: document.description,
+     lambda document: f'/systems/{document.system_id}/'),
+    ('script_document', 'scripts.ScriptDocument',
+     lambda document: document.name,
+     lambda document: document.description,
+     lambda document: f'/scripts/{document.script_id}/'),
+    ('workflow_document', 'workflows.WorkflowDocument',
+     lambda document: document.name,
+     lambda document: document.description,
+     lambda document: f'/workflows/{document.workflow_id}/'),
+    ('card_document', 'boards.CardDocument',
+     lambda document: document.name,
+     lambda document: document.description,
+     lambda document: f'/boards/cards/{document.card_id}/'),
+    ('planning_document', 'planning.PlanningDocument',
+     lambda document: document.name,
+     lambda document: document.description,
+     planning_document_url),
+]
+
+
+def fts_supported(schema_editor):
+    try:
+        schema_editor.execute('CREATE VIRTUAL TABLE temp.fts5_probe USING fts5(content)')
+        schema_editor.execute('DROP TABLE temp.fts5_probe')
+        return True
+    except Exception:
+        return False
+
+
+def fill_entries(apps):
+    SearchEntry = apps.get_model('core', 'SearchEntry')
+    for key, model_label, title, body, url in SEARCH_TYPES:
+        model = apps.get_model(model_label)
+        SearchEntry.objects.filter(entity_type=key).delete()
+        SearchEntry.objects.bulk_create(
+            (
+                SearchEntry(entity_type=key, object_id=obj.pk, title=(title(obj) or '')[:255],
+                            body=body(obj) or '', url=url(obj))
+                for obj in model.objects.iterator(chunk_size=BATCH_SIZE)
+            ),
+            batch_size=BATCH_SIZE,
+        )
+
+
+def install(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        # Without FTS5 search falls back to the basic backend
+        statements = SQLITE_INSTALL if fts_supported(schema_editor) else []
+    elif vendor == 'postgresql':
+        statements = POSTGRES_INSTALL
+    else:
+        statements = []
+    for sql in statements:
+        schema_editor.execute(sql)
+    fill_entries(apps)
+
+
+def uninstall(apps, schema_editor):
+    statements = {'sqlite': SQLITE_UNINSTALL, 'postgresql': POSTGRES_UNINSTALL}
+    for sql in statements.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+        ('boards', '0001_initial'),
+        ('planning', '0001_initial'),
+        ('scripts', '0005_alter_script_workflows'),
+        ('systems', '0005_system_search_index'),
+        ('workflows', '0003_convert_to_node_based'),
+    ]
+
+    operations = [
+        migrations.RunPython(install, uninstall),
+    ]
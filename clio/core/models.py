@@ -1,3 +1,20 @@
+# core/models.py
+
 from django.db import models
 
-# Create your models here.
+
+class SearchEntry(models.Model):
+    """Denormalized text of one searchable object, for the global search index"""
+    entity_type = models.CharField(max_length=30, help_text="Key of the search type in core.search.SEARCH_TYPES")
+    object_id = models.PositiveBigIntegerField()
+    title = models.CharField(max_length=255)
+    body = models.TextField(blank=True)
+    url = models.CharField(max_length=255)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('entity_type', 'object_id')
+        verbose_name_plural = 'Search entries'
+
+    def __str__(self):
+        return f"{self.entity_type}: {self.title}"
@@ -0,0 +1,211 @@
+# core/pagination.py
+
+"""
+Keyset (cursor) pagination for list views.
+
+Offset pagination reads and throws away every row before the requested page
+and needs a COUNT(*) over the whole filtered queryset to number the pages, so
+deep pages get slower the further in they are. A keyset page instead starts
+right after the last row of the previous one:
+
+    WHERE (name, id) > ('Banner', 42) ORDER BY name, id LIMIT 26
+
+which costs the same on any page. Pages are addressed by an opaque cursor
+holding the sort values of the row to continue from and the direction to go
+in; the primary key is always the last sort key so every row has a unique
+position. Sort keys must not be NULL.
+
+Counting is optional. An 'approximate' count stops at COUNT_CAP rows, and on
+Postgres falls back to the planner's estimate beyond that.
+"""
+
+import base64
+import datetime
+import decimal
+import json
+
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.db.models import Q
+
+DEFAULT_PER_PAGE = 25
+MAX_PER_PAGE = 100
+# Approximate counts stop counting here
+COUNT_CAP = 1000
+
+
+class InvalidCursor(ValueError):
+    """Raised when a cursor cannot be decoded or does not match the ordering"""
+
+
+def _json_default(value):
+    # Full precision: DjangoJSONEncoder cuts datetimes to milliseconds, which
+    # would make a cursor skip or repeat rows with the same millisecond
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, decimal.Decimal):
+        return str(value)
+    raise TypeError(f'Cannot use {type(value).__name__} in a cursor')
+
+
+def encode_cursor(values, forward=True):
+    data = json.dumps([1 if forward else 0, values], default=_json_default, separators=(',', ':'))
+    return base64.urlsafe_b64encode(data.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return (values, forward) from a cursor made by encode_cursor"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        forward, values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise InvalidCursor(f'Invalid cursor "{cursor}"')
+    if not isinstance(values, list):
+        raise InvalidCursor(f'Invalid cursor "{cursor}"')
+    return values, bool(forward)
+
+
+def parse_per_page(value, default=DEFAULT_PER_PAGE):
+    """Read a per-page request parameter, clamped to 1..MAX_PER_PAGE"""
+    try:
+        return min(max(int(value), 1), MAX_PER_PAGE)
+    except (TypeError, ValueError):
+        return default
+
+
+def _estimated_count(queryset):
+    """The Postgres planner's row estimate for a queryset"""
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class KeysetPage:
+    """One page of a KeysetPaginator"""
+
+    def __init__(self, object_list, paginator, has_next, has_previous, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.has_next = has_next
+        self.has_previous = has_previous
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+
+class KeysetPaginator:
+    """
+    Paginate a queryset by the values of its sort keys
+
+    Args:
+        queryset: The filtered queryset; any annotations used as sort keys
+                  must already be applied
+        ordering: Sort keys as order_by() style names ('-updated_at',
+                  'category_name'); the primary key is appended if missing
+        per_page: Rows per page
+        count: None for no count, 'approximate' or 'exact'
+    """
+
+    def __init__(self, queryset, ordering, per_page=DEFAULT_PER_PAGE, count=None):
+        ordering = list(ordering)
+        if not any(key.lstrip('-') in ('pk', 'id') for key in ordering):
+            ordering.append('-pk' if ordering and ordering[-1].startswith('-') else 'pk')
+        self.keys = [(key.lstrip('-'), key.startswith('-')) for key in ordering]
+        self.queryset = queryset
+        self.per_page = per_page
+        self.count_mode = count
+        self._count = None
+
+    @property
+    def count(self):
+        """Number of rows, capped at COUNT_CAP for approximate counts; None if not counted"""
+        if self.count_mode is None:
+            return None
+        if self._count is None:
+            if self.count_mode == 'exact':
+                self._count = self.queryset.count()
+            else:
+                self._count = self.queryset.order_by()[:COUNT_CAP + 1].count()
+                if self._count > COUNT_CAP and connection.vendor == 'postgresql':
+                    self._count = max(_estimated_count(self.queryset.order_by()), COUNT_CAP + 1)
+        return self._count
+
+    @property
+    def count_is_exact(self):
+        return self.count_mode == 'exact' or (self.count is not None and self.count <= COUNT_CAP)
+
+    @property
+    def count_label(self):
+        """The count as shown to users, e.g. '1,000+' when the cap was hit"""
+        count = self.count
+        if count is None:
+            return ''
+        if self.count_is_exact:
+            return f'{count:,}'
+        if count == COUNT_CAP + 1:
+            return f'{COUNT_CAP:,}+'
+        return f'about {count:,}'
+
+    def _ordering(self, forward):
+        # Walking backwards flips every key; the page is reversed afterwards
+        return [f'-{name}' if descending == forward else name for name, descending in self.keys]
+
+    def _after(self, values, forward):
+        """Q for rows strictly after values in the walking direction"""
+        if len(values) != len(self.keys):
+            raise InvalidCursor('Cursor does not match the ordering')
+        condition = Q()
+        equal = Q()
+        for (name, descending), value in zip(self.keys, values):
+            lookup = 'lt' if descending == forward else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        return condition
+
+    def _values(self, obj):
+        return [getattr(obj, 'pk' if name in ('pk', 'id') else name) for name, _ in self.keys]
+
+    def page(self, cursor=None):
+        """
+        Return the page a cursor points to, or the first page without one
+
+        Raises:
+            InvalidCursor: If the cursor is malformed
+        """
+        forward = True
+        queryset = self.queryset
+        if cursor:
+            values, forward = decode_cursor(cursor)
+            try:
+                queryset = queryset.filter(self._after(values, forward))
+            except (TypeError, ValueError, ValidationError):
+                raise InvalidCursor('Cursor values do not match the ordering')
+
+        rows = list(queryset.order_by(*self._ordering(forward))[:self.per_page + 1])
+        more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if not forward:
+            rows.reverse()
+
+        has_next = more if forward else bool(cursor)
+        has_previous = bool(cursor) if forward else more
+        return KeysetPage(
+            rows,
+            self,
+            has_next=has_next,
+            has_previous=has_previous,
+            next_cursor=encode_cursor(self._values(rows[-1])) if has_next and rows else None,
+            previous_cursor=encode_cursor(self._values(rows[0]), forward=False) if has_previous and rows else None,
+        )
@@ -0,0 +1,185 @@
+# core/profiling.py
+
+"""
+SQL profiling per request, and query budgets for views.
+
+QueryProfilingMiddleware records every query a request runs: how many, how
+long they took in total, and how many repeated an earlier query with the same
+parameters, the usual sign of an N+1 loop. The figures go out as a
+Server-Timing header, which browsers show in their network panel, and with
+DEBUG on as a small panel at the bottom of HTML pages. The middleware is
+opt-in: it does nothing unless the QUERY_PROFILING setting is on.
+
+Views declare what they are allowed to cost with @query_budget. A request
+that goes over is logged, or with QUERY_BUDGET_STRICT raises
+QueryBudgetExceeded, which makes any test that requests the view fail.
+assert_max_queries does the same for a block of code in a test.
+"""
+
+import logging
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.utils.html import escape
+
+logger = logging.getLogger(__name__)
+
+# Most repeated queries shown in errors and the debug panel
+MAX_REPORTED_DUPLICATES = 5
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised when a view or block runs more queries than its budget allows"""
+
+
+class QueryProfile:
+    """Queries run while installed as a connection execute wrapper"""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, params, time.perf_counter() - start))
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    @property
+    def duration(self):
+        """Total time spent in the database, in seconds"""
+        return sum(duration for _, _, duration in self.queries)
+
+    def repeated(self):
+        """(sql, times run) for queries run more than once with the same parameters"""
+        counts = Counter((sql, repr(params)) for sql, params, _ in self.queries)
+        return [(sql, times) for (sql, _), times in counts.most_common() if times > 1]
+
+    @property
+    def duplicates(self):
+        """Executions that repeated an earlier query"""
+        return sum(times - 1 for _, times in self.repeated())
+
+    def summary(self):
+        return f'{self.count} queries in {self.duration * 1000:.1f}ms, {self.duplicates} duplicates'
+
+    def describe_repeated(self):
+        return '\n'.join(f'  {times}x {sql}' for sql, times in self.repeated()[:MAX_REPORTED_DUPLICATES])
+
+
+@contextmanager
+def profile_queries(using=None):
+    """Record the queries run inside the block on one or every database"""
+    profile = QueryProfile()
+    with ExitStack() as stack:
+        for alias in [using] if using else connections:
+            stack.enter_context(connections[alias].execute_wrapper(profile))
+        yield profile
+
+
+def query_budget(queries, duplicates=None):
+    """
+    Declare the most queries a view may run per request
+
+    Args:
+        queries: Maximum number of queries
+        duplicates: Maximum number of repeated queries, unchecked if None
+    """
+    def decorator(view_func):
+        # Copied onto outer decorators such as login_required by functools.wraps
+        view_func.query_budget = (queries, duplicates)
+        return view_func
+    return decorator
+
+
+def check_budget(profile, queries, duplicates=None, label='Block'):
+    """Raise QueryBudgetExceeded if a profile went over a budget"""
+    problems = []
+    if profile.count > queries:
+        problems.append(f'{profile.count} queries, budget {queries}')
+    if duplicates is not None and profile.duplicates > duplicates:
+        problems.append(f'{profile.duplicates} duplicate queries, budget {duplicates}')
+    if problems:
+        message = f'{label} ran {"; ".join(problems)}'
+        repeated = profile.describe_repeated()
+        raise QueryBudgetExceeded(f'{message}\n{repeated}' if repeated else message)
+
+
+@contextmanager
+def assert_max_queries(queries, duplicates=None, using=None):
+    """
+    Fail a test if the block runs more queries than allowed
+
+        with assert_max_queries(10, duplicates=0):
+            self.client.get(reverse('core:index'))
+    """
+    with profile_queries(using) as profile:
+        yield profile
+    check_budget(profile, queries, duplicates)
+
+
+class QueryProfilingMiddleware:
+    """Profile each request's SQL and enforce the budgets views declare"""
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'QUERY_PROFILING', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.strict = getattr(settings, 'QUERY_BUDGET_STRICT', False)
+
+    def __call__(self, request):
+        request.query_budget = None
+        start = time.perf_counter()
+        with profile_queries() as profile:
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - start
+
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={profile.duration * 1000:.1f};desc="{profile.count} queries"',
+            f'dup;desc="{profile.duplicates} duplicate queries"',
+            f'total;dur={elapsed * 1000:.1f}',
+        ])
+        if settings.DEBUG:
+            self.add_panel(response, profile)
+
+        # Error pages run queries of their own and must not hide the error
+        if request.query_budget is not None and response.status_code < 500:
+            queries, duplicates = request.query_budget
+            try:
+                check_budget(profile, queries, duplicates, label=request.path)
+            except QueryBudgetExceeded as e:
+                if self.strict:
+                    raise
+                logger.warning('%s', e)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.query_budget = getattr(view_func, 'query_budget', None)
+
+    def add_panel(self, response, profile):
+        if response.streaming or not response.get('Content-Type', '').startswith('text/html'):
+            return
+        content = response.content
+        if b'</body>' not in content:
+            return
+
+        repeated = ''.join(
+            f'<li><b>{times}x</b> {escape(sql)}</li>' for sql, times in profile.repeated()[:MAX_REPORTED_DUPLICATES]
+        )
+        panel = (
+            '<div id="query-profile" style="position:fixed;bottom:0;left:0;z-index:100;max-width:50%;'
+            'padding:4px 8px;font:12px monospace;background:#1f2937;color:#f9fafb;opacity:.9">'
+            f'<details><summary>SQL: {escape(profile.summary())}</summary>'
+            f'<ol style="max-height:200px;overflow:auto">{repeated}</ol></details></div>'
+        )
+        response.content = content.replace(b'</body>', panel.encode() + b'</body>', 1)
+        if response.has_header('Content-Length'):
+            response['Content-Length'] = str(len(response.content))
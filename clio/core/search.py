@@ -0,0 +1,335 @@
+# core/search.py
+
+"""
+Global search across every app.
+
+Each searchable model is described by a SearchType that turns an object into a
+title, a body of text and a URL. Those are stored denormalized in SearchEntry,
+which carries the same full-text index as the systems table (see
+systems/search.py), so one query searches systems, scripts, workflows, cards,
+planning and their notes and documents at once.
+
+Entries are kept current by the post_save and post_delete handlers in
+core/signals.py; code that writes with bulk_create or bulk_update calls
+index_objects itself. The rebuild_search_index command recreates them all.
+"""
+
+from collections import Counter
+
+from django.apps import apps
+from django.db import connection, transaction
+from django.db.models import Case, Value, When
+from django.db.models.functions import Length
+from django.urls import reverse
+
+from systems.search import BasicSearchBackend, SearchIndex, search_queryset, search_terms, highlight_results
+from .models import SearchEntry
+
+SEARCH_ENTRY_INDEX = SearchIndex('core_searchentry', [
+    ('title', 10.0),
+    ('body', 1.0),
+])
+
+# Shorter queries match nearly everything and are not worth a typeahead round trip
+MIN_QUERY_LENGTH = 2
+DEFAULT_LIMIT_PER_TYPE = 5
+MAX_LIMIT_PER_TYPE = 20
+COMMENT_TITLE_LENGTH = 80
+BATCH_SIZE = 500
+
+
+def _join(*parts):
+    return '\n'.join(part for part in parts if part)
+
+
+def _workflow_labels(workflow):
+    """Labels and descriptions of the nodes in a workflow's JSON"""
+    nodes = workflow.nodes if isinstance(workflow.nodes, list) else []
+    labels = []
+    for node in nodes:
+        data = node.get('data') if isinstance(node, dict) else None
+        if isinstance(data, dict):
+            labels.extend(str(data[key]) for key in ('label', 'description') if data.get(key))
+    return labels
+
+
+def _planning_document_url(document):
+    if document.task_id:
+        return reverse('planning:task_detail', args=[document.task_id])
+    if document.plan_id:
+        return reverse('planning:plan_detail', args=[document.plan_id])
+    return reverse('planning:initiative_detail', args=[document.initiative_id])
+
+
+class SearchType:
+    """How objects of one model appear in the global search"""
+
+    def __init__(self, key, label, model, title, body, url):
+        """
+        Args:
+            key: Stored in SearchEntry.entity_type and used in the API
+            label: Plural name shown for the group of results
+            model: 'app_label.ModelName'
+            title, body, url: Functions of an object returning its entry's fields
+        """
+        self.key = key
+        self.label = label
+        self.model_label = model
+        self.title = title
+        self.body = body
+        self.url = url
+
+    @property
+    def model(self):
+        return apps.get_model(self.model_label)
+
+    def entry(self, obj, entry_model=SearchEntry):
+        return entry_model(
+            entity_type=self.key,
+            object_id=obj.pk,
+            title=(self.title(obj) or '')[:255],
+            body=self.body(obj) or '',
+            url=self.url(obj),
+        )
+
+
+SEARCH_TYPES = {search_type.key: search_type for search_type in [
+    SearchType(
+        'system', 'Systems', 'systems.System',
+        title=lambda system: system.name,
+        body=lambda system: _join(system.vendor, system.description, system.operating_system,
+                                  system.contact_information, system.support_information),
+        url=lambda system: reverse('systems:detail', args=[system.pk]),
+    ),
+    SearchType(
+        'script', 'Scripts', 'scripts.Script',
+        title=lambda script: script.name,
+        body=lambda script: _join(script.description, script.author, script.path,
+                                  script.programming_language, script.documentation),
+        url=lambda script: reverse('scripts:detail', args=[script.pk]),
+    ),
+    SearchType(
+        'workflow', 'Workflows', 'workflows.Workflow',
+        title=lambda workflow: workflow.name,
+        body=lambda workflow: _join(workflow.description, *_workflow_labels(workflow)),
+        url=lambda workflow: reverse('workflows:detail', args=[workflow.pk]),
+    ),
+    SearchType(
+        'card', 'Cards', 'boards.Card',
+        title=lambda card: card.title,
+        body=lambda card: card.description,
+        url=lambda card: reverse('boards:card_detail', args=[card.pk]),
+    ),
+    SearchType(
+        'card_comment', 'Card comments', 'boards.CardComment',
+        title=lambda comment: ' '.join(comment.text.split())[:COMMENT_TITLE_LENGTH],
+        body=lambda comment: comment.text,
+        url=lambda comment: reverse('boards:card_detail', args=[comment.card_id]),
+    ),
+    SearchType(
+        'initiative', 'Initiatives', 'planning.Initiative',
+        title=lambda initiative: initiative.name,
+        body=lambda initiative: _join(initiative.description, initiative.business_justification,
+                                      initiative.success_criteria),
+        url=lambda initiative: reverse('planning:initiative_detail', args=[initiative.pk]),
+    ),
+    SearchType(
+        'task', 'Tasks', 'planning.Task',
+        title=lambda task: task.name,
+        body=lambda task: _join(task.description, task.notes),
+        url=lambda task: reverse('planning:task_detail', args=[task.pk]),
+    ),
+    SearchType(
+        'system_note', 'System notes', 'systems.SystemNote',
+        title=lambda note: note.title,
+        body=lambda note: note.content,
+        url=lambda note: reverse('systems:detail', args=[note.system_id]),
+    ),
+    SearchType(
+        'system_document', 'System documents', 'systems.SystemDocument',
+        title=lambda document: document.name,
+        body=lambda document: document.description,
+        url=lambda document: reverse('systems:detail', args=[document.system_id]),
+    ),
+    SearchType(
+        'script_document', 'Script documents', 'scripts.ScriptDocument',
+        title=lambda document: document.name,
+        body=lambda document: document.description,
+        url=lambda document: reverse('scripts:detail', args=[document.script_id]),
+    ),
+    SearchType(
+        'workflow_document', 'Workflow documents', 'workflows.WorkflowDocument',
+        title=lambda document: document.name,
+        body=lambda document: document.description,
+        url=lambda document: reverse('workflows:detail', args=[document.workflow_id]),
+    ),
+    SearchType(
+        'card_document', 'Card documents', 'boards.CardDocument',
+        title=lambda document: document.name,
+        body=lambda document: document.description,
+        url=lambda document: reverse('boards:card_detail', args=[document.card_id]),
+    ),
+    SearchType(
+        'planning_document', 'Planning documents', 'planning.PlanningDocument',
+        title=lambda document: document.name,
+        body=lambda document: document.description,
+        url=_planning_document_url,
+    ),
+]}
+
+
+def search_type_for_model(model):
+    """Return the SearchType of a model class, or None if it isn't searchable"""
+    label = model._meta.label
+    for search_type in SEARCH_TYPES.values():
+        if search_type.model_label == label:
+            return search_type
+    return None
+
+
+def _save_entries(entries):
+    SearchEntry.objects.bulk_create(
+        entries,
+        batch_size=BATCH_SIZE,
+        update_conflicts=True,
+        unique_fields=['entity_type', 'object_id'],
+        update_fields=['title', 'body', 'url', 'updated_at'],
+    )
+
+
+def index_object(obj):
+    """Add or refresh the search entry of one object"""
+    search_type = search_type_for_model(type(obj))
+    if search_type is not None:
+        _save_entries([search_type.entry(obj)])
+
+
+def unindex_object(obj):
+    """Remove the search entry of one object"""
+    search_type = search_type_for_model(type(obj))
+    if search_type is not None:
+        SearchEntry.objects.filter(entity_type=search_type.key, object_id=obj.pk).delete()
+
+
+def index_objects(model, ids):
+    """Refresh the search entries of objects written without signals"""
+    search_type = search_type_for_model(model)
+    ids = list(ids)
+    if search_type is None or not ids:
+        return
+    for start in range(0, len(ids), BATCH_SIZE):
+        objects = model.objects.filter(pk__in=ids[start:start + BATCH_SIZE])
+        _save_entries([search_type.entry(obj) for obj in objects])
+
+
+def rebuild_search_entries(keys=None, registry=apps):
+    """
+    Recreate the search entries of the given search types (all by default)
+
+    Args:
+        keys: Search type keys to rebuild
+        registry: App registry to load models from; migrations pass their
+                  historical one
+
+    Returns:
+        dict: search type key -> number of entries written
+    """
+    entry_model = registry.get_model('core', 'SearchEntry')
+    counts = {}
+    with transaction.atomic():
+        for key in keys or SEARCH_TYPES:
+            search_type = SEARCH_TYPES[key]
+            model = registry.get_model(search_type.model_label)
+            entry_model.objects.filter(entity_type=key).delete()
+            entries = [search_type.entry(obj, entry_model) for obj in model.objects.iterator(chunk_size=BATCH_SIZE)]
+            entry_model.objects.bulk_create(entries, batch_size=BATCH_SIZE)
+            counts[key] = len(entries)
+    return counts
+
+
+def _top_per_type(matches, order_by, limit):
+    """
+    Return {entry id: position} for the first limit matches of each type
+
+    Args:
+        matches: values_list queryset selecting id, entity_type and the
+                 columns named in order_by
+        order_by: SQL ORDER BY list over those columns
+        limit: Entries to keep per type
+    """
+    # The window runs over a subquery because SQLite only allows bm25() in
+    # a plain result column, not inside a window's ORDER BY
+    inner_sql, params = matches.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT id, type_position FROM ('
+            f'  SELECT id, ROW_NUMBER() OVER (PARTITION BY entity_type ORDER BY {order_by}) AS type_position'
+            f'  FROM ({inner_sql}) matches'
+            ') ranked WHERE type_position <= %s',
+            [*params, limit]
+        )
+        return dict(cursor.fetchall())
+
+
+def global_search(query, types=None, limit_per_type=DEFAULT_LIMIT_PER_TYPE):
+    """
+    Search every entity type at once
+
+    Each type gets its own top limit_per_type results, so a type with
+    thousands of matches cannot crowd out the others. As befits a typeahead,
+    titles are searched first and ranked by how closely they match, which
+    avoids scoring every body that mentions a common word. Only the types
+    left short of results are searched again over titles and bodies, ranked
+    by relevance. Highlighting is done afterwards, for the returned entries.
+
+    Args:
+        query: The search text
+        types: Search type keys to include (all by default)
+        limit_per_type: Maximum results per type
+
+    Returns:
+        list of dicts: one group per type with matches, in SEARCH_TYPES order
+    """
+    terms = search_terms(query)
+    if not terms or len(query.strip()) < MIN_QUERY_LENGTH:
+        return []
+    types = list(types or SEARCH_TYPES)
+    entries = SearchEntry.objects.filter(entity_type__in=types)
+
+    # Titles starting with the first term, then the shortest titles
+    title_matches = search_queryset(
+        entries, query, SEARCH_ENTRY_INDEX, highlight=False, columns=['title']
+    ).annotate(
+        prefix_match=Case(When(title__istartswith=terms[0], then=Value(1)), default=Value(0)),
+        title_length=Length('title'),
+    ).values_list('id', 'entity_type', 'title', 'prefix_match', 'title_length')
+    positions = _top_per_type(title_matches, 'prefix_match DESC, title_length, title', limit_per_type)
+
+    found = Counter(SearchEntry.objects.filter(id__in=positions).values_list('entity_type', flat=True))
+    short = [key for key in types if found[key] < limit_per_type]
+    if short:
+        matches = search_queryset(
+            entries.filter(entity_type__in=short), query, SEARCH_ENTRY_INDEX, highlight=False
+        ).values_list('id', 'entity_type', 'title', 'search_rank')
+        for entry_id in SearchEntry.objects.filter(id__in=positions, entity_type__in=short).values_list('id', flat=True):
+            del positions[entry_id]
+        positions.update(_top_per_type(matches, 'search_rank DESC, title', limit_per_type))
+
+    results = sorted(SearchEntry.objects.filter(id__in=positions), key=lambda entry: positions[entry.id])
+    # Highlight in Python: the index's highlight functions only work inside
+    # the MATCH query, and a handful of rows is cheap either way
+    highlight_results(results, query, SEARCH_ENTRY_INDEX, backend=BasicSearchBackend())
+
+    groups = {}
+    for entry in results:
+        groups.setdefault(entry.entity_type, []).append({
+            'id': entry.object_id,
+            'title': entry.title,
+            'title_html': entry.search_title_html,
+            'snippet_html': entry.search_snippet_html,
+            'url': entry.url,
+        })
+    return [
+        {'type': key, 'label': search_type.label, 'results': groups[key]}
+        for key, search_type in SEARCH_TYPES.items() if key in groups
+    ]
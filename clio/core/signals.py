@@ -0,0 +1,53 @@
+# core/signals.py
+
+"""
+Signal handlers that keep the global search entries (core/search.py) in sync
+with writes to every searchable model, and drop the cached user lookup index
+(core/lookups.py) and dashboard statistics (core/dashboard.py) when what they
+show changes.
+"""
+
+from django.contrib.auth.models import User
+from django.db.models.signals import post_save, post_delete
+
+from .dashboard import DASHBOARD_MODELS, invalidate_dashboard_stats
+from .lookups import invalidate_user_index
+from .search import SEARCH_TYPES, index_object, unindex_object
+
+
+def object_saved(sender, instance, raw=False, **kwargs):
+    # Fixtures are indexed by rebuild_search_index instead
+    if not raw:
+        index_object(instance)
+
+
+def object_deleted(sender, instance, **kwargs):
+    unindex_object(instance)
+
+
+def user_changed(sender, update_fields=None, **kwargs):
+    # Logging in saves last_login, which the index doesn't show
+    if update_fields is None or set(update_fields) != {'last_login'}:
+        invalidate_user_index()
+
+
+def dashboard_changed(sender, **kwargs):
+    invalidate_dashboard_stats()
+
+
+def connect_search_signals():
+    for key, search_type in SEARCH_TYPES.items():
+        post_save.connect(object_saved, sender=search_type.model, dispatch_uid=f'search_index_{key}')
+        post_delete.connect(object_deleted, sender=search_type.model, dispatch_uid=f'search_unindex_{key}')
+
+
+def connect_lookup_signals():
+    post_save.connect(user_changed, sender=User, dispatch_uid='user_lookup_saved')
+    post_delete.connect(user_changed, sender=User, dispatch_uid='user_lookup_deleted')
+
+
+def connect_dashboard_signals():
+    for model in DASHBOARD_MODELS:
+        label = model._meta.label_lower
+        post_save.connect(dashboard_changed, sender=model, dispatch_uid=f'dashboard_saved_{label}')
+        post_delete.connect(dashboard_changed, sender=model, dispatch_uid=f'dashboard_deleted_{label}')
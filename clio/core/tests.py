@@ -1,3 +1,301 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from scripts.models import Script
+from systems.models import System, SystemCategory, SystemStatus
+from workflows.models import Workflow
+
+from . import lookups, pagination, views
+from .lookups import PrefixIndex
+from .dashboard import DASHBOARD_CACHE_KEY, compute_dashboard_stats
+from .models import SearchEntry
+from .pagination import InvalidCursor, KeysetPaginator, decode_cursor, encode_cursor
+from .profiling import QueryBudgetExceeded, assert_max_queries, profile_queries
+from .search import global_search, rebuild_search_entries
+
+
+def create_systems(count):
+    """count systems spread over two categories and statuses, hosted and signed in through the first"""
+    categories = [
+        SystemCategory.objects.create(name=name, slug=name.lower()) for name in ('Servers', 'Applications')
+    ]
+    statuses = [SystemStatus.objects.create(name=name, slug=name.lower()) for name in ('Active', 'Deprecated')]
+    hub = System.objects.create(name='Directory', category=categories[0], status=statuses[0])
+    return [hub] + [
+        System.objects.create(
+            name=f'Payroll {number}', vendor='Acme', category=categories[number % 2], status=statuses[number % 2],
+            sso_system=hub, hosting_system=hub,
+        )
+        for number in range(1, count)
+    ]
+
+
+class KeysetPaginatorTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        create_systems(12)
+
+    def walk(self, paginator, cursor=None, backwards=False):
+        """Names on every page from a cursor to the first or last page, and that page"""
+        names = []
+        while True:
+            page = paginator.page(cursor)
+            page_names = [system.name for system in page]
+            names = page_names + names if backwards else names + page_names
+            cursor = page.previous_cursor if backwards else page.next_cursor
+            if cursor is None:
+                return names, page
+
+    def test_walks_ties_both_ways(self):
+        # Every system but the hub has the same vendor, so pages split on the id
+        paginator = KeysetPaginator(System.objects.all(), ['-vendor'], per_page=5, count='exact')
+        expected = [system.name for system in System.objects.order_by('-vendor', '-pk')]
+        names, last = self.walk(paginator)
+        self.assertEqual(names, expected)
+        self.assertEqual(len(last), 2)
+        self.assertEqual(self.walk(paginator, last.previous_cursor, backwards=True)[0], expected[:10])
+        self.assertEqual(paginator.count_label, '12')
+
+    def test_approximate_count(self):
+        with mock.patch.object(pagination, 'COUNT_CAP', 10):
+            paginator = KeysetPaginator(System.objects.all(), ['name'], count='approximate')
+            self.assertEqual(paginator.count_label, '10+')
+            self.assertFalse(paginator.count_is_exact)
+
+
+class CursorTests(SimpleTestCase):
+
+    def test_round_trip(self):
+        self.assertEqual(decode_cursor(encode_cursor(['Payroll', 7], forward=False)), (['Payroll', 7], False))
+
+    def test_invalid(self):
+        for cursor in ('nonsense', encode_cursor('Payroll')):
+            with self.subTest(cursor=cursor), self.assertRaises(InvalidCursor):
+                decode_cursor(cursor)
+
+
+@override_settings(QUERY_PROFILING=True, QUERY_BUDGET_STRICT=True)
+class DashboardTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('planner', password='secret')
+        create_systems(12)
+        for number in range(3):
+            Workflow.objects.create(name=f'Payroll run {number}')
+            Script.objects.create(name=f'Payroll export {number}')
+
+    def setUp(self):
+        # Measure the uncached path; the dashboard stats outlive a test otherwise
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def get_index(self):
+        with assert_max_queries(*views.index.query_budget):
+            response = self.client.get(reverse('core:index'))
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_counts(self):
+        context = self.get_index().context
+        self.assertEqual(
+            (context['system_count'], context['workflow_count'], context['script_count']), (12, 3, 3)
+        )
+        self.assertEqual((context['active_systems'], context['deprecated_systems']), (6, 6))
+        self.assertEqual({item['name']: item['count'] for item in context['category_counts']},
+                         {'Servers': 6, 'Applications': 6})
+        self.assertEqual(len(context['recent_systems']), 5)
+
+    def test_cached_until_a_write_commits(self):
+        self.get_index()
+        self.assertEqual(cache.get(DASHBOARD_CACHE_KEY)['system_count'], 12)
+        with profile_queries() as profile:
+            self.client.get(reverse('core:index'))
+        # Only the session and user are read
+        self.assertEqual(profile.count, 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Script.objects.create(name='Ledger export')
+        self.assertIsNone(cache.get(DASHBOARD_CACHE_KEY))
+        self.assertEqual(self.get_index().context['script_count'], 4)
+        self.assertEqual(compute_dashboard_stats()['script_count'], 4)
+
+
+class QueryProfilingTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('planner', password='secret')
+
+    def setUp(self):
+        cache.clear()
+        lookups._user_index = None
+        self.client.force_login(self.user)
+
+    def lookup(self):
+        return self.client.get(reverse('core:user_lookup'), {'q': 'pla'})
+
+    @override_settings(QUERY_PROFILING=False)
+    def test_off(self):
+        self.assertNotIn('Server-Timing', self.lookup())
+
+    @override_settings(QUERY_PROFILING=True)
+    def test_server_timing(self):
+        timing = self.lookup()['Server-Timing']
+        self.assertRegex(timing, r'^db;dur=[\d.]+;desc="\d+ queries", dup;desc="0 duplicate queries", total;dur=')
+
+    @override_settings(QUERY_PROFILING=True, QUERY_BUDGET_STRICT=True)
+    def test_strict_budget_raises(self):
+        with mock.patch.object(views.user_lookup, 'query_budget', (0, 0)):
+            with self.assertRaisesMessage(QueryBudgetExceeded, '/api/users/ ran'):
+                self.lookup()
+
+    @override_settings(QUERY_PROFILING=True)
+    def test_budget_is_logged_otherwise(self):
+        with mock.patch.object(views.user_lookup, 'query_budget', (0, 0)):
+            with self.assertLogs('core.profiling', 'WARNING'):
+                self.assertEqual(self.lookup().status_code, 200)
+
+    def test_assert_max_queries_counts_duplicates(self):
+        with self.assertRaisesMessage(QueryBudgetExceeded, '1 duplicate queries, budget 0'):
+            with assert_max_queries(5, duplicates=0):
+                list(User.objects.filter(pk=self.user.pk))
+                list(User.objects.filter(pk=self.user.pk))
+        with profile_queries() as profile:
+            list(User.objects.all())
+        self.assertEqual((profile.count, profile.duplicates), (1, 0))
+
+
+class PrefixIndexTests(SimpleTestCase):
+
+    def setUp(self):
+        self.index = PrefixIndex(
+            ({'name': name}, [name, email]) for name, email in [
+                ('Ada Lovelace', 'ada@example.com'),
+                ('Grace  Hopper', 'grace@example.com'),
+                ('Alan Turing', 'turing@example.com'),
+                ('Lovelace Admin', ''),
+            ]
+        )
+
+    def names(self, query, offset=0, limit=20):
+        items, has_more = self.index.search(query, offset, limit)
+        return [item['name'] for item in items], has_more
+
+    def test_word_prefixes(self):
+        self.assertEqual(self.names('turing'), (['Alan Turing'], False))
+        self.assertEqual(self.names('GRACE hop'), (['Grace  Hopper'], False))
+        self.assertEqual(self.names('nobody'), ([], False))
+
+    def test_text_starts_rank_first(self):
+        # Lovelace Admin starts with the query, Ada Lovelace only has a later word
+        self.assertEqual(self.names('lovel'), (['Lovelace Admin', 'Ada Lovelace'], False))
+        self.assertEqual(self.names('a'), (['Ada Lovelace', 'Alan Turing', 'Lovelace Admin'], False))
+
+    def test_pages(self):
+        self.assertEqual(self.names('', limit=3), (['Ada Lovelace', 'Grace  Hopper', 'Alan Turing'], True))
+        self.assertEqual(self.names('', offset=3, limit=3), (['Lovelace Admin'], False))
+
+
+@override_settings(QUERY_PROFILING=True, QUERY_BUDGET_STRICT=True)
+class UserLookupTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('planner', password='secret', first_name='Pat', last_name='Planner')
+        User.objects.create_user('ghost', is_active=False)
+
+    def setUp(self):
+        cache.clear()
+        lookups._user_index = None
+        self.client.force_login(self.user)
+
+    def lookup(self, **params):
+        with assert_max_queries(*views.user_lookup.query_budget):
+            response = self.client.get(reverse('core:user_lookup'), params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_lookup(self):
+        self.assertEqual(self.lookup(q='pla'), {'results': [
+            {'id': self.user.pk, 'name': 'Pat Planner', 'username': 'planner', 'email': ''},
+        ], 'next_offset': None})
+        self.assertEqual(self.lookup(q='ghost')['results'], [])
+
+    def test_index_is_built_once_until_users_change(self):
+        with mock.patch('core.lookups.build_user_index', wraps=lookups.build_user_index) as build:
+            self.lookup(q='pat')
+            self.lookup(q='pla')
+            self.assertEqual(build.call_count, 1)
+
+            User.objects.create_user('quinn', first_name='Quinn')
+            self.assertEqual(len(self.lookup(q='quinn')['results']), 1)
+            self.assertEqual(build.call_count, 2)
+
+
+@override_settings(QUERY_PROFILING=True, QUERY_BUDGET_STRICT=True)
+class GlobalSearchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('planner', password='secret')
+        cls.systems = create_systems(12)
+        for number in range(3):
+            Workflow.objects.create(name=f'Payroll run {number}')
+            Script.objects.create(name=f'Payroll export {number}')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def search(self, **params):
+        with assert_max_queries(*views.search.query_budget):
+            response = self.client.get(reverse('core:search'), params)
+        self.assertEqual(response.status_code, 200)
+        return {group['type']: group['results'] for group in response.json()['groups']}
+
+    def test_groups_per_type(self):
+        groups = self.search(q='payroll')
+        self.assertEqual(list(groups), ['system', 'script', 'workflow'])
+        # Each type gets its own share, shortest titles first
+        self.assertEqual([result['title'] for result in groups['system']], [f'Payroll {n}' for n in range(1, 6)])
+        self.assertEqual(len(groups['script']), 3)
+        self.assertEqual(groups['system'][0]['title_html'], '<mark>Payroll</mark> 1')
+        self.assertEqual(groups['system'][0]['url'], reverse('systems:detail', args=[self.systems[1].pk]))
+
+    def test_types_and_limit(self):
+        groups = self.search(q='payroll', types='system', limit=2)
+        self.assertEqual({key: len(results) for key, results in groups.items()}, {'system': 2})
+
+    def test_body_matches_fill_short_types(self):
+        groups = self.search(q='acme')
+        self.assertEqual(len(groups['system']), 5)
+        self.assertIn('<mark>Acme</mark>', groups['system'][0]['snippet_html'])
+
+    def test_short_or_empty_queries(self):
+        self.assertEqual(self.search(q='p'), {})
+        self.assertEqual(self.search(q='  '), {})
+
+    def test_invalid_parameters(self):
+        for params in ({'q': 'payroll', 'types': 'nonsense'}, {'q': 'payroll', 'limit': 'many'}):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get(reverse('core:search'), params).status_code, 400)
+
+    def test_entries_follow_writes(self):
+        system = self.systems[1]
+        system.name = 'Ledger'
+        system.save()
+        self.assertEqual(global_search('ledger')[0]['results'][0]['id'], system.pk)
+        system.delete()
+        self.assertEqual(global_search('ledger'), [])
+
+    def test_rebuild(self):
+        SearchEntry.objects.all().delete()
+        counts = rebuild_search_entries()
+        self.assertEqual((counts['system'], counts['script'], counts['workflow']), (12, 3, 3))
+        self.assertEqual(len(global_search('payroll', types=['workflow'])[0]['results']), 3)
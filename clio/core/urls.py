@@ -8,4 +8,6 @@ urlpatterns = [
     # Changed from '' to 'index/' to avoid conflicts
     path('', views.index, name='index'),
     path('about/', views.about, name='about'),
+    path('search/', views.search, name='search'),
+    path('api/users/', views.user_lookup, name='user_lookup'),
 ]
\ No newline at end of file
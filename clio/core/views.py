@@ -4,11 +4,10 @@ from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.views import LoginView
 from django.http import JsonResponse
-from django.db.models import Count, F
-from systems.models import System, SystemRelationship, SystemCategory, SystemStatus
-from scripts.models import Script, ScriptSystemRelationship
-from workflows.models import Workflow
-from planning.models import Initiative, Plan, Milestone, Task, ResourceAllocation
+from .dashboard import get_dashboard_stats
+from .lookups import get_user_index, lookup_page
+from .profiling import query_budget
+from .search import SEARCH_TYPES, DEFAULT_LIMIT_PER_TYPE, MAX_LIMIT_PER_TYPE, global_search
 
 from django.urls import reverse
 from django.contrib.auth.forms import AuthenticationForm
@@ -29,66 +28,44 @@ def root_redirect(request):
         })
 
 @login_required
+@query_budget(10, duplicates=0)
 def index(request):
     """Dashboard view with overview of all items"""
-    
-    # Get active systems count using the status model
-    try:
-        active_status = SystemStatus.objects.get(slug='active')
-        active_systems_count = System.objects.filter(status=active_status).count()
-    except SystemStatus.DoesNotExist:
-        active_systems_count = 0
-    
-    # Get deprecated systems count using the status model
-    try:
-        deprecated_status = SystemStatus.objects.get(slug='deprecated')
-        deprecated_systems_count = System.objects.filter(status=deprecated_status).count()
-    except SystemStatus.DoesNotExist:
-        deprecated_systems_count = 0
-    
-    # Get recent systems with their related category and status
-    recent_systems = System.objects.all().select_related('category', 'status').order_by('-updated_at')[:5]
-    
-    # Get system counts by category
-    category_counts = []
-    for category in SystemCategory.objects.all().order_by('order', 'name'):
-        count = System.objects.filter(category=category).count()
-        category_counts.append({
-            'name': category.name,
-            'count': count,
-            'color': category.color,
-            'text_color': category.text_color,
-            'slug': category.slug
-        })
-    
-    # Get system counts by status
-    status_counts = []
-    for status in SystemStatus.objects.all().order_by('order', 'name'):
-        count = System.objects.filter(status=status).count()
-        status_counts.append({
-            'name': status.name,
-            'count': count,
-            'color': status.color,
-            'text_color': status.text_color,
-            'slug': status.slug,
-            'is_active': status.is_active
-        })
-    
-    context = {
-        'system_count': System.objects.count(),
-        'workflow_count': Workflow.objects.count(),
-        'script_count': Script.objects.count(),
-        'recent_systems': recent_systems,
-        'recent_workflows': Workflow.objects.all().order_by('-updated_at')[:5],
-        'recent_scripts': Script.objects.all().order_by('-updated_at')[:5],
-        'active_systems': active_systems_count,
-        'deprecated_systems': deprecated_systems_count,
-        'category_counts': category_counts,
-        'status_counts': status_counts,
-    }
-    return render(request, 'core/index.html', context)
+    return render(request, 'core/index.html', get_dashboard_stats())
 
 @login_required
 def about(request):
     """About page with information about the app"""
-    return render(request, 'core/about.html')
\ No newline at end of file
+    return render(request, 'core/about.html')
+
+
+@login_required
+@query_budget(10, duplicates=0)
+def search(request):
+    """Typeahead endpoint searching every entity type at once"""
+    query = request.GET.get('q', '').strip()
+
+    types = None
+    if request.GET.get('types'):
+        types = [key for key in request.GET['types'].split(',') if key]
+        unknown = [key for key in types if key not in SEARCH_TYPES]
+        if unknown:
+            return JsonResponse({'error': f'Unknown search types: {", ".join(unknown)}'}, status=400)
+
+    try:
+        limit = int(request.GET.get('limit', DEFAULT_LIMIT_PER_TYPE))
+    except ValueError:
+        return JsonResponse({'error': 'limit must be a number'}, status=400)
+    limit = min(max(limit, 1), MAX_LIMIT_PER_TYPE)
+
+    return JsonResponse({
+        'query': query,
+        'groups': global_search(query, types=types, limit_per_type=limit),
+    })
+
+
+@login_required
+@query_budget(5, duplicates=0)
+def user_lookup(request):
+    """Typeahead endpoint finding users by a prefix of their name, username or email"""
+    return JsonResponse(lookup_page(get_user_index(), request.GET))
@@ -0,0 +1,16 @@
+# planning/management/commands/rebuild_planning_rollups.py
+
+from django.core.management.base import BaseCommand
+
+from planning.rollups import rebuild_planning_rollups
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the initiative rollups and daily user allocations from scratch'
+
+    def handle(self, *args, **options):
+        counts = rebuild_planning_rollups()
+        self.stdout.write(self.style.SUCCESS(
+            f'Planning rollups rebuilt: {counts["initiatives"]} initiatives, '
+            f'{counts["allocation_days"]} user allocation days'
+        ))
@@ -0,0 +1,139 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:24
+
+import datetime
+from collections import defaultdict
+from decimal import Decimal
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Max, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+# The fill below is a frozen copy of what planning.rollups.rebuild_planning_rollups
+# did when this migration was written, so later changes there don't alter it
+
+BATCH_SIZE = 500
+CLOSED_STATUSES = ('completed', 'canceled', 'missed')
+HOURS = models.DecimalField(max_digits=12, decimal_places=2)
+
+
+def per_initiative(queryset, link, aggregate, output_field):
+    rows = queryset.filter(**{link: OuterRef('pk')}).order_by().values(link).annotate(value=aggregate).values('value')
+    return Subquery(rows, output_field=output_field)
+
+
+def count_per_initiative(queryset, link, condition=None):
+    return Coalesce(per_initiative(queryset, link, Count('pk', filter=condition), models.IntegerField()), 0)
+
+
+def hours_per_initiative(tasks, field):
+    return Coalesce(
+        per_initiative(tasks, 'plan__initiative', Sum(field), HOURS), Value(Decimal(0)), output_field=HOURS
+    )
+
+
+def fill_initiative_rollups(apps):
+    Initiative = apps.get_model('planning', 'Initiative')
+    InitiativeRollup = apps.get_model('planning', 'InitiativeRollup')
+    plans = apps.get_model('planning', 'Plan').objects.all()
+    tasks = apps.get_model('planning', 'Task').objects.all()
+    milestones = apps.get_model('planning', 'Milestone').objects.all()
+    risks = apps.get_model('planning', 'RiskRegister').objects.all()
+    open_tasks = tasks.exclude(status__in=CLOSED_STATUSES)
+    open_milestones = milestones.exclude(status__in=CLOSED_STATUSES)
+
+    rows = Initiative.objects.annotate(
+        plan_count=count_per_initiative(plans, 'initiative'),
+        task_count=count_per_initiative(tasks, 'plan__initiative'),
+        completed_task_count=count_per_initiative(tasks, 'plan__initiative', Q(status='completed')),
+        risk_count=count_per_initiative(risks, 'initiative'),
+        milestone_count=count_per_initiative(milestones, 'plan__initiative'),
+        completed_milestone_count=count_per_initiative(milestones, 'plan__initiative', Q(status='completed')),
+        missed_milestone_count=count_per_initiative(milestones, 'plan__initiative', Q(status='missed')),
+        estimated_hours=hours_per_initiative(tasks, 'estimated_hours'),
+        actual_hours=hours_per_initiative(tasks, 'actual_hours'),
+        latest_task_due=per_initiative(open_tasks, 'plan__initiative', Max('due_date'), models.DateField()),
+        latest_milestone_due=per_initiative(open_milestones, 'plan__initiative', Max('due_date'), models.DateField()),
+    ).values(
+        'pk', 'plan_count', 'task_count', 'completed_task_count', 'risk_count', 'milestone_count',
+        'completed_milestone_count', 'missed_milestone_count', 'estimated_hours', 'actual_hours',
+        'latest_task_due', 'latest_milestone_due',
+    )
+
+    rollups = []
+    for row in rows:
+        due_dates = [date for date in (row.pop('latest_task_due'), row.pop('latest_milestone_due')) if date]
+        rollups.append(InitiativeRollup(
+            initiative_id=row.pop('pk'), latest_due_date=max(due_dates) if due_dates else None, **row
+        ))
+    InitiativeRollup.objects.bulk_create(rollups, batch_size=BATCH_SIZE)
+
+
+def fill_allocation_days(apps):
+    UserAllocationDaily = apps.get_model('planning', 'UserAllocationDaily')
+    ResourceAllocation = apps.get_model('planning', 'ResourceAllocation')
+
+    days = defaultdict(lambda: [Decimal(0), 0])
+    allocations = ResourceAllocation.objects.values_list('user_id', 'start_date', 'end_date', 'allocation_percentage')
+    for user_id, day, last, percentage in allocations:
+        while day <= last:
+            totals = days[(user_id, day)]
+            totals[0] += percentage
+            totals[1] += 1
+            day += datetime.timedelta(days=1)
+    UserAllocationDaily.objects.bulk_create(
+        (
+            UserAllocationDaily(user_id=user_id, date=date, allocation_percentage=percentage, allocation_count=count)
+            for (user_id, date), (percentage, count) in days.items()
+        ),
+        batch_size=BATCH_SIZE,
+    )
+
+
+def fill_rollups(apps, schema_editor):
+    fill_initiative_rollups(apps)
+    fill_allocation_days(apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('planning', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InitiativeRollup',
+            fields=[
+                ('initiative', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='rollup', serialize=False, to='planning.initiative')),
+                ('plan_count', models.PositiveIntegerField(default=0)),
+                ('task_count', models.PositiveIntegerField(default=0)),
+                ('completed_task_count', models.PositiveIntegerField(default=0)),
+                ('risk_count', models.PositiveIntegerField(default=0)),
+                ('milestone_count', models.PositiveIntegerField(default=0)),
+                ('completed_milestone_count', models.PositiveIntegerField(default=0)),
+                ('missed_milestone_count', models.PositiveIntegerField(default=0)),
+                ('estimated_hours', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('actual_hours', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('latest_due_date', models.DateField(blank=True, help_text='Latest due date of the open tasks and milestones', null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='UserAllocationDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('allocation_percentage', models.DecimalField(decimal_places=2, max_digits=7)),
+                ('allocation_count', models.PositiveIntegerField()),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='allocation_days', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['date'], name='planning_allocation_day_date')],
+                'unique_together': {('user', 'date')},
+            },
+        ),
+        migrations.RunPython(fill_rollups, migrations.RunPython.noop),
+    ]
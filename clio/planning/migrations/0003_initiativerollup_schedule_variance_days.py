@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:13
+
+from django.db import migrations, models
+
+BATCH_SIZE = 500
+
+
+def fill_schedule_variance(apps, schema_editor):
+    # Frozen copy of how planning.rollups derived the variance when this was written
+    InitiativeRollup = apps.get_model('planning', 'InitiativeRollup')
+    rollups = list(InitiativeRollup.objects.select_related('initiative'))
+    for rollup in rollups:
+        target = rollup.initiative.target_completion_date
+        finish = rollup.initiative.actual_completion_date or rollup.latest_due_date
+        rollup.schedule_variance_days = (target - finish).days if target and finish else None
+    InitiativeRollup.objects.bulk_update(rollups, ['schedule_variance_days'], batch_size=BATCH_SIZE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('planning', '0002_planning_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='initiativerollup',
+            name='schedule_variance_days',
+            field=models.IntegerField(blank=True, help_text='Days the completion or latest due date is ahead of the target date, negative when behind', null=True),
+        ),
+        migrations.RunPython(fill_schedule_variance, migrations.RunPython.noop),
+    ]
@@ -220,4 +220,48 @@ class PlanningDocument(models.Model):
         ]
     
     def __str__(self):
-        return f"{self.name} v{self.version}"
\ No newline at end of file
+        return f"{self.name} v{self.version}"
+
+class InitiativeRollup(models.Model):
+    """Precomputed planning figures of an initiative, maintained by planning/rollups.py"""
+    initiative = models.OneToOneField(Initiative, on_delete=models.CASCADE, primary_key=True, related_name='rollup')
+    plan_count = models.PositiveIntegerField(default=0)
+    task_count = models.PositiveIntegerField(default=0)
+    completed_task_count = models.PositiveIntegerField(default=0)
+    risk_count = models.PositiveIntegerField(default=0)
+    milestone_count = models.PositiveIntegerField(default=0)
+    completed_milestone_count = models.PositiveIntegerField(default=0)
+    missed_milestone_count = models.PositiveIntegerField(default=0)
+    estimated_hours = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    actual_hours = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    latest_due_date = models.DateField(
+        null=True, blank=True, help_text="Latest due date of the open tasks and milestones"
+    )
+    schedule_variance_days = models.IntegerField(
+        null=True, blank=True,
+        help_text="Days the completion or latest due date is ahead of the target date, negative when behind"
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    @property
+    def completion_percentage(self):
+        return self.completed_task_count * 100 // self.task_count if self.task_count else 0
+    
+    def __str__(self):
+        return f"Rollup of {self.initiative}"
+
+class UserAllocationDaily(models.Model):
+    """A user's summed resource allocation on one day, maintained by planning/rollups.py"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='allocation_days')
+    date = models.DateField()
+    allocation_percentage = models.DecimalField(max_digits=7, decimal_places=2)
+    allocation_count = models.PositiveIntegerField()
+    
+    class Meta:
+        unique_together = ('user', 'date')
+        indexes = [
+            models.Index(fields=['date'], name='planning_allocation_day_date'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user.username} {self.date}: {self.allocation_percentage}%"
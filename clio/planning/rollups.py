@@ -0,0 +1,224 @@
+# planning/rollups.py
+
+"""
+Maintenance of the InitiativeRollup and UserAllocationDaily tables.
+
+InitiativeRollup holds each initiative's plan, task, risk and milestone
+counts, hours, latest open due date and schedule variance; UserAllocationDaily holds each user's
+summed allocation percentage per day. Pages read these rows instead of
+counting Task and ResourceAllocation rows on every request.
+
+Both are refreshed incrementally by the handlers in planning/signals.py: a
+write marks the initiative or the user's date range it affects, and once the
+transaction commits only those rows are recomputed, each initiative batch in
+one query. rebuild_planning_rollups recreates everything, e.g. after bulk
+writes that skip signals.
+"""
+
+import datetime
+from collections import defaultdict
+from decimal import Decimal
+
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import (
+    BooleanField, DateField, DecimalField, Exists, ExpressionWrapper, IntegerField, Max, OuterRef, Q, Subquery, Sum, Value
+)
+from django.db.models.functions import Coalesce
+
+from .metrics import (
+    OVER_ALLOCATED_PERCENTAGE, aggregate_per_row, completion_percentage, count_per_row, with_initiative_metrics
+)
+from .models import InitiativeRollup, ResourceAllocation, UserAllocationDaily
+
+BATCH_SIZE = 500
+ROLLUP_FIELDS = [
+    'plan_count', 'task_count', 'completed_task_count', 'risk_count', 'milestone_count',
+    'completed_milestone_count', 'missed_milestone_count', 'estimated_hours', 'actual_hours', 'latest_due_date',
+    'schedule_variance_days',
+]
+# Filled in Python from the annotated rows rather than annotated themselves
+_DERIVED_FIELDS = ('latest_due_date', 'schedule_variance_days')
+CLOSED_STATUSES = ('completed', 'canceled', 'missed')
+_HOURS = DecimalField(max_digits=12, decimal_places=2)
+_ONE_DAY = datetime.timedelta(days=1)
+
+
+def _schedule_variance(target, finish):
+    """Days finish is ahead of target, negative when behind; None without either date"""
+    if target is None or finish is None:
+        return None
+    return (target - finish).days
+
+
+def _initiative_rollups(initiative_ids=None, registry=apps):
+    """Compute InitiativeRollup objects for the given initiatives (all by default)"""
+    Initiative = registry.get_model('planning', 'Initiative')
+    Task = registry.get_model('planning', 'Task')
+    Milestone = registry.get_model('planning', 'Milestone')
+    rollup_model = registry.get_model('planning', 'InitiativeRollup')
+
+    initiatives = Initiative.objects.all()
+    if initiative_ids is not None:
+        initiatives = initiatives.filter(pk__in=initiative_ids)
+    tasks = Task.objects.all()
+    milestones = Milestone.objects.all()
+    open_tasks = tasks.exclude(status__in=CLOSED_STATUSES)
+    open_milestones = milestones.exclude(status__in=CLOSED_STATUSES)
+
+    rows = with_initiative_metrics(initiatives, registry).annotate(
+        milestone_count=count_per_row(milestones, 'plan__initiative'),
+        completed_milestone_count=count_per_row(milestones, 'plan__initiative', Q(status='completed')),
+        missed_milestone_count=count_per_row(milestones, 'plan__initiative', Q(status='missed')),
+        estimated_hours=Coalesce(
+            aggregate_per_row(tasks, 'plan__initiative', Sum('estimated_hours'), _HOURS), Value(Decimal(0)),
+            output_field=_HOURS,
+        ),
+        actual_hours=Coalesce(
+            aggregate_per_row(tasks, 'plan__initiative', Sum('actual_hours'), _HOURS), Value(Decimal(0)),
+            output_field=_HOURS,
+        ),
+        # The later of the two becomes latest_due_date
+        latest_task_due=aggregate_per_row(open_tasks, 'plan__initiative', Max('due_date'), DateField()),
+        latest_milestone_due=aggregate_per_row(open_milestones, 'plan__initiative', Max('due_date'), DateField()),
+    ).values(
+        'pk', *(field for field in ROLLUP_FIELDS if field not in _DERIVED_FIELDS),
+        'latest_task_due', 'latest_milestone_due', 'target_completion_date', 'actual_completion_date',
+    )
+
+    rollups = []
+    for row in rows:
+        due_dates = [date for date in (row.pop('latest_task_due'), row.pop('latest_milestone_due')) if date]
+        latest_due_date = max(due_dates) if due_dates else None
+        # Unfinished initiatives are measured by when their open work is due
+        finish = row.pop('actual_completion_date') or latest_due_date
+        rollups.append(rollup_model(
+            initiative_id=row.pop('pk'),
+            latest_due_date=latest_due_date,
+            schedule_variance_days=_schedule_variance(row.pop('target_completion_date'), finish),
+            **row,
+        ))
+    return rollups
+
+
+def refresh_initiative_rollups(initiative_ids):
+    """Recompute the rollups of the given initiatives"""
+    initiative_ids = list(initiative_ids)
+    for start in range(0, len(initiative_ids), BATCH_SIZE):
+        InitiativeRollup.objects.bulk_create(
+            _initiative_rollups(initiative_ids[start:start + BATCH_SIZE]),
+            update_conflicts=True,
+            unique_fields=['initiative'],
+            update_fields=ROLLUP_FIELDS + ['updated_at'],
+        )
+
+
+def _allocation_days(allocations, start=None, end=None):
+    """
+    Sum allocations per user and day
+
+    Args:
+        allocations: (user_id, start_date, end_date, percentage) tuples
+        start, end: Only count days in this range, when given
+
+    Returns:
+        dict: (user_id, date) -> [percentage, count]
+    """
+    days = defaultdict(lambda: [Decimal(0), 0])
+    for user_id, first, last, percentage in allocations:
+        day = max(first, start) if start else first
+        last = min(last, end) if end else last
+        while day <= last:
+            totals = days[(user_id, day)]
+            totals[0] += percentage
+            totals[1] += 1
+            day += _ONE_DAY
+    return days
+
+
+def _allocation_rows(days, day_model):
+    return [
+        day_model(user_id=user_id, date=date, allocation_percentage=percentage, allocation_count=count)
+        for (user_id, date), (percentage, count) in days.items()
+    ]
+
+
+def refresh_user_allocation_days(user_id, start, end):
+    """Recompute a user's UserAllocationDaily rows from start to end inclusive"""
+    allocations = ResourceAllocation.objects.filter(
+        user_id=user_id, start_date__lte=end, end_date__gte=start
+    ).values_list('user_id', 'start_date', 'end_date', 'allocation_percentage')
+    rows = _allocation_rows(_allocation_days(allocations, start, end), UserAllocationDaily)
+    with transaction.atomic():
+        UserAllocationDaily.objects.filter(user_id=user_id, date__range=(start, end)).delete()
+        UserAllocationDaily.objects.bulk_create(rows, batch_size=BATCH_SIZE)
+
+
+def rebuild_planning_rollups(registry=apps):
+    """
+    Recreate every rollup row
+
+    Args:
+        registry: App registry to load models from; migrations pass their
+                  historical one
+
+    Returns:
+        dict: number of initiative rollups and allocation days written
+    """
+    rollup_model = registry.get_model('planning', 'InitiativeRollup')
+    day_model = registry.get_model('planning', 'UserAllocationDaily')
+    allocation_model = registry.get_model('planning', 'ResourceAllocation')
+
+    with transaction.atomic():
+        rollup_model.objects.all().delete()
+        rollups = _initiative_rollups(registry=registry)
+        rollup_model.objects.bulk_create(rollups, batch_size=BATCH_SIZE)
+
+        day_model.objects.all().delete()
+        allocations = allocation_model.objects.values_list('user_id', 'start_date', 'end_date', 'allocation_percentage')
+        days = _allocation_rows(_allocation_days(allocations), day_model)
+        day_model.objects.bulk_create(days, batch_size=BATCH_SIZE)
+    return {'initiatives': len(rollups), 'allocation_days': len(days)}
+
+
+def with_initiative_rollups(queryset):
+    """
+    Annotate initiatives with their precomputed figures
+
+    Adds the same plan_count, task_count, completed_task_count, risk_count
+    and completion_percentage as planning.metrics.with_initiative_metrics,
+    read from InitiativeRollup with a single join.
+    """
+    return queryset.select_related('rollup').annotate(
+        plan_count=Coalesce('rollup__plan_count', 0),
+        task_count=Coalesce('rollup__task_count', 0),
+        completed_task_count=Coalesce('rollup__completed_task_count', 0),
+        risk_count=Coalesce('rollup__risk_count', 0),
+    ).annotate(
+        completion_percentage=completion_percentage(),
+    )
+
+
+def users_with_allocation_on(date):
+    """
+    Users with any resource allocation, annotated with their precomputed
+    allocation on date
+
+    Adds total_allocation (the summed percentage), allocation_count and
+    is_over_allocated.
+    """
+    day = UserAllocationDaily.objects.filter(user=OuterRef('pk'), date=date)
+    return User.objects.filter(
+        Exists(ResourceAllocation.objects.filter(user=OuterRef('pk')))
+    ).annotate(
+        total_allocation=Coalesce(
+            Subquery(day.values('allocation_percentage')), Value(Decimal(0)),
+            output_field=DecimalField(max_digits=7, decimal_places=2),
+        ),
+        allocation_count=Coalesce(Subquery(day.values('allocation_count')), 0, output_field=IntegerField()),
+    ).annotate(
+        is_over_allocated=ExpressionWrapper(
+            Q(total_allocation__gt=OVER_ALLOCATED_PERCENTAGE), output_field=BooleanField()
+        ),
+    )
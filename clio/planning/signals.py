@@ -0,0 +1,153 @@
+# planning/signals.py
+
+"""
+Signal handlers that keep the planning rollups (planning/rollups.py) current
+with Initiative, Plan, Task, Milestone, RiskRegister and ResourceAllocation
+writes.
+
+Each write only records what it affects: plans, initiatives and user date
+ranges, including the ones a row was moved away from. The affected rollups
+are recomputed once the transaction commits, so a request touching many rows
+of one initiative refreshes it once.
+"""
+
+import threading
+
+from django.db import transaction
+from django.db.models.signals import post_init, post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Initiative, Milestone, Plan, ResourceAllocation, RiskRegister, Task
+from .rollups import refresh_initiative_rollups, refresh_user_allocation_days
+
+_pending = threading.local()
+
+
+def _pending_changes():
+    if not hasattr(_pending, 'plans'):
+        _pending.plans = set()
+        _pending.initiatives = set()
+        _pending.user_ranges = {}
+    return _pending
+
+
+def _schedule_refresh(plans=(), initiatives=(), user_ranges=()):
+    pending = _pending_changes()
+    pending.plans.update(plan_id for plan_id in plans if plan_id)
+    pending.initiatives.update(initiative_id for initiative_id in initiatives if initiative_id)
+    for user_id, start, end in user_ranges:
+        if user_id and start and end:
+            known = pending.user_ranges.get(user_id)
+            pending.user_ranges[user_id] = (min(start, known[0]), max(end, known[1])) if known else (start, end)
+    # Every write registers a callback, but the first one to run takes all the
+    # pending work; changes left over from a rolled back transaction are
+    # simply refreshed along with the next one
+    transaction.on_commit(_refresh_pending)
+
+
+def _refresh_pending():
+    pending = _pending_changes()
+    plans, initiatives, user_ranges = pending.plans, pending.initiatives, pending.user_ranges
+    if not (plans or initiatives or user_ranges):
+        return
+    pending.plans, pending.initiatives, pending.user_ranges = set(), set(), {}
+
+    # Plans deleted since were counted through the initiative they belonged to
+    initiatives.update(Plan.objects.filter(pk__in=plans).values_list('initiative_id', flat=True))
+    refresh_initiative_rollups(initiatives)
+    for user_id, (start, end) in user_ranges.items():
+        refresh_user_allocation_days(user_id, start, end)
+
+
+# States are read from __dict__ so deferred fields are never loaded just to be remembered
+
+def _plan_link(instance):
+    return instance.__dict__.get('plan_id')
+
+
+def _initiative_link(instance):
+    return instance.__dict__.get('initiative_id')
+
+
+def _initiative_dates(initiative):
+    fields = initiative.__dict__
+    return (fields.get('target_completion_date'), fields.get('actual_completion_date'))
+
+
+def _allocation_range(allocation):
+    fields = allocation.__dict__
+    return (fields.get('user_id'), fields.get('start_date'), fields.get('end_date'))
+
+
+@receiver(post_init, sender=Initiative)
+def remember_initiative_dates(sender, instance, **kwargs):
+    instance._rollup_state = _initiative_dates(instance)
+
+
+@receiver(post_save, sender=Initiative)
+def initiative_saved(sender, instance, created=False, raw=False, **kwargs):
+    # Only the dates feed the rollup, through its schedule variance
+    if raw or not (created or instance._rollup_state != _initiative_dates(instance)):
+        return
+    _schedule_refresh(initiatives=[instance.pk])
+    instance._rollup_state = _initiative_dates(instance)
+
+
+@receiver(post_init, sender=Task)
+@receiver(post_init, sender=Milestone)
+def remember_plan(sender, instance, **kwargs):
+    instance._rollup_state = _plan_link(instance)
+
+
+@receiver(post_save, sender=Task)
+@receiver(post_save, sender=Milestone)
+def plan_item_saved(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    _schedule_refresh(plans=[instance._rollup_state, _plan_link(instance)])
+    instance._rollup_state = _plan_link(instance)
+
+
+@receiver(post_delete, sender=Task)
+@receiver(post_delete, sender=Milestone)
+def plan_item_deleted(sender, instance, **kwargs):
+    _schedule_refresh(plans=[_plan_link(instance)])
+
+
+@receiver(post_init, sender=Plan)
+@receiver(post_init, sender=RiskRegister)
+def remember_initiative(sender, instance, **kwargs):
+    instance._rollup_state = _initiative_link(instance)
+
+
+@receiver(post_save, sender=Plan)
+@receiver(post_save, sender=RiskRegister)
+def initiative_item_saved(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    _schedule_refresh(initiatives=[instance._rollup_state, _initiative_link(instance)])
+    instance._rollup_state = _initiative_link(instance)
+
+
+@receiver(post_delete, sender=Plan)
+@receiver(post_delete, sender=RiskRegister)
+def initiative_item_deleted(sender, instance, **kwargs):
+    _schedule_refresh(initiatives=[_initiative_link(instance)])
+
+
+@receiver(post_init, sender=ResourceAllocation)
+def remember_allocation_range(sender, instance, **kwargs):
+    instance._rollup_state = _allocation_range(instance)
+
+
+@receiver(post_save, sender=ResourceAllocation)
+def allocation_saved(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    _schedule_refresh(user_ranges=[instance._rollup_state, _allocation_range(instance)])
+    instance._rollup_state = _allocation_range(instance)
+
+
+@receiver(post_delete, sender=ResourceAllocation)
+def allocation_deleted(sender, instance, **kwargs):
+    _schedule_refresh(user_ranges=[_allocation_range(instance)])
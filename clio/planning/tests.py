@@ -1,3 +1,262 @@
-from django.test import TestCase
+import datetime
+from decimal import Decimal
+from unittest import skipIf
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from core.profiling import assert_max_queries
+
+from . import views
+
+from .metrics import milestone_adherence, with_initiative_metrics
+from .models import (
+    Initiative, InitiativeRollup, Milestone, Plan, ResourceAllocation, RiskRegister, Task, UserAllocationDaily
+)
+from .rollups import ROLLUP_FIELDS, rebuild_planning_rollups, users_with_allocation_on, with_initiative_rollups
+from .timeline import build_allocation_timeline, daily_load, np
+
+METRICS = ('plan_count', 'task_count', 'completed_task_count', 'risk_count', 'completion_percentage')
+
+
+def day(number):
+    """A day in January 2026; the 5th is a Monday"""
+    return datetime.date(2026, 1, number)
+
+
+class InitiativeMetricsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.initiative = Initiative.objects.create(name='Payroll migration')
+        cls.other = Initiative.objects.create(name='Directory cleanup')
+        cls.plan = Plan.objects.create(initiative=cls.initiative, name='Cutover')
+        Plan.objects.create(initiative=cls.initiative, name='Training')
+        for name, status in (('Export', 'completed'), ('Import', 'not_started'), ('Verify', 'not_started')):
+            Task.objects.create(plan=cls.plan, name=name, status=status)
+        for description in ('Data loss', 'Downtime'):
+            RiskRegister.objects.create(
+                initiative=cls.initiative, description=description, likelihood='low', impact='high'
+            )
+
+    def test_counts_per_initiative(self):
+        metrics = with_initiative_metrics(Initiative.objects.order_by('pk')).values_list(*METRICS)
+        # Plans, tasks and risks are counted apart, not multiplied by a join
+        self.assertEqual(list(metrics), [(2, 3, 1, 2, 33), (0, 0, 0, 0, 0)])
+
+    def test_one_query(self):
+        with self.assertNumQueries(1):
+            list(with_initiative_metrics(Initiative.objects.all()))
+
+    def test_milestone_adherence(self):
+        for name, due, status, updated in (
+            ('On time', day(10), 'completed', day(9)),
+            ('Late', day(10), 'completed', day(12)),
+            ('Missed', day(11), 'missed', day(11)),
+            ('Open', day(12), 'pending', day(1)),
+            ('Future', day(30), 'pending', day(1)),
+        ):
+            milestone = Milestone.objects.create(plan=self.plan, name=name, due_date=due, status=status)
+            Milestone.objects.filter(pk=milestone.pk).update(
+                updated_at=datetime.datetime.combine(updated, datetime.time(12), tzinfo=datetime.timezone.utc)
+            )
+        self.assertEqual(milestone_adherence(day(20)), {
+            'total_passed': 4, 'on_time_count': 1, 'late_count': 1, 'missed_count': 1,
+        })
+
+
+class RollupTests(TestCase):
+
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.initiative = Initiative.objects.create(name='Payroll migration', target_completion_date=day(31))
+            self.other = Initiative.objects.create(name='Directory cleanup')
+            self.plan = Plan.objects.create(initiative=self.initiative, name='Cutover')
+            Plan.objects.create(initiative=self.initiative, name='Training')
+            self.milestone = Milestone.objects.create(plan=self.plan, name='Go live', due_date=day(20))
+            Milestone.objects.create(plan=self.plan, name='Pilot', due_date=day(10), status='completed')
+            Task.objects.create(
+                plan=self.plan, name='Export', status='completed', estimated_hours=4, actual_hours=5, due_date=day(8)
+            )
+            Task.objects.create(plan=self.plan, name='Import', estimated_hours='2.5', due_date=day(25))
+            Task.objects.create(plan=self.plan, name='Verify')
+            RiskRegister.objects.create(
+                initiative=self.initiative, description='Data loss', likelihood='low', impact='high'
+            )
+
+    def rollup(self, initiative):
+        return InitiativeRollup.objects.filter(initiative=initiative).values(*ROLLUP_FIELDS).get()
+
+    def test_writes_refresh_the_rollup(self):
+        self.assertEqual(self.rollup(self.initiative), {
+            'plan_count': 2, 'task_count': 3, 'completed_task_count': 1, 'risk_count': 1,
+            'milestone_count': 2, 'completed_milestone_count': 1, 'missed_milestone_count': 0,
+            'estimated_hours': Decimal('6.50'), 'actual_hours': Decimal('5.00'),
+            # Closed tasks and milestones don't count towards the latest due date
+            'latest_due_date': day(25),
+            'schedule_variance_days': 6,
+        })
+        self.assertEqual(self.rollup(self.other)['task_count'], 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.milestone.status = 'missed'
+            self.milestone.save()
+            Task.objects.filter(name='Import').get().delete()
+        rollup = self.rollup(self.initiative)
+        self.assertEqual((rollup['task_count'], rollup['missed_milestone_count']), (2, 1))
+        self.assertIsNone(rollup['latest_due_date'])
+        self.assertIsNone(rollup['schedule_variance_days'])
+
+    def test_initiative_dates_refresh_the_variance(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.initiative.actual_completion_date = day(31) + datetime.timedelta(days=4)
+            self.initiative.save()
+        self.assertEqual(self.rollup(self.initiative)['schedule_variance_days'], -4)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.other.target_completion_date = day(1)
+            self.other.save()
+        # Without an open due date there is nothing to measure against yet
+        self.assertIsNone(self.rollup(self.other)['schedule_variance_days'])
+
+    def test_other_initiative_edits_skip_the_refresh(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.initiative.name = 'Payroll cutover'
+            self.initiative.save()
+        self.assertEqual(callbacks, [])
+
+    def test_moving_a_plan_refreshes_both_initiatives(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.plan.initiative = self.other
+            self.plan.save()
+        self.assertEqual(self.rollup(self.initiative)['task_count'], 0)
+        self.assertEqual(self.rollup(self.other)['task_count'], 3)
+
+    def test_rollups_match_counted_metrics(self):
+        counted = with_initiative_metrics(Initiative.objects.order_by('pk')).values_list(*METRICS)
+        read = with_initiative_rollups(Initiative.objects.order_by('pk')).values_list(*METRICS)
+        self.assertEqual(list(read), list(counted))
+        self.assertEqual(list(read)[0], (2, 3, 1, 1, 33))
+
+    def test_rebuild_matches_incremental_rows(self):
+        incremental = self.rollup(self.initiative)
+        self.assertEqual(rebuild_planning_rollups(), {'initiatives': 2, 'allocation_days': 0})
+        self.assertEqual(self.rollup(self.initiative), incremental)
+        self.assertEqual(self.rollup(self.other)['task_count'], 0)
+
+
+class AllocationDayTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('analyst')
+        cls.initiative = Initiative.objects.create(name='Payroll migration')
+
+    def allocate(self, percentage, start, end):
+        with self.captureOnCommitCallbacks(execute=True):
+            return ResourceAllocation.objects.create(
+                initiative=self.initiative, user=self.user, role='Analyst',
+                allocation_percentage=percentage, start_date=start, end_date=end,
+            )
+
+    def days(self):
+        return dict(UserAllocationDaily.objects.filter(user=self.user).values_list('date', 'allocation_percentage'))
+
+    def test_overlapping_allocations(self):
+        self.allocate(60, day(5), day(7))
+        self.allocate(50, day(7), day(8))
+        self.assertEqual(self.days(), {day(5): 60, day(6): 60, day(7): 110, day(8): 50})
+
+        user = users_with_allocation_on(day(7)).get()
+        self.assertEqual((user.total_allocation, user.allocation_count, user.is_over_allocated), (110, 2, True))
+        self.assertFalse(users_with_allocation_on(day(8)).get().is_over_allocated)
+        self.assertEqual(users_with_allocation_on(day(9)).get().total_allocation, 0)
+
+    def test_moved_allocation_clears_its_old_days(self):
+        allocation = self.allocate(60, day(5), day(6))
+        with self.captureOnCommitCallbacks(execute=True):
+            allocation.start_date, allocation.end_date = day(12), day(12)
+            allocation.save()
+        self.assertEqual(self.days(), {day(12): 60})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            allocation.delete()
+        self.assertEqual(self.days(), {})
+
+    def test_rebuild_matches_incremental_rows(self):
+        self.allocate(60, day(5), day(7))
+        self.allocate('12.5', day(6), day(9))
+        incremental = self.days()
+        self.assertEqual(rebuild_planning_rollups()['allocation_days'], 5)
+        self.assertEqual(self.days(), incremental)
+
+
+@skipIf(np is None, 'The allocation timeline needs NumPy')
+class DailyLoadTests(SimpleTestCase):
+
+    def test_allocations_are_clipped_to_the_horizon(self):
+        load = daily_load(
+            rows=np.array([0, 0, 1, 1]),
+            starts=np.array([-3, 2, 4, 9]),
+            ends=np.array([1, 3, 6, 12]),
+            hundredths=np.array([1000.0, 2550.0, 5000.0, 7000.0]),
+            user_count=2, day_count=5,
+        )
+        self.assertEqual(load.tolist(), [[1000, 1000, 2550, 2550, 0], [0, 0, 0, 0, 5000]])
+
+
+@skipIf(np is None, 'The allocation timeline needs NumPy')
+class TimelineTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.initiative = Initiative.objects.create(name='Payroll migration')
+        cls.analyst = User.objects.create_user('analyst', password='secret', first_name='Ada', last_name='Byron')
+        cls.tester = User.objects.create_user('tester')
+        for user, percentage, start, end in (
+            (cls.analyst, 60, day(5), day(11)),
+            (cls.analyst, 50, day(9), day(13)),
+            (cls.tester, 100, day(1), day(6)),
+            # Outside a two week horizon
+            (cls.tester, 100, day(20), day(30)),
+        ):
+            ResourceAllocation.objects.create(
+                initiative=cls.initiative, user=user, role='Analyst',
+                allocation_percentage=percentage, start_date=start, end_date=end,
+            )
+
+    def test_weekly_load_and_windows(self):
+        timeline = build_allocation_timeline(start=day(7), weeks=2)
+        self.assertEqual(timeline['start'], '2026-01-05')
+        self.assertEqual(timeline['weeks'], ['2026-01-05', '2026-01-12'])
+        self.assertEqual(timeline['users'], [
+            {'id': self.analyst.pk, 'name': 'Ada Byron', 'load': [81.4, 14.3], 'peak': [110.0, 50.0]},
+            {'id': self.tester.pk, 'name': 'tester', 'load': [28.6, 0.0], 'peak': [100.0, 0.0]},
+        ])
+        # Exactly 100% is not over-allocated
+        self.assertEqual(timeline['over_allocations'], [{
+            'user_id': self.analyst.pk, 'user_name': 'Ada Byron',
+            'start': '2026-01-09', 'end': '2026-01-11', 'days': 3, 'peak': 110.0,
+        }])
+
+    def test_filters(self):
+        timeline = build_allocation_timeline(start=day(5), weeks=2, user_ids=[self.tester.pk], limit=50)
+        self.assertEqual([user['id'] for user in timeline['users']], [self.tester.pk])
+        self.assertEqual(
+            [(window['start'], window['days']) for window in timeline['over_allocations']], [('2026-01-05', 2)]
+        )
+
+    def test_empty_horizon(self):
+        timeline = build_allocation_timeline(start=day(1) + datetime.timedelta(weeks=10), weeks=1)
+        self.assertEqual((timeline['users'], timeline['over_allocations']), ([], []))
+
+    @override_settings(QUERY_PROFILING=True, QUERY_BUDGET_STRICT=True)
+    def test_heatmap_endpoint(self):
+        self.client.force_login(self.analyst)
+        url = reverse('planning:resource_allocation_heatmap')
+        with assert_max_queries(*views.resource_allocation_heatmap.query_budget):
+            response = self.client.get(url, {'start': '2026-01-05', 'weeks': 2, 'users': str(self.tester.pk)})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([user['peak'] for user in response.json()['users']], [[100.0, 0.0]])
+        self.assertEqual(self.client.get(url, {'weeks': 'many'}).status_code, 400)
@@ -0,0 +1,162 @@
+# planning/timeline.py
+
+"""
+Weekly resource load per user, for capacity planning.
+
+Every ResourceAllocation overlapping the horizon is turned into a
+(user x day) load matrix with one interval sweep: each allocation adds its
+percentage at its first day and takes it away after its last, and a running
+sum along the days gives the load on each day. Percentages are summed as
+integer hundredths, so a user at exactly 100% is never pushed over by float
+rounding. The days are then folded into weeks for the heatmap, and runs of
+days above the over-allocation threshold are reported as windows.
+
+NumPy is optional: without it build_allocation_timeline returns None and the
+heatmap endpoint says so.
+"""
+
+import datetime
+
+from django.contrib.auth.models import User
+from django.utils import timezone
+
+from .metrics import OVER_ALLOCATED_PERCENTAGE
+from .models import ResourceAllocation
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy is an optional dependency
+    np = None
+
+DEFAULT_WEEKS = 52
+MAX_WEEKS = 156
+DAYS_PER_WEEK = 7
+
+
+def week_start(date):
+    """The Monday of date's week"""
+    return date - datetime.timedelta(days=date.weekday())
+
+
+def daily_load(rows, starts, ends, hundredths, user_count, day_count):
+    """
+    Sum allocations per user and day with an interval sweep
+
+    Args:
+        rows: Integer array, the matrix row (user) of each allocation
+        starts, ends: Integer arrays, first and last day of each allocation
+                      as offsets from the horizon start; may fall outside it
+        hundredths: Each allocation's percentage * 100, as whole numbers
+        user_count, day_count: Shape of the result
+
+    Returns:
+        (user_count, day_count) int64 array of summed hundredths of a percent
+    """
+    width = day_count + 1
+    starts = np.clip(starts, 0, day_count)
+    stops = np.clip(ends + 1, 0, day_count)
+    overlapping = starts < stops
+    rows, starts, stops, hundredths = rows[overlapping], starts[overlapping], stops[overlapping], hundredths[overlapping]
+
+    size = user_count * width
+    delta = np.bincount(rows * width + starts, weights=hundredths, minlength=size)
+    delta -= np.bincount(rows * width + stops, weights=hundredths, minlength=size)
+    # Whole hundredths stay exact in float64 far beyond any realistic sum
+    delta = np.rint(delta).astype(np.int64).reshape(user_count, width)
+    return np.cumsum(delta[:, :-1], axis=1)
+
+
+def over_allocation_windows(load, limit):
+    """
+    Find the runs of consecutive days each user is loaded above limit
+
+    Returns:
+        (rows, first days, days after the last) integer arrays, one entry per
+        window, ordered by row then day
+    """
+    over = np.zeros((load.shape[0], load.shape[1] + 2), dtype=np.int8)
+    over[:, 1:-1] = load > limit
+    edges = np.diff(over, axis=1)
+    rows, firsts = np.nonzero(edges == 1)
+    _, stops = np.nonzero(edges == -1)
+    return rows, firsts, stops
+
+
+def _allocations(start, end, user_ids=None):
+    allocations = ResourceAllocation.objects.filter(start_date__lte=end, end_date__gte=start)
+    if user_ids is not None:
+        allocations = allocations.filter(user_id__in=user_ids)
+    return list(allocations.values_list('user_id', 'start_date', 'end_date', 'allocation_percentage'))
+
+
+def build_allocation_timeline(start=None, weeks=DEFAULT_WEEKS, user_ids=None, limit=OVER_ALLOCATED_PERCENTAGE):
+    """
+    Compute each user's weekly load and over-allocation windows
+
+    Args:
+        start: First day of the horizon, moved back to its Monday (this week
+               by default)
+        weeks: Length of the horizon in weeks
+        user_ids: Only include these users, when given
+        limit: Daily load percentage above which a user is over-allocated
+
+    Returns:
+        dict with the horizon's week starts, a row per user with allocations
+        in the horizon holding its average (load) and highest daily (peak)
+        percentage per week, and the over_allocations windows; or None
+        without NumPy
+    """
+    if np is None:
+        return None
+
+    start = week_start(start or timezone.now().date())
+    day_count = weeks * DAYS_PER_WEEK
+    end = start + datetime.timedelta(days=day_count - 1)
+
+    allocations = _allocations(start, end, user_ids)
+    user_ids = sorted({user_id for user_id, _, _, _ in allocations})
+    names_by_id = {
+        user_id: f'{first_name} {last_name}'.strip() or username
+        for user_id, username, first_name, last_name in User.objects.filter(pk__in=user_ids).values_list(
+            'pk', 'username', 'first_name', 'last_name'
+        )
+    }
+    names = [names_by_id.get(user_id, '') for user_id in user_ids]
+
+    if allocations:
+        owners, firsts, lasts, percentages = zip(*allocations)
+        rows = np.searchsorted(np.array(user_ids, dtype=np.int64), np.array(owners, dtype=np.int64))
+        origin = np.datetime64(start, 'D')
+        starts = (np.array(firsts, dtype='datetime64[D]') - origin).astype(np.int64)
+        ends = (np.array(lasts, dtype='datetime64[D]') - origin).astype(np.int64)
+        hundredths = np.array([int(percentage * 100) for percentage in percentages], dtype=np.float64)
+    else:
+        rows = starts = ends = np.zeros(0, dtype=np.int64)
+        hundredths = np.zeros(0)
+    load = daily_load(rows, starts, ends, hundredths, len(user_ids), day_count)
+
+    by_week = load.reshape(len(user_ids), weeks, DAYS_PER_WEEK)
+    average = np.round(by_week.mean(axis=2) / 100, 1).tolist()
+    peak = (by_week.max(axis=2) / 100).tolist()
+
+    windows = []
+    for row, first, stop in zip(*(array.tolist() for array in over_allocation_windows(load, limit * 100))):
+        windows.append({
+            'user_id': user_ids[row],
+            'user_name': names[row],
+            'start': (start + datetime.timedelta(days=first)).isoformat(),
+            'end': (start + datetime.timedelta(days=stop - 1)).isoformat(),
+            'days': stop - first,
+            'peak': int(load[row, first:stop].max()) / 100,
+        })
+
+    return {
+        'start': start.isoformat(),
+        'weeks': [(start + datetime.timedelta(weeks=week)).isoformat() for week in range(weeks)],
+        'limit': limit,
+        'users': [
+            {'id': user_id, 'name': name, 'load': average[row], 'peak': peak[row]}
+            for row, (user_id, name) in enumerate(zip(user_ids, names))
+        ],
+        'over_allocations': windows,
+    }
@@ -53,5 +53,6 @@ urlpatterns = [
     path('reports/', views.reports, name='reports'),
     path('reports/initiative-status/', views.initiative_status_report, name='initiative_status_report'),
     path('reports/resource-utilization/', views.resource_utilization_report, name='resource_utilization_report'),
+    path('reports/resource-utilization/heatmap/', views.resource_allocation_heatmap, name='resource_allocation_heatmap'),
     path('reports/timeline-adherence/', views.timeline_adherence_report, name='timeline_adherence_report'),
 ]
\ No newline at end of file
@@ -1,14 +1,19 @@
 # planning/views.py
 
+import datetime
+
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.db.models import Count, Sum, Q, Case, When, Value, IntegerField, F
+from django.db.models import Count, Q, Case, When, Value, IntegerField
+from django.db.models.functions import Coalesce
 from django.urls import reverse
 from django.utils import timezone
 from django.http import JsonResponse
 from django.contrib.auth.models import User
 
+from core.pagination import KeysetPaginator, InvalidCursor, parse_per_page
+from core.profiling import query_budget
 from .models import (
     Initiative, Plan, Milestone, Task, 
     ResourceAllocation, RiskRegister, PlanningDocument
@@ -17,6 +22,12 @@ from .forms import (
     InitiativeForm, PlanForm, MilestoneForm, TaskForm, 
     ResourceAllocationForm, RiskRegisterForm, PlanningDocumentForm
 )
+from .metrics import milestone_adherence
+from .rollups import with_initiative_rollups, users_with_allocation_on
+from .timeline import DEFAULT_WEEKS, MAX_WEEKS, build_allocation_timeline
+
+# How far ahead the resource utilization report looks for over-allocation
+OVER_ALLOCATION_LOOKAHEAD_WEEKS = 13
 
 @login_required
 def dashboard(request):
@@ -51,12 +62,14 @@ def dashboard(request):
 
 # Initiative Views
 @login_required
+@query_budget(4, duplicates=0)
 def initiative_list(request):
     """View to list all initiatives with filtering options"""
     status_filter = request.GET.get('status')
     priority_filter = request.GET.get('priority')
     
-    initiatives = Initiative.objects.all()
+    # Plan, task and risk counts for each initiative
+    initiatives = with_initiative_rollups(Initiative.objects.all())
     
     # Apply filters if provided
     if status_filter:
@@ -64,12 +77,6 @@ def initiative_list(request):
     if priority_filter:
         initiatives = initiatives.filter(priority=priority_filter)
     
-    # Count plans, milestones, and tasks for each initiative
-    for initiative in initiatives:
-        initiative.plan_count = Plan.objects.filter(initiative=initiative).count()
-        initiative.task_count = Task.objects.filter(plan__initiative=initiative).count()
-        initiative.risk_count = RiskRegister.objects.filter(initiative=initiative).count()
-    
     context = {
         'initiatives': initiatives,
         'status_filter': status_filter,
@@ -399,13 +406,22 @@ def task_list(request):
     if milestone_filter:
         tasks = tasks.filter(milestone_id=milestone_filter)
     
+    paginator = KeysetPaginator(tasks, ['name'], per_page=parse_per_page(request.GET.get('per_page')),
+                                count='approximate')
+    try:
+        page_obj = paginator.page(request.GET.get('cursor'))
+    except InvalidCursor:
+        page_obj = paginator.page()
+    
     # Prepare filter choices
     plans = Plan.objects.all()
     milestones = Milestone.objects.all()
     assignees = User.objects.filter(assigned_tasks__isnull=False).distinct()
     
     context = {
-        'tasks': tasks,
+        'tasks': page_obj,
+        'page_obj': page_obj,
+        'paginator': paginator,
         'status_filter': status_filter,
         'priority_filter': priority_filter,
         'plan_filter': plan_filter,
@@ -745,6 +761,7 @@ def reports(request):
     return render(request, 'planning/reports/index.html', context)
 
 @login_required
+@query_budget(6, duplicates=0)
 def initiative_status_report(request):
     """Report showing initiative status breakdown"""
     # Get initiative counts by status
@@ -757,15 +774,7 @@ def initiative_status_report(request):
     top_owners = Initiative.objects.exclude(owner__isnull=True).values('owner__username', 'owner__first_name', 'owner__last_name').annotate(count=Count('id')).order_by('-count')[:5]
     
     # Get completion percentage for each initiative
-    initiatives = Initiative.objects.all()
-    for initiative in initiatives:
-        total_tasks = Task.objects.filter(plan__initiative=initiative).count()
-        completed_tasks = Task.objects.filter(plan__initiative=initiative, status='completed').count()
-        
-        if total_tasks > 0:
-            initiative.completion_percentage = int((completed_tasks / total_tasks) * 100)
-        else:
-            initiative.completion_percentage = 0
+    initiatives = with_initiative_rollups(Initiative.objects.all())
     
     context = {
         'status_counts': status_counts,
@@ -777,28 +786,14 @@ def initiative_status_report(request):
     return render(request, 'planning/reports/initiative_status.html', context)
 
 @login_required
+@query_budget(8, duplicates=0)
 def resource_utilization_report(request):
     """Report showing resource allocation and utilization"""
     # Get all resource allocations
-    allocations = ResourceAllocation.objects.all()
-    
-    # Calculate total allocation percentage per user
-    users_allocation = User.objects.filter(resource_allocations__isnull=False).distinct()
-    
-    for user in users_allocation:
-        # Check current allocations (those that are active now)
-        current_date = timezone.now().date()
-        current_allocations = ResourceAllocation.objects.filter(
-            user=user,
-            start_date__lte=current_date,
-            end_date__gte=current_date
-        )
-        
-        user.total_allocation = current_allocations.aggregate(Sum('allocation_percentage'))['allocation_percentage__sum'] or 0
-        user.allocation_count = current_allocations.count()
-        
-        # Check if over-allocated
-        user.is_over_allocated = user.total_allocation > 100
+    allocations = ResourceAllocation.objects.select_related('user', 'initiative')
+    
+    # Total current allocation percentage per user, and whether it's over 100%
+    users_allocation = users_with_allocation_on(timezone.now().date())
     
     # Get initiatives with most resources allocated
     top_initiatives = Initiative.objects.annotate(
@@ -806,44 +801,57 @@ def resource_utilization_report(request):
     ).order_by('-resource_count')[:5]
     
     # Get upcoming resource changes
-    upcoming_end_dates = ResourceAllocation.objects.filter(
+    upcoming_end_dates = ResourceAllocation.objects.select_related('user', 'initiative').filter(
         end_date__gt=timezone.now().date()
     ).order_by('end_date')[:10]
     
+    # Upcoming periods where someone is booked over 100%, empty without NumPy
+    timeline = build_allocation_timeline(weeks=OVER_ALLOCATION_LOOKAHEAD_WEEKS)
+    
     context = {
         'users_allocation': users_allocation,
         'top_initiatives': top_initiatives,
         'upcoming_end_dates': upcoming_end_dates,
-        'allocations': allocations
+        'allocations': allocations,
+        'over_allocations': timeline['over_allocations'] if timeline else []
     }
     
     return render(request, 'planning/reports/resource_utilization.html', context)
 
 @login_required
+@query_budget(4, duplicates=0)
+def resource_allocation_heatmap(request):
+    """API endpoint returning each user's weekly load for a capacity heatmap
+    
+    Query parameters:
+        start: first day as YYYY-MM-DD, moved back to its Monday (default
+            this week)
+        weeks: number of weeks (default 52, at most 156)
+        users: comma-separated user ids (default everyone with allocations)
+    """
+    try:
+        start = datetime.date.fromisoformat(request.GET['start']) if request.GET.get('start') else None
+        weeks = min(max(int(request.GET.get('weeks', DEFAULT_WEEKS)), 1), MAX_WEEKS)
+        users = request.GET.get('users')
+        user_ids = [int(user_id) for user_id in users.split(',') if user_id.strip()] if users else None
+    except ValueError:
+        return JsonResponse({'error': 'Invalid start, weeks or users'}, status=400)
+    
+    timeline = build_allocation_timeline(start, weeks, user_ids)
+    if timeline is None:
+        return JsonResponse({'error': 'The allocation timeline requires NumPy'}, status=503)
+    return JsonResponse(timeline)
+
+@login_required
+@query_budget(6, duplicates=0)
 def timeline_adherence_report(request):
     """Report showing adherence to timelines and milestones"""
-    # Get all initiatives with timeline details
-    initiatives = Initiative.objects.filter(
+    # Get all initiatives with timeline details and task completion
+    # days_variance is positive ahead of schedule and negative behind
+    initiatives = list(with_initiative_rollups(Initiative.objects.filter(
         start_date__isnull=False,
         target_completion_date__isnull=False
-    )
-    
-    # Calculate days behind/ahead for initiatives
-    for initiative in initiatives:
-        if initiative.actual_completion_date and initiative.target_completion_date:
-            # Positive means ahead of schedule, negative means behind
-            initiative.days_variance = (initiative.target_completion_date - initiative.actual_completion_date).days
-        else:
-            initiative.days_variance = 0
-        
-        # Calculate percentage complete based on tasks
-        total_tasks = Task.objects.filter(plan__initiative=initiative).count()
-        completed_tasks = Task.objects.filter(plan__initiative=initiative, status='completed').count()
-        
-        if total_tasks > 0:
-            initiative.completion_percentage = int((completed_tasks / total_tasks) * 100)
-        else:
-            initiative.completion_percentage = 0
+    )).annotate(days_variance=Coalesce('rollup__schedule_variance_days', 0)))
     
     # Get milestones status summary
     milestone_status = Milestone.objects.values('status').annotate(count=Count('id'))
@@ -855,29 +863,12 @@ def timeline_adherence_report(request):
         due_date__gte=today
     ).order_by('due_date')[:10]
     
-    # Get milestone adherence data
-    passed_milestones = Milestone.objects.filter(due_date__lt=today)
-    
-    on_time_count = passed_milestones.filter(
-        status='completed',
-        updated_at__date__lte=F('due_date')
-    ).count()
-    
-    late_count = passed_milestones.filter(
-        status='completed',
-        updated_at__date__gt=F('due_date')
-    ).count()
-    
-    missed_count = passed_milestones.filter(status='missed').count()
-    
     context = {
         'initiatives': initiatives,
         'milestone_status': milestone_status,
         'upcoming_milestones': upcoming_milestones,
-        'on_time_count': on_time_count,
-        'late_count': late_count,
-        'missed_count': missed_count,
-        'total_passed': passed_milestones.count()
+        # Passed milestones: total_passed, on_time_count, late_count, missed_count
+        **milestone_adherence(today),
     }
     
     return render(request, 'planning/reports/timeline_adherence.html', context)
\ No newline at end of file
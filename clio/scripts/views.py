@@ -5,10 +5,14 @@ from django.contrib import messages
 from django.http import JsonResponse
 from django.contrib.auth.decorators import login_required
 from django.db.models import Q
+from core.pagination import KeysetPaginator, InvalidCursor, parse_per_page
+from core.profiling import query_budget
 from .models import Script, ScriptDocument, ScriptSystemRelationship
 from .forms import ScriptForm, ScriptDocumentForm, ScriptSystemRelationshipForm
+from workflows.projection import workflows_using_script
 
 @login_required
+@query_budget(8, duplicates=0)
 def script_list(request):
     """View to list all scripts with filtering options"""
     scripts = Script.objects.all().select_related('hosted_on')
@@ -39,8 +43,17 @@ def script_list(request):
         'hosted_on__id', 'hosted_on__name'
     ).distinct()
     
+    paginator = KeysetPaginator(scripts, ['name'], per_page=parse_per_page(request.GET.get('per_page')),
+                                count='approximate')
+    try:
+        page_obj = paginator.page(request.GET.get('cursor'))
+    except InvalidCursor:
+        page_obj = paginator.page()
+    
     context = {
-        'scripts': scripts,
+        'scripts': page_obj,
+        'page_obj': page_obj,
+        'paginator': paginator,
         'language_filter': language_filter,
         'system_filter': system_filter,
         'host_filter': host_filter,
@@ -61,8 +74,8 @@ def script_detail(request, pk):
     # Get associated system relationships with details
     system_relationships = script.system_relationships.all().select_related('system')
     
-    # Get associated workflows
-    workflows = script.workflows.all()
+    # Get workflows that run this script, with the steps that do
+    workflows = workflows_using_script(script.pk).order_by('name')
     
     # Handle document upload
     if request.method == 'POST' and 'document_form' in request.POST:
@@ -0,0 +1,174 @@
+# systems/closure.py
+
+"""
+Maintenance of the SystemImpactClosure table.
+
+The table stores, for every system, each system affected by its outage along
+with the depth and the first and last hop of the shortest impact path. Rows are
+computed from the in-memory graph and rewritten only for the sources whose
+reachability can change: a depends_on edge leaving system X affects X and every
+system that can reach X. The table is filled by the systems migration and
+rebuild_impact_closure; reading it never writes.
+
+Writes only record the sources they change. The affected closure rows are
+rewritten once the transaction commits, so a request that drops many edges
+of one system walks its upstream systems once.
+"""
+
+import threading
+from collections import deque
+
+from django.db import transaction
+
+from .graph import get_dependency_graph
+from .impact import impact_search
+from .models import SystemImpactClosure
+
+BATCH_SIZE = 1000
+
+_pending = threading.local()
+
+
+def closure_rows(graph, source_id):
+    """Compute the closure rows for one source system from the graph"""
+    source = graph.node_index(source_id)
+    if source is None:
+        return []
+
+    order, depth, parent = impact_search(graph.successors('depends_on'), source)
+
+    first_hop = {}
+    rows = []
+    for node in order:
+        previous = parent[node]
+        first_hop[node] = node if previous == source else first_hop[previous]
+        rows.append(SystemImpactClosure(
+            source_id=source_id,
+            affected_id=graph.system_id(node),
+            depth=depth[node],
+            next_hop_id=graph.system_id(first_hop[node]),
+            previous_hop_id=graph.system_id(previous),
+        ))
+    return rows
+
+
+def upstream_sources(graph, system_ids):
+    """IDs of the given systems plus every system whose outage reaches them"""
+    predecessors = graph.predecessors('depends_on')
+    seen = set()
+    queue = deque()
+    # One search from all the systems at once, so shared ancestors are walked once
+    for system_id in system_ids:
+        idx = graph.node_index(system_id)
+        if idx is not None and idx not in seen:
+            seen.add(idx)
+            queue.append(idx)
+    while queue:
+        node = queue.popleft()
+        for predecessor in predecessors[node]:
+            if predecessor not in seen:
+                seen.add(predecessor)
+                queue.append(predecessor)
+    return {graph.system_id(node) for node in seen}
+
+
+def _insert_closure_rows(graph, source_ids):
+    rows = []
+    for source_id in source_ids:
+        rows.extend(closure_rows(graph, source_id))
+        if len(rows) >= BATCH_SIZE:
+            SystemImpactClosure.objects.bulk_create(rows, batch_size=BATCH_SIZE)
+            rows = []
+    SystemImpactClosure.objects.bulk_create(rows, batch_size=BATCH_SIZE)
+
+
+def rebuild_source_closure(source_ids, graph=None):
+    """Rewrite the closure rows of the given source systems"""
+    graph = graph or get_dependency_graph()
+    source_ids = list(source_ids)
+
+    with transaction.atomic():
+        for start in range(0, len(source_ids), BATCH_SIZE):
+            SystemImpactClosure.objects.filter(source_id__in=source_ids[start:start + BATCH_SIZE]).delete()
+        _insert_closure_rows(graph, source_ids)
+
+
+def refresh_impact_closure(changed_source_ids):
+    """Recompute the closure after depends_on edges leaving the given systems changed"""
+    graph = get_dependency_graph()
+    rebuild_source_closure(upstream_sources(graph, changed_source_ids), graph)
+
+
+def _pending_sources():
+    if not hasattr(_pending, 'sources'):
+        _pending.sources = set()
+    return _pending.sources
+
+
+def schedule_closure_refresh(changed_source_ids):
+    """Refresh the closure for the given sources once the transaction commits"""
+    changed_source_ids = set(changed_source_ids)
+    if not changed_source_ids:
+        return
+    _pending_sources().update(changed_source_ids)
+    # Every write registers a callback, but the first one to run takes all the
+    # pending sources; sources left over from a rolled back transaction are
+    # simply refreshed along with the next one
+    transaction.on_commit(_refresh_pending)
+
+
+def _refresh_pending():
+    sources = _pending_sources()
+    if not sources:
+        return
+    _pending.sources = set()
+    refresh_impact_closure(sources)
+
+
+def rebuild_impact_closure():
+    """Recompute the whole closure table"""
+    graph = get_dependency_graph()
+    with transaction.atomic():
+        SystemImpactClosure.objects.all().delete()
+        _insert_closure_rows(graph, graph.system_ids())
+
+
+def impacted_systems(source_id):
+    """
+    Return the systems affected by an outage of source_id from the closure table
+
+    Args:
+        source_id: The ID of the system experiencing an outage
+
+    Returns:
+        list: Affected systems in the find_affected_systems payload format,
+              ordered by impact level and name
+    """
+    rows = list(
+        SystemImpactClosure.objects
+        .filter(source_id=source_id)
+        .select_related('affected__category')
+        .order_by('depth', 'affected__name')
+    )
+
+    paths = {source_id: [source_id]}
+    affected = []
+    for row in rows:
+        system = row.affected
+        category = system.category
+        paths[system.id] = paths[row.previous_hop_id] + [system.id]
+        affected.append({
+            'id': system.id,
+            'name': system.name,
+            'category': {
+                'id': category.id,
+                'name': category.name,
+                'slug': category.slug,
+                'color': category.color,
+                'text_color': category.text_color,
+            },
+            'vendor': system.vendor,
+            'impact_level': row.depth,
+            'impact_path': paths[system.id],
+        })
+    return affected
@@ -0,0 +1,85 @@
+# systems/facets.py
+
+"""
+Filter options for the system list, with the number of systems behind each.
+
+The option lists only change when systems, categories or statuses are written,
+and every such write bumps the shared graph version (see systems/signals.py and
+invalidate_dependency_graph for bulk imports). The facets are therefore cached
+together with the version they were computed for and recomputed once it moves
+on, which keeps every process consistent without its own invalidation hooks.
+"""
+
+from django.core.cache import cache
+from django.db.models import Count
+
+from .graph import get_graph_version
+from .models import System, SystemCategory, SystemStatus
+
+FACETS_CACHE_KEY = 'systems:list-facets'
+
+
+def _counts(field):
+    return dict(
+        System.objects.exclude(**{f'{field}__isnull': True})
+        .order_by()
+        .values_list(field)
+        .annotate(count=Count('id'))
+    )
+
+
+def compute_system_facets():
+    """
+    Return the system list's filter options with system counts
+
+    Returns:
+        dict: categories, statuses, sso_systems and hosting_systems as lists
+              of {id, name, count}, vendors as a list of {value, count}
+    """
+    category_counts = _counts('category_id')
+    status_counts = _counts('status_id')
+    sso_counts = _counts('sso_system_id')
+    hosting_counts = _counts('hosting_system_id')
+
+    categories = [
+        {'id': category_id, 'name': name, 'count': category_counts.get(category_id, 0)}
+        for category_id, name in SystemCategory.objects.order_by('order', 'name').values_list('id', 'name')
+    ]
+    statuses = [
+        {'id': status_id, 'name': name, 'count': status_counts.get(status_id, 0)}
+        for status_id, name in SystemStatus.objects.order_by('order', 'name').values_list('id', 'name')
+    ]
+    sso_systems = [
+        {'id': system_id, 'name': name, 'count': sso_counts[system_id]}
+        for system_id, name in System.objects.filter(id__in=sso_counts).order_by('name').values_list('id', 'name')
+    ]
+    # Servers are offered even when nothing is hosted on them yet
+    hosting_systems = [
+        {'id': system_id, 'name': name, 'count': hosting_counts.get(system_id, 0)}
+        for system_id, name in System.objects.filter(category__slug='server').order_by('name').values_list('id', 'name')
+    ]
+    vendors = [
+        {'value': vendor, 'count': count}
+        for vendor, count in System.objects.exclude(vendor='').order_by('vendor')
+        .values_list('vendor').annotate(count=Count('id'))
+    ]
+
+    return {
+        'categories': categories,
+        'statuses': statuses,
+        'vendors': vendors,
+        'sso_systems': sso_systems,
+        'hosting_systems': hosting_systems,
+    }
+
+
+def get_system_facets(version=None):
+    """Return the cached facets, recomputing them if the graph version moved on"""
+    version = get_graph_version() if version is None else version
+    cached = cache.get(FACETS_CACHE_KEY)
+    if cached is not None and cached['version'] == version:
+        return cached['facets']
+
+    facets = compute_system_facets()
+    cache.set(FACETS_CACHE_KEY, {'version': version, 'facets': facets}, None)
+    return facets
@@ -0,0 +1,343 @@
+# systems/graph.py
+
+"""
+In-memory index of the system relationship graph.
+
+Each process loads the graph once and keeps it current through the signal
+handlers in systems/signals.py, so impact queries never rescan the System or
+SystemRelationship tables. Adjacency lists are stored as compact integer arrays
+over dense node indexes. Besides SystemRelationship edges the graph indexes the
+hosting and SSO foreign keys of System and the ScriptSystemRelationship links
+between scripts and systems. A shared version counter (SystemGraphVersion) lets a
+process notice that another process changed the graph and reload its copy.
+"""
+
+import threading
+from array import array
+
+from django.db import transaction
+from django.db.models import F
+
+from .models import (
+    System, SystemRelationship, SystemCategory, SystemStatus, SystemGraphVersion
+)
+from scripts.models import Script, ScriptSystemRelationship
+
+RELATIONSHIP_TYPES = [choice[0] for choice in SystemRelationship.RELATIONSHIP_TYPES]
+
+# Edges derived from System foreign keys: the referenced system -> the referencing system
+FOREIGN_KEY_EDGES = {
+    'hosting': 'hosting_system_id',
+    'sso': 'sso_system_id',
+}
+
+EDGE_TYPES = RELATIONSHIP_TYPES + list(FOREIGN_KEY_EDGES)
+
+# Script relationship types through which a failing script affects the system
+SCRIPT_OUTPUT_TYPES = ('output', 'both')
+
+
+class DependencyGraph:
+    """Adjacency-list index of systems and their relationships"""
+
+    def __init__(self, version=0):
+        self.version = version
+        self._index = {}          # system id -> dense node index
+        self._ids = array('q')    # dense node index -> system id (0 for removed nodes)
+        self._nodes = []          # dense node index -> system attributes
+        self._categories = {}
+        self._statuses = {}
+        # edge type -> per-node arrays of dense node indexes
+        self._outgoing = {edge_type: [] for edge_type in EDGE_TYPES}
+        self._incoming = {edge_type: [] for edge_type in EDGE_TYPES}
+        # Scripts get their own dense index space
+        self._script_index = {}
+        self._script_ids = array('q')
+        self._script_names = []
+        self._script_links = {}          # (script id, system id) -> script relationship type
+        self._system_scripts = []        # system index -> indexes of linked scripts
+        self._script_outputs = []        # script index -> indexes of systems the script writes to
+
+    @classmethod
+    def load(cls, version=0):
+        """Build a graph from the database with one query per table"""
+        graph = cls(version)
+
+        for category in SystemCategory.objects.values('id', 'name', 'slug', 'color', 'text_color'):
+            graph.set_category(category)
+        for status in SystemStatus.objects.values('id', 'name', 'slug', 'is_active'):
+            graph.set_status(status)
+
+        systems = list(System.objects.values_list(
+            'id', 'name', 'vendor', 'category_id', 'status_id', 'hosting_system_id', 'sso_system_id'
+        ))
+        for system_id, name, vendor, category_id, status_id, _, _ in systems:
+            graph.add_system(system_id, name=name, vendor=vendor,
+                             category_id=category_id, status_id=status_id)
+        # Foreign key edges once every system they can point at is indexed
+        for system_id, _, _, _, _, hosting_system_id, sso_system_id in systems:
+            graph.add_system(system_id, hosting_system_id=hosting_system_id, sso_system_id=sso_system_id)
+
+        relationships = SystemRelationship.objects.values_list(
+            'source_system_id', 'target_system_id', 'relationship_type'
+        )
+        for source_id, target_id, rel_type in relationships.iterator():
+            graph.add_relationship(source_id, target_id, rel_type)
+
+        for script_id, name in Script.objects.values_list('id', 'name').iterator():
+            graph.add_script(script_id, name)
+
+        script_links = ScriptSystemRelationship.objects.values_list('script_id', 'system_id', 'relationship_type')
+        for script_id, system_id, rel_type in script_links.iterator():
+            graph.add_script_link(script_id, system_id, rel_type)
+
+        return graph
+
+    def __contains__(self, system_id):
+        return system_id in self._index
+
+    def __len__(self):
+        return len(self._index)
+
+    # Mutation
+
+    def set_category(self, category):
+        self._categories[category['id']] = {
+            'id': category['id'],
+            'name': category['name'],
+            'slug': category['slug'],
+            'color': category['color'],
+            'text_color': category['text_color'],
+        }
+
+    def remove_category(self, category_id):
+        self._categories.pop(category_id, None)
+
+    def set_status(self, status):
+        self._statuses[status['id']] = {
+            'id': status['id'],
+            'name': status['name'],
+            'slug': status['slug'],
+            'is_active': status['is_active'],
+        }
+
+    def remove_status(self, status_id):
+        self._statuses.pop(status_id, None)
+
+    def add_system(self, system_id, **attrs):
+        """Add a system, or update its attributes if it is already indexed"""
+        idx = self._index.get(system_id)
+        if idx is None:
+            idx = len(self._ids)
+            self._index[system_id] = idx
+            self._ids.append(system_id)
+            self._nodes.append({})
+            self._system_scripts.append(array('l'))
+            for adjacency in (self._outgoing, self._incoming):
+                for lists in adjacency.values():
+                    lists.append(array('l'))
+
+        node = self._nodes[idx]
+        for edge_type, field in FOREIGN_KEY_EDGES.items():
+            if field in attrs and attrs[field] != node.get(field):
+                if node.get(field):
+                    self.remove_relationship(node[field], system_id, edge_type)
+                if attrs[field]:
+                    self.add_relationship(attrs[field], system_id, edge_type)
+        node.update(attrs)
+
+    update_system = add_system
+
+    def remove_system(self, system_id):
+        idx = self._index.pop(system_id, None)
+        if idx is None:
+            return
+        for script in list(self._system_scripts[idx]):
+            script_id = self._script_ids[script]
+            self.remove_script_link(script_id, system_id)
+        for rel_type in EDGE_TYPES:
+            for target in self._outgoing[rel_type][idx]:
+                self._incoming[rel_type][target].remove(idx)
+            for source in self._incoming[rel_type][idx]:
+                self._outgoing[rel_type][source].remove(idx)
+            self._outgoing[rel_type][idx] = array('l')
+            self._incoming[rel_type][idx] = array('l')
+        self._ids[idx] = 0
+        self._nodes[idx] = {}
+
+    def add_relationship(self, source_id, target_id, rel_type):
+        source = self._index.get(source_id)
+        target = self._index.get(target_id)
+        if source is None or target is None or rel_type not in self._outgoing:
+            return
+        if target not in self._outgoing[rel_type][source]:
+            self._outgoing[rel_type][source].append(target)
+            self._incoming[rel_type][target].append(source)
+
+    def remove_relationship(self, source_id, target_id, rel_type):
+        source = self._index.get(source_id)
+        target = self._index.get(target_id)
+        if source is None or target is None or rel_type not in self._outgoing:
+            return
+        if target in self._outgoing[rel_type][source]:
+            self._outgoing[rel_type][source].remove(target)
+            self._incoming[rel_type][target].remove(source)
+
+    def add_script(self, script_id, name):
+        """Add a script, or rename it if it is already indexed"""
+        idx = self._script_index.get(script_id)
+        if idx is None:
+            idx = len(self._script_ids)
+            self._script_index[script_id] = idx
+            self._script_ids.append(script_id)
+            self._script_names.append(name)
+            self._script_outputs.append(array('l'))
+        self._script_names[idx] = name
+
+    def remove_script(self, script_id):
+        idx = self._script_index.get(script_id)
+        if idx is None:
+            return
+        for (linked_script_id, system_id) in list(self._script_links):
+            if linked_script_id == script_id:
+                self.remove_script_link(script_id, system_id)
+        del self._script_index[script_id]
+        self._script_ids[idx] = 0
+        self._script_names[idx] = None
+
+    def add_script_link(self, script_id, system_id, rel_type):
+        self.remove_script_link(script_id, system_id)
+        script = self._script_index.get(script_id)
+        system = self._index.get(system_id)
+        if script is None or system is None:
+            return
+        self._script_links[(script_id, system_id)] = rel_type
+        self._system_scripts[system].append(script)
+        if rel_type in SCRIPT_OUTPUT_TYPES:
+            self._script_outputs[script].append(system)
+
+    def remove_script_link(self, script_id, system_id):
+        rel_type = self._script_links.pop((script_id, system_id), None)
+        if rel_type is None:
+            return
+        script = self._script_index[script_id]
+        system = self._index[system_id]
+        self._system_scripts[system].remove(script)
+        if rel_type in SCRIPT_OUTPUT_TYPES:
+            self._script_outputs[script].remove(system)
+
+    # Queries
+
+    def node_index(self, system_id):
+        """Dense index of a system, or None if it is not in the graph"""
+        return self._index.get(system_id)
+
+    def system_id(self, idx):
+        return self._ids[idx]
+
+    def system_ids(self):
+        return list(self._index)
+
+    def successors(self, rel_type='depends_on'):
+        """Per-node arrays of dense indexes of the systems that depend on each node"""
+        return self._outgoing[rel_type]
+
+    def predecessors(self, rel_type='depends_on'):
+        """Per-node arrays of dense indexes of the systems each node depends on"""
+        return self._incoming[rel_type]
+
+    def system_scripts(self):
+        """Per-node arrays of dense indexes of the scripts linked to each system"""
+        return self._system_scripts
+
+    def script_outputs(self):
+        """Per-script arrays of dense indexes of the systems each script writes to"""
+        return self._script_outputs
+
+    def script_id(self, idx):
+        return self._script_ids[idx]
+
+    def describe_script(self, script_id):
+        return {
+            'id': script_id,
+            'name': self._script_names[self._script_index[script_id]],
+        }
+
+    def dependents(self, system_id, rel_type='depends_on'):
+        """IDs of systems that depend on the given system"""
+        idx = self._index.get(system_id)
+        if idx is None:
+            return []
+        return [self._ids[i] for i in self._outgoing[rel_type][idx]]
+
+    def dependencies(self, system_id, rel_type='depends_on'):
+        """IDs of systems the given system depends on"""
+        idx = self._index.get(system_id)
+        if idx is None:
+            return []
+        return [self._ids[i] for i in self._incoming[rel_type][idx]]
+
+    def describe(self, system_id):
+        """Return the serialized form of a system used by the impact APIs"""
+        node = self._nodes[self._index[system_id]]
+        return {
+            'id': system_id,
+            'name': node.get('name'),
+            'category': self._categories.get(node.get('category_id')),
+            'status': self._statuses.get(node.get('status_id')),
+            'vendor': node.get('vendor'),
+        }
+
+
+# Process-local graph, rebuilt lazily whenever the shared version moves on
+_graph = None
+_lock = threading.RLock()
+
+
+def get_graph_version():
+    """Return the shared graph version"""
+    version = SystemGraphVersion.objects.filter(pk=1).values_list('version', flat=True).first()
+    return version or 0
+
+
+def bump_graph_version():
+    """Increment the shared graph version and return the new value"""
+    if not SystemGraphVersion.objects.filter(pk=1).update(version=F('version') + 1):
+        SystemGraphVersion.objects.get_or_create(pk=1)
+        SystemGraphVersion.objects.filter(pk=1).update(version=F('version') + 1)
+    return get_graph_version()
+
+
+def get_dependency_graph(version=None):
+    """Return this process's copy of the graph, reloading it if it is stale"""
+    global _graph
+    version = get_graph_version() if version is None else version
+    with _lock:
+        if _graph is None or _graph.version != version:
+            _graph = DependencyGraph.load(version)
+        return _graph
+
+
+def schedule_graph_update(mutate):
+    """
+    Record a graph change made in the current transaction
+
+    The shared version is bumped immediately so it commits or rolls back with
+    the change itself. Once the transaction commits, ``mutate(graph)`` is applied
+    to the local copy if it was current; otherwise the copy is left stale and
+    reloaded on next use.
+    """
+    new_version = bump_graph_version()
+
+    def apply():
+        with _lock:
+            if _graph is not None and _graph.version == new_version - 1:
+                mutate(_graph)
+                _graph.version = new_version
+
+    transaction.on_commit(apply)
+
+
+def invalidate_dependency_graph():
+    """Force every process to reload the graph, e.g. after bulk writes that skip signals"""
+    bump_graph_version()
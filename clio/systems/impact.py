@@ -0,0 +1,225 @@
+# systems/impact.py
+
+"""
+Outage impact analysis over the in-memory system graph.
+
+Affected systems are found with an iterative breadth-first search that records
+a parent pointer per node, so every system is visited once and the shortest
+impact path to it is rebuilt from those pointers. This is O(V + E) regardless
+of how densely the dependency mesh is connected.
+
+find_impact extends the search across several edge types at once (depends_on,
+hosting, SSO and script links). Each edge type carries a weight in (0, 1] and
+the impact score of a node is the best product of weights along a path from the
+source, found with a best-first search over the same in-memory arrays.
+"""
+
+import heapq
+from collections import deque
+
+
+def impact_search(successors, source):
+    """
+    Breadth-first search from a dense node index
+
+    Args:
+        successors: Per-node sequences of dense indexes reachable in one hop
+        source: Dense index of the system experiencing an outage
+
+    Returns:
+        tuple: (order, depth, parent) where order lists reached nodes in BFS
+               order (excluding the source) and depth/parent map each reached
+               node to its impact level and the node it was reached from
+    """
+    depth = {source: 0}
+    parent = {source: None}
+    order = []
+    queue = deque([source])
+
+    while queue:
+        node = queue.popleft()
+        next_depth = depth[node] + 1
+        for neighbor in successors[node]:
+            if neighbor in depth:
+                continue
+            depth[neighbor] = next_depth
+            parent[neighbor] = node
+            order.append(neighbor)
+            queue.append(neighbor)
+
+    return order, depth, parent
+
+
+def impact_paths(order, parent, source):
+    """Rebuild the path from the source to every reached node from parent pointers"""
+    paths = {source: (source,)}
+    for node in order:
+        paths[node] = paths[parent[node]] + (node,)
+    return paths
+
+
+def find_affected_systems(graph, source_id, rel_type='depends_on'):
+    """
+    Find all systems affected by an outage of the source system
+
+    Args:
+        graph: The DependencyGraph index
+        source_id: The ID of the system experiencing an outage
+        rel_type: The relationship type to follow
+
+    Returns:
+        list: List of affected systems with their impact levels and paths
+    """
+    source = graph.node_index(source_id)
+    if source is None:
+        return []
+
+    order, depth, parent = impact_search(graph.successors(rel_type), source)
+    paths = impact_paths(order, parent, source)
+
+    affected = []
+    for node in order:
+        system_id = graph.system_id(node)
+        system = graph.describe(system_id)
+        affected.append({
+            'id': system_id,
+            'name': system['name'],
+            'category': system['category'],
+            'vendor': system['vendor'],
+            'impact_level': depth[node],
+            'impact_path': [graph.system_id(i) for i in paths[node]],
+        })
+
+    return affected
+
+
+# Edge types understood by find_impact, with the default weight of each
+EDGE_WEIGHTS = {
+    'depends_on': 1.0,
+    'hosting': 1.0,
+    'sso': 0.9,
+    'scripts': 0.8,
+    'provides_data_to': 0.5,
+    'integrates_with': 0.5,
+}
+
+DEFAULT_EDGE_TYPES = ('depends_on', 'hosting', 'sso', 'scripts')
+
+
+def find_impact(graph, source_id, edge_types=DEFAULT_EDGE_TYPES, weights=None,
+                max_depth=None, min_score=0.0):
+    """
+    Find everything affected by an outage of the source system across edge types
+
+    Scripts are nodes of their own: a system outage affects every script linked
+    to it, and a failing script affects the systems it outputs to.
+
+    Args:
+        graph: The DependencyGraph index
+        source_id: The ID of the system experiencing an outage
+        edge_types: Edge types to traverse (keys of EDGE_WEIGHTS)
+        weights: Optional overrides of EDGE_WEIGHTS, each in (0, 1]
+        max_depth: Optional limit on the number of hops
+        min_score: Drop nodes whose impact score falls below this value
+
+    Returns:
+        list: Affected systems and scripts ordered by impact level, score and
+              name. Script entries in impact_path are written as "script-<id>".
+    """
+    source = graph.node_index(source_id)
+    if source is None:
+        return []
+
+    weights = {**EDGE_WEIGHTS, **(weights or {})}
+    for edge_type, weight in weights.items():
+        if not 0 < weight <= 1:
+            raise ValueError(f'Weight for {edge_type} must be in (0, 1]')
+
+    system_edges = [
+        (edge_type, graph.successors(edge_type), weights[edge_type])
+        for edge_type in edge_types if edge_type not in ('scripts',)
+    ]
+    follow_scripts = 'scripts' in edge_types
+    system_scripts = graph.system_scripts()
+    script_outputs = graph.script_outputs()
+
+    # Scripts are encoded as negative keys so both node kinds share one search
+    def script_key(idx):
+        return -idx - 1
+
+    best = {source: (1.0, 0)}
+    reached_by = {source: (None, None)}
+    heap = [(-1.0, 0, source)]
+    order = []
+
+    def relax(node, neighbor, edge_type, score, depth):
+        if score < min_score:
+            return
+        current = best.get(neighbor)
+        if current is None or score > current[0] or (score == current[0] and depth < current[1]):
+            best[neighbor] = (score, depth)
+            reached_by[neighbor] = (node, edge_type)
+            heapq.heappush(heap, (-score, depth, neighbor))
+
+    while heap:
+        negative_score, depth, node = heapq.heappop(heap)
+        if best[node] != (-negative_score, depth):
+            continue  # Superseded by a better path
+        if node != source:
+            order.append(node)
+        if max_depth is not None and depth >= max_depth:
+            continue
+
+        score = -negative_score
+        if node >= 0:
+            for edge_type, successors, weight in system_edges:
+                for neighbor in successors[node]:
+                    relax(node, neighbor, edge_type, score * weight, depth + 1)
+            if follow_scripts:
+                for script in system_scripts[node]:
+                    relax(node, script_key(script), 'scripts', score * weights['scripts'], depth + 1)
+        else:
+            for neighbor in script_outputs[script_key(node)]:
+                relax(node, neighbor, 'scripts', score * weights['scripts'], depth + 1)
+
+    def public_id(node):
+        if node >= 0:
+            return graph.system_id(node)
+        return f'script-{graph.script_id(script_key(node))}'
+
+    paths = {source: [source_id]}
+    affected = []
+    for node in sorted(order, key=lambda n: best[n][1]):
+        previous, edge_type = reached_by[node]
+        paths[node] = paths[previous] + [public_id(node)]
+        score, depth = best[node]
+
+        if node >= 0:
+            system = graph.describe(graph.system_id(node))
+            entry = {
+                'id': system['id'],
+                'node_type': 'system',
+                'name': system['name'],
+                'category': system['category'],
+                'vendor': system['vendor'],
+            }
+        else:
+            script = graph.describe_script(graph.script_id(script_key(node)))
+            entry = {
+                'id': script['id'],
+                'node_type': 'script',
+                'name': script['name'],
+                'category': None,
+                'vendor': '',
+            }
+
+        entry.update({
+            'impact_level': depth,
+            'impact_score': round(score, 4),
+            'edge_type': edge_type,
+            'impact_path': paths[node],
+        })
+        affected.append(entry)
+
+    affected.sort(key=lambda s: (s['impact_level'], -s['impact_score'], s['name'] or ''))
+    return affected
@@ -0,0 +1,715 @@
+# systems/importer.py
+
+"""
+Streaming bulk import of systems and relationships from CMDB exports.
+
+Rows are read lazily from CSV, JSON Lines or YAML and processed in batches.
+Each row describes either a system (it has a ``name``) or a relationship (it
+has ``source`` and ``target`` system names):
+
+    system:       name, category, status, description, vendor, operating_system,
+                  hosting_system, sso_system
+    relationship: source, target, type, description
+
+Category and status are given by slug, hosting/SSO systems and relationship
+endpoints by system name. The current state of the database is loaded once up
+front, so names resolve without queries and rows that match the database are
+skipped, which makes re-importing the same export cheap and idempotent.
+
+Every batch is first planned into a ChangeSet of creates, updates and deletes
+against that in-memory state and then applied with bulk queries. Planning alone
+gives a dry run, and a saved change-set can be applied later without the
+source file.
+"""
+
+import csv
+import io
+import json
+import sys
+import time
+
+from django.db import transaction
+from django.db.models import ProtectedError
+from django.utils import timezone
+
+from core.dashboard import invalidate_dashboard_stats
+from core.search import index_objects
+from .closure import schedule_closure_refresh
+from .graph import invalidate_dependency_graph
+from .models import System, SystemRelationship, SystemCategory, SystemStatus
+from .signals import graph_signals_suspended
+
+try:
+    import yaml
+except ImportError:  # pragma: no cover - PyYAML is only needed for YAML input
+    yaml = None
+
+FORMATS = ('csv', 'jsonl', 'yaml')
+DEFAULT_BATCH_SIZE = 1000
+CHANGESET_FORMAT = 'clio-system-changeset/1'
+
+# Plain text system fields that can be set from an import row
+SYSTEM_TEXT_FIELDS = ('description', 'vendor', 'operating_system')
+# Import columns naming another system -> System foreign key attribute
+SYSTEM_REFERENCE_FIELDS = {'hosting_system': 'hosting_system_id', 'sso_system': 'sso_system_id'}
+# Fields set when a system is created; references are set by a following update
+SYSTEM_CREATE_FIELDS = ('category', 'status', *SYSTEM_TEXT_FIELDS)
+# Import field -> System model attribute
+SYSTEM_MODEL_FIELDS = {
+    'category': 'category_id',
+    'status': 'status_id',
+    **{field: field for field in SYSTEM_TEXT_FIELDS},
+    **SYSTEM_REFERENCE_FIELDS,
+}
+RELATIONSHIP_TYPES = {choice[0] for choice in SystemRelationship.RELATIONSHIP_TYPES}
+
+
+class ImportRowError(Exception):
+    """Raised for an import row that cannot be applied"""
+
+
+def detect_format(path):
+    """Guess the input format from a file name"""
+    lowered = path.lower()
+    if lowered.endswith('.csv'):
+        return 'csv'
+    if lowered.endswith(('.yaml', '.yml')):
+        return 'yaml'
+    return 'jsonl'
+
+
+def open_source(path):
+    """Open an import source path, or stdin for "-", as a text stream"""
+    if path == '-':
+        return io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8-sig')
+    return open(path, encoding='utf-8-sig', newline='')
+
+
+def read_rows(stream, fmt):
+    """
+    Yield (line number, row dict) pairs from a text stream without loading it whole
+
+    YAML input may be a single list of rows or a stream of documents, each a
+    row or a list of rows.
+    """
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            # Empty cells mean "not given" so partial exports do not blank fields
+            yield reader.line_num, {key: value for key, value in row.items() if key and value not in ('', None)}
+    elif fmt == 'jsonl':
+        for line_number, line in enumerate(stream, 1):
+            line = line.strip()
+            if line:
+                yield line_number, json.loads(line)
+    elif fmt == 'yaml':
+        if yaml is None:
+            raise ImportError('PyYAML is required to import YAML files')
+        number = 0
+        for document in yaml.safe_load_all(stream):
+            for row in document if isinstance(document, list) else [document]:
+                number += 1
+                yield number, row
+    else:
+        raise ValueError(f'Unknown import format: {fmt}')
+
+
+def batched(rows, size):
+    """Group an iterable into lists of at most size items"""
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class ImportStats:
+    """Counters and error rows collected during an import"""
+
+    def __init__(self):
+        self.rows = 0
+        self.systems_created = 0
+        self.systems_updated = 0
+        self.systems_deleted = 0
+        self.relationships_created = 0
+        self.relationships_updated = 0
+        self.relationships_deleted = 0
+        self.unchanged = 0
+        self.errors = []   # (line number or None, message)
+        self.started = time.perf_counter()
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def changed(self):
+        return bool(self.systems_created or self.systems_updated or self.systems_deleted
+                    or self.relationships_created or self.relationships_updated or self.relationships_deleted)
+
+    def error(self, line_number, message):
+        self.errors.append((line_number, message))
+
+
+class ChangeSet:
+    """
+    Creates, updates and deletes of systems and relationships
+
+    Systems are identified by name (plus id when they already exist), categories
+    and statuses by slug, so a change-set reads like the import it came from:
+
+        systems.create:       {name, category, status, description, vendor, operating_system}
+        systems.update:       {id, name, changes: {field: [old, new]}}
+        systems.delete:       {id, name}
+        relationships.create: {source, target, type, description}
+        relationships.update: {id, source, target, type, description: [old, new]}
+        relationships.delete: {id, source, target, type}
+
+    Relationship endpoints are system names, or ids for systems whose name is
+    shared with an older system.
+    """
+
+    KINDS = ('systems', 'relationships')
+    ACTIONS = ('create', 'update', 'delete')
+
+    def __init__(self):
+        self.systems = {action: [] for action in self.ACTIONS}
+        self.relationships = {action: [] for action in self.ACTIONS}
+
+    def __bool__(self):
+        return any(getattr(self, kind)[action] for kind in self.KINDS for action in self.ACTIONS)
+
+    def extend(self, other):
+        for kind in self.KINDS:
+            for action in self.ACTIONS:
+                getattr(self, kind)[action].extend(getattr(other, kind)[action])
+
+    def counts(self):
+        return {
+            kind: {action: len(entries) for action, entries in getattr(self, kind).items()}
+            for kind in self.KINDS
+        }
+
+    def to_dict(self, **meta):
+        return {
+            'format': CHANGESET_FORMAT,
+            **meta,
+            'counts': self.counts(),
+            'systems': self.systems,
+            'relationships': self.relationships,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        if not isinstance(data, dict) or data.get('format') != CHANGESET_FORMAT:
+            raise ValueError('Not a system import change-set')
+        changeset = cls()
+        for kind in cls.KINDS:
+            for action in cls.ACTIONS:
+                getattr(changeset, kind)[action] = list(data.get(kind, {}).get(action, []))
+        return changeset
+
+
+class SystemImporter:
+    """
+    Plan and apply imports of systems and relationships
+
+    System.name is not unique, so systems cannot be upserted with
+    bulk_create(update_conflicts=True). Rows are matched against the names
+    loaded up front instead and split into bulk_create and bulk_update calls.
+    Relationships are upserted on their unique constraint.
+    """
+
+    def __init__(self, batch_size=DEFAULT_BATCH_SIZE, default_category=None, default_status=None,
+                 delete_missing=False):
+        self.batch_size = batch_size
+        self.delete_missing = delete_missing
+        self.stats = ImportStats()
+
+        self.categories = dict(SystemCategory.objects.values_list('slug', 'id'))
+        self.statuses = dict(SystemStatus.objects.values_list('slug', 'id'))
+        # Unknown defaults fail an import up front, while planning reports each
+        # row that would use them, so a dry run still shows the rest of the diff
+        self.unknown_defaults = [
+            f'Unknown {label} "{slug}"'
+            for slug, mapping, label in ((default_category, self.categories, 'category'),
+                                         (default_status, self.statuses, 'status'))
+            if slug and slug not in mapping
+        ]
+        self.default_category = default_category
+        self.default_status = default_status
+        self._load_state()
+
+        # Sources of new or removed depends_on edges, whose impact closure is stale
+        self.changed_sources = set()
+        # Systems bulk created or updated by the current apply()
+        self._written_system_ids = set()
+
+        # Names and relationship keys present in the import, for delete_missing
+        self.seen_systems = set()
+        self.seen_relationships = set()
+
+        # Rows that name systems not imported yet are retried at the end
+        self._pending_references = []
+        self._pending_relationships = []
+
+    def _load_state(self):
+        """Load every system and relationship with one query each"""
+        category_slugs = {pk: slug for slug, pk in self.categories.items()}
+        status_slugs = {pk: slug for slug, pk in self.statuses.items()}
+
+        systems = list(System.objects.values(
+            'id', 'name', 'category_id', 'status_id', *SYSTEM_TEXT_FIELDS, *SYSTEM_REFERENCE_FIELDS.values()
+        ))
+        self.system_names = {values['id']: values['name'] for values in systems}
+
+        # name -> system in import terms (slugs and names instead of foreign keys)
+        self.systems = {}
+        # Names are not unique; the oldest system with a name wins
+        for values in sorted(systems, key=lambda values: -values['id']):
+            self.systems[values['name']] = {
+                'id': values['id'],
+                'name': values['name'],
+                'category': category_slugs.get(values['category_id']),
+                'status': status_slugs.get(values['status_id']),
+                **{field: values[field] for field in SYSTEM_TEXT_FIELDS},
+                **{column: self.system_names.get(values[field]) for column, field in SYSTEM_REFERENCE_FIELDS.items()},
+            }
+
+        # (source, target, type) -> {id, description}
+        self.relationships = {}
+        for rel_id, source_id, target_id, rel_type, description in SystemRelationship.objects.values_list(
+            'id', 'source_system_id', 'target_system_id', 'relationship_type', 'description'
+        ).iterator():
+            key = (self._reference(source_id), self._reference(target_id), rel_type)
+            self.relationships[key] = {'id': rel_id, 'description': description}
+
+    def _reference(self, system_id):
+        """Name of a system, or its id if the name belongs to an older system"""
+        name = self.system_names.get(system_id)
+        system = self.systems.get(name)
+        return name if system is not None and system['id'] == system_id else system_id
+
+    def _system_id(self, reference):
+        """Resolve a system name or id to an id, or None if it does not exist"""
+        if isinstance(reference, int):
+            return reference if reference in self.system_names else None
+        system = self.systems.get(reference)
+        return system['id'] if system else None
+
+    # Running imports
+
+    def import_rows(self, rows):
+        """Import (line number, row) pairs batch by batch and return the ImportStats"""
+        if self.unknown_defaults:
+            raise ImportRowError(self.unknown_defaults[0])
+        for batch in batched(rows, self.batch_size):
+            self.stats.rows += len(batch)
+            self.apply(self.plan_batch(batch))
+        self.apply(self.plan_remaining())
+        self.finish()
+        return self.stats
+
+    def plan_rows(self, rows):
+        """Plan an import without writing anything and return its ChangeSet"""
+        changeset = ChangeSet()
+        for batch in batched(rows, self.batch_size):
+            self.stats.rows += len(batch)
+            changeset.extend(self.plan_batch(batch))
+        changeset.extend(self.plan_remaining())
+        return changeset
+
+    def apply_changeset(self, changeset):
+        """Apply a saved ChangeSet, skipping entries that conflict with the current data"""
+        self.apply(changeset, check_conflicts=True)
+        self.finish()
+        return self.stats
+
+    def finish(self):
+        if self.stats.changed:
+            # Bulk writes skip the signals that keep the graph and closure current
+            invalidate_dependency_graph()
+        if self.changed_sources:
+            schedule_closure_refresh(self.changed_sources)
+
+    # Planning
+
+    def plan_batch(self, batch):
+        changeset = ChangeSet()
+        system_rows = []
+        relationship_rows = []
+        for line_number, row in batch:
+            if not isinstance(row, dict):
+                self.stats.error(line_number, 'Row is not a mapping')
+            elif row.get('source') and row.get('target'):
+                relationship_rows.append((line_number, row))
+            elif row.get('name'):
+                system_rows.append((line_number, row))
+            else:
+                self.stats.error(line_number, 'Row has neither a name nor a source and target')
+
+        references = self._plan_systems(system_rows, changeset)
+        self._plan_references(references, changeset)
+        self._plan_relationships(relationship_rows, changeset)
+        return changeset
+
+    def plan_remaining(self):
+        """Plan rows that waited for later systems, then deletes if requested"""
+        changeset = ChangeSet()
+        pending_references, self._pending_references = self._pending_references, []
+        pending_relationships, self._pending_relationships = self._pending_relationships, []
+        self._plan_references(pending_references, changeset, final=True)
+        self._plan_relationships(pending_relationships, changeset, final=True)
+        if self.delete_missing:
+            self._plan_deletes(changeset)
+        return changeset
+
+    def _plan_systems(self, rows, changeset):
+        """Plan system creates and updates and return the rows' system references"""
+        references = []
+        for line_number, row in rows:
+            name = str(row['name']).strip()
+            self.seen_systems.add(name)
+
+            values = {}
+            try:
+                for field, mapping in (('category', self.categories), ('status', self.statuses)):
+                    if row.get(field):
+                        if row[field] not in mapping:
+                            raise ImportRowError(f'Unknown {field} "{row[field]}"')
+                        values[field] = row[field]
+            except ImportRowError as e:
+                self.stats.error(line_number, str(e))
+                continue
+            for field in SYSTEM_TEXT_FIELDS:
+                if field in row:
+                    values[field] = str(row[field] or '')
+
+            for column in SYSTEM_REFERENCE_FIELDS:
+                if column in row:
+                    references.append((line_number, name, column, row[column]))
+
+            current = self.systems.get(name)
+            if current is None:
+                values.setdefault('category', self.default_category)
+                values.setdefault('status', self.default_status)
+                if not values['category'] or not values['status']:
+                    self.stats.error(line_number, f'System "{name}" needs a category and a status')
+                    continue
+                # Only a default can be unknown here, as row values were checked above
+                unknown = [f'Unknown {field} "{values[field]}"'
+                           for field, mapping in (('category', self.categories), ('status', self.statuses))
+                           if values[field] not in mapping]
+                if unknown:
+                    self.stats.error(line_number, '; '.join(unknown))
+                    continue
+                self.systems[name] = {
+                    'id': None,
+                    'name': name,
+                    **{field: '' for field in SYSTEM_TEXT_FIELDS},
+                    **{column: None for column in SYSTEM_REFERENCE_FIELDS},
+                    **values,
+                }
+                changeset.systems['create'].append(
+                    {'name': name, **{field: self.systems[name][field] for field in SYSTEM_CREATE_FIELDS}}
+                )
+                continue
+
+            changes = {field: [current[field], value] for field, value in values.items() if current[field] != value}
+            if changes:
+                current.update(values)
+                changeset.systems['update'].append({'id': current['id'], 'name': name, 'changes': changes})
+            else:
+                self.stats.unchanged += 1
+
+        return references
+
+    def _plan_references(self, references, changeset, final=False):
+        """Plan hosting and SSO system changes"""
+        updates = {}
+        for line_number, name, column, target in references:
+            target = str(target).strip() if target else None
+            if target and target not in self.systems:
+                if final:
+                    self.stats.error(line_number, f'Unknown {column.replace("_", " ")} "{target}"')
+                else:
+                    self._pending_references.append((line_number, name, column, target))
+                continue
+
+            current = self.systems.get(name)
+            if current is None or current[column] == target:
+                continue
+            entry = updates.setdefault(name, {'id': current['id'], 'name': name, 'changes': {}})
+            entry['changes'][column] = [current[column], target]
+            current[column] = target
+
+        changeset.systems['update'].extend(updates.values())
+
+    def _plan_relationships(self, rows, changeset, final=False):
+        """Plan relationship creates and description updates"""
+        for line_number, row in rows:
+            rel_type = row.get('type') or row.get('relationship_type') or 'depends_on'
+            if rel_type not in RELATIONSHIP_TYPES:
+                self.stats.error(line_number, f'Unknown relationship type "{rel_type}"')
+                continue
+
+            source = str(row['source']).strip()
+            target = str(row['target']).strip()
+            self.seen_systems.update((source, target))
+            if source not in self.systems or target not in self.systems:
+                if final:
+                    missing = source if source not in self.systems else target
+                    self.stats.error(line_number, f'Unknown system "{missing}"')
+                else:
+                    self._pending_relationships.append((line_number, row))
+                continue
+
+            key = (source, target, rel_type)
+            self.seen_relationships.add(key)
+            description = str(row.get('description') or '')
+            current = self.relationships.get(key)
+            if current is None:
+                self.relationships[key] = {'id': None, 'description': description}
+                changeset.relationships['create'].append(
+                    {'source': source, 'target': target, 'type': rel_type, 'description': description}
+                )
+            elif current['description'] != description:
+                changeset.relationships['update'].append({
+                    'id': current['id'], 'source': source, 'target': target, 'type': rel_type,
+                    'description': [current['description'], description],
+                })
+                current['description'] = description
+            else:
+                self.stats.unchanged += 1
+
+    def _plan_deletes(self, changeset):
+        """Plan deletes of everything the import did not mention"""
+        for (source, target, rel_type), relationship in self.relationships.items():
+            if (source, target, rel_type) not in self.seen_relationships and relationship['id'] is not None:
+                changeset.relationships['delete'].append(
+                    {'id': relationship['id'], 'source': source, 'target': target, 'type': rel_type}
+                )
+        for name, system in self.systems.items():
+            if name not in self.seen_systems and system['id'] is not None:
+                changeset.systems['delete'].append({'id': system['id'], 'name': name})
+
+    # Applying
+
+    def apply(self, changeset, check_conflicts=False):
+        """
+        Write a ChangeSet in one transaction
+
+        Args:
+            changeset: The ChangeSet to apply
+            check_conflicts: Compare each entry with the loaded state first and
+                             skip entries whose "old" side no longer matches;
+                             used for change-sets planned by an earlier run
+        """
+        if not changeset:
+            return
+        with transaction.atomic(), graph_signals_suspended():
+            self._apply_system_creates(changeset.systems['create'], check_conflicts)
+            self._apply_system_updates(changeset.systems['update'], check_conflicts)
+            self._apply_relationship_upserts(
+                changeset.relationships['create'], changeset.relationships['update'], check_conflicts
+            )
+            self._apply_relationship_deletes(changeset.relationships['delete'])
+            self._apply_system_deletes(changeset.systems['delete'])
+            # Bulk writes skip the signals that keep the global search and
+            # the dashboard current
+            index_objects(System, self._written_system_ids)
+            self._written_system_ids = set()
+            invalidate_dashboard_stats()
+
+    def _apply_system_creates(self, entries, check_conflicts):
+        to_create = {}
+        for entry in entries:
+            name = entry['name']
+            current = self.systems.get(name)
+            if check_conflicts and current is not None:
+                self.stats.error(None, f'System "{name}" already exists')
+                continue
+            if entry.get('category') not in self.categories or entry.get('status') not in self.statuses:
+                self.stats.error(None, f'System "{name}" has an unknown category or status')
+                continue
+            to_create[name] = entry
+
+        if not to_create:
+            return
+
+        created = System.objects.bulk_create(
+            [
+                System(
+                    name=name,
+                    category_id=self.categories[entry['category']],
+                    status_id=self.statuses[entry['status']],
+                    **{field: entry.get(field, '') for field in SYSTEM_TEXT_FIELDS}
+                )
+                for name, entry in to_create.items()
+            ],
+            batch_size=self.batch_size
+        )
+        if any(system.pk is None for system in created):
+            # Backends that do not return primary keys from bulk inserts
+            ids = dict(System.objects.filter(name__in=to_create).order_by('id').values_list('name', 'id'))
+        else:
+            ids = {system.name: system.pk for system in created}
+
+        for name, entry in to_create.items():
+            state = self.systems.setdefault(name, {
+                'name': name,
+                **{column: None for column in SYSTEM_REFERENCE_FIELDS},
+            })
+            state.update({field: entry.get(field, '') for field in SYSTEM_CREATE_FIELDS})
+            state['id'] = ids[name]
+            self.system_names[ids[name]] = name
+            self._written_system_ids.add(ids[name])
+        self.stats.systems_created += len(to_create)
+
+    def _apply_system_updates(self, entries, check_conflicts):
+        to_update = {}
+        fields = set()
+        for entry in entries:
+            name = entry['name']
+            current = self.systems.get(name)
+            if current is None or current['id'] is None or (entry.get('id') and entry['id'] != current['id']):
+                self.stats.error(None, f'System "{name}" no longer exists')
+                continue
+            changes = entry['changes']
+            if check_conflicts:
+                conflicts = [field for field, (old, new) in changes.items() if current.get(field) != old]
+                if conflicts:
+                    self.stats.error(None, f'System "{name}" changed since the change-set was made: {", ".join(conflicts)}')
+                    continue
+            invalid = [
+                field for field, (old, new) in changes.items()
+                if field not in SYSTEM_MODEL_FIELDS
+                or (field == 'category' and new not in self.categories)
+                or (field == 'status' and new not in self.statuses)
+                or (field in SYSTEM_REFERENCE_FIELDS and new is not None and self._system_id(new) is None)
+            ]
+            if invalid:
+                self.stats.error(None, f'System "{name}" has unknown values for {", ".join(invalid)}')
+                continue
+            current.update({field: new for field, (old, new) in changes.items()})
+            to_update[name] = current
+            fields.update(changes)
+
+        if not to_update:
+            return
+
+        now = timezone.now()
+        systems = []
+        for values in to_update.values():
+            system = System(
+                id=values['id'],
+                name=values['name'],
+                category_id=self.categories.get(values['category']),
+                status_id=self.statuses.get(values['status']),
+                **{field: values[field] for field in SYSTEM_TEXT_FIELDS},
+                **{field: self._system_id(values[column]) if values[column] else None
+                   for column, field in SYSTEM_REFERENCE_FIELDS.items()},
+            )
+            system.updated_at = now
+            systems.append(system)
+
+        model_fields = [SYSTEM_MODEL_FIELDS[field] for field in sorted(fields)]
+        System.objects.bulk_update(systems, [*model_fields, 'updated_at'], batch_size=self.batch_size)
+        self._written_system_ids.update(system.id for system in systems)
+        self.stats.systems_updated += len(to_update)
+
+    def _apply_relationship_upserts(self, creates, updates, check_conflicts):
+        upserts = {}
+        for entry, created in [(entry, True) for entry in creates] + [(entry, False) for entry in updates]:
+            key = (entry['source'], entry['target'], entry['type'])
+            source_id = self._system_id(entry['source'])
+            target_id = self._system_id(entry['target'])
+            label = f'Relationship {entry["source"]} -> {entry["target"]} ({entry["type"]})'
+            if source_id is None or target_id is None or entry['type'] not in RELATIONSHIP_TYPES:
+                self.stats.error(None, f'{label} refers to an unknown system or type')
+                continue
+
+            current = self.relationships.get(key)
+            description = entry['description'] if created else entry['description'][1]
+            if check_conflicts:
+                if created and current is not None:
+                    self.stats.error(None, f'{label} already exists')
+                    continue
+                if not created and (current is None or current['description'] != entry['description'][0]):
+                    self.stats.error(None, f'{label} changed since the change-set was made')
+                    continue
+
+            self.relationships[key] = {'id': current['id'] if current else None, 'description': description}
+            upserts[(source_id, target_id, entry['type'])] = description
+            if created:
+                self.stats.relationships_created += 1
+                if entry['type'] == 'depends_on':
+                    self.changed_sources.add(source_id)
+            else:
+                self.stats.relationships_updated += 1
+
+        if upserts:
+            SystemRelationship.objects.bulk_create(
+                [
+                    SystemRelationship(
+                        source_system_id=source_id,
+                        target_system_id=target_id,
+                        relationship_type=rel_type,
+                        description=description
+                    )
+                    for (source_id, target_id, rel_type), description in upserts.items()
+                ],
+                batch_size=self.batch_size,
+                update_conflicts=True,
+                unique_fields=['source_system', 'target_system', 'relationship_type'],
+                update_fields=['description', 'updated_at'],
+            )
+
+    def _apply_relationship_deletes(self, entries):
+        ids = []
+        for entry in entries:
+            key = (entry['source'], entry['target'], entry['type'])
+            self.relationships.pop(key, None)
+            ids.append(entry['id'])
+            if entry['type'] == 'depends_on':
+                source_id = self._system_id(entry['source'])
+                if source_id is not None:
+                    self.changed_sources.add(source_id)
+
+        for start in range(0, len(ids), self.batch_size):
+            deleted, _ = SystemRelationship.objects.filter(id__in=ids[start:start + self.batch_size]).delete()
+            self.stats.relationships_deleted += deleted
+
+    def _apply_system_deletes(self, entries):
+        if not entries:
+            return
+        ids = {entry['id'] for entry in entries}
+
+        # Systems depending on a deleted system lose part of their impact closure
+        for (source, target, rel_type) in self.relationships:
+            if rel_type == 'depends_on' and self._system_id(target) in ids:
+                source_id = self._system_id(source)
+                if source_id is not None:
+                    self.changed_sources.add(source_id)
+
+        try:
+            with transaction.atomic():
+                for start in range(0, len(entries), self.batch_size):
+                    System.objects.filter(
+                        id__in=[entry['id'] for entry in entries[start:start + self.batch_size]]
+                    ).delete()
+        except ProtectedError as e:
+            self.stats.error(None, f'Systems were not deleted because other records still use them: {e.args[0]}')
+            return
+
+        for entry in entries:
+            if self.systems.get(entry['name'], {}).get('id') == entry['id']:
+                del self.systems[entry['name']]
+        self.stats.systems_deleted += len(entries)
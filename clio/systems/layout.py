@@ -0,0 +1,280 @@
+# systems/layout.py
+
+"""
+Server-side layout of the relationship diagram.
+
+Node coordinates are computed with a vectorized Fruchterman-Reingold force
+layout over the in-memory system graph and cached together with the graph
+version they were computed for. When the graph moves on, only the systems
+whose links changed and their direct neighbours are laid out again, with every
+other node held in place. NumPy is optional: without it no positions are served
+and the diagram falls back to laying itself out in the browser.
+
+A full layout takes seconds on a large estate, so requests never run one.
+When there is no cached layout, or too much changed to patch it, one request
+takes a short-lived lock in the cache and starts the full layout in a
+background thread; until it is stored, requests get the previous layout (or
+none, and the browser lays out the systems without a position). The
+rebuild_diagram_layout command computes it ahead of time, e.g. after deploys.
+
+Each process also keeps the cached layout and its arrays in memory, and only
+reads them from the cache again once the layout version stored next to them
+moves on, so serving positions does not unpickle the whole layout per request.
+"""
+
+import logging
+import threading
+
+from django.core.cache import cache
+from django.db import connections
+
+from .graph import RELATIONSHIP_TYPES, get_dependency_graph
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy is an optional dependency
+    np = None
+
+logger = logging.getLogger(__name__)
+
+LAYOUT_CACHE_KEY = 'systems:diagram-layout'
+LAYOUT_LOCK_KEY = 'systems:diagram-layout-lock'
+# The graph version of the cached layout on its own, cheap to read for ETags
+LAYOUT_VERSION_KEY = 'systems:diagram-layout-version'
+# Released when the work is done; the timeout only frees it after a crash
+LAYOUT_LOCK_TIMEOUT = 600
+# Ideal distance between linked nodes, in diagram pixels
+NODE_SPACING = 80.0
+FULL_ITERATIONS = 60
+INCREMENTAL_ITERATIONS = 30
+# Beyond this share of changed nodes a full layout is cheaper than patching
+INCREMENTAL_THRESHOLD = 0.25
+# Rows of the pairwise repulsion matrix computed at a time, to bound memory
+REPULSION_BLOCK = 512
+SEED = 42
+
+# This process's copy of the cached layout, with the version it was read at
+_cached = None
+_cached_version = None
+_lock = threading.Lock()
+
+
+def force_layout(positions, sources, targets, movable, iterations):
+    """
+    Run a Fruchterman-Reingold layout in place
+
+    Args:
+        positions: (n, 2) float array of starting coordinates, updated in place
+        sources, targets: Integer arrays of edge endpoints (row indexes)
+        movable: Row indexes of the nodes allowed to move
+        iterations: Number of layout steps
+
+    Returns:
+        The positions array
+    """
+    count = len(positions)
+    if count < 2 or len(movable) == 0:
+        return positions
+
+    k = NODE_SPACING
+    k_squared = k * k
+    temperature = NODE_SPACING * np.sqrt(count) / 10
+    cooling = temperature / (iterations + 1)
+
+    for _ in range(iterations):
+        displacement = np.zeros((len(movable), 2))
+
+        # Every node repels every movable node with force k^2 / d
+        x = positions[:, 0].astype(np.float32)
+        y = positions[:, 1].astype(np.float32)
+        for start in range(0, len(movable), REPULSION_BLOCK):
+            rows = movable[start:start + REPULSION_BLOCK]
+            dx = x[rows, None] - x[None, :]
+            dy = y[rows, None] - y[None, :]
+            strength = dx * dx
+            strength += dy * dy
+            np.maximum(strength, 0.01, out=strength)
+            np.divide(k_squared, strength, out=strength)
+            displacement[start:start + len(rows), 0] = (dx * strength).sum(axis=1)
+            displacement[start:start + len(rows), 1] = (dy * strength).sum(axis=1)
+
+        # Linked nodes attract each other with force d^2 / k
+        if len(sources):
+            delta = positions[sources] - positions[targets]
+            distance = np.sqrt((delta ** 2).sum(axis=1))[:, None]
+            force = delta * distance / k
+            attraction = np.zeros((count, 2))
+            np.subtract.at(attraction, sources, force)
+            np.add.at(attraction, targets, force)
+            displacement += attraction[movable]
+
+        # Cap each step at the current temperature
+        length = np.maximum(np.sqrt((displacement ** 2).sum(axis=1)), 1e-9)[:, None]
+        positions[movable] += displacement / length * np.minimum(length, temperature)
+        temperature -= cooling
+
+    return positions
+
+
+def _graph_arrays(graph):
+    """Return (system ids, edge sources, edge targets) over layout rows"""
+    system_ids = np.array(sorted(graph.system_ids()), dtype=np.int64)
+    row_of_node = {graph.node_index(system_id): row for row, system_id in enumerate(system_ids.tolist())}
+
+    sources, targets = [], []
+    for rel_type in RELATIONSHIP_TYPES:
+        for node, successors in enumerate(graph.successors(rel_type)):
+            if not len(successors) or node not in row_of_node:
+                continue
+            row = row_of_node[node]
+            for successor in successors:
+                sources.append(row)
+                targets.append(row_of_node[successor])
+
+    return system_ids, np.array(sources, dtype=np.int64), np.array(targets, dtype=np.int64)
+
+
+def _edge_keys(system_ids, sources, targets):
+    """Encode edges as sorted unique (source id, target id) keys"""
+    return np.unique(system_ids[sources] * (1 << 32) + system_ids[targets])
+
+
+def _full_layout(system_ids, sources, targets):
+    rng = np.random.default_rng(SEED)
+    side = NODE_SPACING * np.sqrt(max(len(system_ids), 1))
+    positions = rng.uniform(-side / 2, side / 2, size=(len(system_ids), 2))
+    return force_layout(positions, sources, targets, np.arange(len(system_ids)), FULL_ITERATIONS)
+
+
+def _incremental_layout(previous, system_ids, sources, targets, edge_keys):
+    """
+    Patch a cached layout after the graph changed
+
+    Returns None when too much changed for a local update to be worthwhile.
+    """
+    previous_ids = previous['system_ids']
+    changed_keys = np.setxor1d(previous['edge_keys'], edge_keys, assume_unique=True)
+    changed_ids = np.union1d(
+        np.setxor1d(previous_ids, system_ids, assume_unique=True),
+        np.concatenate([changed_keys >> 32, changed_keys & 0xFFFFFFFF]),
+    )
+    changed = np.isin(system_ids, changed_ids)
+    if changed.sum() > INCREMENTAL_THRESHOLD * max(len(system_ids), 1):
+        return None
+
+    # The neighbourhood of the changed systems moves, everything else stays put
+    affected = changed.copy()
+    affected[sources[changed[targets]]] = True
+    affected[targets[changed[sources]]] = True
+
+    positions = np.zeros((len(system_ids), 2))
+    kept = np.isin(system_ids, previous_ids)
+    previous_rows = np.searchsorted(previous_ids, system_ids[kept])
+    positions[kept] = previous['positions'][previous_rows]
+
+    # New systems start next to their linked neighbours, or at the origin
+    rng = np.random.default_rng(SEED)
+    for row in np.flatnonzero(~kept):
+        neighbours = np.concatenate([targets[sources == row], sources[targets == row]])
+        neighbours = neighbours[kept[neighbours]]
+        centre = positions[neighbours].mean(axis=0) if len(neighbours) else np.zeros(2)
+        positions[row] = centre + rng.normal(scale=NODE_SPACING / 2, size=2)
+
+    return force_layout(positions, sources, targets, np.flatnonzero(affected), INCREMENTAL_ITERATIONS)
+
+
+def _store_layout(version, system_ids, edge_keys, positions):
+    global _cached, _cached_version
+    rounded = np.round(positions, 1).tolist()
+    layout = {system_id: tuple(xy) for system_id, xy in zip(system_ids.tolist(), rounded)}
+    cached = {
+        'version': version,
+        'system_ids': system_ids,
+        'edge_keys': edge_keys,
+        'positions': positions,
+        'layout': layout,
+    }
+    cache.set(LAYOUT_CACHE_KEY, cached, None)
+    cache.set(LAYOUT_VERSION_KEY, version, None)
+    with _lock:
+        _cached, _cached_version = cached, version
+    return layout
+
+
+def _load_layout():
+    """Return the cached layout, read from the cache only if its version moved on"""
+    global _cached, _cached_version
+    version = get_layout_version()
+    with _lock:
+        if _cached is None or _cached_version != version:
+            _cached = cache.get(LAYOUT_CACHE_KEY)
+            _cached_version = version
+        return _cached
+
+
+def get_layout_version():
+    """The graph version the cached layout was computed for, or None"""
+    return cache.get(LAYOUT_VERSION_KEY)
+
+
+def compute_full_layout(graph=None):
+    """Lay out the whole graph from scratch and cache the result"""
+    graph = graph or get_dependency_graph()
+    system_ids, sources, targets = _graph_arrays(graph)
+    logger.info('Computing full diagram layout for %d systems', len(system_ids))
+    positions = _full_layout(system_ids, sources, targets)
+    return _store_layout(graph.version, system_ids, _edge_keys(system_ids, sources, targets), positions)
+
+
+def _full_layout_in_background(version, system_ids, sources, targets, edge_keys):
+    def run():
+        try:
+            logger.info('Computing full diagram layout for %d systems', len(system_ids))
+            _store_layout(version, system_ids, edge_keys, _full_layout(system_ids, sources, targets))
+        except Exception:
+            logger.exception('Full diagram layout failed')
+        finally:
+            cache.delete(LAYOUT_LOCK_KEY)
+            connections.close_all()
+
+    threading.Thread(target=run, name='diagram-layout', daemon=True).start()
+
+
+def get_layout(graph=None):
+    """
+    Return {system id: (x, y)} for the current graph, or {} without NumPy
+
+    The layout is cached per graph version; a stale cached layout is patched
+    around the changed systems rather than recomputed from scratch. Systems
+    missing from the result have no position yet.
+    """
+    if np is None:
+        return {}
+
+    graph = graph or get_dependency_graph()
+    cached = _load_layout()
+    if cached is not None and cached['version'] == graph.version:
+        return cached['layout']
+    previous = cached['layout'] if cached is not None else {}
+
+    # Another request is already updating the layout
+    if not cache.add(LAYOUT_LOCK_KEY, graph.version, LAYOUT_LOCK_TIMEOUT):
+        return previous
+
+    # The arrays are taken now, as the graph may change under a background thread
+    system_ids, sources, targets = _graph_arrays(graph)
+    edge_keys = _edge_keys(system_ids, sources, targets)
+    in_background = False
+    try:
+        positions = None
+        if cached is not None:
+            positions = _incremental_layout(cached, system_ids, sources, targets, edge_keys)
+        if positions is not None:
+            return _store_layout(graph.version, system_ids, edge_keys, positions)
+        # The background thread releases the lock once it is done
+        _full_layout_in_background(graph.version, system_ids, sources, targets, edge_keys)
+        in_background = True
+        return previous
+    finally:
+        if not in_background:
+            cache.delete(LAYOUT_LOCK_KEY)
@@ -0,0 +1,53 @@
+# systems/lookups.py
+
+"""
+Typeahead lookup of systems by name, used by the relationship editor instead
+of embedding every system in the detail page.
+
+Names, categories and their colours only change on writes that bump the graph
+version, so each process keeps the index with the version it was built at and
+rebuilds it once the version moves on, the same way as the dependency graph
+(systems/graph.py). Keeping it in memory rather than the shared cache spares
+unpickling the whole index on every keystroke.
+"""
+
+import threading
+
+from core.lookups import PrefixIndex
+from .graph import get_graph_version
+from .models import System
+
+_index = None
+_index_version = None
+_lock = threading.Lock()
+
+
+def system_lookup_entry(system):
+    """A system as the relationship editor draws it"""
+    category = system.category
+    return {
+        'id': system.id,
+        'name': system.name,
+        'category': {
+            'slug': category.slug,
+            'name': category.name,
+            'color': category.color,
+            'text_color': category.text_color,
+        } if category else None,
+    }
+
+
+def build_system_index():
+    systems = System.objects.select_related('category').order_by('name', 'id')
+    return PrefixIndex((system_lookup_entry(system), [system.name]) for system in systems)
+
+
+def get_system_index(version=None):
+    """Return this process's index, rebuilding it if the graph version moved on"""
+    global _index, _index_version
+    version = get_graph_version() if version is None else version
+    with _lock:
+        if _index is None or _index_version != version:
+            _index = build_system_index()
+            _index_version = version
+        return _index
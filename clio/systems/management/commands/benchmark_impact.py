@@ -0,0 +1,66 @@
+# systems/management/commands/benchmark_impact.py
+
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+
+from systems.graph import DependencyGraph
+from systems.impact import find_affected_systems
+
+
+class Command(BaseCommand):
+    help = 'Benchmark outage impact analysis on a synthetic dependency graph'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--systems', type=int, default=10000, help='Number of synthetic systems')
+        parser.add_argument('--edges', type=int, default=100000, help='Number of depends_on relationships')
+        parser.add_argument('--hubs', type=int, default=50, help='Number of hub systems that attract most edges')
+        parser.add_argument('--queries', type=int, default=20, help='Number of impact queries to time')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        system_count = options['systems']
+        edge_count = options['edges']
+        hub_count = min(options['hubs'], system_count)
+        rng = random.Random(options['seed'])
+
+        self.stdout.write(f'Building synthetic graph: {system_count} systems, {edge_count} edges...')
+        started = time.perf_counter()
+        graph = DependencyGraph()
+        for system_id in range(1, system_count + 1):
+            graph.add_system(system_id, name=f'System {system_id}', vendor='')
+
+        # Half of the edges leave a hub (like "Active Directory"), the rest are random,
+        # which gives the dense mesh that made path enumeration blow up
+        hubs = list(range(1, hub_count + 1))
+        edges = set()
+        while len(edges) < edge_count:
+            source = rng.choice(hubs) if rng.random() < 0.5 else rng.randint(1, system_count)
+            target = rng.randint(1, system_count)
+            if source != target:
+                edges.add((source, target))
+        for source, target in edges:
+            graph.add_relationship(source, target, 'depends_on')
+        self.stdout.write(f'  built in {time.perf_counter() - started:.2f}s')
+
+        sources = hubs[:options['queries'] // 2]
+        sources += [rng.randint(1, system_count) for _ in range(options['queries'] - len(sources))]
+
+        timings = []
+        reached = []
+        for source in sources:
+            started = time.perf_counter()
+            affected = find_affected_systems(graph, source)
+            timings.append(time.perf_counter() - started)
+            reached.append(len(affected))
+
+        total = sum(timings)
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(sources)} impact queries in {total:.3f}s'
+        ))
+        self.stdout.write(f'  median: {statistics.median(timings) * 1000:.1f} ms')
+        self.stdout.write(f'  max:    {max(timings) * 1000:.1f} ms')
+        self.stdout.write(f'  affected systems per query: {min(reached)}-{max(reached)}')
+        self.stdout.write(f'  edges scanned per second: {edge_count * len(sources) / total:,.0f}')
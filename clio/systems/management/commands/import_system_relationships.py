@@ -1,476 +1,60 @@
 # systems/management/commands/import_system_relationships.py
 
-from django.core.management.base import BaseCommand
-from django.db import transaction
-from systems.models import System, SystemRelationship, SystemCategory, SystemStatus
+import json
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from systems.importer import (
+    SystemImporter, ChangeSet, ImportRowError, FORMATS, DEFAULT_BATCH_SIZE, detect_format, open_source, read_rows
+)
+from systems.models import SystemCategory, SystemStatus
+
+# Bundled systems and relationships from the original mockup
+MOCKUP_DATA = os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'mockup_systems.jsonl')
+
+# Categories and status the mockup data refers to, created when missing
+DEFAULT_CATEGORIES = [
+    # slug, name, color, text color
+    ('core', 'Core System', '#d5e8f9', '#3498db'),
+    ('integration', 'Integration', '#e8f6e8', '#27ae60'),
+    ('custom', 'Custom Component', '#fdebd0', '#f39c12'),
+    ('external', 'External System', '#f0d5d5', '#c0392b'),
+    ('server', 'Server', '#e0e0f0', '#5c6bc0'),
+]
+
+MAX_REPORTED_ERRORS = 50
 
 
 class Command(BaseCommand):
-    help = 'Import predefined system relationships from mockup'
+    help = 'Import systems and relationships from a CSV, JSON Lines or YAML export'
 
-    def handle(self, *args, **options):
-        # Define the systems data (from the mockup's systemsData object)
-        systems_data = {
-            # Core Systems
-            "Banner 9 Admin": {
-                "inputs": ["Manual Entry", "Constituo", "External Entities (banking institutions, federal government, etc.)"],
-                "type": "core",
-                "group": "Core Systems"
-            },
-            "Active Directory": {
-                "inputs": ["Identity Management Processes (Custom)"],
-                "type": "core",
-                "group": "Core Systems"
-            },
-            "Ellucian Operational Data Store (ODS)": {
-                "inputs": ["Banner 9 Admin"],
-                "type": "core",
-                "group": "Core Systems"
-            },
-            "Ellucian Ethos": {
-                "inputs": ["Banner 9 Admin"],
-                "type": "core",
-                "group": "Core Systems"
-            },
-            
-            # Authentication & Identity
-            "Azure SSO": {
-                "inputs": ["Active Directory"],
-                "type": "core",
-                "group": "Authentication & Identity"
-            },
-            "CAS SSO": {
-                "inputs": ["Active Directory"],
-                "type": "core",
-                "group": "Authentication & Identity"
-            },
-            "Ellucian Identity Services": {
-                "inputs": ["Active Directory"],
-                "type": "core",
-                "group": "Authentication & Identity"
-            },
-            "Entra Connect": {
-                "inputs": ["Active Directory"],
-                "type": "core",
-                "group": "Authentication & Identity"
-            },
-            "Microsoft Entra": {
-                "inputs": ["Entra Connect"],
-                "type": "core",
-                "group": "Authentication & Identity"
-            },
-            "GlobalProtect VPN": {
-                "inputs": ["Active Directory"],
-                "type": "core",
-                "group": "Authentication & Identity"
-            },
-            
-            # Middleware & Integration
-            "25Live Middleware": {
-                "inputs": ["Banner 9 Admin"],
-                "type": "integration",
-                "group": "Middleware & Integration"
-            },
-            "ACM Integration (Custom)": {
-                "inputs": ["Banner 9 Admin"],
-                "type": "custom",
-                "group": "Middleware & Integration"
-            },
-            "ARMs Integration (Custom)": {
-                "inputs": ["Banner 9 Admin"],
-                "type": "custom",
-                "group": "Middleware & Integration"
-            },
-            "Blackbaud Award Management Integration (Custom)": {
-                "inputs": ["Banner 9 Admin"],
-                "type": "custom",
-                "group": "Middleware & Integration"
-            },
-            "CourseDog Middleware": {
-                "inputs": ["Banner 9 Admin"],
-                "type": "integration",
-                "group": "Middleware & Integration"
-            },
-            "CRM Advise Middleware": {
-                "inputs": ["Banner 9 Admin", "Blackboard"],
-                "type": "integration",
-                "group": "Middleware & Integration"
-            },
-            "EAB Navigate Middleware": {
-                "inputs": ["Banner 9 Admin"],
-                "type": "integration",
-                "group": "Middleware & Integration"
-            },
-            "eRezLife Integration (Custom)": {
-                "inputs": ["Banner 9 Admin"],
-                "type": "custom",
-                "group": "Middleware & Integration"
-            },
-            "Follett (Course Information) Integration (Custom)": {
-                "inputs": ["Banner 9 Admin"],
-                "type": "custom",
-                "group": "Middleware & Integration"
-            },
-            "Follett Access Integration (Custom)": {
-                "inputs": ["Banner 9 Admin"],
-                "type": "custom",
-                "group": "Middleware & Integration"
-            },
-            "Identity Management Processes (Custom)": {
-                "inputs": ["Banner 9 Admin", "Ellucian Operational Data Store (ODS)"],
-                "type": "custom",
-                "group": "Middleware & Integration"
-            },
-            "Library Patron Platform Integration (Custom)": {
-                "inputs": ["Banner 9 Admin"],
-                "type": "custom",
-                "group": "Middleware & Integration"
-            },
-            "Maxient Integration (Custom)": {
-                "inputs": ["Banner 9 Admin"],
-                "type": "custom",
-                "group": "Middleware & Integration"
-            },
-            "Distribution Lists Integration (Custom)": {
-                "inputs": ["Banner 9 Admin"],
-                "type": "custom",
-                "group": "Middleware & Integration"
-            },
-            "Omnilert Integration (Custom)": {
-                "inputs": ["Banner 9 Admin"],
-                "type": "custom",
-                "group": "Middleware & Integration"
-            },
-            "Presence Integration (Custom)": {
-                "inputs": ["Banner 9 Admin"],
-                "type": "custom",
-                "group": "Middleware & Integration"
-            },
-            "Raiser's Edge Integration (Custom)": {
-                "inputs": ["Banner 9 Admin"],
-                "type": "custom",
-                "group": "Middleware & Integration"
-            },
-            "Slate Integration (Custom)": {
-                "inputs": ["Banner 9 Admin"],
-                "type": "custom",
-                "group": "Middleware & Integration"
-            },
-            "Transact Campus Integration (Custom)": {
-                "inputs": ["Ellucian Operational Data Store (ODS)", "Banner 9 Admin"],
-                "type": "custom",
-                "group": "Middleware & Integration"
-            },
-            "Zoom Integration (Custom)": {
-                "inputs": ["Banner 9 Admin"],
-                "type": "custom",
-                "group": "Middleware & Integration"
-            },
-            
-            # Academic Systems
-            "Banner 9 Self-Service": {
-                "inputs": ["Banner 9 Admin"],
-                "type": "core",
-                "group": "Academic Systems"
-            },
-            "Blackboard": {
-                "inputs": ["Intelligent Learning Platform (ILP)"],
-                "type": "core",
-                "group": "Academic Systems"
-            },
-            "CourseDog": {
-                "inputs": ["CourseDog Middleware"],
-                "type": "core",
-                "group": "Academic Systems"
-            },
-            "CRM Advise": {
-                "inputs": ["CRM Advise Middleware"],
-                "type": "core",
-                "group": "Academic Systems"
-            },
-            "DegreeWorks": {
-                "inputs": ["Banner 9 Admin"],
-                "type": "core",
-                "group": "Academic Systems"
-            },
-            "Follet (Course Information)": {
-                "inputs": ["Follett (Course Information) Integration (Custom)"],
-                "type": "external",
-                "group": "Academic Systems"
-            },
-            "Follet Access": {
-                "inputs": ["Follett Access Integration (Custom)"],
-                "type": "external",
-                "group": "Academic Systems"
-            },
-            "Intelligent Learning Platform (ILP)": {
-                "inputs": ["Banner 9 Admin"],
-                "type": "core",
-                "group": "Academic Systems"
-            },
-            "Panopto": {
-                "inputs": ["Blackboard"],
-                "type": "core",
-                "group": "Academic Systems"
-            },
-            "Qualtrics": {
-                "inputs": ["Blackboard"],
-                "type": "core",
-                "group": "Academic Systems"
-            },
-            
-            # Student Services
-            "25Live": {
-                "inputs": ["25Live Middleware"],
-                "type": "core",
-                "group": "Student Services"
-            },
-            "ACM": {
-                "inputs": ["ACM Integration (Custom)", "Instant ID"],
-                "type": "core",
-                "group": "Student Services"
-            },
-            "ARMs": {
-                "inputs": ["ARMs Integration (Custom)"],
-                "type": "core",
-                "group": "Student Services"
-            },
-            "Atlas": {
-                "inputs": ["Banner 9 Admin"],
-                "type": "core",
-                "group": "Student Services"
-            },
-            "Beyond Graduate School": {
-                "inputs": ["Active Directory"],
-                "type": "core",
-                "group": "Student Services"
-            },
-            "Blackbaud Award Management": {
-                "inputs": ["Blackbaud Award Management Integration (Custom)"],
-                "type": "core",
-                "group": "Student Services"
-            },
-            "Door Access": {
-                "inputs": ["Banner 9 Admin", "Instant ID"],
-                "type": "core",
-                "group": "Student Services"
-            },
-            "DynamicForms": {
-                "inputs": ["Atlas"],
-                "type": "core",
-                "group": "Student Services"
-            },
-            "EAB Navigate": {
-                "inputs": ["EAB Navigate Middleware"],
-                "type": "core",
-                "group": "Student Services"
-            },
-            "eRezLife": {
-                "inputs": ["Ellucian Ethos", "eRezLife Integration (Custom)"],
-                "type": "core",
-                "group": "Student Services"
-            },
-            "Instant ID": {
-                "inputs": ["Banner 9 Admin"],
-                "type": "core",
-                "group": "Student Services"
-            },
-            "Library Patron Platform": {
-                "inputs": ["Library Patron Platform Integration (Custom)"],
-                "type": "core",
-                "group": "Student Services"
-            },
-            "Maxient": {
-                "inputs": ["Maxient Integration (Custom)"],
-                "type": "core",
-                "group": "Student Services"
-            },
-            "OneCard": {
-                "inputs": ["Transact Campus"],
-                "type": "core",
-                "group": "Student Services"
-            },
-            "Presence": {
-                "inputs": ["Presence Integration (Custom)"],
-                "type": "core",
-                "group": "Student Services"
-            },
-            "SafeZone": {
-                "inputs": ["Active Directory"],
-                "type": "core",
-                "group": "Student Services"
-            },
-            "SpectrumU": {
-                "inputs": ["Active Directory"],
-                "type": "core",
-                "group": "Student Services"
-            },
-            "SurveyDig": {
-                "inputs": ["Banner 9 Admin"],
-                "type": "core",
-                "group": "Student Services"
-            },
-            
-            # Finance & Operations
-            "Argos": {
-                "inputs": ["Banner 9 Admin", "Ellucian Operational Data Store (ODS)", "Argos Access Control (Custom)"],
-                "type": "core",
-                "group": "Finance & Operations"
-            },
-            "Argos Access Control (Custom)": {
-                "inputs": ["Ellucian Operational Data Store (ODS)"],
-                "type": "custom",
-                "group": "Finance & Operations"
-            },
-            "Automated Reporting Emails (Custom)": {
-                "inputs": ["Banner 9 Admin", "Argos", "Ellucian Operational Data Store (ODS)"],
-                "type": "custom",
-                "group": "Finance & Operations"
-            },
-            "Financial Edge": {
-                "inputs": ["Omatic"],
-                "type": "core",
-                "group": "Finance & Operations"
-            },
-            "FormFusion": {
-                "inputs": ["Banner 9 Admin"],
-                "type": "core",
-                "group": "Finance & Operations"
-            },
-            "Omatic": {
-                "inputs": ["Banner 9 Admin"],
-                "type": "core",
-                "group": "Finance & Operations"
-            },
-            "TouchNet": {
-                "inputs": ["Banner 9 Admin"],
-                "type": "core",
-                "group": "Finance & Operations"
-            },
-            "Transact Campus": {
-                "inputs": ["Transact Campus Integration (Custom)", "Instant ID"],
-                "type": "core",
-                "group": "Finance & Operations"
-            },
-            
-            # External & Other
-            "Campus Website": {
-                "inputs": ["Active Directory", "Argos"],
-                "type": "core",
-                "group": "External & Other"
-            },
-            "Constituo": {
-                "inputs": ["Slate"],
-                "type": "external",
-                "group": "External & Other"
-            },
-            "Manual Entry": {
-                "inputs": [],
-                "type": "external",
-                "group": "External & Other"
-            },
-            "External Entities (banking institutions, federal government, etc.)": {
-                "inputs": [],
-                "type": "external",
-                "group": "External & Other"
-            },
-            "Omnilert": {
-                "inputs": ["Omnilert Integration (Custom)"],
-                "type": "core",
-                "group": "External & Other"
-            },
-            "Raiser's Edge NXT": {
-                "inputs": ["Raiser's Edge Integration (Custom)"],
-                "type": "core",
-                "group": "External & Other"
-            },
-            "Slate": {
-                "inputs": ["Slate Integration (Custom)"],
-                "type": "core",
-                "group": "External & Other"
-            },
-            
-            # Microsoft Ecosystem
-            "Office 365": {
-                "inputs": ["Entra Connect"],
-                "type": "core",
-                "group": "Microsoft Ecosystem"
-            },
-            "Distribution Lists": {
-                "inputs": ["Distribution Lists Integration (Custom)"],
-                "type": "core",
-                "group": "Microsoft Ecosystem"
-            },
-            "Zoom": {
-                "inputs": ["Zoom Integration (Custom)", "Active Directory"],
-                "type": "core",
-                "group": "Microsoft Ecosystem"
-            },
-            "Account Claiming Web Application (Custom)": {
-                "inputs": ["Active Directory", "Argos"],
-                "type": "custom",
-                "group": "Microsoft Ecosystem"
-            },
-            "Unifyed Portal": {
-                "inputs": ["Active Directory"],
-                "type": "core",
-                "group": "Microsoft Ecosystem"
-            }
-        }
-        
-        # Map type names from mockup to model choices
-        type_mapping = {
-            'core': 'core',
-            'integration': 'integration',
-            'custom': 'custom',
-            'external': 'external',
-        }
-        
-        # Get or create the categories and statuses
-        categories = {}
-        for slug in ['core', 'integration', 'custom', 'external', 'server']:
-            try:
-                categories[slug] = SystemCategory.objects.get(slug=slug)
-            except SystemCategory.DoesNotExist:
-                # Create default categories if they don't exist
-                name = {
-                    'core': 'Core System', 
-                    'integration': 'Integration', 
-                    'custom': 'Custom Component', 
-                    'external': 'External System',
-                    'server': 'Server'
-                }[slug]
-                
-                color = {
-                    'core': '#d5e8f9',
-                    'integration': '#e8f6e8',
-                    'custom': '#fdebd0',
-                    'external': '#f0d5d5',
-                    'server': '#e0e0f0'
-                }[slug]
-                
-                text_color = {
-                    'core': '#3498db',
-                    'integration': '#27ae60',
-                    'custom': '#f39c12',
-                    'external': '#c0392b',
-                    'server': '#5c6bc0'
-                }[slug]
-                
-                categories[slug] = SystemCategory.objects.create(
-                    name=name,
-                    slug=slug,
-                    color=color,
-                    text_color=text_color,
-                    order=list(type_mapping.keys()).index(slug) + 1 if slug in type_mapping else 5
-                )
+    def add_arguments(self, parser):
+        parser.add_argument('source', nargs='?', default=MOCKUP_DATA,
+                            help='File to import, or - for stdin (defaults to the bundled mockup data)')
+        parser.add_argument('--format', choices=FORMATS, help='Input format (guessed from the file name by default)')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='Rows per database batch')
+        parser.add_argument('--default-category', default='core', help='Category slug for new systems without one')
+        parser.add_argument('--default-status', default='active', help='Status slug for new systems without one')
+        parser.add_argument('--delete-missing', action='store_true',
+                            help='Delete systems and relationships that are not in the source')
+        parser.add_argument('--dry-run', action='store_true', help='Show a summary of the changes without writing them')
+        parser.add_argument('--diff', action='store_true', help='Show every change without writing it')
+        parser.add_argument('--changeset', metavar='FILE',
+                            help='With --dry-run or --diff, save the changes as JSON (- for stdout)')
+        parser.add_argument('--apply', metavar='FILE', help='Apply a change-set saved with --changeset')
+
+    def ensure_default_lookups(self):
+        """Create the default categories and status if they don't exist"""
+        existing = set(SystemCategory.objects.values_list('slug', flat=True))
+        for order, (slug, name, color, text_color) in enumerate(DEFAULT_CATEGORIES, 1):
+            if slug not in existing:
+                SystemCategory.objects.create(name=name, slug=slug, color=color, text_color=text_color, order=order)
                 self.stdout.write(f"  Created category: {name}")
-        
-        # Get or create active status
-        try:
-            active_status = SystemStatus.objects.get(slug='active')
-        except SystemStatus.DoesNotExist:
-            active_status = SystemStatus.objects.create(
+
+        if not SystemStatus.objects.filter(slug='active').exists():
+            SystemStatus.objects.create(
                 name='Going-Concern',
                 slug='active',
                 color='#e8f6e8',
@@ -478,63 +62,122 @@ class Command(BaseCommand):
                 is_active=True,
                 order=1
             )
-            self.stdout.write(f"  Created status: Going-Concern")
-        
-        # Map for system objects
-        system_map = {}
-        
-        self.stdout.write('Creating systems...')
-        # Create all systems first
-        for name, data in systems_data.items():
-            category_slug = type_mapping.get(data['type'], 'core')
-            category = categories.get(category_slug, categories['core'])
-            
-            # Create or get system
-            system, created = System.objects.update_or_create(
-                name=name,
-                defaults={
-                    'category': category,
-                    'status': active_status,
-                    'description': f"Part of {data['group']}",
-                }
+            self.stdout.write("  Created status: Going-Concern")
+
+    def handle(self, *args, **options):
+        planning = options['dry_run'] or options['diff']
+        if options['apply'] and planning:
+            raise CommandError('--apply cannot be combined with --dry-run or --diff')
+        if options['changeset'] and not planning:
+            raise CommandError('--changeset requires --dry-run or --diff')
+
+        # A dry run must not write, so the importer reports the rows that would
+        # use missing defaults as errors instead
+        if not planning:
+            self.ensure_default_lookups()
+
+        importer = SystemImporter(
+            batch_size=max(options['batch_size'], 1),
+            default_category=options['default_category'],
+            default_status=options['default_status'],
+            delete_missing=options['delete_missing'],
+        )
+
+        if options['apply']:
+            self.apply_changeset(importer, options['apply'])
+            return
+
+        source = options['source']
+        fmt = options['format'] or detect_format(source)
+        self.stdout.write(f'{"Planning" if planning else "Importing"} {source} ({fmt})...')
+        try:
+            with open_source(source) as stream:
+                rows = read_rows(stream, fmt)
+                if planning:
+                    changeset = importer.plan_rows(rows)
+                else:
+                    stats = importer.import_rows(rows)
+        except (OSError, ValueError, ImportError, ImportRowError) as e:
+            raise CommandError(str(e))
+
+        if planning:
+            self.report_changeset(importer, changeset, source, options)
+        else:
+            self.report_errors(importer.stats)
+            self.report_stats(importer.stats)
+
+    def apply_changeset(self, importer, path):
+        try:
+            with open_source(path) as stream:
+                changeset = ChangeSet.from_dict(json.load(stream))
+        except (OSError, ValueError) as e:
+            raise CommandError(f'Cannot read change-set {path}: {e}')
+
+        self.stdout.write(f'Applying change-set {path}...')
+        stats = importer.apply_changeset(changeset)
+        self.report_errors(stats)
+        self.report_stats(stats)
+
+    def report_changeset(self, importer, changeset, source, options):
+        stats = importer.stats
+        if options['diff']:
+            for entry in changeset.systems['create']:
+                self.stdout.write(self.style.SUCCESS(f'+ system {entry["name"]}'))
+            for entry in changeset.systems['update']:
+                changes = ', '.join(f'{field}: {old!r} -> {new!r}' for field, (old, new) in entry['changes'].items())
+                self.stdout.write(self.style.WARNING(f'~ system {entry["name"]} ({changes})'))
+            for entry in changeset.systems['delete']:
+                self.stdout.write(self.style.ERROR(f'- system {entry["name"]}'))
+            for entry in changeset.relationships['create']:
+                self.stdout.write(self.style.SUCCESS(f'+ {entry["source"]} {entry["type"]} {entry["target"]}'))
+            for entry in changeset.relationships['update']:
+                old, new = entry['description']
+                self.stdout.write(self.style.WARNING(
+                    f'~ {entry["source"]} {entry["type"]} {entry["target"]} (description: {old!r} -> {new!r})'
+                ))
+            for entry in changeset.relationships['delete']:
+                self.stdout.write(self.style.ERROR(f'- {entry["source"]} {entry["type"]} {entry["target"]}'))
+
+        self.report_errors(stats)
+        counts = changeset.counts()
+        self.stdout.write(self.style.SUCCESS(
+            f'Planned {stats.rows} rows in {stats.elapsed:.2f}s ({stats.rows_per_second:,.0f} rows/s), nothing written'
+        ))
+        for kind in ChangeSet.KINDS:
+            self.stdout.write(
+                f'  {kind.capitalize()}: {counts[kind]["create"]} to create, '
+                f'{counts[kind]["update"]} to update, {counts[kind]["delete"]} to delete'
             )
-            
-            system_map[name] = system
-            
-            if created:
-                self.stdout.write(f"  Created system: {name}")
+        self.stdout.write(f'  Unchanged rows: {stats.unchanged}')
+        self.stdout.write(f'  Error rows: {len(stats.errors)}')
+
+        if options['changeset']:
+            data = changeset.to_dict(source=source, generated_at=timezone.now())
+            if options['changeset'] == '-':
+                self.stdout.write(json.dumps(data, cls=DjangoJSONEncoder, indent=2))
             else:
-                self.stdout.write(f"  Updated system: {name}")
-        
-        self.stdout.write('Creating relationships...')
-        # Create system relationships
-        relationships_created = 0
-        
-        for target_name, data in systems_data.items():
-            target_system = system_map.get(target_name)
-            
-            if not target_system:
-                self.stderr.write(f"  Target system not found: {target_name}")
-                continue
-                
-            for source_name in data['inputs']:
-                source_system = system_map.get(source_name)
-                
-                if not source_system:
-                    self.stderr.write(f"  Source system not found: {source_name}")
-                    continue
-                
-                # Create the relationship
-                relationship, created = SystemRelationship.objects.update_or_create(
-                    source_system=source_system,
-                    target_system=target_system,
-                    relationship_type='depends_on',
-                    defaults={
-                        'description': f"{target_name} depends on {source_name}"
-                    }
-                )
-                
-                if created:
-                    relationships_created += 1
-        
-        self.stdout.write(self.style.SUCCESS(f'Successfully imported {len(system_map)} systems and {relationships_created} relationships'))
\ No newline at end of file
+                with open(options['changeset'], 'w', encoding='utf-8') as f:
+                    json.dump(data, f, cls=DjangoJSONEncoder, indent=2)
+                self.stdout.write(f'  Change-set saved to {options["changeset"]}')
+
+    def report_errors(self, stats):
+        errors = sorted(stats.errors, key=lambda error: (error[0] is not None, error[0] or 0))
+        for line_number, message in errors[:MAX_REPORTED_ERRORS]:
+            self.stderr.write(f'  Row {line_number}: {message}' if line_number else f'  {message}')
+        if len(errors) > MAX_REPORTED_ERRORS:
+            self.stderr.write(f'  ... and {len(errors) - MAX_REPORTED_ERRORS} more errors')
+
+    def report_stats(self, stats):
+        self.stdout.write(self.style.SUCCESS(
+            f'Processed {stats.rows} rows in {stats.elapsed:.2f}s ({stats.rows_per_second:,.0f} rows/s)'
+        ))
+        self.stdout.write(
+            f'  Systems: {stats.systems_created} created, {stats.systems_updated} updated, '
+            f'{stats.systems_deleted} deleted'
+        )
+        self.stdout.write(
+            f'  Relationships: {stats.relationships_created} created, {stats.relationships_updated} updated, '
+            f'{stats.relationships_deleted} deleted'
+        )
+        self.stdout.write(f'  Unchanged rows: {stats.unchanged}')
+        self.stdout.write(f'  Errors: {len(stats.errors)}')
@@ -0,0 +1,15 @@
+# systems/management/commands/rebuild_diagram_layout.py
+
+from django.core.management.base import BaseCommand, CommandError
+
+from systems.layout import compute_full_layout, np
+
+
+class Command(BaseCommand):
+    help = 'Compute the relationship diagram layout from scratch and cache it'
+
+    def handle(self, *args, **options):
+        if np is None:
+            raise CommandError('The diagram layout needs NumPy')
+        layout = compute_full_layout()
+        self.stdout.write(self.style.SUCCESS(f'Diagram layout rebuilt: {len(layout)} systems'))
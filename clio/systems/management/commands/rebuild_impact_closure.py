@@ -0,0 +1,16 @@
+# systems/management/commands/rebuild_impact_closure.py
+
+from django.core.management.base import BaseCommand
+
+from systems.closure import rebuild_impact_closure
+from systems.models import SystemImpactClosure
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the materialized system impact closure table from scratch'
+
+    def handle(self, *args, **options):
+        rebuild_impact_closure()
+        self.stdout.write(self.style.SUCCESS(
+            f'Impact closure rebuilt: {SystemImpactClosure.objects.count()} rows'
+        ))
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('systems', '0003_systemgraphversion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SystemImpactClosure',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('depth', models.PositiveIntegerField(help_text='Number of depends_on hops from source to affected')),
+                ('affected', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='impacted_by', to='systems.system')),
+                ('next_hop', models.ForeignKey(help_text='Direct dependent of source on the shortest impact path', on_delete=django.db.models.deletion.CASCADE, related_name='+', to='systems.system')),
+                ('previous_hop', models.ForeignKey(help_text='System the impact reaches affected from, used to rebuild the impact path', on_delete=django.db.models.deletion.CASCADE, related_name='+', to='systems.system')),
+                ('source', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='impact_closure', to='systems.system')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['source', 'depth'], name='systems_closure_source_depth')],
+                'unique_together': {('source', 'affected')},
+            },
+        ),
+    ]
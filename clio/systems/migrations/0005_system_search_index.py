@@ -0,0 +1,92 @@
+# Full-text search index for systems (FTS5 on SQLite, tsvector on Postgres)
+#
+# The SQL is a frozen copy of what systems.search.install_search_index
+# generates for SYSTEM_INDEX, so later changes there don't alter this migration
+
+from django.db import migrations
+
+COLUMNS = 'name, vendor, description, operating_system, contact_information, support_information'
+NEW_VALUES = (
+    'new.name, new.vendor, new.description, new.operating_system, new.contact_information, new.support_information'
+)
+OLD_VALUES = (
+    'old.name, old.vendor, old.description, old.operating_system, old.contact_information, old.support_information'
+)
+
+SQLITE_INSTALL = [
+    f"CREATE VIRTUAL TABLE systems_system_fts USING fts5({COLUMNS}, content='systems_system', content_rowid='id', "
+    f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    f'CREATE TRIGGER systems_system_fts_insert AFTER INSERT ON systems_system BEGIN '
+    f'INSERT INTO systems_system_fts(rowid, {COLUMNS}) VALUES (new.id, {NEW_VALUES}); END',
+    f'CREATE TRIGGER systems_system_fts_delete AFTER DELETE ON systems_system BEGIN '
+    f"INSERT INTO systems_system_fts(systems_system_fts, rowid, {COLUMNS}) VALUES ('delete', old.id, {OLD_VALUES}); END",
+    f'CREATE TRIGGER systems_system_fts_update AFTER UPDATE ON systems_system BEGIN '
+    f"INSERT INTO systems_system_fts(systems_system_fts, rowid, {COLUMNS}) VALUES ('delete', old.id, {OLD_VALUES}); "
+    f'INSERT INTO systems_system_fts(rowid, {COLUMNS}) VALUES (new.id, {NEW_VALUES}); END',
+    "INSERT INTO systems_system_fts(systems_system_fts) VALUES ('rebuild')",
+]
+
+SQLITE_UNINSTALL = [
+    'DROP TRIGGER IF EXISTS systems_system_fts_insert',
+    'DROP TRIGGER IF EXISTS systems_system_fts_delete',
+    'DROP TRIGGER IF EXISTS systems_system_fts_update',
+    'DROP TABLE IF EXISTS systems_system_fts',
+]
+
+POSTGRES_VECTOR = (
+    "setweight(to_tsvector('simple', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(vendor, '')), 'B') || "
+    "setweight(to_tsvector('simple', coalesce(description, '')), 'C') || "
+    "setweight(to_tsvector('simple', coalesce(operating_system, '')), 'C') || "
+    "setweight(to_tsvector('simple', coalesce(contact_information, '')), 'D') || "
+    "setweight(to_tsvector('simple', coalesce(support_information, '')), 'D')"
+)
+
+POSTGRES_INSTALL = [
+    f'ALTER TABLE systems_system ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ({POSTGRES_VECTOR}) STORED',
+    'CREATE INDEX systems_system_search_idx ON systems_system USING GIN (search_vector)',
+]
+
+POSTGRES_UNINSTALL = [
+    'DROP INDEX IF EXISTS systems_system_search_idx',
+    'ALTER TABLE systems_system DROP COLUMN IF EXISTS search_vector',
+]
+
+
+def fts_supported(schema_editor):
+    try:
+        schema_editor.execute('CREATE VIRTUAL TABLE temp.fts5_probe USING fts5(content)')
+        schema_editor.execute('DROP TABLE temp.fts5_probe')
+        return True
+    except Exception:
+        return False
+
+
+def install(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        # Without FTS5 search falls back to the basic backend
+        statements = SQLITE_INSTALL if fts_supported(schema_editor) else []
+    elif vendor == 'postgresql':
+        statements = POSTGRES_INSTALL
+    else:
+        statements = []
+    for sql in statements:
+        schema_editor.execute(sql)
+
+
+def uninstall(apps, schema_editor):
+    statements = {'sqlite': SQLITE_UNINSTALL, 'postgresql': POSTGRES_UNINSTALL}
+    for sql in statements.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('systems', '0004_systemimpactclosure'),
+    ]
+
+    operations = [
+        migrations.RunPython(install, uninstall),
+    ]
@@ -0,0 +1,60 @@
+# Fill SystemImpactClosure for the systems that existed before the table
+
+from collections import defaultdict, deque
+
+from django.db import migrations
+
+BATCH_SIZE = 1000
+
+
+def fill_closure(apps, schema_editor):
+    # A frozen copy of systems.closure, so later changes to it can't change
+    # what this migration does
+    System = apps.get_model('systems', 'System')
+    SystemRelationship = apps.get_model('systems', 'SystemRelationship')
+    SystemImpactClosure = apps.get_model('systems', 'SystemImpactClosure')
+
+    successors = defaultdict(list)
+    for source_id, target_id in (
+        SystemRelationship.objects.filter(relationship_type='depends_on')
+        .order_by('pk').values_list('source_system_id', 'target_system_id')
+    ):
+        # The graph's depends_on direction: an outage of the source reaches the target
+        successors[source_id].append(target_id)
+
+    SystemImpactClosure.objects.all().delete()
+    rows = []
+    for source_id in System.objects.order_by('pk').values_list('pk', flat=True):
+        depth = {source_id: 0}
+        next_hop = {source_id: None}
+        queue = deque([source_id])
+        while queue:
+            system_id = queue.popleft()
+            for affected_id in successors[system_id]:
+                if affected_id in depth:
+                    continue
+                depth[affected_id] = depth[system_id] + 1
+                next_hop[affected_id] = next_hop[system_id] or affected_id
+                rows.append(SystemImpactClosure(
+                    source_id=source_id,
+                    affected_id=affected_id,
+                    depth=depth[affected_id],
+                    next_hop_id=next_hop[affected_id],
+                    previous_hop_id=system_id,
+                ))
+                queue.append(affected_id)
+        if len(rows) >= BATCH_SIZE:
+            SystemImpactClosure.objects.bulk_create(rows, batch_size=BATCH_SIZE)
+            rows = []
+    SystemImpactClosure.objects.bulk_create(rows, batch_size=BATCH_SIZE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('systems', '0005_system_search_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_closure, migrations.RunPython.noop),
+    ]
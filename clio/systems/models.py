@@ -1,7 +1,10 @@
 # systems/models.py
 
+from datetime import timedelta
+
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
 
 class SystemCategory(models.Model):
     """Model for customizable system categories"""
@@ -12,6 +15,7 @@ class SystemCategory(models.Model):
     text_color = models.CharField(max_length=20, help_text="Text color (e.g., #333333)", default="#333333")
     icon = models.CharField(max_length=50, blank=True, help_text="CSS class for icon (e.g., fa-server)")
     order = models.PositiveIntegerField(default=0, help_text="Display order")
+    updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         verbose_name = "System Category"
@@ -32,6 +36,7 @@ class SystemStatus(models.Model):
     icon = models.CharField(max_length=50, blank=True, help_text="CSS class for icon (e.g., fa-check)")
     is_active = models.BooleanField(default=True, help_text="Whether systems with this status are considered active")
     order = models.PositiveIntegerField(default=0, help_text="Display order")
+    updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         verbose_name = "System Status"
@@ -129,6 +134,30 @@ class SystemRelationship(models.Model):
         return f"{self.source_system} {self.get_relationship_type_display()} {self.target_system}"
 
 
+class SystemImpactClosure(models.Model):
+    """Materialized reachability of the depends_on graph: systems affected by an outage of source"""
+    source = models.ForeignKey(System, on_delete=models.CASCADE, related_name='impact_closure')
+    affected = models.ForeignKey(System, on_delete=models.CASCADE, related_name='impacted_by')
+    depth = models.PositiveIntegerField(help_text="Number of depends_on hops from source to affected")
+    next_hop = models.ForeignKey(
+        System, on_delete=models.CASCADE, related_name='+',
+        help_text="Direct dependent of source on the shortest impact path"
+    )
+    previous_hop = models.ForeignKey(
+        System, on_delete=models.CASCADE, related_name='+',
+        help_text="System the impact reaches affected from, used to rebuild the impact path"
+    )
+    
+    class Meta:
+        unique_together = ('source', 'affected')
+        indexes = [
+            models.Index(fields=['source', 'depth'], name='systems_closure_source_depth'),
+        ]
+    
+    def __str__(self):
+        return f"{self.source} -> {self.affected} ({self.depth})"
+
+
 class SystemDocument(models.Model):
     """Model for documents attached to systems"""
     system = models.ForeignKey(System, on_delete=models.CASCADE, related_name='documents')
@@ -188,4 +217,45 @@ class DisasterRecoveryStep(models.Model):
         unique_together = ('system', 'order')
     
     def __str__(self):
-        return f"Step {self.order}: {self.title} - {self.system.name}"
\ No newline at end of file
+        return f"Step {self.order}: {self.title} - {self.system.name}"
+
+
+class SystemGraphVersion(models.Model):
+    """Model for the shared version of the system graph, bumped on every change to it"""
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "System Graph Version"
+
+    def __str__(self):
+        return f"System graph v{self.version}"
+
+
+class DiagramTombstone(models.Model):
+    """Model for deleted systems and relationships, sent to diagram refreshes so they can drop them"""
+    KIND_SYSTEM = 'system'
+    KIND_LINK = 'link'
+    KINDS = [
+        (KIND_SYSTEM, 'System'),
+        (KIND_LINK, 'Relationship'),
+    ]
+
+    # Clients that last refreshed before this reload everything instead
+    RETENTION = timedelta(days=7)
+    # Expired tombstones are pruned on every this many deletes
+    PRUNE_EVERY = 500
+
+    kind = models.CharField(max_length=10, choices=KINDS)
+    object_id = models.PositiveBigIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"Deleted {self.kind} {self.object_id}"
+
+    @classmethod
+    def record(cls, kind, object_id):
+        tombstone = cls.objects.create(kind=kind, object_id=object_id)
+        if tombstone.pk % cls.PRUNE_EVERY == 0:
+            cls.objects.filter(deleted_at__lt=timezone.now() - cls.RETENTION).delete()
+        return tombstone
@@ -0,0 +1,111 @@
+# systems/neighborhood.py
+
+"""
+Bounded ego-network queries over the in-memory system graph.
+
+An ego network is a system plus everything within k hops of it over the chosen
+edge types. The search is breadth-first so the closest systems are kept when a
+node cap cuts it short, and hubs (systems linked to more than max_degree others)
+are included but not expanded, which keeps "Active Directory"-style systems
+from pulling the whole estate into a two-hop query.
+"""
+
+from collections import deque
+
+from .graph import EDGE_TYPES
+
+DEFAULT_DEPTH = 2
+MAX_DEPTH = 5
+DEFAULT_MAX_NODES = 200
+DEFAULT_MAX_EDGES = 1000
+DEFAULT_MAX_DEGREE = 50
+DIRECTIONS = ('both', 'out', 'in')
+
+
+def ego_network(graph, source_id, edge_types=EDGE_TYPES, depth=DEFAULT_DEPTH, direction='both',
+                max_nodes=DEFAULT_MAX_NODES, max_edges=DEFAULT_MAX_EDGES, max_degree=DEFAULT_MAX_DEGREE):
+    """
+    Return the k-hop neighbourhood of a system
+
+    Args:
+        graph: The DependencyGraph index
+        source_id: The ID of the system at the centre
+        edge_types: Edge types to follow (keys of graph.EDGE_TYPES)
+        depth: Number of hops
+        direction: 'out' follows edges from a system to its dependents, 'in'
+                   the reverse, 'both' ignores direction
+        max_nodes: Cap on the number of systems returned
+        max_edges: Cap on the number of edges returned
+        max_degree: Systems with more neighbours than this are not expanded
+
+    Returns:
+        dict: nodes (with hop distance and pruned flag), edges and truncated flag,
+              or None if the system is not in the graph
+    """
+    source = graph.node_index(source_id)
+    if source is None:
+        return None
+
+    adjacency = []
+    for edge_type in edge_types:
+        if direction in ('both', 'out'):
+            adjacency.append(graph.successors(edge_type))
+        if direction in ('both', 'in'):
+            adjacency.append(graph.predecessors(edge_type))
+
+    def neighbours(node):
+        for lists in adjacency:
+            yield from lists[node]
+
+    hops = {source: 0}
+    pruned = set()
+    queue = deque([source])
+    truncated = False
+
+    while queue and not truncated:
+        node = queue.popleft()
+        # Hubs are flagged at the last hop too, where nothing is expanded
+        if node != source and max_degree and sum(len(lists[node]) for lists in adjacency) > max_degree:
+            pruned.add(node)
+            continue
+        if hops[node] >= depth:
+            continue
+        for neighbour in neighbours(node):
+            if neighbour in hops:
+                continue
+            if len(hops) >= max_nodes:
+                truncated = True
+                break
+            hops[neighbour] = hops[node] + 1
+            queue.append(neighbour)
+
+    # Edges between returned systems, closest systems first
+    edges = []
+    for edge_type in edge_types:
+        successors = graph.successors(edge_type)
+        for node in sorted(hops, key=hops.get):
+            for target in successors[node]:
+                if target in hops:
+                    edges.append({
+                        'source': graph.system_id(node),
+                        'target': graph.system_id(target),
+                        'type': edge_type,
+                    })
+    if len(edges) > max_edges:
+        edges.sort(key=lambda edge: max(hops[graph.node_index(edge['source'])],
+                                        hops[graph.node_index(edge['target'])]))
+        edges = edges[:max_edges]
+        truncated = True
+
+    nodes = []
+    for node in sorted(hops, key=hops.get):
+        system = graph.describe(graph.system_id(node))
+        system['hops'] = hops[node]
+        system['pruned'] = node in pruned
+        nodes.append(system)
+
+    return {
+        'nodes': nodes,
+        'edges': edges,
+        'truncated': truncated,
+    }
@@ -0,0 +1,386 @@
+# systems/search.py
+
+"""
+Full-text search with pluggable database backends.
+
+A SearchIndex describes the text columns of a table and their weights. The
+backend is picked from the database in use:
+
+    sqlite      an FTS5 external-content table named <table>_fts, kept in sync
+                with the base table by triggers
+    postgresql  a generated tsvector column named search_vector with a GIN index
+    otherwise   OR'ed icontains filters with a simple name-based rank
+
+The index structures are created by migrations through install_search_index.
+If they are missing (for example SQLite built without FTS5) the basic backend
+is used, so search keeps working, just without the index.
+
+Backends filter a queryset and annotate it with search_rank (higher is better)
+plus highlighted name and snippet columns. Highlights are delimited with
+control characters and turned into <mark> tags only after HTML escaping.
+"""
+
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Case, FloatField, IntegerField, Q, TextField, Value, When
+from django.db.models.expressions import RawSQL
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+# Highlight delimiters, replaced by <mark> tags after escaping
+MARK_START = '\x02'
+MARK_END = '\x03'
+SNIPPET_WORDS = 16
+
+
+class SearchIndex:
+    """Text columns of a table and how much a match in each one counts"""
+
+    def __init__(self, table, columns):
+        """
+        Args:
+            table: Database table name
+            columns: (column, weight) pairs; the first column is the title
+        """
+        self.table = table
+        self.columns = [column for column, _ in columns]
+        self.weights = [weight for _, weight in columns]
+
+    @property
+    def fts_table(self):
+        return f'{self.table}_fts'
+
+    @property
+    def title_column(self):
+        return self.columns[0]
+
+    def weight_class(self, weight):
+        """Postgres setweight class for a column weight"""
+        if weight >= 10:
+            return 'A'
+        if weight >= 5:
+            return 'B'
+        if weight >= 2:
+            return 'C'
+        return 'D'
+
+
+SYSTEM_INDEX = SearchIndex('systems_system', [
+    ('name', 10.0),
+    ('vendor', 5.0),
+    ('description', 2.0),
+    ('operating_system', 2.0),
+    ('contact_information', 1.0),
+    ('support_information', 1.0),
+])
+
+
+def search_terms(query):
+    """Split a query into lowercase word tokens"""
+    return [term.lower() for term in re.findall(r'\w+', query or '')]
+
+
+def render_highlight(text):
+    """Escape highlighted text and turn the delimiters into <mark> tags"""
+    if not text:
+        return ''
+    return mark_safe(escape(text).replace(MARK_START, '<mark>').replace(MARK_END, '</mark>'))
+
+
+def _highlight_terms(text, terms):
+    """Python-side highlighting used by the basic backend"""
+    if not text or not terms:
+        return text or ''
+    pattern = re.compile('|'.join(re.escape(term) for term in terms), re.IGNORECASE)
+    return pattern.sub(lambda match: f'{MARK_START}{match.group(0)}{MARK_END}', text)
+
+
+def _snippet(text, terms):
+    """Cut a window of words around the first term found in text"""
+    words = (text or '').split()
+    lowered = [word.lower() for word in words]
+    for position, word in enumerate(lowered):
+        if any(term in word for term in terms):
+            start = max(position - SNIPPET_WORDS // 2, 0)
+            window = ' '.join(words[start:start + SNIPPET_WORDS])
+            prefix = '…' if start else ''
+            suffix = '…' if start + SNIPPET_WORDS < len(words) else ''
+            return prefix + _highlight_terms(window, terms) + suffix
+    return ''
+
+
+class BasicSearchBackend:
+    """icontains search that works on any database"""
+
+    name = 'basic'
+
+    def filter(self, queryset, index, query, highlight=True, columns=None):
+        """
+        Filter a queryset to the matches of query
+
+        Args:
+            queryset: Queryset over the index's table
+            index: The SearchIndex
+            query: The user's search text
+            highlight: Also annotate search_title and search_snippet, which
+                       costs extra work for every match
+            columns: Only match in these columns of the index (all by default)
+
+        Returns:
+            The queryset annotated with search_rank, or unchanged when the
+            query has no searchable terms
+        """
+        terms = search_terms(query)
+        if not terms:
+            return queryset
+
+        # Every term must match some column
+        for term in terms:
+            condition = Q()
+            for column in columns or index.columns:
+                condition |= Q(**{f'{column}__icontains': term})
+            queryset = queryset.filter(condition)
+
+        title = index.title_column
+        return queryset.annotate(search_rank=Case(
+            When(**{f'{title}__iexact': query.strip()}, then=Value(4)),
+            When(**{f'{title}__istartswith': terms[0]}, then=Value(3)),
+            When(**{f'{title}__icontains': terms[0]}, then=Value(2)),
+            default=Value(1),
+            output_field=IntegerField(),
+        ))
+
+    def highlight(self, obj, index, query):
+        terms = search_terms(query)
+        title = getattr(obj, index.title_column)
+        snippet = ''
+        for column in index.columns[1:]:
+            snippet = _snippet(getattr(obj, column, ''), terms)
+            if snippet:
+                break
+        return _highlight_terms(title, terms), snippet
+
+
+class SQLiteFTSBackend(BasicSearchBackend):
+    """SQLite FTS5 external-content index ranked with bm25"""
+
+    name = 'sqlite-fts5'
+
+    def match_expression(self, terms, columns=None):
+        # Each term is a quoted prefix query; FTS5 ANDs them
+        expression = ' '.join('"{}"*'.format(term.replace('"', '""')) for term in terms)
+        if columns:
+            expression = '{%s} : (%s)' % (' '.join(columns), expression)
+        return expression
+
+    def filter(self, queryset, index, query, highlight=True, columns=None):
+        terms = search_terms(query)
+        if not terms:
+            return queryset
+
+        fts = index.fts_table
+        weights = ', '.join(str(weight) for weight in index.weights)
+        queryset = queryset.extra(
+            tables=[fts],
+            where=[f'{fts}.rowid = {index.table}.id', f'{fts} MATCH %s'],
+            params=[self.match_expression(terms, columns)],
+        )
+        # bm25 is lower for better matches
+        queryset = queryset.annotate(search_rank=RawSQL(f'-bm25({fts}, {weights})', (), output_field=FloatField()))
+        if highlight:
+            mark = f"'{MARK_START}', '{MARK_END}'"
+            queryset = queryset.annotate(
+                search_title=RawSQL(f'highlight({fts}, 0, {mark})', (), output_field=TextField()),
+                search_snippet=RawSQL(
+                    f"snippet({fts}, -1, {mark}, '…', {SNIPPET_WORDS})", (), output_field=TextField()
+                ),
+            )
+        return queryset
+
+    def highlight(self, obj, index, query):
+        title = getattr(obj, 'search_title', None)
+        if title is None:
+            return super().highlight(obj, index, query)
+        snippet = obj.search_snippet or ''
+        # Don't repeat the title as its own snippet
+        if snippet == title:
+            snippet = ''
+        return title, snippet
+
+
+class PostgresSearchBackend(BasicSearchBackend):
+    """Postgres tsvector search over a generated, GIN-indexed column"""
+
+    name = 'postgres-tsvector'
+
+    def filter(self, queryset, index, query, highlight=True, columns=None):
+        terms = search_terms(query)
+        if not terms:
+            return queryset
+
+        table = index.table
+        # Columns are picked through the setweight classes of the vector
+        weights = ''
+        if columns:
+            weights = ''.join(sorted({
+                index.weight_class(weight) for column, weight in zip(index.columns, index.weights) if column in columns
+            }))
+        tsquery = ' & '.join(f'{term}:*{weights}' for term in terms)
+        queryset = queryset.extra(
+            where=[f"{table}.search_vector @@ to_tsquery('simple', %s)"],
+            params=[tsquery],
+        ).annotate(search_rank=RawSQL(
+            f"ts_rank({table}.search_vector, to_tsquery('simple', %s))", (tsquery,), output_field=FloatField()
+        ))
+        if highlight:
+            options = f'StartSel={MARK_START}, StopSel={MARK_END}, MaxWords={SNIPPET_WORDS}, MinWords=5'
+            other_columns = " || ' ' || ".join(f"coalesce({table}.{column}, '')" for column in index.columns[1:])
+            queryset = queryset.annotate(
+                search_title=RawSQL(
+                    f"ts_headline('simple', {table}.{index.title_column}, to_tsquery('simple', %s), "
+                    f"'HighlightAll=true, {options}')",
+                    (tsquery,), output_field=TextField()
+                ),
+                search_snippet=RawSQL(
+                    f"ts_headline('simple', {other_columns}, to_tsquery('simple', %s), '{options}')",
+                    (tsquery,), output_field=TextField()
+                ),
+            )
+        return queryset
+
+    def highlight(self, obj, index, query):
+        title = getattr(obj, 'search_title', None)
+        if title is None:
+            return super().highlight(obj, index, query)
+        snippet = obj.search_snippet or ''
+        return title, snippet if MARK_START in snippet else ''
+
+
+BACKENDS = {
+    'basic': BasicSearchBackend,
+    'sqlite': SQLiteFTSBackend,
+    'postgresql': PostgresSearchBackend,
+}
+
+# table -> whether its index structures exist, checked once per process
+_installed = {}
+
+
+def _index_installed(index):
+    if index.table not in _installed:
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [index.fts_table])
+            else:
+                cursor.execute(
+                    "SELECT 1 FROM information_schema.columns WHERE table_name = %s AND column_name = 'search_vector'",
+                    [index.table]
+                )
+            _installed[index.table] = cursor.fetchone() is not None
+    return _installed[index.table]
+
+
+def get_search_backend(index=SYSTEM_INDEX):
+    """
+    Return the search backend for an index
+
+    The SEARCH_BACKEND setting can force 'basic'; by default the database's
+    native full-text index is used when it has been installed.
+    """
+    if getattr(settings, 'SEARCH_BACKEND', 'auto') != 'basic' and connection.vendor in BACKENDS:
+        if _index_installed(index):
+            return BACKENDS[connection.vendor]()
+    return BasicSearchBackend()
+
+
+def search_queryset(queryset, query, index=SYSTEM_INDEX, highlight=True, columns=None):
+    """Filter a queryset to the matches of query, annotated with search_rank"""
+    return get_search_backend(index).filter(queryset, index, query, highlight=highlight, columns=columns)
+
+
+def highlight_results(objects, query, index=SYSTEM_INDEX, backend=None):
+    """Set search_title_html and search_snippet_html on each matched object"""
+    backend = backend or get_search_backend(index)
+    for obj in objects:
+        title, snippet = backend.highlight(obj, index, query)
+        obj.search_title_html = render_highlight(title)
+        obj.search_snippet_html = render_highlight(snippet)
+    return objects
+
+
+# Index installation, used by migrations
+
+def _fts_supported(schema_editor):
+    try:
+        schema_editor.execute('CREATE VIRTUAL TABLE temp.fts5_probe USING fts5(content)')
+        schema_editor.execute('DROP TABLE temp.fts5_probe')
+        return True
+    except Exception:
+        return False
+
+
+def install_search_index(schema_editor, index):
+    """Create the full-text structures for an index on the current database"""
+    vendor = schema_editor.connection.vendor
+    table = index.table
+    columns = ', '.join(index.columns)
+
+    if vendor == 'sqlite':
+        if not _fts_supported(schema_editor):
+            return
+        fts = index.fts_table
+        new_values = ', '.join(f'new.{column}' for column in index.columns)
+        old_values = ', '.join(f'old.{column}' for column in index.columns)
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE {fts} USING fts5({columns}, content='{table}', content_rowid='id', "
+            f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+        )
+        schema_editor.execute(
+            f'CREATE TRIGGER {fts}_insert AFTER INSERT ON {table} BEGIN '
+            f'INSERT INTO {fts}(rowid, {columns}) VALUES (new.id, {new_values}); END'
+        )
+        schema_editor.execute(
+            f'CREATE TRIGGER {fts}_delete AFTER DELETE ON {table} BEGIN '
+            f"INSERT INTO {fts}({fts}, rowid, {columns}) VALUES ('delete', old.id, {old_values}); END"
+        )
+        schema_editor.execute(
+            f'CREATE TRIGGER {fts}_update AFTER UPDATE ON {table} BEGIN '
+            f"INSERT INTO {fts}({fts}, rowid, {columns}) VALUES ('delete', old.id, {old_values}); "
+            f'INSERT INTO {fts}(rowid, {columns}) VALUES (new.id, {new_values}); END'
+        )
+        schema_editor.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+    elif vendor == 'postgresql':
+        vector = ' || '.join(
+            f"setweight(to_tsvector('simple', coalesce({column}, '')), '{index.weight_class(weight)}')"
+            for column, weight in zip(index.columns, index.weights)
+        )
+        schema_editor.execute(
+            f'ALTER TABLE {table} ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ({vector}) STORED'
+        )
+        schema_editor.execute(f'CREATE INDEX {table}_search_idx ON {table} USING GIN (search_vector)')
+
+    _installed.pop(table, None)
+
+
+def uninstall_search_index(schema_editor, index):
+    """Drop the full-text structures created by install_search_index"""
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        fts = index.fts_table
+        for suffix in ('insert', 'delete', 'update'):
+            schema_editor.execute(f'DROP TRIGGER IF EXISTS {fts}_{suffix}')
+        schema_editor.execute(f'DROP TABLE IF EXISTS {fts}')
+    elif vendor == 'postgresql':
+        schema_editor.execute(f'DROP INDEX IF EXISTS {index.table}_search_idx')
+        schema_editor.execute(f'ALTER TABLE {index.table} DROP COLUMN IF EXISTS search_vector')
+    _installed.pop(index.table, None)
+
+
+def rebuild_search_index(index):
+    """Rebuild an FTS5 index from its base table; tsvector columns need no rebuild"""
+    if connection.vendor == 'sqlite' and _index_installed(index):
+        with connection.cursor() as cursor:
+            cursor.execute(f"INSERT INTO {index.fts_table}({index.fts_table}) VALUES ('rebuild')")
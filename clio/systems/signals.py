@@ -0,0 +1,229 @@
+# systems/signals.py
+
+"""
+Signal handlers that keep the in-memory system graph (systems/graph.py) in sync
+with System, SystemRelationship, SystemCategory, SystemStatus, Script and
+ScriptSystemRelationship writes, and record the DiagramTombstone rows the
+relationship diagram's refreshes read deletions from.
+"""
+
+import threading
+from contextlib import contextmanager
+
+from django.db.models.signals import post_init, post_save, post_delete
+from django.dispatch import receiver
+
+from .closure import schedule_closure_refresh
+from .graph import schedule_graph_update
+from .models import DiagramTombstone, System, SystemRelationship, SystemCategory, SystemStatus
+from scripts.models import Script, ScriptSystemRelationship
+
+GRAPH_SYSTEM_FIELDS = ('name', 'vendor', 'category_id', 'status_id', 'hosting_system_id', 'sso_system_id')
+
+_suspended = threading.local()
+
+
+@contextmanager
+def graph_signals_suspended():
+    """Skip the graph handlers for bulk writes that invalidate the graph themselves"""
+    previous = getattr(_suspended, 'active', False)
+    _suspended.active = True
+    try:
+        yield
+    finally:
+        _suspended.active = previous
+
+
+def _signals_suspended():
+    return getattr(_suspended, 'active', False)
+
+
+# States are read from __dict__ so deferred fields are never loaded just to be remembered
+
+def _system_state(system):
+    fields = system.__dict__
+    return {name: fields[name] for name in GRAPH_SYSTEM_FIELDS if name in fields}
+
+
+def _relationship_state(relationship):
+    fields = relationship.__dict__
+    return (fields.get('source_system_id'), fields.get('target_system_id'), fields.get('relationship_type'))
+
+
+@receiver(post_init, sender=System)
+def remember_system_state(sender, instance, **kwargs):
+    instance._graph_state = _system_state(instance)
+
+
+@receiver(post_save, sender=System)
+def system_saved(sender, instance, created, **kwargs):
+    if _signals_suspended():
+        return
+    state = _system_state(instance)
+    if not created and state == instance._graph_state:
+        return
+    instance._graph_state = state
+    schedule_graph_update(lambda graph: graph.add_system(instance.pk, **state))
+
+
+@receiver(post_delete, sender=System)
+def system_deleted(sender, instance, **kwargs):
+    if _signals_suspended():
+        return
+    system_id = instance.pk
+    schedule_graph_update(lambda graph: graph.remove_system(system_id))
+
+
+def _schedule_closure_refresh(*states):
+    """Refresh the impact closure once the graph reflects the committed change"""
+    schedule_closure_refresh(source_id for source_id, _, rel_type in states if rel_type == 'depends_on')
+
+
+@receiver(post_init, sender=SystemRelationship)
+def remember_relationship_state(sender, instance, **kwargs):
+    instance._graph_state = _relationship_state(instance)
+
+
+@receiver(post_save, sender=SystemRelationship)
+def relationship_saved(sender, instance, created, **kwargs):
+    if _signals_suspended():
+        return
+    old_state = instance._graph_state
+    new_state = _relationship_state(instance)
+    if not created and old_state == new_state:
+        return
+    instance._graph_state = new_state
+
+    def update(graph):
+        if not created:
+            graph.remove_relationship(*old_state)
+        graph.add_relationship(*new_state)
+
+    schedule_graph_update(update)
+    _schedule_closure_refresh(*([new_state] if created else [old_state, new_state]))
+
+
+@receiver(post_delete, sender=SystemRelationship)
+def relationship_deleted(sender, instance, **kwargs):
+    if _signals_suspended():
+        return
+    state = _relationship_state(instance)
+    schedule_graph_update(lambda graph: graph.remove_relationship(*state))
+    _schedule_closure_refresh(state)
+
+
+# Tombstones are written inside the deleting transaction, so they roll back with
+# it, and even while the graph handlers are suspended for a bulk import
+
+@receiver(post_delete, sender=System)
+def system_tombstone(sender, instance, **kwargs):
+    DiagramTombstone.record(DiagramTombstone.KIND_SYSTEM, instance.pk)
+
+
+@receiver(post_delete, sender=SystemRelationship)
+def relationship_tombstone(sender, instance, **kwargs):
+    DiagramTombstone.record(DiagramTombstone.KIND_LINK, instance.pk)
+
+
+@receiver(post_save, sender=SystemCategory)
+def category_saved(sender, instance, **kwargs):
+    if _signals_suspended():
+        return
+    category = {
+        'id': instance.pk,
+        'name': instance.name,
+        'slug': instance.slug,
+        'color': instance.color,
+        'text_color': instance.text_color,
+    }
+    schedule_graph_update(lambda graph: graph.set_category(category))
+
+
+@receiver(post_delete, sender=SystemCategory)
+def category_deleted(sender, instance, **kwargs):
+    if _signals_suspended():
+        return
+    category_id = instance.pk
+    schedule_graph_update(lambda graph: graph.remove_category(category_id))
+
+
+@receiver(post_save, sender=SystemStatus)
+def status_saved(sender, instance, **kwargs):
+    if _signals_suspended():
+        return
+    status = {
+        'id': instance.pk,
+        'name': instance.name,
+        'slug': instance.slug,
+        'is_active': instance.is_active,
+    }
+    schedule_graph_update(lambda graph: graph.set_status(status))
+
+
+@receiver(post_delete, sender=SystemStatus)
+def status_deleted(sender, instance, **kwargs):
+    if _signals_suspended():
+        return
+    status_id = instance.pk
+    schedule_graph_update(lambda graph: graph.remove_status(status_id))
+
+
+@receiver(post_init, sender=Script)
+def remember_script_name(sender, instance, **kwargs):
+    instance._graph_state = instance.__dict__.get('name')
+
+
+@receiver(post_save, sender=Script)
+def script_saved(sender, instance, created, **kwargs):
+    if _signals_suspended():
+        return
+    name = instance.__dict__.get('name')
+    if not created and name == instance._graph_state:
+        return
+    instance._graph_state = name
+    script_id = instance.pk
+    schedule_graph_update(lambda graph: graph.add_script(script_id, name))
+
+
+@receiver(post_delete, sender=Script)
+def script_deleted(sender, instance, **kwargs):
+    if _signals_suspended():
+        return
+    script_id = instance.pk
+    schedule_graph_update(lambda graph: graph.remove_script(script_id))
+
+
+def _script_link_state(link):
+    fields = link.__dict__
+    return (fields.get('script_id'), fields.get('system_id'), fields.get('relationship_type'))
+
+
+@receiver(post_init, sender=ScriptSystemRelationship)
+def remember_script_link_state(sender, instance, **kwargs):
+    instance._graph_state = _script_link_state(instance)
+
+
+@receiver(post_save, sender=ScriptSystemRelationship)
+def script_link_saved(sender, instance, created, **kwargs):
+    if _signals_suspended():
+        return
+    old_state = instance._graph_state
+    new_state = _script_link_state(instance)
+    if not created and old_state == new_state:
+        return
+    instance._graph_state = new_state
+
+    def update(graph):
+        if not created:
+            graph.remove_script_link(old_state[0], old_state[1])
+        graph.add_script_link(*new_state)
+
+    schedule_graph_update(update)
+
+
+@receiver(post_delete, sender=ScriptSystemRelationship)
+def script_link_deleted(sender, instance, **kwargs):
+    if _signals_suspended():
+        return
+    script_id, system_id, _ = _script_link_state(instance)
+    schedule_graph_update(lambda graph: graph.remove_script_link(script_id, system_id))
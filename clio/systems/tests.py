@@ -1,3 +1,846 @@
-from django.test import TestCase
+import io
+import json
+import tempfile
+from datetime import timedelta
+from unittest import mock, skipIf
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from core.profiling import assert_max_queries
+from . import graph, layout, lookups, views
+from .closure import impacted_systems, rebuild_impact_closure, refresh_impact_closure
+from .facets import compute_system_facets
+from .graph import DependencyGraph
+from .impact import find_affected_systems, find_impact
+from .importer import ChangeSet, ImportRowError, SystemImporter
+from .neighborhood import ego_network
+from scripts.models import Script, ScriptSystemRelationship
+from .models import (
+    DiagramTombstone, System, SystemCategory, SystemImpactClosure, SystemRelationship, SystemStatus,
+)
+
+
+def create_system(name, category, status, **fields):
+    return System.objects.create(name=name, category=category, status=status, **fields)
+
+
+class SystemTestCase(TestCase):
+    """Creates systems in one category and status"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = SystemCategory.objects.create(name='Servers', slug='servers', color='#123456')
+        cls.status = SystemStatus.objects.create(name='Active', slug='active')
+
+    def create_systems(self, *names):
+        return {name: create_system(name, self.category, self.status) for name in names}
+
+    def relate(self, systems, *pairs, relationship_type='depends_on'):
+        for source, target in pairs:
+            SystemRelationship.objects.create(
+                source_system=systems[source], target_system=systems[target], relationship_type=relationship_type
+            )
+
+
+class GraphTestCase(SystemTestCase):
+    """Runs commit callbacks as writes commit, with a fresh copy of the dependency graph"""
+
+    def setUp(self):
+        # Each test rolls the shared graph version back, so a copy loaded by an
+        # earlier test could pass for current
+        graph._graph = None
+
+    def depends_on(self, source, target):
+        with self.captureOnCommitCallbacks(execute=True):
+            return SystemRelationship.objects.create(
+                source_system=source, target_system=target, relationship_type='depends_on'
+            )
+
+    def closure(self, source):
+        return {
+            (row.affected.name, row.depth, row.next_hop.name, row.previous_hop.name)
+            for row in SystemImpactClosure.objects.filter(source=source).select_related(
+                'affected', 'next_hop', 'previous_hop'
+            )
+        }
+
+
+class AffectedSystemsTests(SystemTestCase):
+
+    def affected(self, systems, source, rel_type='depends_on'):
+        return find_affected_systems(DependencyGraph.load(), systems[source].pk, rel_type)
+
+    def test_payload(self):
+        systems = self.create_systems('A', 'B', 'C')
+        self.relate(systems, ('A', 'B'), ('B', 'C'))
+        category = {
+            'id': self.category.pk, 'name': 'Servers', 'slug': 'servers', 'color': '#123456', 'text_color': '#333333',
+        }
+        self.assertEqual(self.affected(systems, 'A'), [
+            {
+                'id': systems['B'].pk, 'name': 'B', 'category': category, 'vendor': '', 'impact_level': 1,
+                'impact_path': [systems['A'].pk, systems['B'].pk],
+            },
+            {
+                'id': systems['C'].pk, 'name': 'C', 'category': category, 'vendor': '', 'impact_level': 2,
+                'impact_path': [systems['A'].pk, systems['B'].pk, systems['C'].pk],
+            },
+        ])
+
+    def test_each_system_once_on_its_shortest_path(self):
+        systems = self.create_systems('A', 'B', 'C', 'D')
+        self.relate(systems, ('A', 'B'), ('A', 'C'), ('B', 'D'), ('C', 'D'), ('A', 'D'), ('D', 'A'))
+        affected = self.affected(systems, 'A')
+        self.assertEqual([item['name'] for item in affected], ['B', 'C', 'D'])
+        self.assertEqual(affected[-1]['impact_path'], [systems['A'].pk, systems['D'].pk])
+
+    def test_dense_mesh(self):
+        # Every system depends on every earlier one: exponentially many paths, one visit each
+        names = [f'S{number:02}' for number in range(25)]
+        systems = self.create_systems(*names)
+        self.relate(systems, *((source, target) for index, source in enumerate(names) for target in names[index + 1:]))
+        affected = self.affected(systems, 'S00')
+        self.assertEqual(len(affected), 24)
+        self.assertEqual({item['impact_level'] for item in affected}, {1})
+
+    def test_relationship_type(self):
+        systems = self.create_systems('A', 'B', 'C')
+        self.relate(systems, ('A', 'B'))
+        self.relate(systems, ('A', 'C'), relationship_type='provides_data_to')
+        self.assertEqual([item['name'] for item in self.affected(systems, 'A', 'provides_data_to')], ['C'])
+        self.assertEqual(self.affected(systems, 'C'), [])
+
+    def test_unknown_system(self):
+        self.assertEqual(find_affected_systems(DependencyGraph.load(), 0), [])
+
+
+class ImpactClosureTests(GraphTestCase):
+
+    def test_closure_follows_edges(self):
+        systems = self.create_systems('A', 'B', 'C', 'D')
+        self.depends_on(systems['A'], systems['B'])
+        self.depends_on(systems['B'], systems['C'])
+        self.depends_on(systems['A'], systems['C'])
+        self.depends_on(systems['C'], systems['D'])
+
+        self.assertEqual(self.closure(systems['A']), {
+            ('B', 1, 'B', 'A'), ('C', 1, 'C', 'A'), ('D', 2, 'C', 'C'),
+        })
+        self.assertEqual(
+            [(item['name'], item['impact_level'], item['impact_path']) for item in impacted_systems(systems['A'].pk)],
+            [('B', 1, [systems['A'].pk, systems['B'].pk]), ('C', 1, [systems['A'].pk, systems['C'].pk]),
+             ('D', 2, [systems['A'].pk, systems['C'].pk, systems['D'].pk])],
+        )
+
+    def test_removed_edges_refresh_upstream_sources(self):
+        systems = self.create_systems('A', 'B', 'C')
+        self.depends_on(systems['A'], systems['B'])
+        link = self.depends_on(systems['B'], systems['C'])
+        self.assertEqual(len(self.closure(systems['A'])), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            link.delete()
+        self.assertEqual(self.closure(systems['A']), {('B', 1, 'B', 'A')})
+        self.assertEqual(self.closure(systems['B']), set())
+
+    def test_writes_in_one_transaction_refresh_once(self):
+        systems = self.create_systems('A', 'B', 'C')
+        with mock.patch('systems.closure.refresh_impact_closure', wraps=refresh_impact_closure) as refresh:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.relate(systems, ('A', 'B'), ('B', 'C'))
+        refresh.assert_called_once_with({systems['A'].pk, systems['B'].pk})
+        self.assertEqual(self.closure(systems['A']), {('B', 1, 'B', 'A'), ('C', 2, 'B', 'B')})
+
+    def test_cycles(self):
+        systems = self.create_systems('A', 'B')
+        self.depends_on(systems['A'], systems['B'])
+        self.depends_on(systems['B'], systems['A'])
+        self.assertEqual(self.closure(systems['A']), {('B', 1, 'B', 'A')})
+        self.assertEqual(self.closure(systems['B']), {('A', 1, 'A', 'B')})
+
+    def test_rebuild_matches_incremental_rows(self):
+        systems = self.create_systems('A', 'B', 'C', 'D')
+        for source, target in (('A', 'B'), ('B', 'C'), ('D', 'B')):
+            self.depends_on(systems[source], systems[target])
+        incremental = {system.name: self.closure(system) for system in systems.values()}
+
+        rebuild_impact_closure()
+        self.assertEqual({system.name: self.closure(system) for system in systems.values()}, incremental)
+
+    def test_reading_never_writes(self):
+        systems = self.create_systems('A', 'B')
+        self.relate(systems, ('A', 'B'))
+        with self.assertNumQueries(1):
+            self.assertEqual(impacted_systems(systems['A'].pk), [])
+
+
+class FindImpactTests(GraphTestCase):
+
+    def test_edge_types_and_scores(self):
+        systems = self.create_systems('Database', 'Cluster', 'Directory', 'Payroll', 'Reports')
+        payroll = systems['Payroll']
+        payroll.hosting_system = systems['Cluster']
+        payroll.sso_system = systems['Directory']
+        payroll.save()
+        self.relate(systems, ('Database', 'Payroll'))
+        script = Script.objects.create(name='Nightly export')
+        ScriptSystemRelationship.objects.create(script=script, system=payroll, relationship_type='input')
+        ScriptSystemRelationship.objects.create(script=script, system=systems['Reports'], relationship_type='output')
+        index = DependencyGraph.load()
+
+        impact = find_impact(index, systems['Database'].pk)
+        self.assertEqual(
+            [(item['node_type'], item['name'], item['impact_level'], item['impact_score']) for item in impact],
+            [('system', 'Payroll', 1, 1.0), ('script', 'Nightly export', 2, 0.8), ('system', 'Reports', 3, 0.64)],
+        )
+        self.assertEqual(impact[-1]['impact_path'], [
+            systems['Database'].pk, payroll.pk, f'script-{script.pk}', systems['Reports'].pk,
+        ])
+        self.assertEqual(find_impact(index, systems['Directory'].pk)[0]['impact_score'], 0.9)
+        self.assertEqual(find_impact(index, systems['Cluster'].pk)[0]['edge_type'], 'hosting')
+
+    def test_strongest_path_wins(self):
+        systems = self.create_systems('Directory', 'Portal', 'Payroll')
+        portal = systems['Portal']
+        portal.sso_system = systems['Directory']
+        portal.save()
+        self.relate(systems, ('Directory', 'Payroll'), ('Portal', 'Payroll'))
+        impact = find_impact(DependencyGraph.load(), systems['Directory'].pk, weights={'sso': 0.5})
+        self.assertEqual(
+            [(item['name'], item['edge_type'], item['impact_score']) for item in impact],
+            [('Payroll', 'depends_on', 1.0), ('Portal', 'sso', 0.5)],
+        )
+
+    def test_limits(self):
+        systems = self.create_systems('A', 'B', 'C')
+        self.relate(systems, ('A', 'B'))
+        self.relate(systems, ('B', 'C'), relationship_type='provides_data_to')
+        index = DependencyGraph.load()
+
+        def names(**options):
+            return [item['name'] for item in find_impact(index, systems['A'].pk, **options)]
+
+        self.assertEqual(names(), ['B'])
+        everything = ('depends_on', 'provides_data_to')
+        self.assertEqual(names(edge_types=everything), ['B', 'C'])
+        self.assertEqual(names(edge_types=everything, max_depth=1), ['B'])
+        self.assertEqual(names(edge_types=everything, min_score=0.6), ['B'])
+        self.assertEqual(find_impact(index, 0), [])
+        with self.assertRaises(ValueError):
+            find_impact(index, systems['A'].pk, weights={'sso': 2})
+
+
+class AffectedSystemsViewTests(GraphTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.user = User.objects.create_user('planner', password='secret')
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.user)
+        self.systems = self.create_systems('A', 'B')
+        self.depends_on(self.systems['A'], self.systems['B'])
+
+    def get(self, **params):
+        return self.client.get(reverse('systems:get_affected_systems', args=[self.systems['A'].pk]), params)
+
+    def test_closure_and_combined_analysis(self):
+        for params in ({}, {'edges': 'depends_on,sso', 'weights': 'sso:0.5', 'max_depth': '2'}):
+            with self.subTest(params=params):
+                response = self.get(**params)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual([item['name'] for item in response.json()['affected_systems']], ['B'])
+
+    def test_invalid_parameters(self):
+        for params in (
+            {'edges': 'depends_on,carrier_pigeon'},
+            {'edges': 'all', 'weights': 'sso'},
+            {'edges': 'all', 'weights': 'sso:2'},
+            {'edges': 'all', 'weights': 'sso:0'},
+            {'edges': 'all', 'weights': 'sso:nan'},
+            {'edges': 'all', 'weights': 'carrier_pigeon:0.5'},
+            {'edges': 'all', 'max_depth': 'deep'},
+        ):
+            with self.subTest(params=params):
+                response = self.get(**params)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('error', response.json())
+
+
+@override_settings(QUERY_PROFILING=True, QUERY_BUDGET_STRICT=True)
+class RelationshipDataTests(GraphTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.user = User.objects.create_user('planner', password='secret')
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.client.force_login(self.user)
+        self.systems = self.create_systems('A', 'B', 'C')
+        self.links = [self.depends_on(self.systems['A'], self.systems['B']),
+                      self.depends_on(self.systems['B'], self.systems['C'])]
+
+    def get(self, **params):
+        headers = {'If-None-Match': params.pop('etag')} if 'etag' in params else {}
+        with assert_max_queries(*views.relationship_data.query_budget):
+            response = self.client.get(reverse('systems:relationship_data'), params, headers=headers)
+        if response.status_code == 200:
+            response.data = json.loads(b''.join(response.streaming_content))
+        return response
+
+    def test_everything(self):
+        layout.compute_full_layout()
+        data = self.get().data
+        self.assertEqual([system['name'] for system in data['systems']], ['A', 'B', 'C'])
+        self.assertEqual(data['systems'][0]['category']['slug'], 'servers')
+        self.assertEqual(len(data['systems'][0]['position']), 2)
+        self.assertEqual([(link['source'], link['target']) for link in data['links']], [
+            (self.systems['A'].pk, self.systems['B'].pk), (self.systems['B'].pk, self.systems['C'].pk),
+        ])
+        self.assertIsNone(data['next_cursor'])
+
+    def test_fields(self):
+        data = self.get(fields='name,carrier_pigeon').data
+        self.assertEqual(data['systems'][0], {'id': self.systems['A'].pk, 'name': 'A'})
+
+    def test_etag(self):
+        response = self.get(fields='name')
+        self.assertEqual(self.get(fields='name', etag=response['ETag']).status_code, 304)
+        self.assertNotEqual(self.get(fields='id', etag=response['ETag']).status_code, 304)
+
+        self.depends_on(self.systems['A'], self.systems['C'])
+        self.assertEqual(self.get(fields='name', etag=response['ETag']).status_code, 200)
+
+    def test_cursor(self):
+        pages = []
+        cursor = ''
+        while cursor is not None:
+            data = self.get(fields='name', limit=2, cursor=cursor).data
+            pages.append(([system['name'] for system in data['systems']], len(data['links'])))
+            cursor = data['next_cursor']
+        self.assertEqual(pages, [(['A', 'B'], 2), (['C'], 0)])
+
+    def test_since(self):
+        since = timezone.now()
+        System.objects.filter(pk=self.systems['C'].pk).update(updated_at=since + timedelta(minutes=1))
+        removed_system, removed_link = self.systems['A'].pk, self.links[0].pk
+        with self.captureOnCommitCallbacks(execute=True):
+            self.links[0].delete()
+            self.systems['A'].delete()
+
+        data = self.get(fields='name', since=(since + timedelta(seconds=30)).isoformat()).data
+        self.assertEqual([system['name'] for system in data['systems']], ['C'])
+        self.assertEqual(data['links'], [])
+        self.assertEqual(data['removed_system_ids'], [removed_system])
+        self.assertEqual(data['removed_link_ids'], [removed_link])
+        self.assertNotIn('reset', data)
+
+    def test_since_before_retention_resets(self):
+        data = self.get(fields='name', since=(timezone.now() - DiagramTombstone.RETENTION * 2).isoformat()).data
+        self.assertTrue(data['reset'])
+        self.assertEqual(len(data['systems']), 3)
+        self.assertNotIn('removed_system_ids', data)
+
+    def test_invalid_parameters(self):
+        for params in ({'since': 'yesterday'}, {'limit': 'ten'}, {'cursor': 'next'}):
+            with self.subTest(params=params):
+                self.assertEqual(self.get(**params).status_code, 400)
+
+
+@skipIf(layout.np is None, 'The diagram layout needs NumPy')
+class ForceLayoutTests(SimpleTestCase):
+
+    def chain(self, count):
+        """Arrays for systems 1..count linked in a chain"""
+        np = layout.np
+        system_ids = np.arange(1, count + 1, dtype=np.int64)
+        sources = np.arange(count - 1, dtype=np.int64)
+        targets = sources + 1
+        return system_ids, sources, targets
+
+    def test_only_movable_nodes_move(self):
+        np = layout.np
+        system_ids, sources, targets = self.chain(6)
+        start = np.random.default_rng(1).uniform(-100, 100, size=(6, 2))
+        positions = layout.force_layout(start.copy(), sources, targets, np.array([0, 1, 2]), 20)
+        self.assertTrue(np.isfinite(positions).all())
+        self.assertTrue((positions[3:] == start[3:]).all())
+        self.assertFalse((positions[:3] == start[:3]).all())
+
+    def test_linked_nodes_end_up_closer(self):
+        np = layout.np
+        system_ids, sources, targets = self.chain(10)
+        positions = layout._full_layout(system_ids, sources, targets)
+        distances = np.sqrt(((positions[:, None] - positions[None, :]) ** 2).sum(axis=2))
+        linked = distances[sources, targets].mean()
+        self.assertLess(linked, distances[np.triu_indices(10, 2)].mean())
+
+    def previous(self, count):
+        system_ids, sources, targets = self.chain(count)
+        return {
+            'system_ids': system_ids,
+            'edge_keys': layout._edge_keys(system_ids, sources, targets),
+            'positions': layout._full_layout(system_ids, sources, targets),
+        }
+
+    def test_incremental_layout_moves_the_neighbourhood(self):
+        np = layout.np
+        previous = self.previous(12)
+        # System 13 joins, linked to the end of the chain
+        system_ids, sources, targets = self.chain(13)
+        positions = layout._incremental_layout(
+            previous, system_ids, sources, targets, layout._edge_keys(system_ids, sources, targets),
+        )
+        # The new link's endpoints and their neighbours
+        moved = np.flatnonzero((positions[:12] != previous['positions']).any(axis=1))
+        self.assertEqual(moved.tolist(), [10, 11])
+        self.assertTrue(np.isfinite(positions[12]).all())
+
+    def test_incremental_layout_gives_up_on_large_changes(self):
+        previous = self.previous(12)
+        system_ids, sources, targets = self.chain(20)
+        self.assertIsNone(layout._incremental_layout(
+            previous, system_ids, sources, targets, layout._edge_keys(system_ids, sources, targets),
+        ))
+
+
+@skipIf(layout.np is None, 'The diagram layout needs NumPy')
+class LayoutCacheTests(GraphTestCase):
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.systems = self.create_systems(*'ABCDEFGHIJ')
+        for source, target in zip('ABCDEFGHI', 'BCDEFGHIJ'):
+            self.depends_on(self.systems[source], self.systems[target])
+
+    def test_layout_is_read_from_the_cache_once_per_version(self):
+        positions = layout.compute_full_layout()
+        self.assertEqual(len(positions), 10)
+        with mock.patch.object(layout, 'cache', wraps=cache) as shared:
+            for _ in range(3):
+                self.assertEqual(layout.get_layout(), positions)
+            self.assertNotIn(mock.call(layout.LAYOUT_CACHE_KEY), shared.get.call_args_list)
+
+            # Another process stores a newer layout
+            layout._cached = None
+            self.assertEqual(layout.get_layout(), positions)
+            self.assertIn(mock.call(layout.LAYOUT_CACHE_KEY), shared.get.call_args_list)
+
+    def test_changed_graph_patches_the_layout(self):
+        positions = layout.compute_full_layout()
+        new = create_system('K', self.category, self.status)
+        self.depends_on(self.systems['J'], new)
+        patched = layout.get_layout()
+        self.assertEqual(patched[self.systems['A'].pk], positions[self.systems['A'].pk])
+        self.assertIn(new.pk, patched)
+        self.assertEqual(layout.get_layout_version(), graph.get_graph_version())
+
+
+class EgoNetworkTests(SystemTestCase):
+
+    def setUp(self):
+        # A -> B -> Hub -> C -> D, and the hub also feeds five spokes
+        self.systems = self.create_systems('A', 'B', 'Hub', 'C', 'D', *(f'Spoke {n}' for n in range(5)))
+        self.relate(self.systems, ('A', 'B'), ('B', 'Hub'), ('Hub', 'C'), ('C', 'D'))
+        self.relate(self.systems, *(('Hub', f'Spoke {n}') for n in range(5)))
+
+    def network(self, source, **options):
+        return ego_network(DependencyGraph.load(), self.systems[source].pk, **options)
+
+    def nodes(self, network):
+        return {node['name']: (node['hops'], node['pruned']) for node in network['nodes']}
+
+    def test_depth_and_direction(self):
+        self.assertEqual(self.nodes(self.network('C', depth=1)), {
+            'C': (0, False), 'Hub': (1, False), 'D': (1, False),
+        })
+        self.assertEqual(self.nodes(self.network('B', depth=1, direction='in')), {'B': (0, False), 'A': (1, False)})
+        network = self.network('A', depth=1, direction='out', edge_types=['depends_on'])
+        self.assertEqual(network['edges'], [
+            {'source': self.systems['A'].pk, 'target': self.systems['B'].pk, 'type': 'depends_on'},
+        ])
+        self.assertFalse(network['truncated'])
+
+    def test_hubs_are_not_expanded(self):
+        self.assertEqual(self.nodes(self.network('B', depth=3, max_degree=4)), {
+            'B': (0, False), 'A': (1, False), 'Hub': (1, True),
+        })
+        # The centre is always expanded
+        self.assertEqual(len(self.network('Hub', depth=1, max_degree=4)['nodes']), 8)
+        self.assertEqual(len(self.network('B', depth=2, max_degree=0)['nodes']), 9)
+
+    def test_hubs_at_the_last_hop_are_flagged(self):
+        self.assertEqual(self.nodes(self.network('B', depth=1, max_degree=4)), {
+            'B': (0, False), 'A': (1, False), 'Hub': (1, True),
+        })
+        self.assertEqual(self.nodes(self.network('D', depth=1, max_degree=4)), {'D': (0, False), 'C': (1, False)})
+
+    def test_caps(self):
+        network = self.network('Hub', depth=1, max_nodes=3)
+        self.assertTrue(network['truncated'])
+        self.assertEqual([node['hops'] for node in network['nodes']], [0, 1, 1])
+
+        network = self.network('Hub', depth=1, max_edges=2)
+        self.assertTrue(network['truncated'])
+        self.assertEqual(len(network['edges']), 2)
+
+    def test_unknown_system(self):
+        self.assertIsNone(ego_network(DependencyGraph.load(), 0))
+
+
+class SaveRelationshipsTests(GraphTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.user = User.objects.create_user('planner', password='secret')
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.user)
+        self.systems = self.create_systems('A', 'B', 'C')
+
+    def save(self, *relationships):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse('systems:save_relationships', args=[self.systems['B'].pk]),
+                json.dumps({'relationships': [
+                    {
+                        'source_system_id': self.systems[source].pk,
+                        'target_system_id': str(self.systems[target].pk),
+                        'relationship_type': 'depends_on',
+                        'description': description,
+                    }
+                    for source, target, description in relationships
+                ]}),
+                content_type='application/json',
+            )
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def affected(self, source):
+        return [item['name'] for item in find_affected_systems(graph.get_dependency_graph(), self.systems[source].pk)]
+
+    def test_graph_and_closure_follow_without_a_reload(self):
+        loaded = graph.get_dependency_graph()
+        self.save(('A', 'B', ''), ('B', 'C', ''))
+        self.assertIs(graph.get_dependency_graph(), loaded)
+        self.assertEqual(self.affected('A'), ['B', 'C'])
+        self.assertEqual(self.closure(self.systems['A']), {('B', 1, 'B', 'A'), ('C', 2, 'B', 'B')})
+
+        self.save(('B', 'C', 'Nightly sync'))
+        self.assertIs(graph.get_dependency_graph(), loaded)
+        self.assertEqual(self.affected('A'), [])
+        self.assertEqual(self.closure(self.systems['A']), set())
+        self.assertEqual(SystemRelationship.objects.get().description, 'Nightly sync')
+
+    def test_description_changes_keep_the_graph_version(self):
+        self.save(('B', 'C', ''))
+        version = graph.get_graph_version()
+        self.save(('B', 'C', 'Nightly sync'))
+        self.assertEqual(graph.get_graph_version(), version)
+
+
+class ImporterTests(GraphTestCase):
+
+    ROWS = [
+        {'name': 'Directory', 'category': 'servers', 'status': 'active', 'vendor': 'Acme'},
+        {'name': 'Payroll', 'category': 'servers', 'status': 'active', 'hosting_system': 'Cluster'},
+        {'name': 'Cluster', 'category': 'servers', 'status': 'active'},
+        {'source': 'Directory', 'target': 'Payroll', 'type': 'depends_on'},
+        {'source': 'Payroll', 'target': 'Ledger'},
+        {'name': 'Ledger', 'category': 'servers', 'status': 'active'},
+    ]
+
+    def rows(self, rows=None):
+        return list(enumerate(rows or self.ROWS, start=1))
+
+    def import_rows(self, rows=None, **options):
+        with self.captureOnCommitCallbacks(execute=True):
+            return SystemImporter(batch_size=2, **options).import_rows(self.rows(rows))
+
+    def test_import(self):
+        stats = self.import_rows()
+        self.assertEqual(stats.errors, [])
+        self.assertEqual((stats.systems_created, stats.relationships_created), (4, 2))
+
+        payroll = System.objects.get(name='Payroll')
+        self.assertEqual(payroll.hosting_system.name, 'Cluster')
+        self.assertEqual(
+            set(SystemRelationship.objects.values_list('source_system__name', 'target_system__name')),
+            {('Directory', 'Payroll'), ('Payroll', 'Ledger')},
+        )
+        # Bulk writes skip the signals, so the import refreshes the closure itself
+        self.assertEqual(
+            self.closure(System.objects.get(name='Directory')),
+            {('Payroll', 1, 'Payroll', 'Directory'), ('Ledger', 2, 'Payroll', 'Payroll')},
+        )
+
+    def test_reimport_is_idempotent(self):
+        self.import_rows()
+        stats = self.import_rows()
+        self.assertFalse(stats.changed)
+        self.assertEqual(stats.unchanged, len(self.ROWS))
+        self.assertEqual(System.objects.count(), 4)
+        self.assertEqual(SystemRelationship.objects.count(), 2)
+
+    def test_reimport_plans_nothing(self):
+        self.import_rows()
+        self.assertFalse(SystemImporter().plan_rows(self.rows()))
+
+    def test_plan_then_apply(self):
+        self.import_rows()
+        rows = [
+            {'name': 'Directory', 'vendor': 'Globex'},
+            {'source': 'Directory', 'target': 'Payroll', 'description': 'Logins'},
+        ]
+        changeset = SystemImporter(delete_missing=True).plan_rows(self.rows(rows))
+        self.assertEqual(changeset.counts(), {
+            'systems': {'create': 0, 'update': 1, 'delete': 2},
+            'relationships': {'create': 0, 'update': 1, 'delete': 1},
+        })
+        # Planning writes nothing
+        self.assertEqual(System.objects.get(name='Directory').vendor, 'Acme')
+
+        saved = ChangeSet.from_dict(changeset.to_dict())
+        with self.captureOnCommitCallbacks(execute=True):
+            SystemImporter().apply_changeset(saved)
+        self.assertEqual(
+            set(System.objects.values_list('name', 'vendor')), {('Directory', 'Globex'), ('Payroll', '')}
+        )
+        self.assertEqual(SystemRelationship.objects.get().description, 'Logins')
+        self.assertFalse(SystemImporter(delete_missing=True).plan_rows(self.rows(rows)))
+
+    def test_conflicting_changeset_entries_are_skipped(self):
+        self.import_rows()
+        changeset = SystemImporter().plan_rows(self.rows([{'name': 'Directory', 'vendor': 'Globex'}]))
+        System.objects.filter(name='Directory').update(vendor='Initech')
+        stats = SystemImporter().apply_changeset(changeset)
+        self.assertEqual(stats.systems_updated, 0)
+        self.assertEqual(System.objects.get(name='Directory').vendor, 'Initech')
+
+    def test_unknown_defaults(self):
+        rows = [{'name': 'Directory'}, {'name': 'Payroll', 'category': 'servers'}, {'name': 'Cluster', 'status': 'active'}]
+        importer = SystemImporter(default_category='core', default_status='active')
+        changeset = importer.plan_rows(self.rows(rows))
+        self.assertEqual(importer.stats.errors, [(1, 'Unknown category "core"'), (3, 'Unknown category "core"')])
+        self.assertEqual([entry['name'] for entry in changeset.systems['create']], ['Payroll'])
+
+        with self.assertRaisesMessage(ImportRowError, 'Unknown category "core"'):
+            self.import_rows(rows, default_category='core', default_status='active')
+        self.assertFalse(System.objects.exists())
+
+    def test_dry_run_on_an_empty_database(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.jsonl') as source:
+            source.write('\n'.join(json.dumps(row) for row in [*self.ROWS[:3], {'name': 'Ledger'}]))
+            source.flush()
+            stdout, stderr = io.StringIO(), io.StringIO()
+            call_command('import_system_relationships', source.name, '--diff', '--default-status', 'retired',
+                         stdout=stdout, stderr=stderr)
+            self.assertIn('+ system Directory', stdout.getvalue())
+            self.assertIn('Error rows: 1', stdout.getvalue())
+            self.assertIn('Row 4: Unknown category "core"; Unknown status "retired"', stderr.getvalue())
+
+            with self.assertRaisesMessage(CommandError, 'Unknown status "retired"'):
+                call_command('import_system_relationships', source.name, '--default-status', 'retired',
+                             stdout=stdout, stderr=stderr)
+        self.assertFalse(System.objects.exists())
+
+    def test_row_errors(self):
+        stats = self.import_rows([
+            {'name': 'Payroll', 'category': 'missing', 'status': 'active'},
+            {'name': 'Ledger'},
+            {'source': 'Ledger', 'target': 'Nowhere'},
+            {'description': 'Neither'},
+        ])
+        self.assertEqual([line for line, _ in stats.errors], [1, 2, 4, 3])
+        self.assertFalse(System.objects.exists())
+
+
+@override_settings(QUERY_PROFILING=True, QUERY_BUDGET_STRICT=True)
+class SystemListTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('planner', password='secret')
+        cls.servers = SystemCategory.objects.create(name='Servers', slug='servers')
+        cls.applications = SystemCategory.objects.create(name='Applications', slug='applications')
+        cls.active = SystemStatus.objects.create(name='Active', slug='active')
+        cls.retired = SystemStatus.objects.create(name='Retired', slug='retired')
+        cls.hub = create_system('Directory', cls.servers, cls.active, description='Logins for payroll staff')
+        for number in range(1, 30):
+            create_system(
+                f'Payroll {number}', (cls.servers, cls.applications)[number % 2], (cls.active, cls.retired)[number % 2],
+                vendor=f'Vendor {number % 3}', sso_system=cls.hub, hosting_system=cls.hub,
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def get_list(self, **params):
+        with assert_max_queries(*views.system_list.query_budget):
+            response = self.client.get(reverse('systems:list'), params)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def names(self, response):
+        return [system.name for system in response.context['systems']]
+
+    def test_pages(self):
+        seen = []
+        cursor = None
+        while True:
+            page = self.get_list(per_page=10, **({'cursor': cursor} if cursor else {})).context['systems']
+            seen.extend(system.name for system in page)
+            if not page.has_next:
+                break
+            cursor = page.next_cursor
+        self.assertEqual(seen, sorted(['Directory', *(f'Payroll {number}' for number in range(1, 30))]))
+
+        previous = self.get_list(per_page=10, cursor=page.previous_cursor).context['systems']
+        self.assertEqual(len(previous), 10)
+        self.assertLess(previous.object_list[-1].name, page.object_list[0].name)
+
+    def test_invalid_cursor_restarts(self):
+        response = self.get_list(per_page=10, cursor='nonsense')
+        self.assertEqual(response.context['systems'].object_list[0].name, 'Directory')
+
+    def test_sorted_by_related_field(self):
+        for sort in ('category', 'status', 'vendor', 'updated_at'):
+            with self.subTest(sort=sort):
+                first = self.get_list(sort=sort, direction='desc', per_page=20).context['systems']
+                second = self.get_list(sort=sort, direction='desc', per_page=20, cursor=first.next_cursor)
+                names = [system.name for system in first] + self.names(second)
+                self.assertEqual(len(set(names)), 30)
+        statuses = [system.status.name for system in self.get_list(sort='status', per_page=30).context['systems']]
+        self.assertEqual(statuses, sorted(statuses))
+
+    def test_filtered(self):
+        response = self.get_list(
+            category=self.servers.pk, status=self.active.pk, sso_system=self.hub.pk, hosting_system=self.hub.pk
+        )
+        self.assertEqual(len(self.names(response)), 14)
+        self.assertTrue(all(system.category_id == self.servers.pk for system in response.context['systems']))
+        self.assertEqual(self.names(self.get_list(sso_system='none')), ['Directory'])
+        self.assertEqual(len(self.names(self.get_list(vendor='Vendor 0', per_page=50))), 9)
+
+    def test_search(self):
+        for backend in ('auto', 'basic'):
+            with self.subTest(backend=backend), self.settings(SEARCH_BACKEND=backend):
+                response = self.get_list(search='payroll', per_page=50)
+                self.assertTrue(response.context['search_active'])
+                names = self.names(response)
+                self.assertEqual(len(names), 30)
+                # Name matches rank above the description match
+                self.assertEqual(names[-1], 'Directory')
+                self.assertIn('<mark>', next(iter(response.context['systems'])).search_title_html)
+                self.assertEqual(response.context['search_facets']['status'], {self.active.pk: 15, self.retired.pk: 15})
+
+    def test_search_with_filters_and_prefixes(self):
+        response = self.get_list(search='payr vendor', status=self.retired.pk)
+        self.assertEqual(len(self.names(response)), 15)
+        self.assertEqual(self.names(self.get_list(search='payroll 7')), ['Payroll 7'])
+        self.assertFalse(self.get_list(search='!!').context['search_active'])
+
+
+@override_settings(QUERY_PROFILING=True, QUERY_BUDGET_STRICT=True)
+class SystemFacetsTests(GraphTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.user = User.objects.create_user('planner', password='secret')
+        cls.server = SystemCategory.objects.create(name='Server', slug='server')
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.client.force_login(self.user)
+        self.host = create_system('Cluster', self.server, self.status)
+        self.spare = create_system('Spare', self.server, self.status)
+        for number in range(3):
+            create_system(f'Payroll {number}', self.category, self.status, vendor=('Acme', 'Globex')[number % 2],
+                          hosting_system=self.host, sso_system=self.host if number else None)
+
+    def get(self, etag=None):
+        headers = {'If-None-Match': etag} if etag else {}
+        with assert_max_queries(*views.system_facets.query_budget):
+            return self.client.get(reverse('systems:system_facets'), headers=headers)
+
+    def test_counts(self):
+        facets = compute_system_facets()
+        self.assertEqual([(item['name'], item['count']) for item in facets['categories']],
+                         [('Server', 2), ('Servers', 3)])
+        self.assertEqual(facets['statuses'], [{'id': self.status.pk, 'name': 'Active', 'count': 5}])
+        self.assertEqual(facets['vendors'], [{'value': 'Acme', 'count': 2}, {'value': 'Globex', 'count': 1}])
+        self.assertEqual(facets['sso_systems'], [{'id': self.host.pk, 'name': 'Cluster', 'count': 2}])
+        # Servers are offered even when nothing is hosted on them
+        self.assertEqual([(item['name'], item['count']) for item in facets['hosting_systems']],
+                         [('Cluster', 3), ('Spare', 0)])
+
+    def test_cached_per_graph_version(self):
+        response = self.get()
+        self.assertEqual(response.json(), compute_system_facets())
+        self.assertEqual(self.get(response['ETag']).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            create_system('Payroll 3', self.category, self.status, vendor='Initech')
+        response = self.get(response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertIn({'value': 'Initech', 'count': 1}, response.json()['vendors'])
+
+
+@override_settings(QUERY_PROFILING=True, QUERY_BUDGET_STRICT=True)
+class SystemLookupTests(GraphTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.user = User.objects.create_user('planner', password='secret')
+
+    def setUp(self):
+        super().setUp()
+        lookups._index = None
+        self.client.force_login(self.user)
+        self.systems = self.create_systems('Payroll', 'Active Directory', 'Directory Sync')
+
+    def lookup(self, **params):
+        with assert_max_queries(*views.system_lookup.query_budget):
+            response = self.client.get(reverse('systems:system_lookup'), params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def names(self, **params):
+        return [result['name'] for result in self.lookup(**params)['results']]
+
+    def test_lookup(self):
+        self.assertEqual(self.names(q='dir'), ['Directory Sync', 'Active Directory'])
+        self.assertEqual(self.lookup(q='pay')['results'][0]['category']['slug'], 'servers')
+        response = self.lookup(limit=2)
+        self.assertEqual(len(response['results']), 2)
+        self.assertEqual(response['next_offset'], 2)
+
+    def test_index_is_rebuilt_when_the_graph_version_moves(self):
+        with mock.patch('systems.lookups.build_system_index', wraps=lookups.build_system_index) as build:
+            self.names(q='pay')
+            self.names(q='dir')
+            self.assertEqual(build.call_count, 1)
+
+            payroll = self.systems['Payroll']
+            payroll.name = 'Payroll Ledger'
+            with self.captureOnCommitCallbacks(execute=True):
+                payroll.save()
+            self.assertEqual(self.names(q='ledger'), ['Payroll Ledger'])
+            self.assertEqual(build.call_count, 2)
@@ -13,6 +13,8 @@ urlpatterns = [
     path('<int:pk>/delete/', views.system_delete, name='delete'),
     path('relationships/', views.relationship_diagram, name='relationship_diagram'),
     path('api/relationships/', views.relationship_data, name='relationship_data'),
+    path('api/facets/', views.system_facets, name='system_facets'),
+    path('api/lookup/', views.system_lookup, name='system_lookup'),
     
     # API endpoints for quick-edit functionality
     path('<int:pk>/update-quick/', views.quick_update_system, name='quick_update_system'),
@@ -46,6 +48,7 @@ urlpatterns = [
 
     path('<int:pk>/disaster-analysis/', views.system_disaster_analysis, name='disaster_analysis'),
     path('api/<int:pk>/affected-systems/', views.get_affected_systems, name='get_affected_systems'),
+    path('api/<int:pk>/neighborhood/', views.system_neighborhood, name='system_neighborhood'),
 
     # Recovery step planning
     path('<int:system_pk>/recovery-step/', views.save_recovery_step, name='save_recovery_step'),
@@ -1,26 +1,45 @@
 # systems/views.py
 
+import hashlib
 import json
-from django.http import JsonResponse
+from datetime import timedelta
+from django.http import JsonResponse, StreamingHttpResponse
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.contrib.auth.models import User
 from django.db import models, transaction, connection
 from django.db.models import Q
-from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
-from django.views.decorators.http import require_POST, require_http_methods
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.views.decorators.http import require_POST, require_http_methods, condition
 from .models import (
     System, SystemRelationship, SystemDocument, SystemNote,
-    SystemCategory, SystemStatus, SystemAdministrator, DisasterRecoveryStep
+    SystemCategory, SystemStatus, SystemAdministrator, DisasterRecoveryStep, DiagramTombstone
 )
 from .forms import (
     SystemForm, SystemRelationshipForm, SystemDocumentForm, SystemNoteForm,
     SystemAdministratorForm, SystemCategoryForm, SystemStatusForm  , DisasterRecoveryStepForm
 )
+from .graph import EDGE_TYPES, get_dependency_graph, get_graph_version, schedule_graph_update
+from .closure import impacted_systems, schedule_closure_refresh
+from core.lookups import lookup_page
+from core.profiling import query_budget
+from core.pagination import KeysetPaginator, InvalidCursor, parse_per_page
+from .facets import get_system_facets
+from .lookups import get_system_index, system_lookup_entry
+from .layout import get_layout, get_layout_version
+from .search import search_queryset, search_terms, highlight_results
+from .neighborhood import (
+    ego_network, DEFAULT_DEPTH, MAX_DEPTH, DEFAULT_MAX_NODES, DEFAULT_MAX_EDGES, DEFAULT_MAX_DEGREE,
+    DIRECTIONS as NEIGHBORHOOD_DIRECTIONS
+)
+from .impact import find_impact, EDGE_WEIGHTS
 from scripts.models import Script, ScriptSystemRelationship
+from workflows.projection import workflows_using_system
 
 @login_required
+@query_budget(8, duplicates=0)
 def system_list(request):
     """View to list all systems with sorting and filtering"""
     status_filter = request.GET.get('status')
@@ -31,8 +50,7 @@ def system_list(request):
     search_query = request.GET.get('search')
     
     # Pagination parameters
-    page = request.GET.get('page', 1)
-    per_page = request.GET.get('per_page', 25)
+    per_page = parse_per_page(request.GET.get('per_page'))
     
     # Sorting parameters
     sort_by = request.GET.get('sort', 'name')  # Default sort by name
@@ -41,16 +59,10 @@ def system_list(request):
     # Start with all systems
     systems = System.objects.all().select_related('category', 'status', 'sso_system', 'hosting_system')
     
-    # Apply search filter if provided
-    if search_query:
-        systems = systems.filter(
-            Q(name__icontains=search_query) |
-            Q(description__icontains=search_query) |
-            Q(vendor__icontains=search_query) |
-            Q(operating_system__icontains=search_query) |
-            Q(contact_information__icontains=search_query) |
-            Q(support_information__icontains=search_query)
-        )
+    # Apply search filter if provided, ranked by the full-text index
+    search_active = bool(search_terms(search_query))
+    if search_active:
+        systems = search_queryset(systems, search_query)
     
     # Apply filters if provided
     if status_filter:
@@ -77,6 +89,18 @@ def system_list(request):
         else:
             systems = systems.filter(hosting_system_id=hosting_filter)
     
+    # Facet counts over the search matches
+    search_facets = None
+    if search_active:
+        matches = systems.order_by()
+        search_facets = {
+            'category': dict(matches.values_list('category_id').annotate(count=models.Count('id'))),
+            'status': dict(matches.values_list('status_id').annotate(count=models.Count('id'))),
+            'vendor': list(
+                matches.exclude(vendor='').values_list('vendor').annotate(count=models.Count('id')).order_by('vendor')
+            ),
+        }
+
     # Apply primary and secondary sorting
     order_fields = []
     
@@ -109,41 +133,32 @@ def system_list(request):
     # Always add name as a secondary sort key if it's not the primary
     if sort_by != 'name':
         order_fields.append('name')
+
+    # Search results are ranked by relevance unless a sort was picked
+    if search_active and 'sort' not in request.GET:
+        order_fields = ['-search_rank', 'name']
     
-    # Apply the ordering
-    if order_fields:
-        systems = systems.order_by(*order_fields)
-    
-    # Get all available categories, statuses, and SSO systems for filters
-    all_categories = SystemCategory.objects.all().order_by('order', 'name')
-    all_statuses = SystemStatus.objects.all().order_by('order', 'name')
-    sso_systems = System.objects.filter(sso_dependent_systems__isnull=False).distinct().order_by('name')
-    hosting_systems = System.objects.filter(category__slug='server').order_by('name')
-    
-    # Get all unique vendors for filtering
-    all_vendors = System.objects.exclude(vendor='').values_list('vendor', flat=True).distinct().order_by('vendor')
-    
-    # Paginate the results
-    paginator = Paginator(systems, per_page)
+    # Keyset pagination on the sort keys, so every page costs the same
+    paginator = KeysetPaginator(systems, order_fields, per_page=per_page, count='approximate')
     try:
-        systems = paginator.page(page)
-    except PageNotAnInteger:
-        systems = paginator.page(1)
-    except EmptyPage:
-        systems = paginator.page(paginator.num_pages)
-    
+        systems = paginator.page(request.GET.get('cursor'))
+    except InvalidCursor:
+        systems = paginator.page()
+
+    if search_active:
+        highlight_results(systems, search_query)
+
+    # Filter options are lazy-loaded from system_facets; only the counts
+    # over the search matches are specific to this request
     context = {
         'systems': systems,
+        'search_active': search_active,
+        'search_facets': search_facets,
         'status_filter': status_filter,
         'category_filter': category_filter,
         'sso_filter': sso_filter,
         'hosting_filter': hosting_filter,
         'vendor_filter': vendor_filter,
-        'all_categories': all_categories,
-        'all_statuses': all_statuses,
-        'all_vendors': all_vendors,
-        'sso_systems': sso_systems,
-        'hosting_systems': hosting_systems,
         'paginator': paginator,
         'page_obj': systems,
         'per_page': per_page,
@@ -151,6 +166,32 @@ def system_list(request):
     
     return render(request, 'systems/system_list.html', context)
 
+def _system_facets_etag(request):
+    # Remembered so the view doesn't read the version a second time
+    request.graph_version = get_graph_version()
+    return f'"facets-{request.graph_version}"'
+
+
+@login_required
+@query_budget(12, duplicates=0)
+@condition(etag_func=_system_facets_etag)
+def system_facets(request):
+    """API endpoint for the system list's filter options and their counts"""
+    return JsonResponse(get_system_facets(getattr(request, 'graph_version', None)))
+
+def _system_lookup_etag(request):
+    request.graph_version = get_graph_version()
+    return f'"lookup-{request.graph_version}"'
+
+
+@login_required
+@query_budget(6, duplicates=0)
+@condition(etag_func=_system_lookup_etag)
+def system_lookup(request):
+    """Typeahead endpoint finding systems by a prefix of any word in their name"""
+    index = get_system_index(getattr(request, 'graph_version', None))
+    return JsonResponse(lookup_page(index, request.GET))
+
 # API endpoint for getting system details
 @login_required
 def get_system_details(request, pk):
@@ -204,6 +245,7 @@ def quick_update_system(request, pk):
     return JsonResponse({'success': True, 'message': 'System updated successfully'})
 
 @login_required
+@query_budget(16, duplicates=0)
 def system_detail(request, pk):
     """View details of a system"""
     system = get_object_or_404(System, pk=pk)
@@ -222,7 +264,7 @@ def system_detail(request, pk):
     hosted_systems = system.hosted_systems.all().select_related('category', 'status')
     
     # Get workflows that use this system
-    workflows = system.workflows.all() if hasattr(system, 'workflows') else []
+    workflows = workflows_using_system(system.pk).order_by('name')
     
     # Get scripts associated with this system
     scripts = system.related_scripts.all()
@@ -247,73 +289,24 @@ def system_detail(request, pk):
     else:
         note_form = SystemNoteForm()
     
-    # Get all systems for relationship management - sorted by name
-    all_systems = System.objects.all().order_by('name')
-    
-    # Get all users for admin management
-    all_users = User.objects.all().order_by('first_name', 'last_name')
-    
-    # Get relationships for this system
+    # Get relationships for this system; the editor looks other systems up
+    # through system_lookup as they are typed
     system_relationships = (
         SystemRelationship.objects.filter(source_system=system) | 
         SystemRelationship.objects.filter(target_system=system)
-    ).select_related('source_system', 'target_system', 'source_system__category', 'target_system__category')
+    ).select_related('source_system__category', 'target_system__category')
     
     # Format relationships for JSON
-    relationships_json = []
-    for rel in system_relationships:
-        # Track the IDs of systems in existing relationships
-        source_id = rel.source_system.id
-        target_id = rel.target_system.id
-        
-        relationships_json.append({
+    relationships_json = [
+        {
             'id': rel.id,
-            'source_system': {
-                'id': source_id,
-                'name': rel.source_system.name,
-                'category': {
-                    'slug': rel.source_system.category.slug,
-                    'name': rel.source_system.category.name,
-                    'color': rel.source_system.category.color,
-                    'text_color': rel.source_system.category.text_color
-                } if rel.source_system.category else None
-            },
-            'target_system': {
-                'id': target_id,
-                'name': rel.target_system.name,
-                'category': {
-                    'slug': rel.target_system.category.slug,
-                    'name': rel.target_system.category.name,
-                    'color': rel.target_system.category.color,
-                    'text_color': rel.target_system.category.text_color
-                } if rel.target_system.category else None
-            },
+            'source_system': system_lookup_entry(rel.source_system),
+            'target_system': system_lookup_entry(rel.target_system),
             'relationship_type': rel.relationship_type,
             'description': rel.description
-        })
-    
-    # Format all systems for JSON - sorted by name
-    all_systems_json = []
-    for sys in all_systems:
-        all_systems_json.append({
-            'id': sys.id,
-            'name': sys.name,
-            'category': {
-                'slug': sys.category.slug,
-                'name': sys.category.name,
-                'color': sys.category.color,
-                'text_color': sys.category.text_color
-            } if sys.category else None
-        })
-    
-    # Create a list of existing relationships to filter out duplicates in the UI
-    existing_relationships = []
-    for rel in system_relationships:
-        existing_relationships.append({
-            'source': rel.source_system.id,
-            'target': rel.target_system.id,
-            'type': rel.relationship_type
-        })
+        }
+        for rel in system_relationships
+    ]
     
     context = {
         'system': system,
@@ -327,11 +320,8 @@ def system_detail(request, pk):
         'notes': notes,
         'administrators': administrators,
         'note_form': note_form,
-        'all_systems': all_systems,
-        'all_users': all_users,
         'relationships_json': json.dumps(relationships_json),
-        'all_systems_json': json.dumps(all_systems_json),
-        'existing_relationships_json': json.dumps(existing_relationships)
+        'system_json': json.dumps(system_lookup_entry(system)),
     }
     
     return render(request, 'systems/system_detail.html', context)
@@ -386,35 +376,46 @@ def system_delete(request, pk):
     
     return render(request, 'systems/system_confirm_delete.html', {'system': system})
 
-def analyze_system_dependencies(system_id):
+def analyze_system_dependencies(system_id, edge_types=None, weights=None, max_depth=None, min_score=0.0):
     """
     Analyze a system and determine all of its dependencies and dependents
     
     Args:
         system_id: The ID of the system to analyze
+        edge_types: Edge types to traverse; None reads the depends_on closure
+        weights: Per-edge-type weight overrides for the combined analysis
+        max_depth: Optional hop limit for the combined analysis
+        min_score: Minimum impact score for the combined analysis
         
     Returns:
         dict: Analysis results including dependencies, dependents, and impact paths
     """
     try:
-        # Get the source system
-        source_system = System.objects.get(id=system_id)
+        # Use the in-memory dependency graph instead of rescanning the tables
+        dependency_graph = get_dependency_graph()
         
-        # Build a complete dependency graph
-        dependency_graph = build_dependency_graph()
+        if system_id not in dependency_graph:
+            raise System.DoesNotExist
         
-        # Find all affected systems with impact levels
-        affected_systems = find_affected_systems(dependency_graph, source_system.id)
+        source_system = dependency_graph.describe(system_id)
         
-        # Sort affected systems by impact level (depth)
-        affected_systems.sort(key=lambda s: (s['impact_level'], s['name']))
+        if edge_types is None:
+            # Read affected systems with impact levels from the materialized closure,
+            # already sorted by impact level (depth) and name
+            affected_systems = impacted_systems(system_id)
+        else:
+            # Walk all requested edge types in one pass over the in-memory graph
+            affected_systems = find_impact(
+                dependency_graph, system_id, edge_types=edge_types, weights=weights,
+                max_depth=max_depth, min_score=min_score
+            )
         
         return {
             'source_system': {
-                'id': source_system.id,
-                'name': source_system.name,
-                'category': source_system.category.name if source_system.category else None,
-                'vendor': source_system.vendor
+                'id': source_system['id'],
+                'name': source_system['name'],
+                'category': source_system['category']['name'] if source_system['category'] else None,
+                'vendor': source_system['vendor']
             },
             'affected_systems': affected_systems
         }
@@ -476,6 +477,7 @@ def get_administrator_details(request, admin_pk):
     data = {
         'id': admin.id,
         'user_id': admin.user.id,
+        'user_name': admin.user.get_full_name() or admin.user.username,
         'is_primary': admin.is_primary,
         'notes': admin.notes
     }
@@ -494,53 +496,92 @@ def save_system_relationships(request, pk):
         data = json.loads(request.body)
         relationships_data = data.get('relationships', [])
         
-        # Get current relationships
-        current_relationships = SystemRelationship.objects.filter(
-            source_system=system
-        ) | SystemRelationship.objects.filter(
-            target_system=system
-        )
-        
-        # Track which relationships to keep
-        relationship_ids_to_keep = []
-        
-        # First delete all relationships to avoid unique constraint violations
-        # This ensures we don't run into issues with partially updated relationships
-        current_relationships.delete()
-        
-        # Create or update relationships
+        # Skip incomplete rows; system ids may arrive as strings, as the
+        # form fields send them
+        rows = []
         for rel_data in relationships_data:
-            rel_id = rel_data.get('id')
             source_id = rel_data.get('source_system_id')
             target_id = rel_data.get('target_system_id')
             rel_type = rel_data.get('relationship_type')
-            description = rel_data.get('description', '')
-            
-            # Skip if missing required fields
             if not all([source_id, target_id, rel_type]):
                 continue
-                
-            # Get the related systems
             try:
-                source_system = System.objects.get(pk=source_id)
-                target_system = System.objects.get(pk=target_id)
-            except System.DoesNotExist:
+                source_id, target_id = int(source_id), int(target_id)
+            except (TypeError, ValueError):
+                return JsonResponse({'error': f'Invalid system id in relationship {rel_data!r}'}, status=400)
+            rows.append((source_id, target_id, rel_type, rel_data.get('description', '')))
+        
+        # Validate every referenced system with one query
+        referenced_ids = {system_id for source_id, target_id, _, _ in rows for system_id in (source_id, target_id)}
+        existing_system_ids = System.objects.only('id').in_bulk(referenced_ids)
+        
+        # Desired state keyed like the unique constraint; later duplicates win
+        valid_types = {choice[0] for choice in SystemRelationship.RELATIONSHIP_TYPES}
+        desired = {}
+        for source_id, target_id, rel_type, description in rows:
+            # Skip unknown types, unknown systems and rows not involving this system
+            if rel_type not in valid_types:
+                continue
+            if source_id not in existing_system_ids or target_id not in existing_system_ids:
+                continue
+            if system.pk not in (source_id, target_id):
                 continue
             
-            # Create new relationship
-            relationship = SystemRelationship.objects.create(
-                source_system=source_system,
-                target_system=target_system,
+            desired[(source_id, target_id, rel_type)] = description
+        
+        current_relationships = {
+            (rel.source_system_id, rel.target_system_id, rel.relationship_type): rel
+            for rel in SystemRelationship.objects.filter(Q(source_system=system) | Q(target_system=system))
+        }
+        
+        to_delete = [rel.id for key, rel in current_relationships.items() if key not in desired]
+        to_create = [
+            SystemRelationship(
+                source_system_id=source_id,
+                target_system_id=target_id,
                 relationship_type=rel_type,
                 description=description
             )
-            relationship_ids_to_keep.append(relationship.id)
+            for (source_id, target_id, rel_type), description in desired.items()
+            if (source_id, target_id, rel_type) not in current_relationships
+        ]
+        to_update = []
+        now = timezone.now()
+        for key, description in desired.items():
+            rel = current_relationships.get(key)
+            if rel is not None and rel.description != description:
+                rel.description = description
+                rel.updated_at = now
+                to_update.append(rel)
         
-        # Get updated relationships
-        updated_relationships = SystemRelationship.objects.filter(
-            source_system=system
-        ) | SystemRelationship.objects.filter(
-            target_system=system
+        # Deletes go through the post_delete signals; description updates leave
+        # the graph as it is
+        with transaction.atomic():
+            if to_delete:
+                SystemRelationship.objects.filter(id__in=to_delete).delete()
+            if to_update:
+                SystemRelationship.objects.bulk_update(to_update, ['description', 'updated_at'])
+            if to_create:
+                SystemRelationship.objects.bulk_create(to_create)
+                # bulk_create skips the signals that keep the graph and closure current
+                created_states = [
+                    (rel.source_system_id, rel.target_system_id, rel.relationship_type) for rel in to_create
+                ]
+                
+                def add_created(graph):
+                    for state in created_states:
+                        graph.add_relationship(*state)
+                
+                schedule_graph_update(add_created)
+                schedule_closure_refresh(
+                    source_id for source_id, _, rel_type in created_states if rel_type == 'depends_on'
+                )
+        
+        # Get updated relationships with both systems and their categories in one query
+        updated_relationships = (
+            SystemRelationship.objects
+            .filter(Q(source_system=system) | Q(target_system=system))
+            .select_related('source_system__category', 'target_system__category')
         )
         
         # Format updated relationships for response
@@ -579,7 +620,10 @@ def save_system_relationships(request, pk):
         
         return JsonResponse({
             'success': True,
-            'relationships': updated_relationships_json
+            'relationships': updated_relationships_json,
+            'created': len(to_create),
+            'updated': len(to_update),
+            'deleted': len(to_delete)
         })
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=400)
@@ -589,69 +633,226 @@ def relationship_diagram(request):
     """Show the systems relationship diagram"""
     return render(request, 'systems/relationship_diagram.html')
 
-@login_required
-def relationship_data(request):
-    """API endpoint to get relationship data for the diagram"""
-    systems = []
-    links = []
+# Fields of each system node that relationship_data can project with ?fields=
+RELATIONSHIP_DATA_FIELDS = ('name', 'category', 'status', 'vendor', 'sso_system', 'hosting_system', 'position')
+RELATIONSHIP_DATA_MAX_LIMIT = 5000
+# Delta requests re-send rows changed slightly before `since` so writes that were
+# still committing when the previous response was built are not missed
+RELATIONSHIP_DATA_DELTA_OVERLAP = timedelta(seconds=30)
+
+
+def _relationship_data_params(request):
+    """Parse the projection, pagination and delta parameters of relationship_data"""
+    fields = request.GET.get('fields')
+    if fields:
+        fields = [field for field in fields.split(',') if field in RELATIONSHIP_DATA_FIELDS]
+    else:
+        fields = list(RELATIONSHIP_DATA_FIELDS)
+    
+    limit = request.GET.get('limit')
+    limit = max(1, min(int(limit), RELATIONSHIP_DATA_MAX_LIMIT)) if limit else None
+    
+    # The cursor is "<last system id>:<last link id>" from the previous page
+    cursor = request.GET.get('cursor') or '0:0'
+    system_cursor, link_cursor = (int(part) for part in cursor.split(':'))
+    
+    since = request.GET.get('since')
+    if since:
+        since = parse_datetime(since)
+        if since is None:
+            raise ValueError('Invalid since timestamp')
+        if timezone.is_naive(since):
+            since = timezone.make_aware(since)
+    
+    return {
+        'fields': fields,
+        'limit': limit,
+        'system_cursor': system_cursor,
+        'link_cursor': link_cursor,
+        'since': since,
+    }
+
+
+def _relationship_data_etag(request):
+    """ETag of relationship_data: the graph version plus everything but `since`
+    
+    Every write that changes a node or link bumps the graph version, so a client
+    polling with its last ETag gets a 304 while nothing has changed. Positions
+    also depend on the layout, which may be computed after the graph changed.
+    """
+    query = '&'.join(
+        f'{key}={value}' for key, value in sorted(request.GET.items()) if key != 'since'
+    )
+    version = request.graph_version = get_graph_version()
+    fields = request.GET.get('fields')
+    if not fields or 'position' in fields.split(','):
+        version = f'{version}-{get_layout_version()}'
+    return f'"rel-{version}-{hashlib.md5(query.encode()).hexdigest()[:12]}"'
+
+
+def _serialize_diagram_system(system, fields, layout):
+    data = {'id': system.id}
     
-    # Get all systems with related category and status
-    all_systems = System.objects.all().select_related('category', 'status', 'sso_system', 'hosting_system')
+    if 'name' in fields:
+        data['name'] = system.name
     
-    for system in all_systems:
+    if 'category' in fields:
         # Get category and status information
-        category = {
+        data['category'] = {
             'slug': system.category.slug,
             'name': system.category.name,
             'color': system.category.color,
             'text_color': system.category.text_color,
         } if system.category else {'slug': 'unknown', 'name': 'Unknown', 'color': '#f2f2f2', 'text_color': '#333333'}
-        
-        status = {
+    
+    if 'status' in fields:
+        data['status'] = {
             'slug': system.status.slug,
             'name': system.status.name,
             'color': system.status.color,
             'text_color': system.status.text_color,
             'is_active': system.status.is_active,
         } if system.status else {'slug': 'unknown', 'name': 'Unknown', 'color': '#f2f2f2', 'text_color': '#333333', 'is_active': False}
-        
-        # Get SSO system data if present
-        sso_system = None
-        if system.sso_system:
-            sso_system = {
-                'id': system.sso_system.id,
-                'name': system.sso_system.name
-            }
-        
-        # Get hosting system data if present
-        hosting_system = None
-        if system.hosting_system:
-            hosting_system = {
-                'id': system.hosting_system.id,
-                'name': system.hosting_system.name
-            }
-        
-        systems.append({
-            'id': system.id,
-            'name': system.name,
-            'category': category,
-            'status': status,
-            'vendor': system.vendor,
-            'sso_system': sso_system,
-            'hosting_system': hosting_system,
-        })
     
-    # Get all relationships
-    relationships = SystemRelationship.objects.all().select_related('source_system', 'target_system')
+    if 'vendor' in fields:
+        data['vendor'] = system.vendor
     
-    for rel in relationships:
-        links.append({
-            'source': rel.source_system.id,
-            'target': rel.target_system.id,
-            'type': rel.relationship_type,
-        })
+    # Get SSO and hosting system data if present
+    if 'sso_system' in fields:
+        data['sso_system'] = {
+            'id': system.sso_system.id,
+            'name': system.sso_system.name
+        } if system.sso_system else None
+    
+    if 'hosting_system' in fields:
+        data['hosting_system'] = {
+            'id': system.hosting_system.id,
+            'name': system.hosting_system.name
+        } if system.hosting_system else None
     
-    return JsonResponse({'systems': systems, 'links': links})
+    if 'position' in fields:
+        # Precomputed [x, y], or null when the server cannot lay out the graph
+        data['position'] = layout.get(system.id)
+    
+    return data
+
+
+def _stream_json_array(rows):
+    """Yield the JSON encoding of an iterable of dicts one element at a time"""
+    yield '['
+    for index, row in enumerate(rows):
+        yield (',' if index else '') + json.dumps(row, cls=DjangoJSONEncoder)
+    yield ']'
+
+
+def _stream_relationship_data(systems, links, meta):
+    yield '{"systems": '
+    yield from _stream_json_array(systems)
+    yield ', "links": '
+    yield from _stream_json_array(links)
+    for key, value in meta.items():
+        yield f', {json.dumps(key)}: {json.dumps(value, cls=DjangoJSONEncoder)}'
+    yield '}'
+
+
+@login_required
+@query_budget(12, duplicates=0)
+@condition(etag_func=_relationship_data_etag)
+def relationship_data(request):
+    """API endpoint to get relationship data for the diagram
+    
+    Query parameters:
+        fields: comma-separated system fields to include (id is always sent);
+            position carries the server-side layout coordinates
+        limit, cursor: keyset pagination over systems and links; pass the
+            returned next_cursor to fetch the following page
+        since: ISO timestamp; only systems and links changed since then are
+            sent (a system also when its category or status changed), along
+            with removed_system_ids and removed_link_ids for those deleted
+            since. A since older than the tombstone retention gets everything
+            with reset set, and the client replaces what it has
+    
+    The rows are read before the view returns, so the query profiler counts
+    them; only their JSON encoding is streamed. The response carries an ETag
+    based on the graph version.
+    """
+    try:
+        params = _relationship_data_params(request)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
+    fields = params['fields']
+    limit = params['limit']
+    since = params['since']
+    server_time = timezone.now()
+    
+    # Get systems with only the related rows the projection needs
+    related = [field for field in ('category', 'status', 'sso_system', 'hosting_system') if field in fields]
+    systems = System.objects.select_related(*related).filter(id__gt=params['system_cursor']).order_by('id')
+    
+    # Relationships are sent as plain values, no model instances needed
+    links = (
+        SystemRelationship.objects
+        .filter(id__gt=params['link_cursor'])
+        .order_by('id')
+        .values('id', 'source_system_id', 'target_system_id', 'relationship_type')
+    )
+    
+    meta = {'server_time': server_time}
+    
+    if since and since < server_time - DiagramTombstone.RETENTION:
+        # Deletions this old may have been pruned
+        meta['reset'] = True
+    elif since:
+        changed_after = since - RELATIONSHIP_DATA_DELTA_OVERLAP
+        systems = systems.filter(
+            Q(updated_at__gt=changed_after)
+            | Q(category__updated_at__gt=changed_after)
+            | Q(status__updated_at__gt=changed_after)
+        )
+        links = links.filter(updated_at__gt=changed_after)
+        removed = {DiagramTombstone.KIND_SYSTEM: set(), DiagramTombstone.KIND_LINK: set()}
+        tombstones = DiagramTombstone.objects.filter(deleted_at__gt=changed_after)
+        for kind, object_id in tombstones.values_list('kind', 'object_id'):
+            removed[kind].add(object_id)
+        meta['removed_system_ids'] = sorted(removed[DiagramTombstone.KIND_SYSTEM])
+        meta['removed_link_ids'] = sorted(removed[DiagramTombstone.KIND_LINK])
+    
+    if limit:
+        systems = list(systems[:limit])
+        links = list(links[:limit])
+        if len(systems) < limit and len(links) < limit:
+            meta['next_cursor'] = None
+        else:
+            meta['next_cursor'] = '{}:{}'.format(
+                systems[-1].id if systems else params['system_cursor'],
+                links[-1]['id'] if links else params['link_cursor'],
+            )
+    else:
+        systems = list(systems)
+        links = list(links)
+        meta['next_cursor'] = None
+    
+    if 'position' in fields:
+        layout = get_layout(get_dependency_graph(getattr(request, 'graph_version', None)))
+    else:
+        layout = {}
+    system_rows = [_serialize_diagram_system(system, fields, layout) for system in systems]
+    link_rows = [
+        {
+            'id': link['id'],
+            'source': link['source_system_id'],
+            'target': link['target_system_id'],
+            'type': link['relationship_type'],
+        }
+        for link in links
+    ]
+    
+    response = StreamingHttpResponse(
+        _stream_relationship_data(system_rows, link_rows, meta),
+        content_type='application/json'
+    )
+    return response
 
 @login_required
 def delete_system_note(request, system_pk, note_pk):
@@ -1045,106 +1246,6 @@ def move_recovery_step(request, system_pk):
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=400)
 
-def build_dependency_graph():
-    """
-    Build a graph representation of all system dependencies
-    
-    Returns:
-        dict: A graph where keys are system IDs and values are dicts with 
-              system information and dependency relationships
-    """
-    # Start with an empty graph
-    graph = {}
-    
-    # Get all systems and their relationships
-    systems = System.objects.all().select_related('category', 'status')
-    relationships = SystemRelationship.objects.filter(relationship_type='depends_on')
-    
-    # Add all systems to the graph
-    for system in systems:
-        graph[system.id] = {
-            'id': system.id,
-            'name': system.name,
-            'category': {
-                'id': system.category.id,
-                'name': system.category.name,
-                'slug': system.category.slug
-            } if system.category else None,
-            'status': {
-                'id': system.status.id,
-                'name': system.status.name,
-                'slug': system.status.slug
-            } if system.status else None,
-            'vendor': system.vendor,
-            'depends_on': [],  # Systems this system depends on
-            'dependents': []   # Systems that depend on this system
-        }
-    
-    # Add dependency relationships to the graph
-    for rel in relationships:
-        source_id = rel.source_system_id
-        target_id = rel.target_system_id
-        
-        # Add source as a dependency of target (target depends on source)
-        if target_id in graph:
-            graph[target_id]['depends_on'].append(source_id)
-        
-        # Add target as a dependent of source
-        if source_id in graph:
-            graph[source_id]['dependents'].append(target_id)
-    
-    return graph
-
-def find_affected_systems(graph, source_id):
-    """
-    Find all systems affected by an outage of the source system
-    
-    Args:
-        graph: The dependency graph
-        source_id: The ID of the system experiencing an outage
-        
-    Returns:
-        list: List of affected systems with their impact levels
-    """
-    # Track affected systems
-    affected = {}
-    
-    # Helper function to find all systems that depend on a given system
-    def find_dependents(system_id, current_path=None, impact_level=1):
-        if current_path is None:
-            current_path = [system_id]
-        
-        # Get all direct dependents
-        dependents = graph.get(system_id, {}).get('dependents', [])
-        
-        for dependent_id in dependents:
-            # Skip if this would create a loop
-            if dependent_id in current_path:
-                continue
-                
-            # Check if the dependent is already affected with a shorter path
-            if dependent_id in affected and affected[dependent_id]['impact_level'] <= impact_level:
-                continue
-                
-            # Add the dependent as an affected system
-            affected[dependent_id] = {
-                'id': dependent_id,
-                'name': graph[dependent_id]['name'],
-                'category': graph[dependent_id]['category'],
-                'vendor': graph[dependent_id]['vendor'],
-                'impact_level': impact_level,
-                'impact_path': current_path + [dependent_id]
-            }
-            
-            # Recursively find systems that depend on this dependent
-            find_dependents(dependent_id, current_path + [dependent_id], impact_level + 1)
-    
-    # Start the recursive search
-    find_dependents(source_id)
-    
-    # Convert to a list
-    return list(affected.values())
-
 def system_disaster_analysis(request, pk):
     """View for the system disaster impact analysis"""
     system = get_object_or_404(System, pk=pk)
@@ -1180,9 +1281,86 @@ def system_disaster_analysis(request, pk):
 # For API access to get affected systems
 @login_required
 def get_affected_systems(request, pk):
-    """API endpoint to get systems affected by an outage of the specified system"""
-    # Analyze dependencies
-    analysis = analyze_system_dependencies(pk)
+    """API endpoint to get systems affected by an outage of the specified system
+    
+    Without parameters only depends_on edges are followed. Pass
+    ?edges=depends_on,hosting,sso,scripts to combine edge types, plus optional
+    weights=sso:0.5,scripts:0.3, max_depth and min_score.
+    """
+    edges = request.GET.get('edges')
+    if not edges:
+        # Analyze dependencies
+        analysis = analyze_system_dependencies(pk)
+        
+        # Return as JSON
+        return JsonResponse(analysis)
+    
+    edge_types = [edge.strip() for edge in edges.split(',') if edge.strip()]
+    if edge_types == ['all']:
+        edge_types = list(EDGE_WEIGHTS)
+    unknown = [edge for edge in edge_types if edge not in EDGE_WEIGHTS]
+    if unknown:
+        return JsonResponse({'error': f'Unknown edge types: {", ".join(unknown)}'}, status=400)
     
-    # Return as JSON
-    return JsonResponse(analysis)
\ No newline at end of file
+    try:
+        weights = {}
+        for item in request.GET.get('weights', '').split(','):
+            if item.strip():
+                edge_type, weight = item.split(':')
+                weights[edge_type.strip()] = float(weight)
+        max_depth = int(request.GET['max_depth']) if request.GET.get('max_depth') else None
+        min_score = float(request.GET.get('min_score', 0))
+    except ValueError:
+        return JsonResponse({'error': 'Invalid weights, max_depth or min_score'}, status=400)
+    for edge_type, weight in weights.items():
+        if edge_type not in EDGE_WEIGHTS:
+            return JsonResponse({'error': f'Unknown edge type in weights: {edge_type}'}, status=400)
+        # Also false for NaN
+        if not 0 < weight <= 1:
+            return JsonResponse({'error': f'Weight for {edge_type} must be in (0, 1]'}, status=400)
+    
+    analysis = analyze_system_dependencies(
+        pk, edge_types=edge_types, weights=weights, max_depth=max_depth, min_score=min_score
+    )
+    return JsonResponse(analysis)
+
+
+@login_required
+def system_neighborhood(request, pk):
+    """API endpoint returning the systems within a few hops of a system
+    
+    Query parameters:
+        depth: number of hops (default 2, at most 5)
+        edges: comma-separated edge types (default all of them)
+        direction: both, out (dependents) or in (dependencies)
+        max_nodes, max_edges: caps on the size of the returned subgraph
+        max_degree: systems linked to more systems than this are returned
+            but not expanded; 0 disables hub pruning
+    """
+    edges = request.GET.get('edges')
+    edge_types = [edge.strip() for edge in edges.split(',') if edge.strip()] if edges else list(EDGE_TYPES)
+    unknown = [edge for edge in edge_types if edge not in EDGE_TYPES]
+    if unknown:
+        return JsonResponse({'error': f'Unknown edge types: {", ".join(unknown)}'}, status=400)
+    
+    direction = request.GET.get('direction', 'both')
+    if direction not in NEIGHBORHOOD_DIRECTIONS:
+        return JsonResponse({'error': f'Unknown direction: {direction}'}, status=400)
+    
+    try:
+        depth = min(int(request.GET.get('depth', DEFAULT_DEPTH)), MAX_DEPTH)
+        max_nodes = min(int(request.GET.get('max_nodes', DEFAULT_MAX_NODES)), RELATIONSHIP_DATA_MAX_LIMIT)
+        max_edges = min(int(request.GET.get('max_edges', DEFAULT_MAX_EDGES)), RELATIONSHIP_DATA_MAX_LIMIT)
+        max_degree = int(request.GET.get('max_degree', DEFAULT_MAX_DEGREE))
+    except ValueError:
+        return JsonResponse({'error': 'Invalid depth, max_nodes, max_edges or max_degree'}, status=400)
+    
+    network = ego_network(
+        get_dependency_graph(), pk, edge_types=edge_types, depth=max(depth, 0), direction=direction,
+        max_nodes=max(max_nodes, 1), max_edges=max(max_edges, 0), max_degree=max(max_degree, 0)
+    )
+    if network is None:
+        return JsonResponse({'error': 'System not found'}, status=404)
+    
+    network['source_id'] = pk
+    return JsonResponse(network)
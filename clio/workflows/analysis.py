@@ -0,0 +1,289 @@
+# workflows/analysis.py
+
+"""
+Structural checks and critical path for a workflow's graph.
+
+The nodes and edges JSON is turned into an adjacency index (node ids mapped
+to positions, successor and predecessor lists) in one pass, and every check
+below is a single traversal of it, so an analysis is linear in the size of
+the workflow:
+
+    cycles       strongly connected components with more than one node, or
+                 a node linked to itself (Tarjan's algorithm)
+    unreachable  nodes no start node leads to
+    dead_ends    nodes a start node leads to but from which no end is reached
+    critical     the start-to-end path with the longest total estimated
+                 duration, read in hours from each node's data.duration;
+                 nodes without one count as zero. Decisions take one branch,
+                 so this is the worst case. A cycle between a start and an
+                 end makes the path unbounded and it is left out.
+
+Edges whose source or target isn't a node are reported as dangling and
+otherwise ignored; for a repeated node id the first one counts.
+
+Results are cached per (workflow, version). A stored version never changes,
+and the post_save handler in workflows/signals.py drops the current
+version's entry whenever the workflow's nodes or edges are saved.
+"""
+
+from collections import deque
+
+from django.core.cache import cache
+
+from .versioning import load_version
+
+ANALYSIS_CACHE_KEY = 'workflows:analysis:{workflow_id}:{version}'
+DURATION_KEY = 'duration'
+
+
+def node_duration(node):
+    """A node's estimated duration in hours; zero when unset or invalid"""
+    data = node.get('data')
+    try:
+        duration = float(data.get(DURATION_KEY) or 0) if isinstance(data, dict) else 0.0
+    except (TypeError, ValueError):
+        return 0.0
+    # NaN and infinity fail this too
+    return duration if 0 <= duration < float('inf') else 0.0
+
+
+class GraphIndex:
+    """A workflow's nodes and edges as successor and predecessor lists"""
+
+    def __init__(self, nodes, edges):
+        self.nodes = []
+        self.positions = {}
+        for node in nodes if isinstance(nodes, list) else []:
+            if isinstance(node, dict) and isinstance(node.get('id'), str) and node['id'] not in self.positions:
+                self.positions[node['id']] = len(self.nodes)
+                self.nodes.append(node)
+
+        self.successors = [[] for _ in self.nodes]
+        self.predecessors = [[] for _ in self.nodes]
+        self.dangling_edges = []
+        self.edge_count = 0
+        for edge in edges if isinstance(edges, list) else []:
+            if not isinstance(edge, dict):
+                continue
+            source = self.positions.get(edge.get('source'))
+            target = self.positions.get(edge.get('target'))
+            if source is None or target is None:
+                self.dangling_edges.append(edge.get('id'))
+                continue
+            self.successors[source].append(target)
+            self.predecessors[target].append(source)
+            self.edge_count += 1
+
+    def of_type(self, node_type):
+        return [position for position, node in enumerate(self.nodes) if node.get('type') == node_type]
+
+
+def reachable(adjacency, sources):
+    """Flags for the positions reachable from sources, sources included"""
+    seen = [False] * len(adjacency)
+    queue = deque(sources)
+    for position in sources:
+        seen[position] = True
+    while queue:
+        for neighbour in adjacency[queue.popleft()]:
+            if not seen[neighbour]:
+                seen[neighbour] = True
+                queue.append(neighbour)
+    return seen
+
+
+def strongly_connected(successors):
+    """
+    Tarjan's strongly connected components, without recursion
+
+    Returns:
+        list of components, each a list of positions
+    """
+    count = len(successors)
+    index = [None] * count
+    lowlink = [0] * count
+    on_stack = [False] * count
+    stack = []
+    components = []
+    counter = 0
+
+    for root in range(count):
+        if index[root] is not None:
+            continue
+        index[root] = lowlink[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack[root] = True
+        # Each frame is a node and the position of its next successor to visit
+        frames = [(root, 0)]
+        while frames:
+            position, next_child = frames[-1]
+            children = successors[position]
+            if next_child < len(children):
+                frames[-1] = (position, next_child + 1)
+                child = children[next_child]
+                if index[child] is None:
+                    index[child] = lowlink[child] = counter
+                    counter += 1
+                    stack.append(child)
+                    on_stack[child] = True
+                    frames.append((child, 0))
+                elif on_stack[child]:
+                    lowlink[position] = min(lowlink[position], index[child])
+                continue
+
+            frames.pop()
+            if frames:
+                parent = frames[-1][0]
+                lowlink[parent] = min(lowlink[parent], lowlink[position])
+            if lowlink[position] == index[position]:
+                component = []
+                while True:
+                    member = stack.pop()
+                    on_stack[member] = False
+                    component.append(member)
+                    if member == position:
+                        break
+                components.append(component)
+    return components
+
+
+def find_cycles(index):
+    """The groups of positions that lie on a cycle"""
+    return [
+        component for component in strongly_connected(index.successors)
+        if len(component) > 1 or component[0] in index.successors[component[0]]
+    ]
+
+
+def longest_path(index, included, durations, starts):
+    """
+    The heaviest path from a start through the included positions
+
+    Args:
+        included: Flags for the positions to consider; they must not contain
+                  a cycle
+        durations: Weight of each position
+
+    Returns:
+        (finish, previous): the heaviest total ending at each included
+        position and the position before it on that path (None at a start)
+    """
+    finish = [None] * len(index.nodes)
+    previous = [None] * len(index.nodes)
+    waiting = [0] * len(index.nodes)
+    for position, flag in enumerate(included):
+        if flag:
+            waiting[position] = sum(1 for source in index.predecessors[position] if included[source])
+
+    # Kahn's order: a position is settled once all its included predecessors are
+    queue = deque(position for position in starts if included[position] and not waiting[position])
+    for position in queue:
+        finish[position] = durations[position]
+    while queue:
+        position = queue.popleft()
+        for target in index.successors[position]:
+            if not included[target]:
+                continue
+            candidate = finish[position] + durations[target]
+            if finish[target] is None or candidate > finish[target]:
+                finish[target] = candidate
+                previous[target] = position
+            waiting[target] -= 1
+            if not waiting[target]:
+                queue.append(target)
+    return finish, previous
+
+
+def _summary(index, position, durations=None):
+    node = index.nodes[position]
+    data = node.get('data') if isinstance(node.get('data'), dict) else {}
+    summary = {'id': node['id'], 'type': node.get('type'), 'label': data.get('label')}
+    if durations is not None:
+        summary['duration'] = durations[position]
+    return summary
+
+
+def analyze_graph(nodes, edges):
+    """
+    Check a workflow's graph and find its critical path
+
+    Returns:
+        dict with node_count and edge_count, the summaries of the cycles
+        (a list per cycle), unreachable and dead_end nodes, the
+        dangling_edges ids, critical_path ({nodes, duration} or None) with
+        the reason when it's None, and valid (no start or end is missing and
+        none of the problems above was found)
+    """
+    index = GraphIndex(nodes, edges)
+    starts, ends = index.of_type('start'), index.of_type('end')
+    durations = [node_duration(node) for node in index.nodes]
+
+    from_start = reachable(index.successors, starts)
+    to_end = reachable(index.predecessors, ends)
+    cycles = find_cycles(index)
+    on_route = [forward and backward for forward, backward in zip(from_start, to_end)]
+
+    critical_path, reason = None, None
+    if not starts or not ends:
+        reason = 'The workflow needs a start and an end node'
+    elif not any(on_route):
+        reason = 'No path leads from a start to an end node'
+    elif any(on_route[position] for cycle in cycles for position in cycle):
+        reason = 'A cycle between the start and end makes the path unbounded'
+    else:
+        finish, previous = longest_path(index, on_route, durations, starts)
+        last = max((position for position in ends if finish[position] is not None), key=lambda p: finish[p])
+        path = [last]
+        while previous[path[-1]] is not None:
+            path.append(previous[path[-1]])
+        critical_path = {
+            'nodes': [_summary(index, position, durations) for position in reversed(path)],
+            'duration': finish[last],
+        }
+
+    unreachable = [position for position, seen in enumerate(from_start) if not seen]
+    dead_ends = [
+        position for position, (forward, backward) in enumerate(zip(from_start, to_end))
+        if forward and not backward
+    ]
+    return {
+        'node_count': len(index.nodes),
+        'edge_count': index.edge_count,
+        'start_count': len(starts),
+        'end_count': len(ends),
+        'cycles': [[_summary(index, position) for position in sorted(cycle)] for cycle in cycles],
+        'unreachable': [_summary(index, position) for position in unreachable],
+        'dead_ends': [_summary(index, position) for position in dead_ends],
+        'dangling_edges': index.dangling_edges,
+        'critical_path': critical_path,
+        'critical_path_error': reason,
+        'valid': bool(starts and ends) and not (cycles or unreachable or dead_ends or index.dangling_edges),
+    }
+
+
+def analysis_cache_key(workflow_id, version):
+    return ANALYSIS_CACHE_KEY.format(workflow_id=workflow_id, version=version)
+
+
+def analyze_workflow(workflow, version=None):
+    """
+    Return the cached analysis of a workflow as it is now or at a version
+
+    Raises:
+        WorkflowVersion.DoesNotExist: If a version is given that isn't stored
+    """
+    current = version is None or version == workflow.version
+    version = workflow.version if current else version
+    key = analysis_cache_key(workflow.pk, version)
+    analysis = cache.get(key)
+    if analysis is None:
+        nodes, edges = (workflow.nodes, workflow.edges) if current else load_version(workflow, version)
+        analysis = dict(analyze_graph(nodes, edges), version=version)
+        cache.set(key, analysis, None)
+    return analysis
+
+
+def invalidate_workflow_analysis(workflow):
+    """Drop the cached analysis of the workflow's current version"""
+    cache.delete(analysis_cache_key(workflow.pk, workflow.version))
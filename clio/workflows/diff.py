@@ -0,0 +1,131 @@
+# workflows/diff.py
+
+"""
+Structural comparison of two workflow states.
+
+Nodes and edges are matched by id in one pass over each list, and every
+difference is put in a category the versions page can show:
+
+    nodes: added, removed, moved (position only), relabelled (data.label)
+           and changed (any other key of the node or its data)
+    edges: added, removed, rewired (source or target) and changed
+
+A save whose only differences are moved nodes is layout-only: save_workflow
+stores it in place instead of creating a new version.
+"""
+
+NODE_CATEGORIES = ('added', 'removed', 'moved', 'relabelled', 'changed')
+EDGE_CATEGORIES = ('added', 'removed', 'rewired', 'changed')
+
+
+def index_by_id(items):
+    """Map id to item for the dicts in a nodes or edges list that have one"""
+    if not isinstance(items, list):
+        return {}
+    return {item['id']: item for item in items if isinstance(item, dict) and 'id' in item}
+
+
+def _label(node):
+    data = node.get('data')
+    return data.get('label') if isinstance(data, dict) else None
+
+
+def _node_summary(node):
+    return {'id': node['id'], 'type': node.get('type'), 'label': _label(node)}
+
+
+def _edge_summary(edge):
+    return {'id': edge['id'], 'source': edge.get('source'), 'target': edge.get('target')}
+
+
+def _changed_keys(before, after, skip=()):
+    keys = (before.keys() | after.keys()) - set(skip)
+    return sorted(key for key in keys if before.get(key) != after.get(key))
+
+
+def diff_nodes(old, new):
+    old_index, new_index = index_by_id(old), index_by_id(new)
+    result = {category: [] for category in NODE_CATEGORIES}
+    for node_id, node in new_index.items():
+        before = old_index.get(node_id)
+        if before is None:
+            result['added'].append(_node_summary(node))
+            continue
+        if before == node:
+            continue
+
+        if before.get('position') != node.get('position'):
+            result['moved'].append({
+                'id': node_id, 'label': _label(node), 'from': before.get('position'), 'to': node.get('position')
+            })
+        if _label(before) != _label(node):
+            result['relabelled'].append({'id': node_id, 'from': _label(before), 'to': _label(node)})
+
+        fields = _changed_keys(before, node, skip=('position', 'data'))
+        before_data, data = before.get('data'), node.get('data')
+        if isinstance(before_data, dict) and isinstance(data, dict):
+            fields += [f'data.{key}' for key in _changed_keys(before_data, data, skip=('label',))]
+        elif before_data != data:
+            fields.append('data')
+        if fields:
+            result['changed'].append({'id': node_id, 'label': _label(node), 'fields': fields})
+
+    result['removed'] = [_node_summary(node) for node_id, node in old_index.items() if node_id not in new_index]
+    return result
+
+
+def diff_edges(old, new):
+    old_index, new_index = index_by_id(old), index_by_id(new)
+    result = {category: [] for category in EDGE_CATEGORIES}
+    for edge_id, edge in new_index.items():
+        before = old_index.get(edge_id)
+        if before is None:
+            result['added'].append(_edge_summary(edge))
+            continue
+        if before == edge:
+            continue
+
+        if (before.get('source'), before.get('target')) != (edge.get('source'), edge.get('target')):
+            result['rewired'].append({
+                'id': edge_id,
+                'from': {'source': before.get('source'), 'target': before.get('target')},
+                'to': {'source': edge.get('source'), 'target': edge.get('target')},
+            })
+        fields = _changed_keys(before, edge, skip=('source', 'target'))
+        if fields:
+            result['changed'].append({'id': edge_id, 'fields': fields})
+
+    result['removed'] = [_edge_summary(edge) for edge_id, edge in old_index.items() if edge_id not in new_index]
+    return result
+
+
+def diff_workflow(old_nodes, old_edges, new_nodes, new_edges):
+    """
+    Compare two workflow states
+
+    Returns:
+        dict with the nodes and edges changes by category, their counts
+        (summary), and whether they amount to moved nodes only (layout_only)
+    """
+    nodes = diff_nodes(old_nodes, new_nodes)
+    edges = diff_edges(old_edges, new_edges)
+    summary = {f'nodes_{category}': len(nodes[category]) for category in NODE_CATEGORIES}
+    summary.update({f'edges_{category}': len(edges[category]) for category in EDGE_CATEGORIES})
+    structural = any(count for key, count in summary.items() if key != 'nodes_moved')
+    # Items without a unique id can't be compared, so their changes can't be
+    # ruled out
+    comparable = all(
+        isinstance(items, list) and len(index_by_id(items)) == len(items)
+        for items in (old_nodes, old_edges, new_nodes, new_edges)
+    )
+    return {
+        'nodes': nodes,
+        'edges': edges,
+        'summary': summary,
+        'layout_only': comparable and bool(summary['nodes_moved']) and not structural,
+    }
+
+
+def is_layout_only(old_nodes, old_edges, new_nodes, new_edges):
+    """Whether new differs from old only in node positions"""
+    return diff_workflow(old_nodes, old_edges, new_nodes, new_edges)['layout_only']
@@ -0,0 +1,116 @@
+# workflows/management/commands/benchmark_workflow_versions.py
+
+import json
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test.utils import override_settings
+
+from workflows.models import Workflow
+from workflows.versioning import load_version, save_version
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Benchmark workflow version storage size and reconstruction on a synthetic editing session'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--steps', type=int, default=300, help='Number of step nodes in the workflow')
+        parser.add_argument('--saves', type=int, default=500, help='Number of designer saves to store')
+        parser.add_argument('--loads', type=int, default=50, help='Number of version reconstructions to time')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        states = [self.initial_state(options['steps'], rng)]
+        for _ in range(options['saves'] - 1):
+            states.append(self.edit(*states[-1], rng))
+        full_size = sum(len(json.dumps({'nodes': nodes, 'edges': edges})) for nodes, edges in states)
+        self.stdout.write(
+            f'{len(states)} versions of a {options["steps"]}-step workflow, '
+            f'{full_size / 1024:,.0f} KiB as full copies'
+        )
+
+        versions = [rng.randint(1, len(states)) for _ in range(options['loads'])]
+        for compression in (True, False):
+            with override_settings(WORKFLOW_VERSION_COMPRESSION=compression):
+                self.run(states, versions, full_size, 'zlib' if compression else 'uncompressed')
+
+    def run(self, states, versions, full_size, label):
+        try:
+            with transaction.atomic():
+                workflow = Workflow.objects.create(name='Version storage benchmark')
+                started = time.perf_counter()
+                for number, (nodes, edges) in enumerate(states, start=1):
+                    save_version(workflow, number, nodes, edges)
+                save_time = time.perf_counter() - started
+                stored = workflow.versions.all()
+                stored_size = sum(len(version.data) for version in stored)
+                snapshots = stored.filter(is_snapshot=True).count()
+
+                timings = []
+                for number in versions:
+                    started = time.perf_counter()
+                    nodes, edges = load_version(workflow, number)
+                    timings.append(time.perf_counter() - started)
+                    assert (nodes, edges) == states[number - 1], f'version {number} was not reconstructed exactly'
+                raise Rollback
+        except Rollback:
+            pass
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{label}: {stored_size / 1024:,.0f} KiB stored, {1 - stored_size / full_size:.1%} saved'
+        ))
+        self.stdout.write(f'  snapshots: {snapshots} of {len(states)} versions')
+        self.stdout.write(f'  save:   {save_time / len(states) * 1000:.1f} ms per version')
+        self.stdout.write(f'  load median: {statistics.median(timings) * 1000:.1f} ms')
+        self.stdout.write(f'  load max:    {max(timings) * 1000:.1f} ms')
+
+    def initial_state(self, step_count, rng):
+        nodes = [{'id': 'start', 'type': 'start', 'position': {'x': 250, 'y': 50}, 'data': {'label': 'Start Workflow'}}]
+        for number in range(step_count):
+            nodes.append({
+                'id': f'step_{number}',
+                'type': 'step',
+                'position': {'x': rng.randint(0, 2000), 'y': rng.randint(0, 4000)},
+                'data': {
+                    'label': f'Step {number}',
+                    'description': 'Review the output and hand over to the next team. ' * rng.randint(1, 4),
+                    'system_id': rng.randint(1, 200),
+                },
+            })
+        nodes.append({'id': 'end', 'type': 'end', 'position': {'x': 250, 'y': 4100}, 'data': {'label': 'End Workflow'}})
+        edges = [
+            {'id': f'e-{source["id"]}-{target["id"]}', 'source': source['id'], 'target': target['id']}
+            for source, target in zip(nodes, nodes[1:])
+        ]
+        return nodes, edges
+
+    def edit(self, nodes, edges, rng):
+        """One designer save: mostly drags, sometimes a relabel, an added or a removed step"""
+        nodes = [dict(node) for node in nodes]
+        steps = [node for node in nodes if node['type'] == 'step']
+        action = rng.random()
+        if action < 0.6 and steps:
+            for node in rng.sample(steps, min(len(steps), rng.randint(1, 3))):
+                node['position'] = {'x': rng.randint(0, 2000), 'y': rng.randint(0, 4000)}
+        elif action < 0.8 and steps:
+            node = rng.choice(steps)
+            node['data'] = dict(node['data'], label=f'{node["data"]["label"]} (revised)')
+        elif action < 0.9 or not steps:
+            node_id = f'step_{len(nodes)}_{rng.randint(0, 10 ** 6)}'
+            nodes.insert(-1, {
+                'id': node_id, 'type': 'step', 'position': {'x': 0, 'y': 0}, 'data': {'label': 'New step'}
+            })
+            edges = edges + [{'id': f'e-start-{node_id}', 'source': 'start', 'target': node_id}]
+        else:
+            removed = rng.choice(steps)['id']
+            nodes = [node for node in nodes if node['id'] != removed]
+            edges = [edge for edge in edges if removed not in (edge['source'], edge['target'])]
+        return nodes, edges
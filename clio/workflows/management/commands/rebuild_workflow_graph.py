@@ -0,0 +1,13 @@
+# workflows/management/commands/rebuild_workflow_graph.py
+
+from django.core.management.base import BaseCommand
+
+from workflows.projection import rebuild_workflow_graphs
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the WorkflowNode and WorkflowEdge rows from every workflow\'s nodes and edges'
+
+    def handle(self, *args, **options):
+        count = rebuild_workflow_graphs()
+        self.stdout.write(self.style.SUCCESS(f'Workflow graph rebuilt for {count} workflows'))
@@ -0,0 +1,165 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:29
+
+import json
+import zlib
+
+from django.db import migrations, models
+
+BATCH_SIZE = 500
+
+# A frozen copy of the storage format in workflows/versioning.py as it was
+# when this migration was written, so later changes there can't change what
+# it does. Every row records its own compression, so the current code still
+# reads what it writes.
+COMPRESSION_ZLIB = 'zlib'
+SNAPSHOT_INTERVAL = 20
+MAX_DELTA_RATIO = 0.5
+
+
+def encode_payload(payload):
+    return zlib.compress(json.dumps(payload, separators=(',', ':')).encode())
+
+
+def decode_payload(data, compression):
+    data = bytes(data)
+    return json.loads(zlib.decompress(data) if compression == COMPRESSION_ZLIB else data)
+
+
+def _keyed(items):
+    if not isinstance(items, list):
+        return None
+    index = {}
+    for item in items:
+        if not isinstance(item, dict) or not isinstance(item.get('id'), str) or item['id'] in index:
+            return None
+        index[item['id']] = item
+    return index
+
+
+def diff_items(old, new):
+    old_index, new_index = _keyed(old), _keyed(new)
+    if old_index is None or new_index is None:
+        return None
+
+    delta = {}
+    removed = [item_id for item_id in old_index if item_id not in new_index]
+    added = [item for item_id, item in new_index.items() if item_id not in old_index]
+    changes = {}
+    for item_id, item in new_index.items():
+        before = old_index.get(item_id)
+        if before is None or before == item:
+            continue
+        changed = {key: value for key, value in item.items() if key not in before or before[key] != value}
+        unset = [key for key in before if key not in item]
+        changes[item_id] = {'set': changed, 'unset': unset} if unset else {'set': changed}
+
+    if removed:
+        delta['remove'] = removed
+    if added:
+        delta['add'] = added
+    if changes:
+        delta['change'] = changes
+    expected_order = [item_id for item_id in old_index if item_id in new_index] + [item['id'] for item in added]
+    if expected_order != list(new_index):
+        delta['order'] = list(new_index)
+    return delta
+
+
+def apply_items_delta(items, delta):
+    removed = set(delta.get('remove', ()))
+    index = {item['id']: item for item in items if item['id'] not in removed}
+    for item_id, change in delta.get('change', {}).items():
+        item = {key: value for key, value in index[item_id].items() if key not in change.get('unset', ())}
+        item.update(change['set'])
+        index[item_id] = item
+    for item in delta.get('add', ()):
+        index[item['id']] = item
+    order = delta.get('order')
+    return [index[item_id] for item_id in order] if order else list(index.values())
+
+
+def encode_version(nodes, edges, previous, since_snapshot):
+    full = encode_payload({'nodes': nodes, 'edges': edges})
+    if previous is not None and since_snapshot < SNAPSHOT_INTERVAL - 1:
+        node_delta = diff_items(previous[0], nodes)
+        edge_delta = diff_items(previous[1], edges)
+        if node_delta is not None and edge_delta is not None:
+            data = encode_payload({'nodes': node_delta, 'edges': edge_delta})
+            if len(data) < len(full) * MAX_DELTA_RATIO:
+                return {'is_snapshot': False, 'compression': COMPRESSION_ZLIB, 'data': data}
+    return {'is_snapshot': True, 'compression': COMPRESSION_ZLIB, 'data': full}
+
+
+def _versions_in_batches(WorkflowVersion, fields):
+    """Yield each version in (workflow, version) order, saving fields on them in batches"""
+    batch = []
+    for version in WorkflowVersion.objects.order_by('workflow_id', 'version').iterator(chunk_size=BATCH_SIZE):
+        yield version
+        batch.append(version)
+        if len(batch) == BATCH_SIZE:
+            WorkflowVersion.objects.bulk_update(batch, fields)
+            batch = []
+    WorkflowVersion.objects.bulk_update(batch, fields)
+
+
+def compact_versions(apps, schema_editor):
+    """Store each existing version as a snapshot or a delta against the one before"""
+    WorkflowVersion = apps.get_model('workflows', 'WorkflowVersion')
+    workflow_id = previous = None
+    since_snapshot = 0
+    for version in _versions_in_batches(WorkflowVersion, ['is_snapshot', 'compression', 'data']):
+        if version.workflow_id != workflow_id:
+            workflow_id, previous, since_snapshot = version.workflow_id, None, 0
+        fields = encode_version(version.nodes, version.edges, previous, since_snapshot)
+        for name, value in fields.items():
+            setattr(version, name, value)
+        since_snapshot = 0 if fields['is_snapshot'] else since_snapshot + 1
+        previous = (version.nodes, version.edges)
+
+
+def expand_versions(apps, schema_editor):
+    """Write every version's full nodes and edges back"""
+    WorkflowVersion = apps.get_model('workflows', 'WorkflowVersion')
+    for version in _versions_in_batches(WorkflowVersion, ['nodes', 'edges']):
+        payload = decode_payload(version.data, version.compression)
+        if version.is_snapshot:
+            nodes, edges = payload['nodes'], payload['edges']
+        else:
+            nodes = apply_items_delta(nodes, payload['nodes'])
+            edges = apply_items_delta(edges, payload['edges'])
+        version.nodes, version.edges = nodes, edges
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workflows', '0003_convert_to_node_based'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='workflowversion',
+            name='compression',
+            field=models.CharField(blank=True, max_length=10),
+        ),
+        migrations.AddField(
+            model_name='workflowversion',
+            name='data',
+            field=models.BinaryField(default=b''),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='workflowversion',
+            name='is_snapshot',
+            field=models.BooleanField(default=True),
+        ),
+        migrations.RunPython(compact_versions, expand_versions),
+        migrations.RemoveField(
+            model_name='workflowversion',
+            name='edges',
+        ),
+        migrations.RemoveField(
+            model_name='workflowversion',
+            name='nodes',
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workflows', '0004_compact_versions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='workflow',
+            name='revision',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,105 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:35
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+BATCH_SIZE = 500
+
+
+# A frozen copy of the projection in workflows/projection.py as it was when
+# this migration was written, so later changes there can't change what it
+# does. The tables are new and empty, so every row is simply inserted.
+
+def _keyed(items):
+    keyed = {}
+    for item in items if isinstance(items, list) else []:
+        if isinstance(item, dict) and isinstance(item.get('id'), str):
+            keyed.setdefault(item['id'], item)
+    return keyed
+
+
+def _step_links(node):
+    if node.get('type') != 'step' or not isinstance(node.get('data'), dict):
+        return None, None
+    links = []
+    for key in ('system_id', 'script_id'):
+        try:
+            links.append(int(node['data'][key]) if node['data'].get(key) else None)
+        except (TypeError, ValueError):
+            links.append(None)
+    return tuple(links)
+
+
+def project_workflows(apps, schema_editor):
+    Workflow = apps.get_model('workflows', 'Workflow')
+    WorkflowNode = apps.get_model('workflows', 'WorkflowNode')
+    WorkflowEdge = apps.get_model('workflows', 'WorkflowEdge')
+    nodes, edges = [], []
+    for workflow in Workflow.objects.only('nodes', 'edges').iterator(chunk_size=BATCH_SIZE):
+        for node_id, node in _keyed(workflow.nodes).items():
+            data = node.get('data') if isinstance(node.get('data'), dict) else {}
+            label = data.get('label')
+            system_id, script_id = _step_links(node)
+            nodes.append(WorkflowNode(
+                workflow_id=workflow.pk,
+                node_id=node_id[:100],
+                type=str(node.get('type') or '')[:20],
+                label=str(label)[:255] if label is not None else '',
+                system_id=system_id,
+                script_id=script_id,
+            ))
+        for edge_id, edge in _keyed(workflow.edges).items():
+            edges.append(WorkflowEdge(
+                workflow_id=workflow.pk,
+                edge_id=edge_id[:100],
+                source=str(edge.get('source') or '')[:100],
+                target=str(edge.get('target') or '')[:100],
+            ))
+        if len(nodes) + len(edges) >= BATCH_SIZE:
+            WorkflowNode.objects.bulk_create(nodes, batch_size=BATCH_SIZE)
+            WorkflowEdge.objects.bulk_create(edges, batch_size=BATCH_SIZE)
+            nodes, edges = [], []
+    WorkflowNode.objects.bulk_create(nodes, batch_size=BATCH_SIZE)
+    WorkflowEdge.objects.bulk_create(edges, batch_size=BATCH_SIZE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scripts', '0005_alter_script_workflows'),
+        ('systems', '0005_system_search_index'),
+        ('workflows', '0005_workflow_revision'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WorkflowEdge',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('edge_id', models.CharField(max_length=100)),
+                ('source', models.CharField(max_length=100)),
+                ('target', models.CharField(max_length=100)),
+                ('workflow', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='graph_edges', to='workflows.workflow')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['workflow', 'source'], name='workflow_edge_source'), models.Index(fields=['workflow', 'target'], name='workflow_edge_target')],
+                'unique_together': {('workflow', 'edge_id')},
+            },
+        ),
+        migrations.CreateModel(
+            name='WorkflowNode',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('node_id', models.CharField(max_length=100)),
+                ('type', models.CharField(db_index=True, max_length=20)),
+                ('label', models.CharField(blank=True, max_length=255)),
+                ('script', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='workflow_nodes', to='scripts.script')),
+                ('system', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='workflow_nodes', to='systems.system')),
+                ('workflow', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='graph_nodes', to='workflows.workflow')),
+            ],
+            options={
+                'unique_together': {('workflow', 'node_id')},
+            },
+        ),
+        migrations.RunPython(project_workflows, migrations.RunPython.noop),
+    ]
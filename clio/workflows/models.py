@@ -19,6 +19,9 @@ class Workflow(models.Model):
     scripts = models.ManyToManyField('scripts.Script', related_name='used_in_workflows', blank=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='draft')
     version = models.PositiveIntegerField(default=1)
+    # Bumped on every change to nodes or edges, including layout-only ones
+    # that keep the version; clients send it back to detect conflicting edits
+    revision = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -29,14 +32,10 @@ class Workflow(models.Model):
     def __str__(self):
         return f"{self.name} (v{self.version})"
     
-    def create_new_version(self):
+    def create_new_version(self, created_by=None):
         """Create a new version record of this workflow"""
-        WorkflowVersion.objects.create(
-            workflow=self,
-            version=self.version,
-            nodes=self.nodes,
-            edges=self.edges
-        )
+        from .versioning import save_version
+        save_version(self, self.version, self.nodes, self.edges, created_by=created_by)
         
         # Increment version
         self.version += 1
@@ -44,11 +43,17 @@ class Workflow(models.Model):
 
 
 class WorkflowVersion(models.Model):
-    """Model to track workflow versions"""
+    """
+    Model to track workflow versions
+
+    Holds either the full nodes and edges (a snapshot) or a delta against the
+    previous version; see workflows/versioning.py.
+    """
     workflow = models.ForeignKey(Workflow, on_delete=models.CASCADE, related_name='versions')
     version = models.PositiveIntegerField()
-    nodes = models.JSONField(default=dict, blank=True)
-    edges = models.JSONField(default=dict, blank=True)
+    is_snapshot = models.BooleanField(default=True)
+    compression = models.CharField(max_length=10, blank=True)
+    data = models.BinaryField()
     created_at = models.DateTimeField(auto_now_add=True)
     created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
     
@@ -68,4 +73,51 @@ class WorkflowDocument(models.Model):
     uploaded_at = models.DateTimeField(auto_now_add=True)
     
     def __str__(self):
-        return f"{self.name} - {self.workflow.name}"
\ No newline at end of file
+        return f"{self.name} - {self.workflow.name}"
+
+
+class WorkflowNode(models.Model):
+    """
+    One node of a workflow's diagram, projected from Workflow.nodes
+
+    Workflow.nodes stays the source of truth; these rows are rewritten from
+    it on every save (workflows/projection.py) so steps can be queried
+    across workflows. The system and script columns deliberately have no
+    database constraint: they mirror whatever ids the JSON holds.
+    """
+    workflow = models.ForeignKey(Workflow, on_delete=models.CASCADE, related_name='graph_nodes')
+    node_id = models.CharField(max_length=100)
+    type = models.CharField(max_length=20, db_index=True)
+    label = models.CharField(max_length=255, blank=True)
+    system = models.ForeignKey(
+        'systems.System', on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True,
+        related_name='workflow_nodes'
+    )
+    script = models.ForeignKey(
+        'scripts.Script', on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True,
+        related_name='workflow_nodes'
+    )
+
+    class Meta:
+        unique_together = ('workflow', 'node_id')
+
+    def __str__(self):
+        return f"{self.workflow_id}:{self.node_id}"
+
+
+class WorkflowEdge(models.Model):
+    """One edge of a workflow's diagram, projected from Workflow.edges"""
+    workflow = models.ForeignKey(Workflow, on_delete=models.CASCADE, related_name='graph_edges')
+    edge_id = models.CharField(max_length=100)
+    source = models.CharField(max_length=100)
+    target = models.CharField(max_length=100)
+
+    class Meta:
+        unique_together = ('workflow', 'edge_id')
+        indexes = [
+            models.Index(fields=['workflow', 'source'], name='workflow_edge_source'),
+            models.Index(fields=['workflow', 'target'], name='workflow_edge_target'),
+        ]
+
+    def __str__(self):
+        return f"{self.workflow_id}:{self.source}->{self.target}"
@@ -0,0 +1,181 @@
+# workflows/patching.py
+
+"""
+Incremental edits to a workflow's nodes and edges.
+
+The designer's autosave sends the operations made since its last save
+instead of the whole diagram:
+
+    {"op": "add_node", "node": {...}}
+    {"op": "update_node", "id": "...", "set": {...}, "unset": [...], "data": {...}}
+    {"op": "remove_node", "id": "..."}      also removes the node's edges
+    {"op": "add_edge", "edge": {...}}
+    {"op": "update_edge", "id": "...", "set": {...}, "unset": [...]}
+    {"op": "remove_edge", "id": "..."}
+
+update_* replaces the top-level keys in set and drops those in unset;
+update_node also merges data into the node's data. Only the nodes an operation touches are looked at to
+work out which Workflow.systems and Workflow.scripts links may have changed,
+and only those links are added or removed.
+"""
+
+LAYOUT_KEYS = {'position'}
+
+
+class InvalidPatch(ValueError):
+    """Raised when an operation is malformed or refers to a missing item"""
+
+
+def step_links(node):
+    """The (system id, script id) a step node points at, None where unset or invalid"""
+    if not isinstance(node, dict) or node.get('type') != 'step' or not isinstance(node.get('data'), dict):
+        return None, None
+    links = []
+    for key in ('system_id', 'script_id'):
+        try:
+            links.append(int(node['data'][key]) if node['data'].get(key) else None)
+        except (TypeError, ValueError):
+            links.append(None)
+    return tuple(links)
+
+
+class _Items:
+    """A nodes or edges list indexed by id, copied on write"""
+
+    def __init__(self, items, kind):
+        self.kind = kind
+        self.items = {}
+        for item in items if isinstance(items, list) else []:
+            if not isinstance(item, dict) or not isinstance(item.get('id'), str) or item['id'] in self.items:
+                raise InvalidPatch(f'The stored {kind}s lack unique ids; save the whole workflow instead')
+            self.items[item['id']] = item
+
+    def get(self, item_id):
+        if not isinstance(item_id, str) or item_id not in self.items:
+            raise InvalidPatch(f'Unknown {self.kind} {item_id!r}')
+        return self.items[item_id]
+
+    def add(self, item):
+        if not isinstance(item, dict) or not isinstance(item.get('id'), str):
+            raise InvalidPatch(f'A new {self.kind} needs a string id')
+        if item['id'] in self.items:
+            raise InvalidPatch(f'Duplicate {self.kind} {item["id"]!r}')
+        self.items[item['id']] = item
+
+    def update(self, item_id, values, unset=(), data=None):
+        if (not isinstance(values, dict) or not isinstance(unset, list) or 'id' in values or 'id' in unset
+                or not all(isinstance(key, str) for key in unset) or not isinstance(data, (dict, type(None)))):
+            raise InvalidPatch(f'Invalid update for {self.kind} {item_id!r}')
+        item = {key: value for key, value in self.get(item_id).items() if key not in unset}
+        item.update(values)
+        if data:
+            current = item.get('data')
+            item['data'] = {**(current if isinstance(current, dict) else {}), **data}
+        self.items[item_id] = item
+        return item
+
+    def remove(self, item_id):
+        self.get(item_id)
+        return self.items.pop(item_id)
+
+    def as_list(self):
+        return list(self.items.values())
+
+
+def apply_operations(nodes, edges, operations):
+    """
+    Apply designer operations to a workflow's nodes and edges
+
+    Returns:
+        dict with the new nodes and edges, touched (a (before, after) pair
+        per node that was added, changed or removed, None for the missing
+        side) and layout_only (whether only node positions changed)
+
+    Raises:
+        InvalidPatch: If any operation can't be applied; nothing is applied
+    """
+    if not isinstance(operations, list):
+        raise InvalidPatch('operations must be a list')
+    node_items = _Items(nodes, 'node')
+    edge_items = _Items(edges, 'edge')
+    touched = {}
+    layout_only = True
+
+    def touch(node_id, before, after):
+        original = touched[node_id][0] if node_id in touched else before
+        touched[node_id] = (original, after)
+
+    for operation in operations:
+        if not isinstance(operation, dict):
+            raise InvalidPatch('Each operation must be an object')
+        op = operation.get('op')
+        values = operation.get('set', {})
+        unset = operation.get('unset', [])
+        if op == 'update_node':
+            before = node_items.get(operation.get('id'))
+            after = node_items.update(operation['id'], values, unset, operation.get('data'))
+            touch(after['id'], before, after)
+            layout_only = layout_only and set(values) <= LAYOUT_KEYS and not unset and not operation.get('data')
+            continue
+
+        layout_only = False
+        if op == 'add_node':
+            node_items.add(operation.get('node'))
+            touch(operation['node']['id'], None, operation['node'])
+        elif op == 'remove_node':
+            node = node_items.remove(operation.get('id'))
+            touch(node['id'], node, None)
+            for edge in edge_items.as_list():
+                if node['id'] in (edge.get('source'), edge.get('target')):
+                    edge_items.remove(edge['id'])
+        elif op == 'add_edge':
+            edge = operation.get('edge')
+            edge_items.add(edge)
+            node_items.get(edge.get('source'))
+            node_items.get(edge.get('target'))
+        elif op == 'update_edge':
+            edge = edge_items.update(operation.get('id'), values, unset)
+            node_items.get(edge.get('source'))
+            node_items.get(edge.get('target'))
+        elif op == 'remove_edge':
+            edge_items.remove(operation.get('id'))
+        else:
+            raise InvalidPatch(f'Unknown operation {op!r}')
+
+    return {
+        'nodes': node_items.as_list(),
+        'edges': edge_items.as_list(),
+        'touched': list(touched.values()),
+        'layout_only': layout_only and bool(operations),
+    }
+
+
+def changed_links(nodes, touched):
+    """
+    Work out the system and script links a patch adds and removes
+
+    Args:
+        nodes: The workflow's nodes after the patch
+        touched: (before, after) node pairs from apply_operations
+
+    Returns:
+        dict: {'systems': (ids to link, ids to unlink), 'scripts': (...)}
+    """
+    added, dropped = (set(), set()), (set(), set())
+    for before, after in touched:
+        for index, (old, new) in enumerate(zip(step_links(before), step_links(after))):
+            if old == new:
+                continue
+            if old is not None:
+                dropped[index].add(old)
+            if new is not None:
+                added[index].add(new)
+
+    result = {}
+    for index, relation in enumerate(('systems', 'scripts')):
+        unlinked = dropped[index] - added[index]
+        # A link dropped from one node may still be used by another
+        if unlinked:
+            unlinked -= {step_links(node)[index] for node in nodes}
+        result[relation] = (added[index], unlinked)
+    return result
@@ -0,0 +1,128 @@
+# workflows/projection.py
+
+"""
+The WorkflowNode and WorkflowEdge tables, projected from the workflow JSON.
+
+Workflow.nodes and Workflow.edges remain what the designer reads and writes.
+After every save that touches them, sync_workflow_graph compares the JSON
+with the workflow's stored rows and inserts, updates and deletes only the
+rows that differ, so a save that moves or renames one step writes one row.
+Node positions aren't projected, so layout-only saves write nothing. Items
+without a string id are skipped; for a repeated id the first one counts.
+
+With the rows in place, questions such as "which workflows have a step on
+system X" are indexed queries instead of a scan of every workflow's JSON.
+"""
+
+from django.db import transaction
+from django.db.models import Count, Exists, OuterRef, Prefetch, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Workflow, WorkflowEdge, WorkflowNode
+from .patching import step_links
+
+BATCH_SIZE = 500
+NODE_FIELDS = ('type', 'label', 'system_id', 'script_id')
+EDGE_FIELDS = ('source', 'target')
+
+
+def _keyed(items):
+    keyed = {}
+    for item in items if isinstance(items, list) else []:
+        if isinstance(item, dict) and isinstance(item.get('id'), str):
+            keyed.setdefault(item['id'], item)
+    return keyed
+
+
+def node_values(node):
+    """The projected (type, label, system_id, script_id) of a node"""
+    data = node.get('data') if isinstance(node.get('data'), dict) else {}
+    label = data.get('label')
+    return (
+        str(node.get('type') or '')[:20],
+        str(label)[:255] if label is not None else '',
+        *step_links(node),
+    )
+
+
+def edge_values(edge):
+    """The projected (source, target) of an edge"""
+    return str(edge.get('source') or '')[:100], str(edge.get('target') or '')[:100]
+
+
+def _sync_rows(model, workflow_id, key_field, fields, desired):
+    """Make the workflow's rows of model match desired, {key: field values}"""
+    existing = {
+        row[0]: row[1:]
+        for row in model.objects.filter(workflow_id=workflow_id).values_list(key_field, 'pk', *fields)
+    }
+    removed = [row[0] for key, row in existing.items() if key not in desired]
+    created, changed = [], []
+    for key, values in desired.items():
+        row = existing.get(key)
+        if row is None:
+            created.append(model(workflow_id=workflow_id, **{key_field: key}, **dict(zip(fields, values))))
+        elif tuple(row[1:]) != values:
+            changed.append(model(pk=row[0], **dict(zip(fields, values))))
+
+    if removed:
+        model.objects.filter(pk__in=removed).delete()
+    if created:
+        model.objects.bulk_create(created, batch_size=BATCH_SIZE)
+    if changed:
+        model.objects.bulk_update(changed, fields, batch_size=BATCH_SIZE)
+    return len(removed) + len(created) + len(changed)
+
+
+def sync_workflow_graph(workflow):
+    """
+    Bring a workflow's WorkflowNode and WorkflowEdge rows in line with its JSON
+
+    Returns:
+        int: Rows inserted, updated or deleted
+    """
+    with transaction.atomic():
+        return (
+            _sync_rows(WorkflowNode, workflow.pk, 'node_id', NODE_FIELDS, {
+                node_id[:100]: node_values(node) for node_id, node in _keyed(workflow.nodes).items()
+            })
+            + _sync_rows(WorkflowEdge, workflow.pk, 'edge_id', EDGE_FIELDS, {
+                edge_id[:100]: edge_values(edge) for edge_id, edge in _keyed(workflow.edges).items()
+            })
+        )
+
+
+def rebuild_workflow_graphs():
+    """Project every workflow, returning how many there were"""
+    count = 0
+    for workflow in Workflow.objects.only('nodes', 'edges').iterator(chunk_size=BATCH_SIZE):
+        sync_workflow_graph(workflow)
+        count += 1
+    return count
+
+
+def workflows_using_system(system_id):
+    """
+    Workflows with a step on a system or linked to it by hand, annotated with
+    their step_count
+    """
+    steps = WorkflowNode.objects.filter(workflow=OuterRef('pk'), type='step')
+    links = Workflow.systems.through.objects.filter(workflow=OuterRef('pk'), system_id=system_id)
+    step_count = steps.order_by().values('workflow').annotate(count=Count('pk')).values('count')
+    return Workflow.objects.filter(
+        Exists(steps.filter(system_id=system_id)) | Exists(links)
+    ).annotate(step_count=Coalesce(Subquery(step_count), 0))
+
+
+def workflows_using_script(script_id):
+    """
+    Workflows with a step running a script or linked to it by hand, each with
+    those steps in script_steps
+    """
+    steps = WorkflowNode.objects.filter(workflow=OuterRef('pk'), type='step', script_id=script_id)
+    links = Workflow.scripts.through.objects.filter(workflow=OuterRef('pk'), script_id=script_id)
+    return Workflow.objects.filter(Exists(steps) | Exists(links)).prefetch_related(Prefetch(
+        'graph_nodes',
+        queryset=WorkflowNode.objects.filter(type='step', script_id=script_id).order_by('label', 'node_id'),
+        to_attr='script_steps',
+    ))
@@ -0,0 +1,25 @@
+# workflows/signals.py
+
+"""
+Keep the WorkflowNode and WorkflowEdge projection (workflows/projection.py)
+and the cached graph analysis (workflows/analysis.py) in step with saves of a
+workflow's nodes and edges.
+"""
+
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .analysis import invalidate_workflow_analysis
+from .models import Workflow
+from .projection import sync_workflow_graph
+
+GRAPH_FIELDS = {'nodes', 'edges'}
+
+
+@receiver(post_save, sender=Workflow)
+def workflow_saved(sender, instance, raw=False, update_fields=None, **kwargs):
+    # Saves of other fields, such as the version bump, leave the graph alone
+    if raw or (update_fields is not None and not GRAPH_FIELDS & set(update_fields)):
+        return
+    sync_workflow_graph(instance)
+    invalidate_workflow_analysis(instance)
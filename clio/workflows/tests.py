@@ -1,3 +1,404 @@
-from django.test import TestCase
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
 
-# Create your tests here.
+from scripts.models import Script
+from systems.models import System, SystemCategory, SystemStatus
+from .analysis import analyze_graph
+from .diff import diff_workflow
+from .models import Workflow, WorkflowEdge, WorkflowNode, WorkflowVersion
+from .patching import InvalidPatch, apply_operations, changed_links
+from .projection import rebuild_workflow_graphs, sync_workflow_graph, workflows_using_script, workflows_using_system
+from .versioning import apply_items_delta, diff_items, load_version, save_version
+
+
+def node(node_id, node_type='step', label=None, x=0, **data):
+    return {
+        'id': node_id, 'type': node_type, 'position': {'x': x, 'y': 0},
+        'data': {'label': label or node_id, **data},
+    }
+
+
+def edge(source, target):
+    return {'id': f'{source}-{target}', 'source': source, 'target': target}
+
+
+def chain(*node_ids):
+    """A start, the given steps and an end, linked in a line"""
+    nodes = [node('start', 'start')] + [node(node_id) for node_id in node_ids] + [node('end', 'end')]
+    ids = [item['id'] for item in nodes]
+    return nodes, [edge(source, target) for source, target in zip(ids, ids[1:])]
+
+
+class VersioningTests(TestCase):
+
+    def test_items_delta_round_trip(self):
+        old = [node('a'), node('b'), node('c')]
+        new = [node('c'), node('a', label='Renamed'), node('d')]
+        delta = diff_items(old, new)
+        self.assertEqual(delta['remove'], ['b'])
+        self.assertEqual(delta['change'], {'a': {'set': {'data': {'label': 'Renamed'}}}})
+        self.assertEqual(delta['order'], ['c', 'a', 'd'])
+        self.assertEqual(apply_items_delta(old, delta), new)
+
+    def test_items_without_ids_are_not_diffed(self):
+        self.assertIsNone(diff_items([{'type': 'step'}], [node('a')]))
+        self.assertIsNone(diff_items([node('a'), node('a')], [node('a')]))
+
+    @override_settings(WORKFLOW_SNAPSHOT_INTERVAL=5)
+    def test_versions_load_across_snapshots(self):
+        workflow = Workflow.objects.create(name='Payroll')
+        saved = {}
+        nodes, edges = chain(*(f'step-{number}' for number in range(40)))
+        for version in range(1, 13):
+            # Small edits, so every version between snapshots is stored as a delta
+            nodes = [dict(item, position={'x': version, 'y': 0}) if item['id'] == 'step-0' else item for item in nodes]
+            if version % 3 == 0:
+                nodes = nodes + [node(f'extra-{version}')]
+                edges = edges + [edge('start', f'extra-{version}')]
+            saved[version] = (nodes, edges)
+            save_version(workflow, version, nodes, edges)
+
+        snapshots = WorkflowVersion.objects.filter(workflow=workflow, is_snapshot=True)
+        self.assertEqual(list(snapshots.order_by('version').values_list('version', flat=True)), [1, 6, 11])
+        for version, state in saved.items():
+            with self.subTest(version=version):
+                self.assertEqual(load_version(workflow, version), state)
+
+    def test_saved_version_is_not_overwritten(self):
+        workflow = Workflow.objects.create(name='Payroll')
+        save_version(workflow, 1, *chain('a'))
+        save_version(workflow, 1, *chain('b'))
+        self.assertEqual(load_version(workflow, 1), chain('a'))
+
+    def test_missing_version(self):
+        workflow = Workflow.objects.create(name='Payroll')
+        save_version(workflow, 1, *chain('a'))
+        with self.assertRaises(WorkflowVersion.DoesNotExist):
+            load_version(workflow, 2)
+
+    def test_load_and_restore_views(self):
+        user = User.objects.create_user('designer', password='secret')
+        self.client.force_login(user)
+        nodes, edges = chain('a')
+        workflow = Workflow.objects.create(name='Payroll', nodes=nodes, edges=edges)
+        workflow.create_new_version(created_by=user)
+        workflow.nodes, workflow.edges = chain('b')
+        workflow.save()
+
+        response = self.client.get(reverse('workflows:load_version', args=[workflow.pk, 1]))
+        self.assertEqual(response.json(), {'nodes': nodes, 'edges': edges, 'version': 1})
+        self.assertEqual(self.client.get(reverse('workflows:load_version', args=[workflow.pk, 5])).status_code, 404)
+
+        self.client.post(reverse('workflows:restore_version', args=[workflow.pk, 1]))
+        workflow.refresh_from_db()
+        self.assertEqual((workflow.nodes, workflow.edges, workflow.version), (nodes, edges, 3))
+        self.assertEqual(load_version(workflow, 2), chain('b'))
+
+
+class DiffTests(SimpleTestCase):
+
+    def test_categories(self):
+        old_nodes = [node('a'), node('b'), node('c'), node('d', owner='ops')]
+        new_nodes = [node('a', x=50), node('b', label='Approve'), node('d', owner='finance'), node('e')]
+        old_edges = [edge('a', 'b'), edge('b', 'c'), {'id': 'x', 'source': 'a', 'target': 'd', 'label': 'no'}]
+        new_edges = [
+            {'id': 'a-b', 'source': 'a', 'target': 'd'}, {'id': 'x', 'source': 'a', 'target': 'd', 'label': 'yes'},
+            edge('d', 'e'),
+        ]
+        result = diff_workflow(old_nodes, old_edges, new_nodes, new_edges)
+
+        self.assertEqual([item['id'] for item in result['nodes']['added']], ['e'])
+        self.assertEqual([item['id'] for item in result['nodes']['removed']], ['c'])
+        self.assertEqual([item['id'] for item in result['nodes']['moved']], ['a'])
+        self.assertEqual(result['nodes']['relabelled'], [{'id': 'b', 'from': 'b', 'to': 'Approve'}])
+        self.assertEqual(result['nodes']['changed'], [{'id': 'd', 'label': 'd', 'fields': ['data.owner']}])
+        self.assertEqual([item['id'] for item in result['edges']['added']], ['d-e'])
+        self.assertEqual([item['id'] for item in result['edges']['removed']], ['b-c'])
+        self.assertEqual(result['edges']['rewired'][0]['to'], {'source': 'a', 'target': 'd'})
+        self.assertEqual(result['edges']['changed'], [{'id': 'x', 'fields': ['label']}])
+        self.assertEqual(result['summary']['nodes_added'], 1)
+        self.assertFalse(result['layout_only'])
+
+    def test_layout_only(self):
+        nodes, edges = chain('a', 'b')
+        moved = [dict(item, position={'x': 10, 'y': 20}) for item in nodes]
+        self.assertTrue(diff_workflow(nodes, edges, moved, edges)['layout_only'])
+        self.assertFalse(diff_workflow(nodes, edges, nodes, edges)['layout_only'])
+
+        relabelled = moved[:-1] + [node('end', 'end', label='Done')]
+        self.assertFalse(diff_workflow(nodes, edges, relabelled, edges)['layout_only'])
+
+    def test_items_without_ids_are_never_layout_only(self):
+        nodes, edges = chain('a')
+        moved = [dict(item, position={'x': 10, 'y': 20}) for item in nodes]
+        edges.append({'source': 'a', 'target': 'end'})
+        self.assertFalse(diff_workflow(nodes, edges, moved, edges)['layout_only'])
+
+
+class DiffViewTests(TestCase):
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_user('designer', password='secret'))
+
+    def test_diff_against_current(self):
+        workflow = Workflow.objects.create(name='Payroll', nodes=chain('a')[0], edges=chain('a')[1])
+        workflow.create_new_version()
+        workflow.nodes, workflow.edges = chain('a', 'b')
+        workflow.save()
+
+        response = self.client.get(reverse('workflows:version_diff', args=[workflow.pk, '1', 'current']))
+        result = response.json()
+        self.assertEqual((result['from'], result['to']), ('1', 'current'))
+        self.assertEqual([item['id'] for item in result['nodes']['added']], ['b'])
+        self.assertEqual(
+            self.client.get(reverse('workflows:version_diff', args=[workflow.pk, '1', '9'])).status_code, 404
+        )
+
+    def test_moving_steps_keeps_the_version(self):
+        nodes, edges = chain('a')
+        workflow = Workflow.objects.create(name='Payroll', nodes=nodes, edges=edges)
+        moved = [dict(item, position={'x': 10, 'y': 20}) for item in nodes]
+        response = self.client.post(
+            reverse('workflows:save_workflow', args=[workflow.pk]), {'nodes': moved, 'edges': edges},
+            content_type='application/json',
+        )
+        self.assertEqual(response.json()['message'], 'Layout saved')
+        workflow.refresh_from_db()
+        self.assertEqual((workflow.nodes, workflow.version, workflow.revision), (moved, 1, 1))
+        self.assertFalse(WorkflowVersion.objects.filter(workflow=workflow).exists())
+
+
+class PatchingTests(SimpleTestCase):
+
+    def test_operations(self):
+        nodes, edges = chain('a', 'b')
+        result = apply_operations(nodes, edges, [
+            {'op': 'add_node', 'node': node('c')},
+            {'op': 'add_edge', 'edge': edge('a', 'c')},
+            {'op': 'update_node', 'id': 'a', 'data': {'owner': 'ops'}, 'unset': ['position']},
+            {'op': 'remove_node', 'id': 'b'},
+        ])
+        self.assertEqual([item['id'] for item in result['nodes']], ['start', 'a', 'end', 'c'])
+        self.assertEqual({item['id'] for item in result['edges']}, {'start-a', 'a-c'})
+        updated = result['nodes'][1]
+        self.assertEqual(updated['data'], {'label': 'a', 'owner': 'ops'})
+        self.assertNotIn('position', updated)
+        self.assertFalse(result['layout_only'])
+        # The stored lists are copied, not changed
+        self.assertEqual(nodes, chain('a', 'b')[0])
+
+    def test_layout_only(self):
+        nodes, edges = chain('a')
+        result = apply_operations(nodes, edges, [{'op': 'update_node', 'id': 'a', 'set': {'position': {'x': 5}}}])
+        self.assertTrue(result['layout_only'])
+        self.assertFalse(apply_operations(nodes, edges, [])['layout_only'])
+
+    def test_invalid_operations(self):
+        nodes, edges = chain('a')
+        for operations in (
+            {'op': 'add_node'},
+            ['remove_node'],
+            [{'op': 'remove_node', 'id': 'missing'}],
+            [{'op': 'update_node', 'id': ['a']}],
+            [{'op': 'update_node', 'id': {'a': 1}, 'set': {}}],
+            [{'op': 'update_node', 'id': 'a', 'unset': [['data']]}],
+            [{'op': 'add_node', 'node': node('a')}],
+            [{'op': 'add_edge', 'edge': edge('a', 'missing')}],
+            [{'op': 'rename_node', 'id': 'a'}],
+        ):
+            with self.subTest(operations=operations), self.assertRaises(InvalidPatch):
+                apply_operations(nodes, edges, operations)
+
+    def test_changed_links(self):
+        nodes = [node('a', system_id=1, script_id=7), node('b', system_id=2), node('c', system_id=2)]
+        result = apply_operations(nodes, [], [
+            {'op': 'update_node', 'id': 'a', 'data': {'system_id': 3}},
+            {'op': 'remove_node', 'id': 'b'},
+            {'op': 'add_node', 'node': node('d', script_id='8')},
+        ])
+        links = changed_links(result['nodes'], result['touched'])
+        # System 2 is still used by step c
+        self.assertEqual(links['systems'], ({3}, {1}))
+        self.assertEqual(links['scripts'], ({8}, set()))
+
+
+class PatchViewTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('designer', password='secret')
+        category = SystemCategory.objects.create(name='Servers', slug='servers')
+        status = SystemStatus.objects.create(name='Active', slug='active')
+        cls.system = System.objects.create(name='Payroll', category=category, status=status)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        self.workflow = Workflow.objects.create(name='Payroll run', nodes=chain('a')[0], edges=chain('a')[1])
+
+    def patch(self, revision, operations):
+        return self.client.patch(
+            reverse('workflows:patch_workflow', args=[self.workflow.pk]),
+            {'revision': revision, 'operations': operations}, content_type='application/json',
+        )
+
+    def test_patch_stores_a_version_and_links(self):
+        response = self.patch(0, [{'op': 'update_node', 'id': 'a', 'data': {'system_id': self.system.pk}}])
+        self.assertEqual(response.json()['revision'], 1)
+        self.workflow.refresh_from_db()
+        self.assertEqual(self.workflow.version, 2)
+        self.assertEqual(load_version(self.workflow, 1), chain('a'))
+        self.assertEqual(list(self.workflow.systems.all()), [self.system])
+
+        self.patch(1, [{'op': 'update_node', 'id': 'a', 'set': {'position': {'x': 5, 'y': 0}}}])
+        self.workflow.refresh_from_db()
+        # Moving a step only bumps the revision
+        self.assertEqual((self.workflow.version, self.workflow.revision), (2, 2))
+
+    def test_stale_revision_conflicts(self):
+        self.assertEqual(self.patch(0, [{'op': 'remove_node', 'id': 'a'}]).status_code, 200)
+        response = self.patch(0, [{'op': 'add_node', 'node': node('b')}])
+        self.assertEqual((response.status_code, response.json()['revision']), (409, 1))
+
+    def test_invalid_patch(self):
+        self.assertEqual(self.patch(0, [{'op': 'remove_node', 'id': 'missing'}]).status_code, 400)
+        self.assertEqual(self.patch('latest', []).status_code, 400)
+        self.workflow.refresh_from_db()
+        self.assertEqual(self.workflow.revision, 0)
+
+
+class ProjectionTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        category = SystemCategory.objects.create(name='Servers', slug='servers')
+        status = SystemStatus.objects.create(name='Active', slug='active')
+        cls.system = System.objects.create(name='Payroll', category=category, status=status)
+
+    def test_saves_are_projected(self):
+        nodes, edges = chain('a', 'b')
+        workflow = Workflow.objects.create(name='Payroll run', nodes=nodes, edges=edges)
+        self.assertEqual(
+            set(WorkflowNode.objects.filter(workflow=workflow).values_list('node_id', 'type')),
+            {('start', 'start'), ('a', 'step'), ('b', 'step'), ('end', 'end')},
+        )
+        self.assertEqual(WorkflowEdge.objects.filter(workflow=workflow).count(), 3)
+
+        workflow.nodes = [node('a', system_id=self.system.pk) if item['id'] == 'a' else item for item in nodes]
+        workflow.save()
+        self.assertEqual(WorkflowNode.objects.get(workflow=workflow, node_id='a').system_id, self.system.pk)
+        self.assertEqual(list(workflows_using_system(self.system.pk)), [workflow])
+        self.assertEqual(workflows_using_system(self.system.pk).get().step_count, 2)
+
+    def test_only_differences_are_written(self):
+        nodes, edges = chain('a', 'b')
+        workflow = Workflow.objects.create(name='Payroll run', nodes=nodes, edges=edges)
+
+        workflow.nodes = [dict(item, position={'x': 99, 'y': 99}) for item in nodes]
+        self.assertEqual(sync_workflow_graph(workflow), 0)
+
+        workflow.nodes = [node('a', label='Approve')] + nodes[2:]
+        workflow.edges = edges[1:]
+        # a is relabelled; start and its edge are deleted
+        self.assertEqual(sync_workflow_graph(workflow), 3)
+        self.assertEqual(WorkflowNode.objects.get(workflow=workflow, node_id='a').label, 'Approve')
+
+    def test_other_fields_leave_the_projection_alone(self):
+        workflow = Workflow.objects.create(name='Payroll run', nodes=chain('a')[0], edges=[])
+        WorkflowNode.objects.filter(workflow=workflow).delete()
+        workflow.version += 1
+        workflow.save(update_fields=['version'])
+        self.assertFalse(WorkflowNode.objects.filter(workflow=workflow).exists())
+
+    def test_script_steps_and_rebuild(self):
+        script = Script.objects.create(name='Payroll export')
+        nodes = [node('b', label='Export', script_id=script.pk), node('a', label='Check', script_id=script.pk)]
+        workflow = Workflow.objects.create(name='Payroll run', nodes=nodes, edges=[])
+        WorkflowNode.objects.all().delete()
+        self.assertEqual(rebuild_workflow_graphs(), 1)
+
+        found = workflows_using_script(script.pk).get()
+        self.assertEqual(found, workflow)
+        self.assertEqual([step.label for step in found.script_steps], ['Check', 'Export'])
+
+
+class AnalysisTests(SimpleTestCase):
+
+    def test_critical_path(self):
+        nodes = [
+            node('start', 'start'), node('quick', duration=1), node('slow', duration=5), node('check', duration='2'),
+            node('end', 'end'),
+        ]
+        edges = [
+            edge('start', 'quick'), edge('start', 'slow'), edge('quick', 'check'), edge('slow', 'check'),
+            edge('check', 'end'),
+        ]
+        result = analyze_graph(nodes, edges)
+        self.assertTrue(result['valid'])
+        self.assertEqual([item['id'] for item in result['critical_path']['nodes']], ['start', 'slow', 'check', 'end'])
+        self.assertEqual(result['critical_path']['duration'], 7)
+        self.assertIsNone(result['critical_path_error'])
+
+    def test_cycles(self):
+        nodes, edges = chain('a', 'b', 'c')
+        result = analyze_graph(nodes, edges + [edge('c', 'a'), edge('end', 'end')])
+        self.assertCountEqual(
+            [[item['id'] for item in cycle] for cycle in result['cycles']], [['a', 'b', 'c'], ['end']]
+        )
+        self.assertIsNone(result['critical_path'])
+        self.assertEqual(result['critical_path_error'], 'A cycle between the start and end makes the path unbounded')
+        self.assertFalse(result['valid'])
+
+    def test_cycle_off_the_route(self):
+        nodes, edges = chain('a')
+        nodes += [node('x'), node('y')]
+        edges += [edge('a', 'x'), edge('x', 'y'), edge('y', 'x')]
+        result = analyze_graph(nodes, edges)
+        self.assertEqual(len(result['cycles']), 1)
+        self.assertEqual({item['id'] for item in result['dead_ends']}, {'x', 'y'})
+        self.assertEqual([item['id'] for item in result['critical_path']['nodes']], ['start', 'a', 'end'])
+
+    def test_structural_problems(self):
+        nodes, edges = chain('a')
+        nodes.append(node('orphan'))
+        edges.append(edge('a', 'ghost'))
+        result = analyze_graph(nodes, edges)
+        self.assertEqual([item['id'] for item in result['unreachable']], ['orphan'])
+        self.assertEqual(result['dangling_edges'], ['a-ghost'])
+        self.assertEqual(result['edge_count'], 2)
+        self.assertFalse(result['valid'])
+
+    def test_missing_end(self):
+        result = analyze_graph([node('start', 'start'), node('a')], [edge('start', 'a')])
+        self.assertEqual(result['critical_path_error'], 'The workflow needs a start and an end node')
+        self.assertFalse(result['valid'])
+
+    def test_malformed_input(self):
+        result = analyze_graph({}, None)
+        self.assertEqual(result['node_count'], 0)
+        self.assertFalse(result['valid'])
+
+
+class AnalysisViewTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(User.objects.create_user('designer', password='secret'))
+
+    def analysis(self, workflow, version):
+        response = self.client.get(reverse('workflows:version_analysis', args=[workflow.pk, version]))
+        return response.json() if response.status_code == 200 else response.status_code
+
+    def test_cached_until_the_workflow_changes(self):
+        nodes, edges = chain('a')
+        workflow = Workflow.objects.create(name='Payroll run', nodes=nodes, edges=edges)
+        self.assertTrue(self.analysis(workflow, 'current')['valid'])
+
+        workflow.edges = edges[:1]
+        workflow.save()
+        self.assertFalse(self.analysis(workflow, 'current')['valid'])
+
+        workflow.create_new_version()
+        self.assertEqual(self.analysis(workflow, '1')['version'], 1)
+        self.assertEqual(self.analysis(workflow, '7'), 404)
@@ -15,7 +15,10 @@ urlpatterns = [
     # New workflow designer URLs
     path('<int:pk>/designer/', views.workflow_designer, name='designer'),
     path('<int:pk>/save/', views.save_workflow, name='save_workflow'),
+    path('<int:pk>/patch/', views.patch_workflow, name='patch_workflow'),
     path('<int:pk>/versions/', views.workflow_versions, name='versions'),
     path('<int:pk>/versions/<str:version>/', views.load_workflow_version, name='load_version'),
+    path('<int:pk>/versions/<str:version_a>/diff/<str:version_b>/', views.workflow_version_diff, name='version_diff'),
+    path('<int:pk>/versions/<str:version>/analysis/', views.workflow_analysis, name='version_analysis'),
     path('<int:pk>/versions/<int:version>/restore/', views.restore_workflow_version, name='restore_version'),
 ]
\ No newline at end of file
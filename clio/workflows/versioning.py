@@ -0,0 +1,200 @@
+# workflows/versioning.py
+
+"""
+Compact storage for workflow versions.
+
+Saving from the designer used to copy the whole nodes and edges JSON into a
+new WorkflowVersion row every time. Now most rows hold only a delta against
+the version before them, keyed by node and edge id: the items added and
+removed, the top-level keys changed on the others, and the new id order when
+it changed. Every WORKFLOW_SNAPSHOT_INTERVAL versions, and whenever a delta
+would not be much smaller, the full state is stored instead. Any version is
+rebuilt by replaying the deltas after the nearest snapshot at or before it,
+fetched together in one query. Payloads are zlib-compressed unless
+WORKFLOW_VERSION_COMPRESSION is off; each row records its own encoding, so
+the setting can change at any time.
+"""
+
+import json
+import zlib
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import WorkflowVersion
+
+COMPRESSION_NONE = ''
+COMPRESSION_ZLIB = 'zlib'
+# A delta at least this share of the full state's size is stored as a snapshot
+MAX_DELTA_RATIO = 0.5
+
+
+def _snapshot_interval():
+    return max(getattr(settings, 'WORKFLOW_SNAPSHOT_INTERVAL', 20), 1)
+
+
+def _compression():
+    return COMPRESSION_ZLIB if getattr(settings, 'WORKFLOW_VERSION_COMPRESSION', True) else COMPRESSION_NONE
+
+
+def encode_payload(payload, compression):
+    data = json.dumps(payload, separators=(',', ':')).encode()
+    return zlib.compress(data) if compression == COMPRESSION_ZLIB else data
+
+
+def decode_payload(data, compression):
+    data = bytes(data)
+    return json.loads(zlib.decompress(data) if compression == COMPRESSION_ZLIB else data)
+
+
+def _keyed(items):
+    """Index a list of dicts by id, or None if any lacks a unique string id"""
+    if not isinstance(items, list):
+        return None
+    index = {}
+    for item in items:
+        # Ids become JSON object keys in a delta, so they must be strings
+        if not isinstance(item, dict) or not isinstance(item.get('id'), str) or item['id'] in index:
+            return None
+        index[item['id']] = item
+    return index
+
+
+def diff_items(old, new):
+    """
+    Describe how a list of items with ids changed
+
+    Returns:
+        dict with the optional keys add (new items in order), remove (ids),
+        change ({id: {'set': {key: value}, 'unset': [keys]}}) and order (the
+        new id order, only when appending the added items to the remaining
+        ones would not give it); None if either list can't be keyed by id
+    """
+    old_index, new_index = _keyed(old), _keyed(new)
+    if old_index is None or new_index is None:
+        return None
+
+    delta = {}
+    removed = [item_id for item_id in old_index if item_id not in new_index]
+    added = [item for item_id, item in new_index.items() if item_id not in old_index]
+    changes = {}
+    for item_id, item in new_index.items():
+        before = old_index.get(item_id)
+        if before is None or before == item:
+            continue
+        changed = {key: value for key, value in item.items() if key not in before or before[key] != value}
+        unset = [key for key in before if key not in item]
+        changes[item_id] = {'set': changed, 'unset': unset} if unset else {'set': changed}
+
+    if removed:
+        delta['remove'] = removed
+    if added:
+        delta['add'] = added
+    if changes:
+        delta['change'] = changes
+    expected_order = [item_id for item_id in old_index if item_id in new_index] + [item['id'] for item in added]
+    if expected_order != list(new_index):
+        delta['order'] = list(new_index)
+    return delta
+
+
+def apply_items_delta(items, delta):
+    """Apply a diff_items delta to a list of items, returning a new list"""
+    removed = set(delta.get('remove', ()))
+    index = {item['id']: item for item in items if item['id'] not in removed}
+    for item_id, change in delta.get('change', {}).items():
+        item = {key: value for key, value in index[item_id].items() if key not in change.get('unset', ())}
+        item.update(change['set'])
+        index[item_id] = item
+    for item in delta.get('add', ()):
+        index[item['id']] = item
+    order = delta.get('order')
+    return [index[item_id] for item_id in order] if order else list(index.values())
+
+
+def encode_version(nodes, edges, previous=None, since_snapshot=0, compression=COMPRESSION_ZLIB):
+    """
+    Build the stored fields for one version
+
+    Args:
+        nodes, edges: The version's full state
+        previous: (nodes, edges) of the version before it, if any
+        since_snapshot: Versions stored since the last snapshot
+
+    Returns:
+        dict of WorkflowVersion field values: is_snapshot, compression, data
+    """
+    full = encode_payload({'nodes': nodes, 'edges': edges}, compression)
+    if previous is not None and since_snapshot < _snapshot_interval() - 1:
+        node_delta = diff_items(previous[0], nodes)
+        edge_delta = diff_items(previous[1], edges)
+        if node_delta is not None and edge_delta is not None:
+            data = encode_payload({'nodes': node_delta, 'edges': edge_delta}, compression)
+            if len(data) < len(full) * MAX_DELTA_RATIO:
+                return {'is_snapshot': False, 'compression': compression, 'data': data}
+    return {'is_snapshot': True, 'compression': compression, 'data': full}
+
+
+def replay_versions(rows):
+    """
+    Rebuild the state after a run of stored versions
+
+    Args:
+        rows: (is_snapshot, compression, data) in version order, starting
+              with a snapshot
+
+    Returns:
+        (nodes, edges)
+    """
+    nodes = edges = None
+    for is_snapshot, compression, data in rows:
+        payload = decode_payload(data, compression)
+        if is_snapshot:
+            nodes, edges = payload['nodes'], payload['edges']
+        else:
+            nodes = apply_items_delta(nodes, payload['nodes'])
+            edges = apply_items_delta(edges, payload['edges'])
+    return nodes, edges
+
+
+def _chain(workflow, version):
+    """The stored rows from the nearest snapshot up to version, in order"""
+    versions = WorkflowVersion.objects.filter(workflow=workflow, version__lte=version)
+    snapshot = versions.filter(is_snapshot=True).order_by('-version').values('version')[:1]
+    return list(
+        versions.filter(version__gte=snapshot).order_by('version')
+        .values_list('version', 'is_snapshot', 'compression', 'data')
+    )
+
+
+def load_version(workflow, version):
+    """
+    Return the (nodes, edges) stored for a version of a workflow
+
+    Raises:
+        WorkflowVersion.DoesNotExist: If the version isn't stored
+    """
+    rows = _chain(workflow, version)
+    if not rows or rows[-1][0] != version:
+        raise WorkflowVersion.DoesNotExist(f'Workflow {workflow.pk} has no version {version}')
+    return replay_versions(row[1:] for row in rows)
+
+
+def save_version(workflow, version, nodes, edges, created_by=None):
+    """
+    Store the state of a workflow at a version
+
+    A version that was already stored is left alone, since the state a
+    version number stands for never changes.
+    """
+    with transaction.atomic():
+        if WorkflowVersion.objects.filter(workflow=workflow, version=version).exists():
+            return
+        rows = _chain(workflow, version - 1)
+        previous = replay_versions(row[1:] for row in rows) if rows else None
+        WorkflowVersion.objects.create(
+            workflow=workflow,
+            version=version,
+            created_by=created_by,
+            **encode_version(nodes, edges, previous, len(rows) - 1 if rows else 0, _compression()),
+        )
@@ -2,27 +2,45 @@
 
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
-from django.http import JsonResponse
-from django.views.decorators.http import require_POST
+from django.http import Http404, JsonResponse
+from django.views.decorators.http import require_http_methods, require_POST
 from django.contrib.auth.decorators import login_required
+from django.db import transaction
+from django.db.models import Count
 import json
+from core.pagination import KeysetPaginator, InvalidCursor, parse_per_page
+from core.profiling import query_budget
 from .models import Workflow, WorkflowVersion, WorkflowDocument
+from .analysis import analyze_workflow
+from .diff import diff_workflow, is_layout_only
+from .patching import InvalidPatch, apply_operations, changed_links
+from .versioning import load_version, save_version
 from .forms import WorkflowForm, WorkflowDocumentForm
 from systems.models import System
 from scripts.models import Script
 
 @login_required
+@query_budget(8, duplicates=0)
 def workflow_list(request):
     """View to list all workflows"""
     status_filter = request.GET.get('status')
     
-    workflows = Workflow.objects.all()
+    workflows = Workflow.objects.annotate(system_count=Count('systems'))
     
     if status_filter:
         workflows = workflows.filter(status=status_filter)
     
+    paginator = KeysetPaginator(workflows, ['-updated_at'], per_page=parse_per_page(request.GET.get('per_page')),
+                                count='approximate')
+    try:
+        page_obj = paginator.page(request.GET.get('cursor'))
+    except InvalidCursor:
+        page_obj = paginator.page()
+    
     context = {
-        'workflows': workflows,
+        'workflows': page_obj,
+        'page_obj': page_obj,
+        'paginator': paginator,
         'status_filter': status_filter,
         'status_choices': Workflow.STATUS_CHOICES,
     }
@@ -58,6 +76,7 @@ def workflow_detail(request, pk):
         'documents': documents,
         'systems': systems,
         'scripts': scripts,
+        'analysis': analyze_workflow(workflow),
     }
     
     return render(request, 'workflows/workflow_detail.html', context)
@@ -100,11 +119,8 @@ def workflow_create(request):
             workflow.save()
             
             # Create initial version
-            WorkflowVersion.objects.create(
-                workflow=workflow,
-                version=1,
-                nodes=nodes,
-                edges=edges,
+            save_version(
+                workflow, 1, nodes, edges,
                 created_by=request.user if request.user.is_authenticated else None
             )
             
@@ -188,7 +204,8 @@ def workflow_designer(request, pk):
             'name': workflow.name,
             'nodes': workflow_nodes,
             'edges': workflow_edges,
-            'version': workflow.version
+            'version': workflow.version,
+            'revision': workflow.revision
         })
     }
     
@@ -201,14 +218,27 @@ def save_workflow(request, pk):
     workflow = get_object_or_404(Workflow, pk=pk)
     data = json.loads(request.body)
     
+    # Dragging steps around doesn't make a new version
+    if is_layout_only(workflow.nodes, workflow.edges, data.get('nodes'), data.get('edges')):
+        workflow.nodes = data['nodes']
+        workflow.revision += 1
+        workflow.save(update_fields=['nodes', 'revision', 'updated_at'])
+        return JsonResponse({
+            'success': True,
+            'message': 'Layout saved',
+            'version': workflow.version,
+            'revision': workflow.revision
+        })
+    
     # Create a new version if changes were made
     if (workflow.nodes != data.get('nodes') or workflow.edges != data.get('edges')):
         # Store the current state as a version
-        workflow.create_new_version()
+        workflow.create_new_version(created_by=request.user)
         
         # Update the workflow with new data
         workflow.nodes = data.get('nodes', [])
         workflow.edges = data.get('edges', [])
+        workflow.revision += 1
         workflow.save()
         
         # Extract system IDs and script IDs from nodes and update M2M relationships
@@ -234,16 +264,73 @@ def save_workflow(request, pk):
         return JsonResponse({
             'success': True, 
             'message': 'Workflow saved successfully',
-            'version': workflow.version
+            'version': workflow.version,
+            'revision': workflow.revision
         })
     
-    return JsonResponse({'success': True, 'message': 'No changes detected'})
+    return JsonResponse({'success': True, 'message': 'No changes detected', 'revision': workflow.revision})
+
+@login_required
+@require_http_methods(['PATCH'])
+def patch_workflow(request, pk):
+    """Apply the designer's node and edge operations to a workflow
+    
+    The body is {"revision": <revision the client last saw>, "operations":
+    [...]}, with the operations described in workflows/patching.py. If the
+    workflow has been saved since that revision nothing is applied and the
+    response is a 409 with the current revision. Moving nodes keeps the
+    version; any other change stores the previous state as a version first.
+    """
+    try:
+        data = json.loads(request.body)
+        revision = int(data['revision'])
+        operations = data['operations']
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({'success': False, 'message': 'Expected revision and operations'}, status=400)
+    
+    with transaction.atomic():
+        workflow = get_object_or_404(Workflow.objects.select_for_update(), pk=pk)
+        if workflow.revision != revision:
+            return JsonResponse({
+                'success': False,
+                'message': 'The workflow was changed elsewhere; reload it before saving',
+                'revision': workflow.revision
+            }, status=409)
+        
+        try:
+            patch = apply_operations(workflow.nodes, workflow.edges, operations)
+        except InvalidPatch as e:
+            return JsonResponse({'success': False, 'message': str(e)}, status=400)
+        
+        if not patch['layout_only']:
+            workflow.create_new_version(created_by=request.user)
+        workflow.nodes = patch['nodes']
+        workflow.edges = patch['edges']
+        workflow.revision += 1
+        workflow.save(update_fields=['nodes', 'edges', 'revision', 'updated_at'])
+        
+        # Only the links the touched steps gained or lost
+        links = changed_links(patch['nodes'], patch['touched'])
+        for relation, model in (('systems', System), ('scripts', Script)):
+            added, removed = links[relation]
+            if added:
+                getattr(workflow, relation).add(*model.objects.filter(pk__in=added).values_list('pk', flat=True))
+            if removed:
+                getattr(workflow, relation).remove(*removed)
+    
+    return JsonResponse({
+        'success': True,
+        'message': 'Layout saved' if patch['layout_only'] else 'Workflow saved successfully',
+        'version': workflow.version,
+        'revision': workflow.revision
+    })
 
 @login_required
 def workflow_versions(request, pk):
     """View versions of a workflow"""
     workflow = get_object_or_404(Workflow, pk=pk)
-    versions = WorkflowVersion.objects.filter(workflow=workflow)
+    # The stored payloads aren't shown here
+    versions = WorkflowVersion.objects.filter(workflow=workflow).select_related('created_by').defer('data')
     
     context = {
         'workflow': workflow,
@@ -252,6 +339,13 @@ def workflow_versions(request, pk):
     
     return render(request, 'workflows/workflow_versions.html', context)
 
+def _load_version_or_404(workflow, version):
+    """Rebuild the nodes and edges of a stored version"""
+    try:
+        return load_version(workflow, int(version))
+    except (ValueError, WorkflowVersion.DoesNotExist):
+        raise Http404('No such workflow version')
+
 @login_required
 def load_workflow_version(request, pk, version):
     """Load a specific version of a workflow"""
@@ -264,15 +358,50 @@ def load_workflow_version(request, pk, version):
             'version': workflow.version
         }
     else:
-        version_obj = get_object_or_404(WorkflowVersion, workflow=workflow, version=version)
+        nodes, edges = _load_version_or_404(workflow, version)
         data = {
-            'nodes': version_obj.nodes,
-            'edges': version_obj.edges,
-            'version': version_obj.version
+            'nodes': nodes,
+            'edges': edges,
+            'version': int(version)
         }
     
     return JsonResponse(data)
 
+@login_required
+def workflow_version_diff(request, pk, version_a, version_b):
+    """API endpoint listing what changed from one version to another
+    
+    Either version may be 'current' for the workflow as it is now.
+    """
+    workflow = get_object_or_404(Workflow, pk=pk)
+    
+    states = []
+    for version in (version_a, version_b):
+        if version == 'current':
+            states.append((workflow.nodes, workflow.edges))
+        else:
+            states.append(_load_version_or_404(workflow, version))
+    (old_nodes, old_edges), (new_nodes, new_edges) = states
+    
+    diff = diff_workflow(old_nodes, old_edges, new_nodes, new_edges)
+    diff['from'] = version_a
+    diff['to'] = version_b
+    return JsonResponse(diff)
+
+@login_required
+def workflow_analysis(request, pk, version):
+    """API endpoint with the graph checks and critical path of a version
+    
+    The version may be 'current' for the workflow as it is now.
+    """
+    workflow = get_object_or_404(Workflow, pk=pk)
+    
+    try:
+        analysis = analyze_workflow(workflow, None if version == 'current' else int(version))
+    except (ValueError, WorkflowVersion.DoesNotExist):
+        raise Http404('No such workflow version')
+    return JsonResponse(analysis)
+
 @login_required
 def restore_workflow_version(request, pk, version):
     """Restore a workflow to a previous version"""
@@ -280,14 +409,15 @@ def restore_workflow_version(request, pk, version):
         return JsonResponse({'success': False, 'message': 'Invalid request method'})
         
     workflow = get_object_or_404(Workflow, pk=pk)
-    version_obj = get_object_or_404(WorkflowVersion, workflow=workflow, version=version)
+    nodes, edges = _load_version_or_404(workflow, version)
     
     # Create a version of the current state before restoring
-    workflow.create_new_version()
+    workflow.create_new_version(created_by=request.user)
     
     # Update workflow with version data
-    workflow.nodes = version_obj.nodes
-    workflow.edges = version_obj.edges
+    workflow.nodes = nodes
+    workflow.edges = edges
+    workflow.revision += 1
     workflow.save()
     
     messages.success(request, f'Workflow restored to version {version}')
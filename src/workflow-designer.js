@@ -516,7 +516,21 @@ const PropertiesPanel = ({ selectedNode, systemsList, scriptsList, updateNodeDat
             />
           </div>
         )}
-        
+
+        {(selectedNode.type === 'step' || selectedNode.type === 'decision') && (
+          <div>
+            <label className="block text-sm font-medium text-gray-700">Estimated Duration (hours)</label>
+            <input
+              type="number"
+              min="0"
+              step="0.25"
+              value={selectedNode.data.duration ?? ''}
+              onChange={(e) => updateNodeData(selectedNode.id, 'duration', e.target.value)}
+              className="mt-1 block w-full border border-gray-300 rounded-md shadow-sm p-2"
+            />
+          </div>
+        )}
+
         {selectedNode.type === 'step' && (
           <>
             <div>
@@ -671,6 +685,58 @@ const ActiveConnectionLine = ({ from, to }) => {
   );
 };
 
+// Operations turning the last saved nodes and edges into the current ones,
+// in the format the patch endpoint expects
+const buildOperations = (saved, nodes, edges) => {
+  const byId = items => new Map(items.map(item => [item.id, item]));
+  // Keys set or changed on after, and keys it no longer has
+  const update = (before, after) => {
+    const set = Object.keys(after).filter(key => JSON.stringify(before[key]) !== JSON.stringify(after[key]));
+    const unset = Object.keys(before).filter(key => !(key in after));
+    if (!set.length && !unset.length) return null;
+    return { set: Object.fromEntries(set.map(key => [key, after[key]])), ...(unset.length ? { unset } : {}) };
+  };
+  const savedNodes = byId(saved.nodes);
+  const savedEdges = byId(saved.edges);
+  const currentNodes = byId(nodes);
+  const currentEdges = byId(edges);
+  const removedNodes = new Set(saved.nodes.filter(node => !currentNodes.has(node.id)).map(node => node.id));
+  const operations = [];
+
+  // Removing a node removes its edges on the server too
+  saved.edges.forEach(edge => {
+    if (!currentEdges.has(edge.id) && !removedNodes.has(edge.source) && !removedNodes.has(edge.target)) {
+      operations.push({ op: 'remove_edge', id: edge.id });
+    }
+  });
+  removedNodes.forEach(id => operations.push({ op: 'remove_node', id }));
+
+  nodes.forEach(node => {
+    const before = savedNodes.get(node.id);
+    if (!before) {
+      operations.push({ op: 'add_node', node });
+      return;
+    }
+    const changes = update(before, node);
+    if (changes) {
+      operations.push({ op: 'update_node', id: node.id, ...changes });
+    }
+  });
+
+  edges.forEach(edge => {
+    const before = savedEdges.get(edge.id);
+    if (!before) {
+      operations.push({ op: 'add_edge', edge });
+      return;
+    }
+    const changes = update(before, edge);
+    if (changes) {
+      operations.push({ op: 'update_edge', id: edge.id, ...changes });
+    }
+  });
+  return operations;
+};
+
 // Main workflow designer component
 const WorkflowDesigner = () => {
   // Get data from container element
@@ -678,7 +744,7 @@ const WorkflowDesigner = () => {
   let workflowData = { nodes: [], edges: [], name: 'Workflow' };
   let systemsList = [];
   let scriptsList = [];
-  let apiUrls = { save: '', detail: '' };
+  let apiUrls = { save: '', patch: '', detail: '' };
   
   if (container) {
     try {
@@ -686,6 +752,7 @@ const WorkflowDesigner = () => {
       const systemsStr = container.getAttribute('data-systems');
       const scriptsStr = container.getAttribute('data-scripts');
       const saveUrl = container.getAttribute('data-save-url') || '';
+      const patchUrl = container.getAttribute('data-patch-url') || '';
       const detailUrl = container.getAttribute('data-detail-url') || '';
       
       try {
@@ -709,7 +776,7 @@ const WorkflowDesigner = () => {
         scriptsList = [];
       }
       
-      apiUrls = { save: saveUrl, detail: detailUrl };
+      apiUrls = { save: saveUrl, patch: patchUrl, detail: detailUrl };
     } catch (e) {
       console.error('Error getting data from container:', e);
     }
@@ -723,6 +790,12 @@ const WorkflowDesigner = () => {
   const [isDirty, setIsDirty] = useState(false);
   const [isSaving, setIsSaving] = useState(false);
   const [successMessage, setSuccessMessage] = useState('');
+  // What the server last confirmed, to send only the changes since then
+  const savedState = useRef({
+    nodes: workflowData.nodes || [],
+    edges: workflowData.edges || [],
+    revision: workflowData.revision,
+  });
   
   // Connection state
   const [isConnecting, setIsConnecting] = useState(false);
@@ -956,13 +1029,20 @@ const WorkflowDesigner = () => {
         return;
       }
       
-      const response = await fetch(apiUrls.save, {
-        method: 'POST',
+      // Send only the operations since the last save when the server told us
+      // which revision that was; otherwise the whole workflow
+      const saved = savedState.current;
+      const patching = Boolean(apiUrls.patch) && saved.revision !== undefined;
+      const response = await fetch(patching ? apiUrls.patch : apiUrls.save, {
+        method: patching ? 'PATCH' : 'POST',
         headers: {
           'Content-Type': 'application/json',
           'X-CSRFToken': csrfToken,
         },
-        body: JSON.stringify({
+        body: JSON.stringify(patching ? {
+          revision: saved.revision,
+          operations: buildOperations(saved, nodes, edges),
+        } : {
           nodes,
           edges,
         }),
@@ -970,7 +1050,10 @@ const WorkflowDesigner = () => {
       
       const data = await response.json();
       
-      if (data.success) {
+      if (response.status === 409) {
+        alert(data.message || 'The workflow was changed elsewhere; reload it before saving');
+      } else if (data.success) {
+        savedState.current = { nodes, edges, revision: data.revision };
         setIsDirty(false);
         setSuccessMessage(data.message || 'Workflow saved successfully');
         